@@ -4,6 +4,7 @@ Punto de entrada principal para la API de DeepSeek.
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 import os
 import logging
 
@@ -11,15 +12,24 @@ from src.api.routes import router as api_router
 from src.api.middlewares.logging_middleware import LoggingMiddleware
 from src.api.middlewares.auth_middleware import APIKeyMiddleware
 from src.config.settings import get_settings
+from src.services.deepseek_service import iniciar_cliente_http, cerrar_cliente_http
 
 # Obtener configuración
 settings = get_settings()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Crea el pool de conexiones hacia DeepSeek al iniciar y lo cierra al apagar."""
+    await iniciar_cliente_http()
+    yield
+    await cerrar_cliente_http()
+
 # Inicialización de la aplicación FastAPI
 app = FastAPI(
     title="EIVAI IA Assistant API",
     description="API de Asistente de IA para el Sistema de Gestión de Instrumental Quirúrgico EIVAI",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configuración de CORS
@@ -35,7 +35,7 @@ class DeepSeekController:
         }
     
     @staticmethod
-    def procesar_texto(
+    async def procesar_texto(
         texto: str, 
         temperatura: Optional[float] = settings.TEMPERATURA_PREDETERMINADA, 
         max_tokens: Optional[int] = settings.MAX_TOKENS_PREDETERMINADO, 
@@ -61,7 +61,7 @@ class DeepSeekController:
             servicio = DeepSeekService()
             
             # Procesar texto
-            resultado = servicio.procesar_texto(
+            resultado = await servicio.procesar_texto(
                 texto=texto,
                 temperatura=temperatura,
                 max_tokens=max_tokens,
@@ -1,18 +1,35 @@
 """
 Controlador especializado para EIVAI Assistant API.
 """
+import asyncio
+import json
 import time
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator
 from datetime import datetime
 
 from src.services.eivai_assistant_service import EIVAIAssistantService
 from src.services.deepseek_service import DeepSeekException
+from src.services.response_cache import cache_respuestas
+from src.services.single_flight import solicitudes_en_curso
 from src.config.settings import get_settings
 
 settings = get_settings()
 logger = logging.getLogger("eivai_assistant")
 
+def formatear_evento_sse(evento: str, datos: Dict[str, Any]) -> str:
+    """
+    Formatea un evento server-sent events.
+    
+    Args:
+        evento: Nombre del evento
+        datos: Datos del evento (se serializan como JSON en una línea)
+        
+    Returns:
+        Evento en formato text/event-stream
+    """
+    return f"event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
 class EIVAIAssistantController:
     """
     Controlador para el asistente de IA de EIVAI.
@@ -49,7 +66,9 @@ class EIVAIAssistantController:
                     "ultimo_mantenimiento": datetime.now().strftime("%Y-%m-%d")
                 },
                 "timestamp": datetime.now().isoformat(),
-                "servicios_ia_activos": True
+                "servicios_ia_activos": True,
+                "cache_respuestas": cache_respuestas.estadisticas() if cache_respuestas is not None else None,
+                "solicitudes_compartidas": solicitudes_en_curso.estadisticas() if solicitudes_en_curso is not None else None
             }
             
             logger.info("Estado de EIVAI Assistant verificado exitosamente")
@@ -70,7 +89,8 @@ class EIVAIAssistantController:
         conteo_final: list,
         tipo_cirugia: str,
         procedimiento_id: Optional[int] = None,
-        incluir_recomendaciones: bool = True
+        incluir_recomendaciones: bool = True,
+        forzar_analisis_ia: bool = False
     ) -> Dict[str, Any]:
         """
         Analiza conteos de instrumentos quirúrgicos.
@@ -81,6 +101,7 @@ class EIVAIAssistantController:
             tipo_cirugia: Tipo de procedimiento quirúrgico
             procedimiento_id: ID del procedimiento (opcional)
             incluir_recomendaciones: Si incluir recomendaciones
+            forzar_analisis_ia: Si solicitar el análisis de IA aunque los conteos coincidan
             
         Returns:
             Análisis detallado con discrepancias y recomendaciones
@@ -98,11 +119,12 @@ class EIVAIAssistantController:
                 raise ValueError("Los conteos inicial y final son requeridos")
             
             # Procesar análisis con el servicio especializado
-            resultado = self.assistant_service.analizar_conteo_instrumentos(
+            resultado = await self.assistant_service.analizar_conteo_instrumentos(
                 conteo_inicial=conteo_inicial,
                 conteo_final=conteo_final,
                 tipo_cirugia=tipo_cirugia,
-                incluir_recomendaciones=incluir_recomendaciones
+                incluir_recomendaciones=incluir_recomendaciones,
+                forzar_analisis_ia=forzar_analisis_ia
             )
             
             # Agregar metadatos adicionales
@@ -152,7 +174,7 @@ class EIVAIAssistantController:
                     raise ValueError(f"Campo requerido faltante: {campo}")
             
             # Generar reporte con el servicio
-            resultado = self.assistant_service.generar_reporte_quirurgico(
+            resultado = await self.assistant_service.generar_reporte_quirurgico(
                 procedimiento_data=procedimiento_data,
                 incluir_recomendaciones=incluir_recomendaciones
             )
@@ -204,7 +226,7 @@ class EIVAIAssistantController:
                 raise ValueError("La consulta no puede estar vacía")
             
             # Procesar con el servicio de asistente
-            resultado = self.assistant_service.consulta_natural_instrumentos(consulta)
+            resultado = await self.assistant_service.consulta_natural_instrumentos(consulta)
             
             # Agregar contexto adicional si se proporciona
             if contexto_adicional:
@@ -227,6 +249,128 @@ class EIVAIAssistantController:
             logger.error(f"Error inesperado procesando consulta: {str(e)}")
             raise
     
+    def generar_reporte_quirurgico_stream(
+        self,
+        procedimiento_data: Dict[str, Any],
+        incluir_recomendaciones: bool = True,
+        incluir_analisis_detallado: bool = False
+    ) -> AsyncIterator[str]:
+        """
+        Genera un reporte de procedimiento quirúrgico como eventos SSE.
+        
+        La validación ocurre antes de iniciar el streaming para poder responder
+        con un error HTTP.
+        
+        Args:
+            procedimiento_data: Datos del procedimiento quirúrgico
+            incluir_recomendaciones: Si incluir recomendaciones
+            incluir_analisis_detallado: Si incluir análisis detallado
+            
+        Returns:
+            Iterador de eventos SSE ("inicio", "token", "fin" o "error")
+            
+        Raises:
+            ValueError: Si faltan campos requeridos
+        """
+        campos_requeridos = ['procedimiento_id', 'tipo_cirugia', 'fecha_procedimiento']
+        for campo in campos_requeridos:
+            if campo not in procedimiento_data:
+                raise ValueError(f"Campo requerido faltante: {campo}")
+                
+        logger.info(f"Generando reporte en streaming para procedimiento {procedimiento_data.get('procedimiento_id')}")
+        
+        adicionales: Dict[str, Any] = {}
+        if incluir_analisis_detallado:
+            adicionales["analisis_detallado"] = True
+            adicionales["metricas_calidad"] = self._calcular_metricas_calidad(procedimiento_data)
+            
+        return self._eventos_sse(
+            self.assistant_service.generar_reporte_quirurgico_stream(
+                procedimiento_data=procedimiento_data,
+                incluir_recomendaciones=incluir_recomendaciones
+            ),
+            adicionales
+        )
+    
+    def procesar_consulta_natural_stream(
+        self,
+        consulta: str,
+        contexto_adicional: Optional[Dict[str, Any]] = None,
+        incluir_referencias: bool = True
+    ) -> AsyncIterator[str]:
+        """
+        Procesa una consulta en lenguaje natural como eventos SSE.
+        
+        Args:
+            consulta: Pregunta o consulta del usuario
+            contexto_adicional: Contexto adicional para la consulta
+            incluir_referencias: Si incluir referencias y enlaces
+            
+        Returns:
+            Iterador de eventos SSE ("inicio", "token", "fin" o "error")
+            
+        Raises:
+            ValueError: Si la consulta está vacía
+        """
+        if not consulta.strip():
+            raise ValueError("La consulta no puede estar vacía")
+            
+        logger.info(f"Procesando consulta natural en streaming: {consulta[:50]}...")
+        
+        adicionales: Dict[str, Any] = {}
+        if contexto_adicional:
+            adicionales["contexto_utilizado"] = contexto_adicional
+        if incluir_referencias:
+            adicionales["referencias_incluidas"] = self._generar_referencias_eivai()
+            
+        return self._eventos_sse(self.assistant_service.consulta_natural_instrumentos_stream(consulta), adicionales)
+    
+    async def _eventos_sse(
+        self,
+        eventos: AsyncIterator[Dict[str, Any]],
+        adicionales: Dict[str, Any]
+    ) -> AsyncIterator[str]:
+        """
+        Convierte los eventos del asistente en eventos SSE.
+        
+        Emite "inicio" de inmediato, un "token" por fragmento y "fin" con la
+        respuesta completa más `adicionales`. Un error de IA se informa como
+        evento "error" porque el estado HTTP ya fue enviado. Si el cliente se
+        desconecta, cerrar este iterador cierra también la solicitud a DeepSeek.
+        
+        Args:
+            eventos: Eventos del servicio de asistente
+            adicionales: Campos que se agregan al evento final
+            
+        Yields:
+            Eventos en formato text/event-stream
+        """
+        inicio = time.time()
+        yield formatear_evento_sse("inicio", {"timestamp": datetime.now().isoformat()})
+        
+        try:
+            async for evento in eventos:
+                tipo = evento.pop("tipo")
+                if tipo == "fin":
+                    evento.update(adicionales)
+                    evento["tiempo_total_proceso"] = time.time() - inicio
+                    logger.info(f"Streaming completado en {evento['tiempo_total_proceso']:.2f}s")
+                yield formatear_evento_sse(tipo, evento)
+        except DeepSeekException as e:
+            logger.error(f"Error de IA durante el streaming: {str(e)}")
+            yield formatear_evento_sse("error", {
+                "error": "Error en el servicio de IA",
+                "codigo": 500,
+                "detalle": str(e),
+                "tipo_error": "IA_ERROR",
+                "timestamp": datetime.now().isoformat()
+            })
+        except (asyncio.CancelledError, GeneratorExit):
+            logger.info(f"Cliente desconectado, streaming cancelado tras {time.time() - inicio:.2f}s")
+            raise
+        finally:
+            await eventos.aclose()
+    
     async def analizar_patrones_uso(
         self,
         datos_historicos: list,
@@ -256,7 +400,7 @@ class EIVAIAssistantController:
                 raise ValueError("Se requieren datos históricos para el análisis")
             
             # Procesar análisis de patrones
-            resultado = self.assistant_service.analizar_patrones_uso(datos_historicos)
+            resultado = await self.assistant_service.analizar_patrones_uso(datos_historicos)
             
             # Agregar metadatos del análisis
             resultado["tipo_analisis_solicitado"] = tipo_analisis
@@ -305,7 +449,7 @@ class EIVAIAssistantController:
                 prioridad = "MEDIA"
             
             # Generar alerta con el servicio
-            resultado = self.assistant_service.generar_alerta_inteligente(
+            resultado = await self.assistant_service.generar_alerta_inteligente(
                 tipo_alerta=tipo_alerta,
                 datos_contexto=datos_contexto,
                 prioridad=prioridad
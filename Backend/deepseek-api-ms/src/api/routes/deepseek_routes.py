@@ -44,7 +44,7 @@ async def procesar_texto(request: ProcesamientoRequest):
         HTTPException: Si ocurre un error en el procesamiento
     """
     try:
-        resultado = DeepSeekController.procesar_texto(
+        resultado = await DeepSeekController.procesar_texto(
             texto=request.texto,
             temperatura=request.temperatura,
             max_tokens=request.max_tokens,
@@ -1,8 +1,8 @@
 """
 Rutas específicas para EIVAI Assistant API.
 """
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import Dict, Any, Optional, List
 
 from src.api.controllers.eivai_controller import EIVAIAssistantController
@@ -19,6 +19,9 @@ from datetime import datetime
 
 router = APIRouter(tags=["EIVAI Assistant"])
 
+# Cabeceras de las respuestas en streaming (sin caché ni buffering en proxies)
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 @router.get("/estado", 
           summary="Verificar estado del sistema EIVAI",
           response_model=EstadoEIVAIResponse)
@@ -50,7 +53,10 @@ async def verificar_estado_eivai():
                400: {"model": ErrorEIVAI, "description": "Error en los datos de conteo"},
                500: {"model": ErrorEIVAI, "description": "Error en el análisis de IA"}
            })
-async def analizar_conteos_instrumentos(request: ConteoInstrumentosRequest):
+async def analizar_conteos_instrumentos(
+    request: ConteoInstrumentosRequest,
+    forzar_analisis_ia: bool = Query(False, description="Solicitar el análisis de IA aunque los conteos coincidan")
+):
     """
     Analiza conteos de instrumentos quirúrgicos y detecta discrepancias.
     
@@ -59,10 +65,13 @@ async def analizar_conteos_instrumentos(request: ConteoInstrumentosRequest):
     - Detección de instrumentos faltantes o sobrantes
     - Evaluación de criticidad de discrepancias
     - Recomendaciones específicas para resolución
+    - Cálculo local del riesgo; la IA solo se consulta si hay discrepancias
+      o con `forzar_analisis_ia`
     - Análisis de riesgo para seguridad del paciente
     
     Args:
         request: Datos de conteos inicial y final con información del procedimiento
+        forzar_analisis_ia: Si solicitar el análisis de IA aunque no haya discrepancias
         
     Returns:
         Análisis detallado con discrepancias, nivel de riesgo y recomendaciones
@@ -79,7 +88,8 @@ async def analizar_conteos_instrumentos(request: ConteoInstrumentosRequest):
             conteo_final=conteo_final,
             tipo_cirugia=request.tipo_cirugia,
             procedimiento_id=request.procedimiento_id,
-            incluir_recomendaciones=request.incluir_recomendaciones
+            incluir_recomendaciones=request.incluir_recomendaciones,
+            forzar_analisis_ia=forzar_analisis_ia
         )
         
         return JSONResponse(status_code=200, content=resultado)
@@ -190,6 +200,49 @@ async def generar_reporte_quirurgico(request: ReporteQuirurgicoRequest):
         }
         return JSONResponse(status_code=500, content=error_response)
 
+@router.post("/generar-reporte/stream",
+           summary="Generar reporte quirúrgico en streaming (SSE)",
+           responses={
+               200: {"content": {"text/event-stream": {}}, "description": "Eventos inicio, token, fin o error"},
+               400: {"model": ErrorEIVAI, "description": "Datos de procedimiento inválidos"}
+           })
+async def generar_reporte_quirurgico_stream(request: ReporteQuirurgicoRequest):
+    """
+    Genera el reporte quirúrgico enviando el texto a medida que DeepSeek lo produce.
+    
+    Eventos (text/event-stream):
+    - `inicio`: enviado de inmediato
+    - `token`: fragmento de texto (`{"texto": ...}`)
+    - `fin`: los mismos campos que /generar-reporte más `tiempo_primer_token`
+    - `error`: error del servicio de IA durante la generación
+    
+    Si el cliente se desconecta, la solicitud a DeepSeek se cancela.
+    
+    Args:
+        request: Datos completos del procedimiento quirúrgico
+        
+    Returns:
+        Respuesta en streaming con los eventos del reporte
+    """
+    try:
+        controller = EIVAIAssistantController()
+        eventos = controller.generar_reporte_quirurgico_stream(
+            procedimiento_data=request.procedimiento_data.dict(),
+            incluir_recomendaciones=request.incluir_recomendaciones,
+            incluir_analisis_detallado=request.incluir_analisis_detallado
+        )
+    except ValueError as e:
+        error_response = {
+            "error": "Datos de procedimiento inválidos",
+            "codigo": 400,
+            "detalle": str(e),
+            "tipo_error": "VALIDATION_ERROR",
+            "timestamp": datetime.now().isoformat()
+        }
+        return JSONResponse(status_code=400, content=error_response)
+        
+    return StreamingResponse(eventos, media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.post("/consulta-natural",
            summary="Procesar consulta en lenguaje natural",
            response_model=ConsultaNaturalResponse,
@@ -264,6 +317,50 @@ async def procesar_consulta_natural(request: ConsultaNaturalRequest):
         }
         return JSONResponse(status_code=500, content=error_response)
 
+@router.post("/consulta-natural/stream",
+           summary="Procesar consulta en lenguaje natural en streaming (SSE)",
+           responses={
+               200: {"content": {"text/event-stream": {}}, "description": "Eventos inicio, token, fin o error"},
+               400: {"model": ErrorEIVAI, "description": "Consulta inválida"}
+           })
+async def procesar_consulta_natural_stream(request: ConsultaNaturalRequest):
+    """
+    Responde una consulta en lenguaje natural enviando el texto a medida que
+    DeepSeek lo produce.
+    
+    Eventos (text/event-stream):
+    - `inicio`: enviado de inmediato
+    - `token`: fragmento de texto (`{"texto": ...}`)
+    - `fin`: los mismos campos que /consulta-natural más `tiempo_primer_token`
+    - `error`: error del servicio de IA durante la generación
+    
+    Si el cliente se desconecta, la solicitud a DeepSeek se cancela.
+    
+    Args:
+        request: Consulta en lenguaje natural del usuario
+        
+    Returns:
+        Respuesta en streaming con los eventos de la respuesta
+    """
+    try:
+        controller = EIVAIAssistantController()
+        eventos = controller.procesar_consulta_natural_stream(
+            consulta=request.consulta,
+            contexto_adicional=request.contexto_adicional,
+            incluir_referencias=request.incluir_referencias
+        )
+    except ValueError as e:
+        error_response = {
+            "error": "Consulta inválida",
+            "codigo": 400,
+            "detalle": str(e),
+            "tipo_error": "VALIDATION_ERROR",
+            "timestamp": datetime.now().isoformat()
+        }
+        return JSONResponse(status_code=400, content=error_response)
+        
+    return StreamingResponse(eventos, media_type="text/event-stream", headers=SSE_HEADERS)
+
 @router.post("/analizar-patrones",
            summary="Analizar patrones de uso de instrumentos",
            response_model=AnalisisPatronesResponse,
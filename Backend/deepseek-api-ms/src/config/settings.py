@@ -39,6 +39,25 @@ class Settings(BaseSettings):
     MAX_REINTENTOS: int = os.getenv("MAX_REINTENTOS")
     TIEMPO_ENTRE_REINTENTOS: int = os.getenv("TIEMPO_ENTRE_REINTENTOS")
     
+    # Pool de conexiones HTTP hacia DeepSeek (compartido por todas las solicitudes)
+    HTTP_MAX_CONEXIONES: int = os.getenv("HTTP_MAX_CONEXIONES", 20)
+    HTTP_MAX_CONEXIONES_INACTIVAS: int = os.getenv("HTTP_MAX_CONEXIONES_INACTIVAS", 10)
+    HTTP_TIEMPO_INACTIVIDAD: float = os.getenv("HTTP_TIEMPO_INACTIVIDAD", 30)
+    HTTP2_HABILITADO: bool = os.getenv("HTTP2_HABILITADO", "true")
+    
+    # Caché de respuestas del asistente (solo solicitudes de baja temperatura)
+    CACHE_RESPUESTAS_HABILITADA: bool = os.getenv("CACHE_RESPUESTAS_HABILITADA", "true")
+    CACHE_MAX_ENTRADAS: int = os.getenv("CACHE_MAX_ENTRADAS", 512)
+    CACHE_TTL_SEGUNDOS: float = os.getenv("CACHE_TTL_SEGUNDOS", 3600)
+    CACHE_TEMPERATURA_MAXIMA: float = os.getenv("CACHE_TEMPERATURA_MAXIMA", 0.4)
+    # Nivel semántico para consultas en lenguaje natural casi idénticas
+    CACHE_SEMANTICA_HABILITADA: bool = os.getenv("CACHE_SEMANTICA_HABILITADA", "false")
+    CACHE_SEMANTICA_UMBRAL: float = os.getenv("CACHE_SEMANTICA_UMBRAL", 0.92)
+    CACHE_SEMANTICA_MODELO: str = os.getenv("CACHE_SEMANTICA_MODELO", "")  # sentence-transformers; vacío = trigramas
+    
+    # Solicitudes idénticas simultáneas comparten una sola llamada a DeepSeek
+    SINGLE_FLIGHT_HABILITADO: bool = os.getenv("SINGLE_FLIGHT_HABILITADO", "true")
+    
     model_config = {
         "env_file": ".env",
         "env_prefix": "",
@@ -1,17 +1,68 @@
 """
 Servicio para interactuar con la API de DeepSeek.
 """
-import requests
+import asyncio
+import importlib.util
+import json
 import logging
 import time
-from typing import Dict, Any, Optional
-from tenacity import retry, stop_after_attempt, wait_fixed, retry_if_exception_type
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, AsyncIterator
+
+import httpx
 
 from src.config.settings import get_settings
 
 settings = get_settings()
 logger = logging.getLogger("deepseek_api")
 
+# Errores de transporte que se reintentan (incluye conexiones del pool cerradas por el servidor)
+ERRORES_REINTENTABLES = (httpx.ConnectError, httpx.RemoteProtocolError, httpx.TimeoutException)
+
+# Cliente HTTP compartido con pool de conexiones keep-alive (creado en el lifespan de la app)
+_cliente_http: Optional[httpx.AsyncClient] = None
+
+def http2_habilitado() -> bool:
+    """HTTP/2 solo se usa si está configurado y el paquete `h2` está instalado."""
+    return bool(settings.HTTP2_HABILITADO) and importlib.util.find_spec("h2") is not None
+
+def crear_cliente_http() -> httpx.AsyncClient:
+    """
+    Crea un cliente HTTP asíncrono con los límites del pool configurados.
+    
+    Returns:
+        Cliente httpx.AsyncClient
+    """
+    limites = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONEXIONES,
+        max_keepalive_connections=settings.HTTP_MAX_CONEXIONES_INACTIVAS,
+        keepalive_expiry=settings.HTTP_TIEMPO_INACTIVIDAD
+    )
+    return httpx.AsyncClient(limits=limites, timeout=settings.REQUEST_TIMEOUT, http2=http2_habilitado())
+
+async def iniciar_cliente_http() -> httpx.AsyncClient:
+    """
+    Inicia el cliente HTTP compartido del proceso.
+    
+    Returns:
+        Cliente compartido
+    """
+    global _cliente_http
+    if _cliente_http is None or _cliente_http.is_closed:
+        _cliente_http = crear_cliente_http()
+        logger.info(
+            f"Cliente HTTP de DeepSeek iniciado (máx. {settings.HTTP_MAX_CONEXIONES} conexiones, "
+            f"HTTP/2: {'sí' if http2_habilitado() else 'no'})"
+        )
+    return _cliente_http
+
+async def cerrar_cliente_http() -> None:
+    """Cierra el cliente HTTP compartido y sus conexiones."""
+    global _cliente_http
+    if _cliente_http is not None:
+        await _cliente_http.aclose()
+        _cliente_http = None
+
 class DeepSeekException(Exception):
     """Excepción personalizada para errores del servicio DeepSeek."""
     pass
@@ -24,40 +75,60 @@ class DeepSeekService:
     con manejo de errores y reintentos automáticos.
     """
     
-    def __init__(self):
-        """Inicializa el servicio con la configuración de la API."""
+    def __init__(self, cliente: Optional[httpx.AsyncClient] = None):
+        """
+        Inicializa el servicio con la configuración de la API.
+        
+        Args:
+            cliente: Cliente HTTP a utilizar (por defecto el cliente compartido)
+        """
         self.api_url = settings.DEEPSEEK_API_URL
         self.api_key = settings.DEEPSEEK_API_KEY
         self.default_model = settings.DEEPSEEK_MODELO
         self.default_temperature = settings.TEMPERATURA_PREDETERMINADA
         self.default_max_tokens = settings.MAX_TOKENS_PREDETERMINADO
         self.timeout = settings.REQUEST_TIMEOUT
+        self.max_reintentos = max(1, settings.MAX_REINTENTOS)
+        self.tiempo_entre_reintentos = settings.TIEMPO_ENTRE_REINTENTOS
+        self.cliente = cliente
     
-    @retry(
-        retry=retry_if_exception_type((requests.exceptions.ConnectionError, requests.exceptions.Timeout)),
-        stop=stop_after_attempt(settings.MAX_REINTENTOS),
-        wait=wait_fixed(settings.TIEMPO_ENTRE_REINTENTOS),
-        reraise=True
-    )
-    def procesar_texto(
-        self, 
-        texto: str, 
-        temperatura: Optional[float] = settings.TEMPERATURA_PREDETERMINADA, 
-        max_tokens: Optional[int] = settings.MAX_TOKENS_PREDETERMINADO, 
+    @asynccontextmanager
+    async def _obtener_cliente(self) -> AsyncIterator[httpx.AsyncClient]:
+        """
+        Cliente para la solicitud: el propio, el compartido o, si la app no lo
+        ha iniciado (scripts, tests), uno temporal que se cierra al terminar.
+        """
+        cliente = self.cliente or _cliente_http
+        if cliente is not None and not cliente.is_closed:
+            yield cliente
+            return
+        
+        async with crear_cliente_http() as temporal:
+            yield temporal
+    
+    async def procesar_texto(
+        self,
+        texto: str,
+        temperatura: Optional[float] = settings.TEMPERATURA_PREDETERMINADA,
+        max_tokens: Optional[int] = settings.MAX_TOKENS_PREDETERMINADO,
         modelo: Optional[str] = settings.DEEPSEEK_MODELO
     ) -> Dict[str, Any]:
         """
         Procesa texto utilizando la API de DeepSeek.
         
+        Los errores de conexión y timeout se reintentan hasta `MAX_REINTENTOS`
+        veces, esperando `TIEMPO_ENTRE_REINTENTOS` segundos sin bloquear el
+        event loop.
+        
         Args:
             texto: Texto a procesar
             temperatura: Nivel de aleatoriedad (0.0 a 1.0)
             max_tokens: Número máximo de tokens a generar
             modelo: Modelo de DeepSeek a utilizar
-            
+        
         Returns:
             Diccionario con la respuesta procesada
-            
+        
         Raises:
             DeepSeekException: Si ocurre un error en la API
         """
@@ -84,13 +155,15 @@ class DeepSeekService:
                 "max_tokens": max_tokens_final
             }
             
-            # Realizar la solicitud a la API
-            response = requests.post(
-                f"{self.api_url}/v1/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=self.timeout
-            )
+            # Realizar la solicitud a la API reutilizando las conexiones del pool
+            async with self._obtener_cliente() as cliente:
+                response = await self._enviar_con_reintentos(
+                    cliente,
+                    f"{self.api_url}/v1/chat/completions",
+                    headers=headers,
+                    json=payload,
+                    timeout=self.timeout
+                )
             
             # Verificar respuesta
             if response.status_code != 200:
@@ -117,16 +190,175 @@ class DeepSeekService:
                 "tokens_salida": tokens_salida,
                 "tiempo_proceso": tiempo_proceso
             }
+        
+        except DeepSeekException:
+            raise
+        except Exception as e:
+            raise self._convertir_error(e)
+    
+    async def procesar_texto_stream(
+        self,
+        texto: str,
+        temperatura: Optional[float] = settings.TEMPERATURA_PREDETERMINADA,
+        max_tokens: Optional[int] = settings.MAX_TOKENS_PREDETERMINADO,
+        modelo: Optional[str] = settings.DEEPSEEK_MODELO
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Procesa texto con la API de DeepSeek recibiendo la respuesta por partes.
+        
+        Solo se reintenta la apertura de la conexión; una vez recibidos datos,
+        un error se propaga. Si el consumidor deja de iterar (cliente
+        desconectado), la respuesta de DeepSeek se cierra y la generación se
+        cancela.
+        
+        Args:
+            texto: Texto a procesar
+            temperatura: Nivel de aleatoriedad (0.0 a 1.0)
+            max_tokens: Número máximo de tokens a generar
+            modelo: Modelo de DeepSeek a utilizar
             
-        except requests.exceptions.ConnectionError as e:
-            logger.error(f"Error de conexión con la API de DeepSeek: {str(e)}")
-            raise DeepSeekException(f"Error de conexión con la API de DeepSeek: {str(e)}")
-        except requests.exceptions.Timeout as e:
+        Yields:
+            {"tipo": "token", "texto": fragmento} por cada fragmento recibido y, al
+            terminar, {"tipo": "fin", ...} con el texto completo, tokens y tiempos
+            
+        Raises:
+            DeepSeekException: Si ocurre un error en la API
+        """
+        temperatura_final = temperatura if temperatura is not None else self.default_temperature
+        max_tokens_final = max_tokens if max_tokens is not None else self.default_max_tokens
+        modelo_final = modelo if modelo is not None else self.default_model
+        
+        inicio = time.time()
+        logger.info(f"Procesando texto en streaming con modelo {modelo_final}, temperatura {temperatura_final}")
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream"
+        }
+        payload = {
+            "model": modelo_final,
+            "messages": [{"role": "user", "content": texto}],
+            "temperature": temperatura_final,
+            "max_tokens": max_tokens_final,
+            "stream": True,
+            "stream_options": {"include_usage": True}
+        }
+        
+        partes = []
+        uso: Dict[str, Any] = {}
+        tiempo_primer_token = None
+        try:
+            async with self._obtener_cliente() as cliente:
+                response = await self._enviar_con_reintentos(
+                    cliente,
+                    f"{self.api_url}/v1/chat/completions",
+                    stream=True,
+                    headers=headers,
+                    json=payload,
+                    timeout=self.timeout
+                )
+                try:
+                    if response.status_code != 200:
+                        await response.aread()
+                        error_detail = response.json() if response.content else "Sin detalles"
+                        logger.error(f"Error en la API de DeepSeek: {response.status_code} - {error_detail}")
+                        raise DeepSeekException(f"Error en la API de DeepSeek: {response.status_code}")
+                        
+                    async for linea in response.aiter_lines():
+                        if not linea.startswith("data:"):
+                            continue
+                        datos = linea[len("data:"):].strip()
+                        if datos == "[DONE]":
+                            break
+                            
+                        evento = json.loads(datos)
+                        if evento.get("usage"):
+                            uso = evento["usage"]
+                        for opcion in evento.get("choices") or []:
+                            fragmento = (opcion.get("delta") or {}).get("content")
+                            if fragmento:
+                                if tiempo_primer_token is None:
+                                    tiempo_primer_token = time.time() - inicio
+                                partes.append(fragmento)
+                                yield {"tipo": "token", "texto": fragmento}
+                finally:
+                    await response.aclose()
+        except DeepSeekException:
+            raise
+        except Exception as e:
+            raise self._convertir_error(e)
+            
+        tiempo_proceso = time.time() - inicio
+        logger.info(
+            f"Streaming completado en {tiempo_proceso:.2f}s (primer token: {tiempo_primer_token or 0:.2f}s) - "
+            f"Tokens E/S: {uso.get('prompt_tokens', 0)}/{uso.get('completion_tokens', 0)}"
+        )
+        yield {
+            "tipo": "fin",
+            "texto_procesado": "".join(partes),
+            "modelo_usado": modelo_final,
+            "tokens_entrada": uso.get("prompt_tokens", 0),
+            "tokens_salida": uso.get("completion_tokens", 0),
+            "tiempo_primer_token": tiempo_primer_token,
+            "tiempo_proceso": tiempo_proceso
+        }
+    
+    @staticmethod
+    def _convertir_error(e: Exception) -> DeepSeekException:
+        """
+        Convierte un error de transporte o inesperado en DeepSeekException.
+        
+        Args:
+            e: Error original
+            
+        Returns:
+            Excepción a lanzar
+        """
+        if isinstance(e, httpx.TimeoutException):
             logger.error(f"Timeout en la conexión con la API de DeepSeek: {str(e)}")
-            raise DeepSeekException(f"Timeout en la conexión con la API de DeepSeek")
-        except requests.exceptions.RequestException as e:
+            return DeepSeekException("Timeout en la conexión con la API de DeepSeek")
+        if isinstance(e, (httpx.ConnectError, httpx.RemoteProtocolError)):
+            logger.error(f"Error de conexión con la API de DeepSeek: {str(e)}")
+            return DeepSeekException(f"Error de conexión con la API de DeepSeek: {str(e)}")
+        if isinstance(e, httpx.HTTPError):
             logger.error(f"Error en la solicitud a la API de DeepSeek: {str(e)}")
-            raise DeepSeekException(f"Error en la solicitud a la API de DeepSeek: {str(e)}")
-        except Exception as e:
-            logger.error(f"Error inesperado al procesar texto: {str(e)}")
-            raise DeepSeekException(f"Error inesperado al procesar texto: {str(e)}")
+            return DeepSeekException(f"Error en la solicitud a la API de DeepSeek: {str(e)}")
+        logger.error(f"Error inesperado al procesar texto: {str(e)}")
+        return DeepSeekException(f"Error inesperado al procesar texto: {str(e)}")
+    
+    async def _enviar_con_reintentos(
+        self,
+        cliente: httpx.AsyncClient,
+        url: str,
+        stream: bool = False,
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Envía un POST reintentando los errores de transporte.
+        
+        Args:
+            cliente: Cliente HTTP a utilizar
+            url: URL de destino
+            stream: Si devolver la respuesta sin leer el cuerpo (el llamador la cierra)
+            **kwargs: Argumentos de `httpx.AsyncClient.post`
+        
+        Returns:
+            Respuesta de la API
+        
+        Raises:
+            httpx.HTTPError: Si se agotan los reintentos
+        """
+        for intento in range(1, self.max_reintentos + 1):
+            try:
+                if stream:
+                    return await cliente.send(cliente.build_request("POST", url, **kwargs), stream=True)
+                return await cliente.post(url, **kwargs)
+            except ERRORES_REINTENTABLES as e:
+                if intento >= self.max_reintentos:
+                    raise
+                logger.warning(
+                    f"Intento {intento}/{self.max_reintentos} fallido con DeepSeek ({type(e).__name__}), "
+                    f"reintentando en {self.tiempo_entre_reintentos}s"
+                )
+                await asyncio.sleep(self.tiempo_entre_reintentos)
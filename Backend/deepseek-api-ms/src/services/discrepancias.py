@@ -0,0 +1,165 @@
+"""
+Motor local de discrepancias y riesgo para conteos de instrumentos.
+"""
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+# Niveles de riesgo en orden creciente (los mismos que se piden a la IA)
+NIVELES_RIESGO = ["BAJO", "MEDIO", "ALTO", "CRÍTICO"]
+
+# Peso de cada nivel de criticidad en el puntaje de riesgo
+PESOS_CRITICIDAD = {"ALTA": 3, "MEDIA": 2, "BAJA": 1}
+
+# Criticidad por nombre cuando el conteo no la indica: material blando que
+# puede quedar retenido y cortopunzantes (ALTA), instrumental articulado (MEDIA)
+PALABRAS_CRITICIDAD = [
+    ("ALTA", ("gasa", "compresa", "torunda", "aguja", "sutura", "bisturi", "hoja", "lanceta")),
+    ("MEDIA", ("pinza", "clamp", "tijera", "separador", "porta", "trocar", "grapa", "kelly")),
+]
+
+# Nivel de riesgo de un faltante y de un sobrante según la criticidad
+NIVEL_FALTANTE = {"ALTA": "CRÍTICO", "MEDIA": "ALTO", "BAJA": "MEDIO"}
+NIVEL_SOBRANTE = {"ALTA": "MEDIO", "MEDIA": "BAJO", "BAJA": "BAJO"}
+
+# Un sobrante pesa menos que un faltante: no hay riesgo de material retenido
+FACTOR_SOBRANTE = 0.25
+
+def _sin_acentos(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", texto.casefold())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+def criticidad_instrumento(item: Dict) -> str:
+    """
+    Determina la criticidad de un instrumento.
+    
+    Args:
+        item: Instrumento del conteo; si incluye `criticidad` (ALTA/MEDIA/BAJA) se respeta
+        
+    Returns:
+        "ALTA", "MEDIA" o "BAJA"
+    """
+    criticidad = str(item.get("criticidad") or "").upper()
+    if criticidad in PESOS_CRITICIDAD:
+        return criticidad
+    
+    # Por inicio de palabra: "portaagujas" es MEDIA aunque contenga "aguja"
+    palabras_nombre = re.findall(r"\w+", _sin_acentos(str(item.get("nombre_instrumento") or "")))
+    for nivel, palabras in PALABRAS_CRITICIDAD:
+        if any(p.startswith(palabra) for p in palabras_nombre for palabra in palabras):
+            return nivel
+    return "BAJA"
+
+def _agrupar(conteo: List[Dict], esperada_por_defecto: Optional[int] = None) -> Dict[Any, Tuple[Dict, int, int]]:
+    """
+    Agrupa un conteo por instrumento sumando las cantidades esperadas y contadas.
+    
+    Sin cantidad esperada en la línea se usa `esperada_por_defecto` o, si es
+    None, la cantidad contada (no hay referencia con la que comparar).
+    """
+    agrupado: Dict[Any, Tuple[Dict, int, int]] = {}
+    for item in conteo:
+        clave = item.get("instrumento_id")
+        if clave is None:
+            clave = item.get("codigo_instrumento") or item.get("nombre_instrumento")
+        cantidad_contada = int(item.get("cantidad_contada") or 0)
+        cantidad_esperada = item.get("cantidad_esperada")
+        if cantidad_esperada is None:
+            cantidad_esperada = cantidad_contada if esperada_por_defecto is None else esperada_por_defecto
+        cantidad_esperada = int(cantidad_esperada)
+        primero, esperada, contada = agrupado.get(clave, (item, 0, 0))
+        agrupado[clave] = (primero, esperada + cantidad_esperada, contada + cantidad_contada)
+    return agrupado
+
+def _discrepancia(clave: Any, item: Dict, tipo: str, esperado: int, encontrado: int) -> Dict[str, Any]:
+    """Construye una discrepancia ponderada por la criticidad del instrumento."""
+    criticidad = criticidad_instrumento(item)
+    diferencia = encontrado - esperado
+    if diferencia < 0:
+        nivel = NIVEL_FALTANTE[criticidad]
+        puntaje = PESOS_CRITICIDAD[criticidad] * -diferencia
+    else:
+        nivel = NIVEL_SOBRANTE[criticidad]
+        puntaje = PESOS_CRITICIDAD[criticidad] * diferencia * FACTOR_SOBRANTE
+        
+    return {
+        "instrumento_id": item.get("instrumento_id", clave),
+        "nombre": item.get("nombre_instrumento"),
+        "tipo": tipo,
+        "esperado": esperado,
+        "encontrado": encontrado,
+        "diferencia": diferencia,
+        "criticidad": criticidad,
+        "nivel_riesgo": nivel,
+        "puntaje_riesgo": puntaje
+    }
+
+def analizar_discrepancias(inicial: List[Dict], final: List[Dict]) -> Dict[str, Any]:
+    """
+    Compara los conteos inicial y final y calcula el riesgo sin usar la IA.
+    
+    Detecta instrumentos cuyo conteo inicial no coincide con la cantidad
+    esperada del set (faltantes o sobrantes desde el inicio), y entre los
+    conteos inicial y final: faltantes en el final, sobrantes (presentes solo en
+    el final y ajenos al set) y cantidades diferentes. Las líneas presentes solo
+    en el final que pertenecen al set se comparan con su cantidad esperada.
+    Cada discrepancia se pondera por la criticidad del instrumento y las
+    unidades afectadas; el nivel de riesgo global es el mayor de los niveles
+    individuales.
+    
+    Args:
+        inicial: Lista de instrumentos del conteo inicial
+        final: Lista de instrumentos del conteo final
+        
+    Returns:
+        Discrepancias ordenadas por riesgo, nivel y puntaje de riesgo, y resumen
+    """
+    inicial_map = _agrupar(inicial)
+    # Una línea solo del final sin cantidad esperada no forma parte del set
+    final_map = _agrupar(final, esperada_por_defecto=0)
+    
+    discrepancias = []
+    for clave, (item, esperada, contada) in inicial_map.items():
+        # El set ya estaba incompleto (o sobraba material) al iniciar
+        if contada != esperada:
+            tipo = "FALTANTE_RESPECTO_AL_SET" if contada < esperada else "SOBRANTE_RESPECTO_AL_SET"
+            discrepancias.append(_discrepancia(clave, item, tipo, esperada, contada))
+            
+        _, _, encontrado = final_map.get(clave, (None, 0, 0))
+        if clave not in final_map:
+            if contada:
+                discrepancias.append(_discrepancia(clave, item, "FALTANTE_EN_FINAL", contada, 0))
+        elif encontrado != contada:
+            discrepancias.append(_discrepancia(clave, item, "CANTIDAD_DIFERENTE", contada, encontrado))
+            
+    for clave, (item, esperada, encontrado) in final_map.items():
+        if clave in inicial_map:
+            continue
+        if not esperada:
+            # Material que no formaba parte del set ni del conteo inicial
+            if encontrado:
+                discrepancias.append(_discrepancia(clave, item, "SOBRANTE_EN_FINAL", 0, encontrado))
+        elif encontrado != esperada:
+            # Sin conteo inicial, la referencia es la cantidad esperada de la línea final
+            tipo = "FALTANTE_RESPECTO_AL_SET" if encontrado < esperada else "SOBRANTE_RESPECTO_AL_SET"
+            discrepancias.append(_discrepancia(clave, item, tipo, esperada, encontrado))
+            
+    discrepancias.sort(key=lambda d: (NIVELES_RIESGO.index(d["nivel_riesgo"]), d["puntaje_riesgo"]), reverse=True)
+    nivel_riesgo = max(
+        (d["nivel_riesgo"] for d in discrepancias), key=NIVELES_RIESGO.index, default="BAJO"
+    )
+    return {
+        "discrepancias": discrepancias,
+        "nivel_riesgo": nivel_riesgo,
+        "puntaje_riesgo": sum(d["puntaje_riesgo"] for d in discrepancias),
+        "requiere_accion_inmediata": nivel_riesgo in ("ALTO", "CRÍTICO"),
+        "resumen": {
+            "instrumentos_inicial": len(inicial_map),
+            "instrumentos_final": len(final_map),
+            "unidades_esperadas": sum(esperada for _, esperada, _ in inicial_map.values()),
+            "unidades_inicial": sum(contada for _, _, contada in inicial_map.values()),
+            "unidades_final": sum(contada for _, _, contada in final_map.values()),
+            "faltantes": sum(1 for d in discrepancias if d["diferencia"] < 0),
+            "sobrantes": sum(1 for d in discrepancias if d["diferencia"] > 0)
+        }
+    }
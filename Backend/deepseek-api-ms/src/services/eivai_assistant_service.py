@@ -3,10 +3,13 @@ Servicio especializado de IA para el Sistema EIVAI.
 """
 import time
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator
 from datetime import datetime
 
 from src.services.deepseek_service import DeepSeekService, DeepSeekException
+from src.services.discrepancias import analizar_discrepancias
+from src.services.response_cache import cache_respuestas, clave_cache
+from src.services.single_flight import solicitudes_en_curso
 
 logger = logging.getLogger("eivai_assistant")
 
@@ -58,25 +61,111 @@ class EIVAIAssistantService:
         - Cumplir con normativas de calidad hospitalaria
         """
     
-    def analizar_conteo_instrumentos(
+    async def _procesar(
+        self,
+        texto: str,
+        temperatura: float,
+        max_tokens: int,
+        consulta: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Envía un prompt a DeepSeek o reutiliza una respuesta de la caché.
+        
+        Args:
+            texto: Prompt completo
+            temperatura: Nivel de aleatoriedad
+            max_tokens: Número máximo de tokens a generar
+            consulta: Texto libre del usuario para el nivel semántico de la caché
+        
+        Returns:
+            Respuesta de DeepSeek; si proviene de la caché, `cache` indica el nivel
+            ("en_curso" si se compartió una llamada idéntica simultánea)
+        """
+        modelo = self.deepseek_service.default_model
+        if cache_respuestas is not None:
+            inicio = time.time()
+            resultado = await cache_respuestas.obtener_async(texto, modelo, temperatura, max_tokens, consulta=consulta)
+            if resultado is not None:
+                resultado["tiempo_proceso"] = time.time() - inicio
+                logger.info(f"Respuesta obtenida de la caché ({resultado['cache']})")
+                return resultado
+        
+        async def llamar() -> Dict[str, Any]:
+            resultado = await self.deepseek_service.procesar_texto(
+                texto=texto,
+                temperatura=temperatura,
+                max_tokens=max_tokens,
+                modelo=modelo
+            )
+            
+            if cache_respuestas is not None:
+                await cache_respuestas.guardar_async(texto, modelo, temperatura, max_tokens, resultado, consulta=consulta)
+            return resultado
+        
+        if solicitudes_en_curso is None:
+            return await llamar()
+        
+        # Las solicitudes idénticas simultáneas esperan la misma llamada
+        resultado, compartida = await solicitudes_en_curso.ejecutar(
+            clave_cache(texto, modelo, temperatura, max_tokens), llamar
+        )
+        if compartida:
+            resultado["cache"] = "en_curso"
+        return resultado
+    
+    async def analizar_conteo_instrumentos(
         self, 
         conteo_inicial: List[Dict],
         conteo_final: List[Dict],
         tipo_cirugia: str,
-        incluir_recomendaciones: bool = True
+        incluir_recomendaciones: bool = True,
+        forzar_analisis_ia: bool = False
     ) -> Dict[str, Any]:
         """
         Analiza conteos de instrumentos y detecta discrepancias.
         
+        Las discrepancias y el nivel de riesgo se calculan localmente; DeepSeek
+        solo redacta el análisis cuando hay discrepancias o se solicita.
+        
         Args:
             conteo_inicial: Lista de instrumentos del conteo inicial
             conteo_final: Lista de instrumentos del conteo final
             tipo_cirugia: Tipo de procedimiento quirúrgico
             incluir_recomendaciones: Si incluir recomendaciones automáticas
+            forzar_analisis_ia: Si solicitar el análisis de IA aunque los conteos coincidan
             
         Returns:
             Análisis completo con discrepancias y recomendaciones
         """
+        inicio = time.time()
+        analisis = analizar_discrepancias(conteo_inicial, conteo_final)
+        respuesta = {
+            "tipo_analisis": "conteo_instrumentos",
+            "tipo_cirugia": tipo_cirugia,
+            "timestamp": datetime.now().isoformat(),
+            "discrepancias_detectadas": analisis["discrepancias"],
+            "nivel_riesgo": analisis["nivel_riesgo"],
+            "puntaje_riesgo": analisis["puntaje_riesgo"],
+            "requiere_accion_inmediata": analisis["requiere_accion_inmediata"],
+            "resumen_conteo": analisis["resumen"]
+        }
+        
+        if not analisis["discrepancias"] and not forzar_analisis_ia:
+            resumen = analisis["resumen"]
+            respuesta.update({
+                "analisis_ia": (
+                    f"Conteos coincidentes: {resumen['instrumentos_final']} instrumentos y "
+                    f"{resumen['unidades_final']} unidades verificadas contra el set sin discrepancias. "
+                    "Nivel de riesgo: BAJO."
+                ),
+                "analisis_ia_utilizado": False,
+                "nivel_confianza": "ALTO",
+                "tokens_utilizados": 0,
+                "tiempo_proceso": time.time() - inicio,
+                "cache": None
+            })
+            return respuesta
+        
         texto_analisis = f"""
         {self.contexto_sistema}
         
@@ -90,12 +179,17 @@ class EIVAIAssistantService:
         
         TIPO DE CIRUGÍA: {tipo_cirugia}
         
+        DISCREPANCIAS DETECTADAS (cálculo verificado):
+        {self._formatear_discrepancias(analisis["discrepancias"])}
+        
+        NIVEL DE RIESGO CALCULADO: {analisis["nivel_riesgo"]}
+        
         ANÁLISIS REQUERIDO:
-        1. Identificar discrepancias entre conteo inicial y final
+        1. Explicar las discrepancias detectadas
         2. Evaluar la criticidad de cada discrepancia
         3. Determinar posibles causas de las diferencias
         4. {"Generar recomendaciones específicas para resolución" if incluir_recomendaciones else "Solo reportar discrepancias"}
-        5. Clasificar el nivel de riesgo para el paciente
+        5. Justificar el nivel de riesgo calculado para el paciente
         
         Formato de respuesta esperado:
         - Resumen ejecutivo
@@ -105,27 +199,70 @@ class EIVAIAssistantService:
         """
         
         try:
-            resultado = self.deepseek_service.procesar_texto(
+            resultado = await self._procesar(
                 texto=texto_analisis,
                 temperatura=0.1,  # Baja temperatura para análisis preciso
                 max_tokens=800
             )
             
-            return {
-                "tipo_analisis": "conteo_instrumentos",
-                "tipo_cirugia": tipo_cirugia,
-                "timestamp": datetime.now().isoformat(),
-                "discrepancias_detectadas": self._extraer_discrepancias(conteo_inicial, conteo_final),
+            respuesta.update({
                 "analisis_ia": resultado["texto_procesado"],
+                "analisis_ia_utilizado": True,
                 "nivel_confianza": "ALTO",
                 "tokens_utilizados": resultado["tokens_salida"],
-                "tiempo_proceso": resultado["tiempo_proceso"]
-            }
+                "tiempo_proceso": resultado["tiempo_proceso"],
+                "cache": resultado.get("cache")
+            })
+            return respuesta
         except DeepSeekException as e:
             logger.error(f"Error en análisis de conteos: {str(e)}")
             raise
     
-    def generar_reporte_quirurgico(
+    async def _procesar_stream(
+        self,
+        texto: str,
+        temperatura: float,
+        max_tokens: int,
+        consulta: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Variante por partes de `_procesar`.
+        
+        Una respuesta en caché se emite como un único fragmento; una respuesta
+        nueva se guarda en la caché solo si el streaming termina completo.
+        
+        Args:
+            texto: Prompt completo
+            temperatura: Nivel de aleatoriedad
+            max_tokens: Número máximo de tokens a generar
+            consulta: Texto libre del usuario para el nivel semántico de la caché
+            
+        Yields:
+            Eventos "token" y un evento final "fin" (ver DeepSeekService.procesar_texto_stream)
+        """
+        modelo = self.deepseek_service.default_model
+        if cache_respuestas is not None:
+            inicio = time.time()
+            resultado = await cache_respuestas.obtener_async(texto, modelo, temperatura, max_tokens, consulta=consulta)
+            if resultado is not None:
+                logger.info(f"Respuesta obtenida de la caché ({resultado['cache']})")
+                yield {"tipo": "token", "texto": resultado["texto_procesado"]}
+                resultado["tiempo_primer_token"] = resultado["tiempo_proceso"] = time.time() - inicio
+                yield {"tipo": "fin", **resultado}
+                return
+                
+        async for evento in self.deepseek_service.procesar_texto_stream(
+            texto=texto,
+            temperatura=temperatura,
+            max_tokens=max_tokens,
+            modelo=modelo
+        ):
+            if evento["tipo"] == "fin" and cache_respuestas is not None:
+                respuesta = {clave: valor for clave, valor in evento.items() if clave not in ("tipo", "tiempo_primer_token")}
+                await cache_respuestas.guardar_async(texto, modelo, temperatura, max_tokens, respuesta, consulta=consulta)
+            yield evento
+    
+    async def generar_reporte_quirurgico(
         self,
         procedimiento_data: Dict,
         incluir_recomendaciones: bool = True
@@ -133,7 +270,49 @@ class EIVAIAssistantService:
         """
         Genera un reporte inteligente de procedimiento quirúrgico.
         """
-        texto_reporte = f"""
+        try:
+            resultado = await self._procesar(
+                texto=self._prompt_reporte(procedimiento_data, incluir_recomendaciones),
+                temperatura=0.3,
+                max_tokens=1000
+            )
+            
+            return self._respuesta_reporte(procedimiento_data, resultado)
+        except DeepSeekException as e:
+            logger.error(f"Error generando reporte: {str(e)}")
+            raise
+    
+    async def generar_reporte_quirurgico_stream(
+        self,
+        procedimiento_data: Dict,
+        incluir_recomendaciones: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Genera el reporte de procedimiento quirúrgico emitiendo el texto por partes.
+        
+        Yields:
+            Eventos "token" y un evento "fin" con los campos de la respuesta completa
+        """
+        try:
+            async for evento in self._procesar_stream(
+                texto=self._prompt_reporte(procedimiento_data, incluir_recomendaciones),
+                temperatura=0.3,
+                max_tokens=1000
+            ):
+                if evento["tipo"] == "fin":
+                    evento = {
+                        "tipo": "fin",
+                        **self._respuesta_reporte(procedimiento_data, evento),
+                        "tiempo_primer_token": evento["tiempo_primer_token"]
+                    }
+                yield evento
+        except DeepSeekException as e:
+            logger.error(f"Error generando reporte en streaming: {str(e)}")
+            raise
+    
+    def _prompt_reporte(self, procedimiento_data: Dict, incluir_recomendaciones: bool) -> str:
+        """Construye el prompt del reporte de procedimiento quirúrgico."""
+        return f"""
         {self.contexto_sistema}
         
         TAREA: Generar reporte profesional de procedimiento quirúrgico
@@ -151,30 +330,63 @@ class EIVAIAssistantService:
         El reporte debe ser profesional, preciso y útil para el equipo quirúrgico.
         """
         
+    def _respuesta_reporte(self, procedimiento_data: Dict, resultado: Dict[str, Any]) -> Dict[str, Any]:
+        """Construye la respuesta del reporte a partir del resultado de DeepSeek."""
+        return {
+            "tipo_reporte": "procedimiento_quirurgico",
+            "procedimiento_id": procedimiento_data.get("procedimiento_id"),
+            "fecha_generacion": datetime.now().isoformat(),
+            "reporte_generado": resultado["texto_procesado"],
+            "modelo_utilizado": resultado["modelo_usado"],
+            "tiempo_generacion": resultado["tiempo_proceso"],
+            "cache": resultado.get("cache")
+        }
+    
+    async def consulta_natural_instrumentos(self, consulta: str) -> Dict[str, Any]:
+        """
+        Responde consultas en lenguaje natural sobre instrumentos y procedimientos.
+        """
         try:
-            resultado = self.deepseek_service.procesar_texto(
-                texto=texto_reporte,
-                temperatura=0.3,
-                max_tokens=1000
+            resultado = await self._procesar(
+                texto=self._prompt_consulta_natural(consulta),
+                temperatura=0.4,
+                max_tokens=600,
+                consulta=consulta
             )
             
-            return {
-                "tipo_reporte": "procedimiento_quirurgico",
-                "procedimiento_id": procedimiento_data.get("procedimiento_id"),
-                "fecha_generacion": datetime.now().isoformat(),
-                "reporte_generado": resultado["texto_procesado"],
-                "modelo_utilizado": resultado["modelo_usado"],
-                "tiempo_generacion": resultado["tiempo_proceso"]
-            }
+            return self._respuesta_consulta_natural(consulta, resultado)
         except DeepSeekException as e:
-            logger.error(f"Error generando reporte: {str(e)}")
+            logger.error(f"Error en consulta natural: {str(e)}")
             raise
     
-    def consulta_natural_instrumentos(self, consulta: str) -> Dict[str, Any]:
+    async def consulta_natural_instrumentos_stream(self, consulta: str) -> AsyncIterator[Dict[str, Any]]:
         """
-        Responde consultas en lenguaje natural sobre instrumentos y procedimientos.
+        Responde una consulta en lenguaje natural emitiendo el texto por partes.
+        
+        Yields:
+            Eventos "token" y un evento "fin" con los campos de la respuesta completa
         """
-        texto_consulta = f"""
+        try:
+            async for evento in self._procesar_stream(
+                texto=self._prompt_consulta_natural(consulta),
+                temperatura=0.4,
+                max_tokens=600,
+                consulta=consulta
+            ):
+                if evento["tipo"] == "fin":
+                    evento = {
+                        "tipo": "fin",
+                        **self._respuesta_consulta_natural(consulta, evento),
+                        "tiempo_primer_token": evento["tiempo_primer_token"]
+                    }
+                yield evento
+        except DeepSeekException as e:
+            logger.error(f"Error en consulta natural en streaming: {str(e)}")
+            raise
+    
+    def _prompt_consulta_natural(self, consulta: str) -> str:
+        """Construye el prompt de una consulta en lenguaje natural."""
+        return f"""
         {self.contexto_sistema}
         
         CONSULTA DEL USUARIO: {consulta}
@@ -189,25 +401,18 @@ class EIVAIAssistantService:
         La respuesta debe ser clara, profesional y orientada a personal médico.
         """
         
-        try:
-            resultado = self.deepseek_service.procesar_texto(
-                texto=texto_consulta,
-                temperatura=0.4,
-                max_tokens=600
-            )
-            
-            return {
-                "tipo_consulta": "lenguaje_natural",
-                "consulta_original": consulta,
-                "respuesta": resultado["texto_procesado"],
-                "timestamp": datetime.now().isoformat(),
-                "calidad_respuesta": "ESTÁNDAR"
-            }
-        except DeepSeekException as e:
-            logger.error(f"Error en consulta natural: {str(e)}")
-            raise
+    def _respuesta_consulta_natural(self, consulta: str, resultado: Dict[str, Any]) -> Dict[str, Any]:
+        """Construye la respuesta de una consulta a partir del resultado de DeepSeek."""
+        return {
+            "tipo_consulta": "lenguaje_natural",
+            "consulta_original": consulta,
+            "respuesta": resultado["texto_procesado"],
+            "timestamp": datetime.now().isoformat(),
+            "calidad_respuesta": "ESTÁNDAR",
+            "cache": resultado.get("cache")
+        }
     
-    def analizar_patrones_uso(self, datos_historicos: List[Dict]) -> Dict[str, Any]:
+    async def analizar_patrones_uso(self, datos_historicos: List[Dict]) -> Dict[str, Any]:
         """
         Analiza patrones de uso de instrumentos para optimización.
         """
@@ -230,7 +435,7 @@ class EIVAIAssistantService:
         """
         
         try:
-            resultado = self.deepseek_service.procesar_texto(
+            resultado = await self._procesar(
                 texto=texto_analisis,
                 temperatura=0.2,
                 max_tokens=900
@@ -241,13 +446,14 @@ class EIVAIAssistantService:
                 "periodo_analizado": self._extraer_periodo(datos_historicos),
                 "insights": resultado["texto_procesado"],
                 "fecha_analisis": datetime.now().isoformat(),
-                "recomendaciones_incluidas": True
+                "recomendaciones_incluidas": True,
+                "cache": resultado.get("cache")
             }
         except DeepSeekException as e:
             logger.error(f"Error en análisis de patrones: {str(e)}")
             raise
     
-    def generar_alerta_inteligente(
+    async def generar_alerta_inteligente(
         self,
         tipo_alerta: str,
         datos_contexto: Dict,
@@ -278,7 +484,7 @@ class EIVAIAssistantService:
         """
         
         try:
-            resultado = self.deepseek_service.procesar_texto(
+            resultado = await self._procesar(
                 texto=texto_alerta,
                 temperatura=0.1,
                 max_tokens=500
@@ -290,7 +496,8 @@ class EIVAIAssistantService:
                 "mensaje_generado": resultado["texto_procesado"],
                 "timestamp": datetime.now().isoformat(),
                 "requiere_accion_inmediata": prioridad in ["ALTA", "CRITICA"],
-                "contexto_proporcionado": datos_contexto
+                "contexto_proporcionado": datos_contexto,
+                "cache": resultado.get("cache")
             }
         except DeepSeekException as e:
             logger.error(f"Error generando alerta: {str(e)}")
@@ -337,37 +544,21 @@ class EIVAIAssistantService:
             lineas.append(f"- {clave}: {valor}")
         return "\n".join(lineas)
     
+    def _formatear_discrepancias(self, discrepancias: List[Dict]) -> str:
+        """Formatea las discrepancias calculadas para el análisis."""
+        if not discrepancias:
+            return "Ninguna: los conteos coinciden"
+        
+        lineas = []
+        for d in discrepancias:
+            lineas.append(f"- {d['nombre'] or d['instrumento_id']}: {d['tipo']}, "
+                         f"Esperado: {d['esperado']}, Encontrado: {d['encontrado']}, "
+                         f"Criticidad: {d['criticidad']}, Riesgo: {d['nivel_riesgo']}")
+        return "\n".join(lineas)
+    
     def _extraer_discrepancias(self, inicial: List[Dict], final: List[Dict]) -> List[Dict]:
         """Extrae discrepancias entre conteos inicial y final."""
-        discrepancias = []
-        
-        # Crear mapas para comparación fácil
-        inicial_map = {item.get('instrumento_id'): item for item in inicial}
-        final_map = {item.get('instrumento_id'): item for item in final}
-        
-        # Buscar discrepancias
-        for inst_id in inicial_map:
-            inicial_item = inicial_map[inst_id]
-            final_item = final_map.get(inst_id)
-            
-            if not final_item:
-                discrepancias.append({
-                    "instrumento_id": inst_id,
-                    "nombre": inicial_item.get('nombre_instrumento'),
-                    "tipo": "FALTANTE_EN_FINAL",
-                    "esperado": inicial_item.get('cantidad_contada', 0),
-                    "encontrado": 0
-                })
-            elif inicial_item.get('cantidad_contada') != final_item.get('cantidad_contada'):
-                discrepancias.append({
-                    "instrumento_id": inst_id,
-                    "nombre": inicial_item.get('nombre_instrumento'),
-                    "tipo": "CANTIDAD_DIFERENTE",
-                    "esperado": inicial_item.get('cantidad_contada', 0),
-                    "encontrado": final_item.get('cantidad_contada', 0)
-                })
-        
-        return discrepancias
+        return analizar_discrepancias(inicial, final)["discrepancias"]
     
     def _extraer_periodo(self, datos: List[Dict]) -> str:
         """Extrae el período de tiempo de los datos históricos."""
@@ -0,0 +1,367 @@
+"""
+Caché de respuestas de DeepSeek para el asistente EIVAI.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.config.settings import get_settings
+
+settings = get_settings()
+logger = logging.getLogger("eivai_assistant")
+
+def normalizar_prompt(texto: str) -> str:
+    """
+    Normaliza un prompt para que diferencias de formato no cambien la clave.
+    
+    Colapsa espacios y saltos de línea (los prompts se construyen con
+    indentación) e ignora mayúsculas.
+    """
+    return re.sub(r"\s+", " ", texto).strip().casefold()
+
+def clave_cache(prompt: str, modelo: str, temperatura: float, max_tokens: int) -> str:
+    """
+    Calcula la clave exacta de una solicitud.
+    
+    Args:
+        prompt: Prompt completo enviado a DeepSeek
+        modelo: Modelo utilizado
+        temperatura: Temperatura de la solicitud
+        max_tokens: Máximo de tokens de la respuesta
+    
+    Returns:
+        Hash hexadecimal de la solicitud normalizada
+    """
+    contenido = f"{modelo}\x00{float(temperatura)}\x00{int(max_tokens)}\x00{normalizar_prompt(prompt)}"
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+# Palabras que invierten o cuantifican el sentido de una consulta: dos consultas
+# casi idénticas que difieren en ellas no tienen la misma respuesta
+NEGACIONES = {"no", "ni", "nunca", "jamas", "sin", "tampoco", "ningun", "ninguna", "ninguno", "nada"}
+NUMEROS = {
+    "cero", "uno", "dos", "tres", "cuatro", "cinco", "seis", "siete", "ocho", "nueve",
+    "diez", "once", "doce", "veinte", "cien", "mil"
+}
+
+def firma_consulta(texto: str) -> Tuple[str, ...]:
+    """
+    Obtiene los números y negaciones de una consulta, en orden.
+    
+    El nivel semántico solo reutiliza respuestas de consultas con la misma
+    firma: "¿Cuántas pinzas tiene el set 3?" y "... el set 4?" son muy
+    similares como texto pero no comparten respuesta.
+    """
+    texto = unicodedata.normalize("NFKD", normalizar_prompt(texto))
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return tuple(
+        palabra for palabra in re.findall(r"\w+", texto)
+        if palabra.isdigit() or palabra in NUMEROS or palabra in NEGACIONES
+    )
+
+class EmbeddingNgramas:
+    """
+    Embedding local sin dependencias: trigramas de caracteres de la consulta
+    proyectados por hash a un vector de dimensión fija y normalizados.
+    
+    Detecta reformulaciones cercanas (puntuación, acentos, orden de palabras,
+    errores de tipeo), no sinónimos.
+    """
+    
+    def __init__(self, dimension: int = 512):
+        self.dimension = dimension
+    
+    def __call__(self, texto: str) -> List[float]:
+        texto = unicodedata.normalize("NFKD", normalizar_prompt(texto))
+        texto = "".join(c for c in texto if c.isalnum() or c == " ")
+        vector = [0.0] * self.dimension
+        for palabra in texto.split():
+            palabra = f" {palabra} "
+            for i in range(len(palabra) - 2):
+                vector[zlib.crc32(palabra[i:i + 3].encode("utf-8")) % self.dimension] += 1.0
+        
+        norma = math.sqrt(sum(v * v for v in vector))
+        return [v / norma for v in vector] if norma else vector
+
+def crear_embedding(nombre_modelo: str = "") -> Callable[[str], List[float]]:
+    """
+    Crea la función de embedding del nivel semántico.
+    
+    Args:
+        nombre_modelo: Modelo de sentence-transformers a cargar localmente
+            (vacío = trigramas de caracteres)
+    
+    Returns:
+        Función texto -> vector normalizado
+    """
+    if nombre_modelo:
+        try:
+            from sentence_transformers import SentenceTransformer
+            modelo = SentenceTransformer(nombre_modelo)
+            return lambda texto: modelo.encode(texto, normalize_embeddings=True).tolist()
+        except Exception as e:
+            logger.warning(f"No se pudo cargar el modelo de embeddings {nombre_modelo}, se usan trigramas: {str(e)}")
+    return EmbeddingNgramas()
+
+class CacheRespuestas:
+    """
+    Caché LRU con expiración (TTL) para respuestas de DeepSeek.
+    
+    El nivel exacto indexa por el hash del prompt normalizado, el modelo, la
+    temperatura y el máximo de tokens. El nivel semántico (opcional) compara
+    solo la consulta del usuario contra las consultas almacenadas con el mismo
+    modelo, parámetros y firma (números y negaciones), y reutiliza la respuesta
+    si la similitud coseno supera el umbral. Solo se almacenan solicitudes de
+    baja temperatura, cuya respuesta es prácticamente determinista.
+    
+    El embedding puede requerir cargar un modelo y es costoso de calcular: desde
+    código asíncrono se usan `obtener_async` y `guardar_async`, que lo calculan
+    fuera del event loop.
+    """
+    
+    def __init__(
+        self,
+        max_entradas: int = 512,
+        ttl_segundos: float = 3600.0,
+        temperatura_maxima: float = 0.4,
+        semantica: bool = False,
+        umbral_semantico: float = 0.92,
+        embedding: Optional[Callable[[str], List[float]]] = None
+    ):
+        """
+        Inicializa la caché.
+        
+        Args:
+            max_entradas: Número máximo de respuestas almacenadas
+            ttl_segundos: Tiempo de vida de cada entrada en segundos (0 = sin expiración)
+            temperatura_maxima: Temperatura máxima de las solicitudes almacenables
+            semantica: Si habilitar el nivel semántico
+            umbral_semantico: Similitud coseno mínima para un acierto semántico
+            embedding: Función de embedding del nivel semántico (por defecto trigramas)
+        """
+        self.max_entradas = max(1, int(max_entradas))
+        self.ttl_segundos = float(ttl_segundos)
+        self.temperatura_maxima = float(temperatura_maxima)
+        self.semantica = semantica
+        self.umbral_semantico = float(umbral_semantico)
+        self._embedding = embedding
+        
+        # clave -> (instante, ámbito, firma, vector de la consulta, respuesta)
+        self._entradas: "OrderedDict[str, Tuple[float, str, Tuple[str, ...], Optional[List[float]], Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._aciertos = 0
+        self._aciertos_semanticos = 0
+        self._fallos = 0
+        self._omitidas = 0
+        self._desalojos = 0
+        self._tokens_ahorrados = 0
+    
+    @property
+    def embedding(self) -> Callable[[str], List[float]]:
+        """Función de embedding, creada en el primer uso."""
+        if self._embedding is None:
+            self._embedding = crear_embedding(settings.CACHE_SEMANTICA_MODELO)
+        return self._embedding
+    
+    def es_cacheable(self, temperatura: float) -> bool:
+        """Indica si una solicitud con esta temperatura puede almacenarse."""
+        return temperatura <= self.temperatura_maxima
+    
+    @staticmethod
+    def _ambito(modelo: str, temperatura: float, max_tokens: int) -> str:
+        return f"{modelo}|{float(temperatura)}|{int(max_tokens)}"
+    
+    def _expirada(self, instante: float) -> bool:
+        return self.ttl_segundos > 0 and time.monotonic() - instante > self.ttl_segundos
+    
+    def obtener(
+        self,
+        prompt: str,
+        modelo: str,
+        temperatura: float,
+        max_tokens: int,
+        consulta: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene una respuesta almacenada.
+        
+        Args:
+            prompt: Prompt completo enviado a DeepSeek
+            modelo: Modelo utilizado
+            temperatura: Temperatura de la solicitud
+            max_tokens: Máximo de tokens de la respuesta
+            consulta: Texto libre del usuario para el nivel semántico (opcional)
+        
+        Returns:
+            Copia de la respuesta con `cache` = "exacta" o "semantica", o None
+        """
+        if not self.es_cacheable(temperatura):
+            with self._lock:
+                self._omitidas += 1
+            return None
+        
+        clave = clave_cache(prompt, modelo, temperatura, max_tokens)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and self._expirada(entrada[0]):
+                del self._entradas[clave]
+                entrada = None
+            
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+                return self._registrar_acierto(entrada[4], "exacta")
+            
+            if not (self.semantica and consulta):
+                self._fallos += 1
+                return None
+        
+        # El embedding se calcula fuera del lock
+        vector = self.embedding(consulta)
+        ambito = self._ambito(modelo, temperatura, max_tokens)
+        firma = firma_consulta(consulta)
+        with self._lock:
+            mejor, similitud_maxima = None, self.umbral_semantico
+            for clave_entrada, (instante, ambito_entrada, firma_entrada, vector_entrada, _) in list(self._entradas.items()):
+                if ambito_entrada != ambito or firma_entrada != firma or vector_entrada is None:
+                    continue
+                if self._expirada(instante):
+                    del self._entradas[clave_entrada]
+                    continue
+                similitud = sum(a * b for a, b in zip(vector, vector_entrada))
+                if similitud >= similitud_maxima:
+                    mejor, similitud_maxima = clave_entrada, similitud
+            
+            if mejor is None:
+                self._fallos += 1
+                return None
+            
+            self._entradas.move_to_end(mejor)
+            self._aciertos_semanticos += 1
+            respuesta = self._registrar_acierto(self._entradas[mejor][4], "semantica")
+            respuesta["similitud_cache"] = round(similitud_maxima, 4)
+            return respuesta
+    
+    def _registrar_acierto(self, respuesta: Dict[str, Any], nivel: str) -> Dict[str, Any]:
+        """Contabiliza un acierto (requiere el lock tomado) y devuelve una copia."""
+        self._aciertos += 1
+        self._tokens_ahorrados += int(respuesta.get("tokens_entrada", 0)) + int(respuesta.get("tokens_salida", 0))
+        copia = dict(respuesta)
+        copia["cache"] = nivel
+        return copia
+    
+    def guardar(
+        self,
+        prompt: str,
+        modelo: str,
+        temperatura: float,
+        max_tokens: int,
+        respuesta: Dict[str, Any],
+        consulta: Optional[str] = None
+    ) -> None:
+        """
+        Almacena una respuesta si la temperatura lo permite.
+        
+        Args:
+            prompt: Prompt completo enviado a DeepSeek
+            modelo: Modelo utilizado
+            temperatura: Temperatura de la solicitud
+            max_tokens: Máximo de tokens de la respuesta
+            respuesta: Respuesta de DeepSeekService.procesar_texto
+            consulta: Texto libre del usuario para el nivel semántico (opcional)
+        """
+        if not self.es_cacheable(temperatura):
+            return
+        
+        vector = self.embedding(consulta) if self.semantica and consulta else None
+        clave = clave_cache(prompt, modelo, temperatura, max_tokens)
+        with self._lock:
+            self._entradas[clave] = (
+                time.monotonic(),
+                self._ambito(modelo, temperatura, max_tokens),
+                firma_consulta(consulta) if vector is not None else (),
+                vector,
+                dict(respuesta)
+            )
+            self._entradas.move_to_end(clave)
+            
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self._desalojos += 1
+    
+    def _usa_embedding(self, temperatura: float, consulta: Optional[str]) -> bool:
+        """Indica si la operación calculará un embedding."""
+        return bool(self.semantica and consulta) and self.es_cacheable(temperatura)
+    
+    async def obtener_async(
+        self,
+        prompt: str,
+        modelo: str,
+        temperatura: float,
+        max_tokens: int,
+        consulta: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Como `obtener`, con el embedding calculado fuera del event loop."""
+        if self._usa_embedding(temperatura, consulta):
+            return await asyncio.to_thread(self.obtener, prompt, modelo, temperatura, max_tokens, consulta)
+        return self.obtener(prompt, modelo, temperatura, max_tokens, consulta=consulta)
+    
+    async def guardar_async(
+        self,
+        prompt: str,
+        modelo: str,
+        temperatura: float,
+        max_tokens: int,
+        respuesta: Dict[str, Any],
+        consulta: Optional[str] = None
+    ) -> None:
+        """Como `guardar`, con el embedding calculado fuera del event loop."""
+        if self._usa_embedding(temperatura, consulta):
+            await asyncio.to_thread(self.guardar, prompt, modelo, temperatura, max_tokens, respuesta, consulta)
+        else:
+            self.guardar(prompt, modelo, temperatura, max_tokens, respuesta, consulta=consulta)
+    
+    def limpiar(self) -> None:
+        """Elimina todas las entradas."""
+        with self._lock:
+            self._entradas.clear()
+    
+    def estadisticas(self) -> Dict[str, Any]:
+        """
+        Obtiene estadísticas de uso de la caché.
+        
+        Returns:
+            Entradas, aciertos (exactos y semánticos), fallos, tasa de aciertos,
+            solicitudes no cacheables y tokens ahorrados
+        """
+        with self._lock:
+            total = self._aciertos + self._fallos
+            return {
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "ttl_segundos": self.ttl_segundos,
+                "temperatura_maxima": self.temperatura_maxima,
+                "semantica": self.semantica,
+                "aciertos": self._aciertos,
+                "aciertos_semanticos": self._aciertos_semanticos,
+                "fallos": self._fallos,
+                "tasa_aciertos": round(self._aciertos / total, 3) if total else 0.0,
+                "no_cacheables": self._omitidas,
+                "desalojos": self._desalojos,
+                "tokens_ahorrados": self._tokens_ahorrados
+            }
+
+# Instancia global de la caché (None si está deshabilitada)
+cache_respuestas = CacheRespuestas(
+    max_entradas=settings.CACHE_MAX_ENTRADAS,
+    ttl_segundos=settings.CACHE_TTL_SEGUNDOS,
+    temperatura_maxima=settings.CACHE_TEMPERATURA_MAXIMA,
+    semantica=settings.CACHE_SEMANTICA_HABILITADA,
+    umbral_semantico=settings.CACHE_SEMANTICA_UMBRAL
+) if settings.CACHE_RESPUESTAS_HABILITADA else None
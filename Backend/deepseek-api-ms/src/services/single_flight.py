@@ -0,0 +1,82 @@
+"""
+Agrupación de solicitudes idénticas en curso (single-flight).
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from src.config.settings import get_settings
+
+settings = get_settings()
+logger = logging.getLogger("eivai_assistant")
+
+class SingleFlight:
+    """
+    Comparte una sola llamada entre solicitudes idénticas simultáneas.
+    
+    La primera solicitud con una clave ejecuta la llamada; las que llegan
+    mientras sigue en curso esperan su resultado (o su excepción) en lugar de
+    repetirla. La llamada se protege de la cancelación de cada solicitud, de
+    modo que si un cliente se desconecta el resto sigue recibiendo la respuesta.
+    """
+    
+    def __init__(self):
+        """Inicializa el registro de llamadas en curso."""
+        self._en_curso: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+        self._ejecutadas = 0
+        self._compartidas = 0
+    
+    async def ejecutar(
+        self,
+        clave: str,
+        llamada: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Ejecuta la llamada o se une a una idéntica en curso.
+        
+        Args:
+            clave: Identificador de la solicitud (p. ej. hash del prompt y parámetros)
+            llamada: Función que inicia la llamada
+            
+        Returns:
+            Copia del resultado y si se compartió una llamada en curso
+            
+        Raises:
+            Exception: La excepción de la llamada, para todas las solicitudes que la esperan
+        """
+        tarea = self._en_curso.get(clave)
+        compartida = tarea is not None
+        if compartida:
+            self._compartidas += 1
+            logger.info(f"Solicitud idéntica en curso, se comparte su resultado ({clave[:12]})")
+        else:
+            tarea = asyncio.ensure_future(llamada())
+            self._en_curso[clave] = tarea
+            self._ejecutadas += 1
+            tarea.add_done_callback(lambda terminada: self._terminar(clave, terminada))
+            
+        resultado = await asyncio.shield(tarea)
+        return dict(resultado), compartida
+    
+    def _terminar(self, clave: str, tarea: "asyncio.Future[Dict[str, Any]]") -> None:
+        """Retira la llamada terminada y marca su excepción como recuperada."""
+        if self._en_curso.get(clave) is tarea:
+            del self._en_curso[clave]
+        if not tarea.cancelled():
+            tarea.exception()
+    
+    def estadisticas(self) -> Dict[str, Any]:
+        """
+        Obtiene estadísticas de agrupación.
+        
+        Returns:
+            Llamadas en curso, ejecutadas y solicitudes que compartieron una llamada
+        """
+        return {
+            "en_curso": len(self._en_curso),
+            "ejecutadas": self._ejecutadas,
+            "compartidas": self._compartidas
+        }
+
+# Instancia global (None si está deshabilitada)
+solicitudes_en_curso = SingleFlight() if settings.SINGLE_FLIGHT_HABILITADO else None
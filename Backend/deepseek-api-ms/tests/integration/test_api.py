@@ -1,8 +1,9 @@
 """
 Tests de integración para la API.
 """
+import httpx
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock
 from fastapi.testclient import TestClient
 
 class TestDeepSeekAPI:
@@ -48,13 +49,11 @@ class TestDeepSeekAPI:
         
         assert response.status_code == 403
     
-    @patch("src.services.deepseek_service.requests.post")
+    @patch("src.services.deepseek_service.httpx.AsyncClient.post", new_callable=AsyncMock)
     def test_procesar_texto(self, mock_post, client):
         """Test para el endpoint de procesamiento de texto."""
         # Configurar el mock
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        mock_post.return_value = httpx.Response(200, json={
             "choices": [
                 {
                     "message": {
@@ -66,8 +65,7 @@ class TestDeepSeekAPI:
                 "prompt_tokens": 5,
                 "completion_tokens": 10
             }
-        }
-        mock_post.return_value = mock_response
+        })
         
         # Preparar payload y headers
         payload = {
@@ -105,7 +103,7 @@ class TestDeepSeekAPI:
         # Verificar respuesta de error
         assert response.status_code == 422  # Unprocessable Entity
     
-    @patch("src.services.deepseek_service.requests.post")
+    @patch("src.services.deepseek_service.httpx.AsyncClient.post", new_callable=AsyncMock)
     def test_procesar_texto_error_servicio(self, mock_post, client):
         """Test para el endpoint cuando el servicio falla."""
         # Configurar el mock para fallar
@@ -1,8 +1,9 @@
 """
 Tests para el controlador DeepSeek.
 """
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from src.api.controllers.deepseek_controller import DeepSeekController
 from src.services.deepseek_service import DeepSeekException
 
@@ -28,21 +29,21 @@ class TestDeepSeekController:
         mock_instance = MagicMock()
         mock_service.return_value = mock_instance
         
-        mock_instance.procesar_texto.return_value = {
+        mock_instance.procesar_texto = AsyncMock(return_value={
             "texto_procesado": "Texto procesado de prueba",
             "modelo_usado": "test-model",
             "tokens_entrada": 5,
             "tokens_salida": 10,
             "tiempo_proceso": 0.5
-        }
+        })
         
         # Llamar al método bajo prueba
-        resultado = DeepSeekController.procesar_texto(
+        resultado = asyncio.run(DeepSeekController.procesar_texto(
             texto="Texto de prueba",
             temperatura=0.5,
             max_tokens=100,
             modelo="test-model"
-        )
+        ))
         
         # Verificar resultados
         assert resultado["texto_procesado"] == "Texto procesado de prueba"
@@ -52,7 +53,7 @@ class TestDeepSeekController:
         assert resultado["tiempo_proceso"] == 0.5
         
         # Verificar que el mock fue llamado correctamente
-        mock_instance.procesar_texto.assert_called_once_with(
+        mock_instance.procesar_texto.assert_awaited_once_with(
             texto="Texto de prueba",
             temperatura=0.5,
             max_tokens=100,
@@ -65,10 +66,10 @@ class TestDeepSeekController:
         # Configurar el mock para lanzar una excepción
         mock_instance = MagicMock()
         mock_service.return_value = mock_instance
-        mock_instance.procesar_texto.side_effect = DeepSeekException("Error de prueba")
+        mock_instance.procesar_texto = AsyncMock(side_effect=DeepSeekException("Error de prueba"))
         
         # Verificar que se propaga la excepción
         with pytest.raises(DeepSeekException) as excinfo:
-            DeepSeekController.procesar_texto(texto="Texto de prueba")
+            asyncio.run(DeepSeekController.procesar_texto(texto="Texto de prueba"))
         
         assert "Error de prueba" in str(excinfo.value)
@@ -1,50 +1,58 @@
 """
 Tests para el servicio DeepSeek.
 """
+import asyncio
+import json
 import pytest
-import requests
-import time
-from unittest.mock import patch, MagicMock
+import httpx
+from src.services import deepseek_service
 from src.services.deepseek_service import DeepSeekService, DeepSeekException
 
+RESPUESTA_EXITOSA = {
+    "choices": [
+        {
+            "message": {
+                "content": "Texto procesado de prueba"
+            }
+        }
+    ],
+    "usage": {
+        "prompt_tokens": 5,
+        "completion_tokens": 10
+    }
+}
+
+def crear_servicio(manejador):
+    """Crea un servicio cuyo cliente HTTP responde con `manejador` sin salir a la red."""
+    cliente = httpx.AsyncClient(transport=httpx.MockTransport(manejador))
+    servicio = DeepSeekService(cliente=cliente)
+    servicio.tiempo_entre_reintentos = 0
+    return servicio
+
 class TestDeepSeekService:
     """
     Clase para probar el servicio DeepSeek.
     """
     
-    @patch("src.services.deepseek_service.requests.post")
-    def test_procesar_texto_exitoso(self, mock_post):
+    def test_procesar_texto_exitoso(self):
         """Test para el método procesar_texto cuando es exitoso."""
-        # Configurar el mock de respuesta
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            "choices": [
-                {
-                    "message": {
-                        "content": "Texto procesado de prueba"
-                    }
-                }
-            ],
-            "usage": {
-                "prompt_tokens": 5,
-                "completion_tokens": 10
-            }
-        }
-        mock_post.return_value = mock_response
+        solicitudes = []
         
-        # Crear instancia del servicio
-        servicio = DeepSeekService()
+        def manejador(request):
+            solicitudes.append(request)
+            return httpx.Response(200, json=RESPUESTA_EXITOSA)
+        
+        servicio = crear_servicio(manejador)
         
         # Llamar al método bajo prueba
-        resultado = servicio.procesar_texto("Texto de prueba")
+        resultado = asyncio.run(servicio.procesar_texto("Texto de prueba"))
         
-        # Verificar que se llamó al método post con los parámetros correctos
-        mock_post.assert_called_once()
-        args, kwargs = mock_post.call_args
-        assert f"{servicio.api_url}/v1/chat/completions" == args[0]
-        assert kwargs["headers"]["Authorization"] == f"Bearer {servicio.api_key}"
-        assert kwargs["json"]["messages"][0]["content"] == "Texto de prueba"
+        # Verificar la solicitud enviada
+        assert len(solicitudes) == 1
+        request = solicitudes[0]
+        assert str(request.url) == f"{servicio.api_url}/v1/chat/completions"
+        assert request.headers["Authorization"] == f"Bearer {servicio.api_key}"
+        assert json.loads(request.content)["messages"][0]["content"] == "Texto de prueba"
         
         # Verificar el resultado
         assert resultado["texto_procesado"] == "Texto procesado de prueba"
@@ -53,47 +61,25 @@ class TestDeepSeekService:
         assert resultado["tokens_salida"] == 10
         assert "tiempo_proceso" in resultado
     
-    @patch("src.services.deepseek_service.requests.post")
-    def test_procesar_texto_error_api(self, mock_post):
+    def test_procesar_texto_error_api(self):
         """Test para el método procesar_texto cuando la API devuelve un error."""
-        # Configurar el mock para devolver un error
-        mock_response = MagicMock()
-        mock_response.status_code = 400
-        mock_response.json.return_value = {"error": "Error de API"}
-        mock_post.return_value = mock_response
-        
-        # Crear instancia del servicio
-        servicio = DeepSeekService()
+        servicio = crear_servicio(lambda request: httpx.Response(400, json={"error": "Error de API"}))
         
         # Verificar que se lanza la excepción correcta
         with pytest.raises(DeepSeekException) as excinfo:
-            servicio.procesar_texto("Texto de prueba")
+            asyncio.run(servicio.procesar_texto("Texto de prueba"))
         
         assert "Error en la API de DeepSeek: 400" in str(excinfo.value)
     
-    @patch("src.services.deepseek_service.requests.post")
-    def test_procesar_texto_parametros_personalizados(self, mock_post):
+    def test_procesar_texto_parametros_personalizados(self):
         """Test para el método procesar_texto con parámetros personalizados."""
-        # Configurar el mock de respuesta
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            "choices": [
-                {
-                    "message": {
-                        "content": "Texto procesado de prueba"
-                    }
-                }
-            ],
-            "usage": {
-                "prompt_tokens": 5,
-                "completion_tokens": 10
-            }
-        }
-        mock_post.return_value = mock_response
+        cuerpos = []
+        
+        def manejador(request):
+            cuerpos.append(json.loads(request.content))
+            return httpx.Response(200, json=RESPUESTA_EXITOSA)
         
-        # Crear instancia del servicio
-        servicio = DeepSeekService()
+        servicio = crear_servicio(manejador)
         
         # Parámetros personalizados
         temperatura = 0.3
@@ -101,48 +87,100 @@ class TestDeepSeekService:
         modelo = "modelo-personalizado"
         
         # Llamar al método bajo prueba
-        resultado = servicio.procesar_texto(
+        resultado = asyncio.run(servicio.procesar_texto(
             "Texto de prueba",
             temperatura=temperatura,
             max_tokens=max_tokens,
             modelo=modelo
-        )
+        ))
         
-        # Verificar que se llamó al método post con los parámetros correctos
-        args, kwargs = mock_post.call_args
-        assert kwargs["json"]["temperature"] == temperatura
-        assert kwargs["json"]["max_tokens"] == max_tokens
-        assert kwargs["json"]["model"] == modelo
+        # Verificar que se enviaron los parámetros correctos
+        assert cuerpos[0]["temperature"] == temperatura
+        assert cuerpos[0]["max_tokens"] == max_tokens
+        assert cuerpos[0]["model"] == modelo
         
         # Verificar el resultado
         assert resultado["modelo_usado"] == modelo
     
-    @patch("src.services.deepseek_service.requests.post")
-    def test_procesar_texto_connection_error(self, mock_post):
-        """Test para manejar errores de conexión."""
-        # Configurar el mock para lanzar un error de conexión
-        mock_post.side_effect = requests.exceptions.ConnectionError("Error de conexión")
+    def test_procesar_texto_connection_error(self):
+        """Test para manejar errores de conexión tras agotar los reintentos."""
+        intentos = []
+        
+        def manejador(request):
+            intentos.append(request)
+            raise httpx.ConnectError("Error de conexión", request=request)
         
-        # Crear instancia del servicio con reintentos mínimos para acelerar el test
-        servicio = DeepSeekService()
+        servicio = crear_servicio(manejador)
         
         # Verificar que se lanza la excepción correcta
         with pytest.raises(DeepSeekException) as excinfo:
-            servicio.procesar_texto("Texto de prueba")
+            asyncio.run(servicio.procesar_texto("Texto de prueba"))
         
         assert "Error de conexión con la API de DeepSeek" in str(excinfo.value)
+        assert len(intentos) == servicio.max_reintentos
     
-    @patch("src.services.deepseek_service.requests.post")
-    def test_procesar_texto_timeout(self, mock_post):
+    def test_procesar_texto_timeout(self):
         """Test para manejar errores de timeout."""
-        # Configurar el mock para lanzar un error de timeout
-        mock_post.side_effect = requests.exceptions.Timeout("Timeout")
+        def manejador(request):
+            raise httpx.ReadTimeout("Timeout", request=request)
         
-        # Crear instancia del servicio con reintentos mínimos para acelerar el test
-        servicio = DeepSeekService()
+        servicio = crear_servicio(manejador)
         
         # Verificar que se lanza la excepción correcta
         with pytest.raises(DeepSeekException) as excinfo:
-            servicio.procesar_texto("Texto de prueba")
+            asyncio.run(servicio.procesar_texto("Texto de prueba"))
         
         assert "Timeout en la conexión con la API de DeepSeek" in str(excinfo.value)
+    
+    def test_procesar_texto_reintento_exitoso(self):
+        """Test para recuperarse de un error transitorio con un reintento."""
+        intentos = []
+        
+        def manejador(request):
+            intentos.append(request)
+            if len(intentos) == 1:
+                raise httpx.RemoteProtocolError("Conexión cerrada por el servidor", request=request)
+            return httpx.Response(200, json=RESPUESTA_EXITOSA)
+        
+        servicio = crear_servicio(manejador)
+        resultado = asyncio.run(servicio.procesar_texto("Texto de prueba"))
+        
+        assert len(intentos) == 2
+        assert resultado["texto_procesado"] == "Texto procesado de prueba"
+    
+    def test_solicitudes_concurrentes(self):
+        """Test para verificar que las solicitudes concurrentes no se serializan."""
+        activas = []
+        maximo = []
+        
+        async def manejador(request):
+            activas.append(request)
+            maximo.append(len(activas))
+            await asyncio.sleep(0.05)
+            activas.remove(request)
+            return httpx.Response(200, json=RESPUESTA_EXITOSA)
+        
+        servicio = crear_servicio(manejador)
+        
+        async def ejecutar():
+            return await asyncio.gather(*[servicio.procesar_texto(f"Texto {i}") for i in range(5)])
+        
+        resultados = asyncio.run(ejecutar())
+        
+        assert len(resultados) == 5
+        assert max(maximo) == 5
+    
+    def test_cliente_compartido(self):
+        """Test del ciclo de vida del cliente HTTP compartido."""
+        async def ciclo():
+            cliente = await deepseek_service.iniciar_cliente_http()
+            assert await deepseek_service.iniciar_cliente_http() is cliente
+            async with DeepSeekService()._obtener_cliente() as usado:
+                assert usado is cliente
+            await deepseek_service.cerrar_cliente_http()
+            return cliente
+        
+        cliente = asyncio.run(ciclo())
+        
+        assert cliente.is_closed
+        assert deepseek_service._cliente_http is None
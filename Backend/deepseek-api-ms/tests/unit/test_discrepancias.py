@@ -0,0 +1,177 @@
+"""
+Tests para el motor local de discrepancias de conteos.
+"""
+import asyncio
+from unittest.mock import patch, AsyncMock
+from src.services import eivai_assistant_service
+from src.services.eivai_assistant_service import EIVAIAssistantService
+from src.services.discrepancias import analizar_discrepancias, criticidad_instrumento
+
+def item(instrumento_id, nombre, cantidad):
+    """Crea un instrumento de conteo."""
+    return {
+        "instrumento_id": instrumento_id,
+        "nombre_instrumento": nombre,
+        "cantidad_esperada": cantidad,
+        "cantidad_contada": cantidad
+    }
+
+CONTEO_INICIAL = [item(1, "Bisturí #11", 2), item(2, "Pinza Kelly", 4), item(3, "Riñonera", 1)]
+
+class TestDiscrepancias:
+    """
+    Clase para probar el cálculo local de discrepancias y riesgo.
+    """
+    
+    def test_conteos_coincidentes(self):
+        """Test para conteos iguales sin discrepancias."""
+        analisis = analizar_discrepancias(CONTEO_INICIAL, list(CONTEO_INICIAL))
+        
+        assert analisis["discrepancias"] == []
+        assert analisis["nivel_riesgo"] == "BAJO"
+        assert analisis["puntaje_riesgo"] == 0
+        assert analisis["requiere_accion_inmediata"] is False
+        assert analisis["resumen"]["unidades_final"] == 7
+    
+    def test_faltante_sobrante_y_cantidad(self):
+        """Test para detectar faltantes, sobrantes (solo en el final) y cantidades diferentes."""
+        final = [
+            item(1, "Bisturí #11", 1), item(2, "Pinza Kelly", 4),
+            dict(item(4, "Gasa 10x10", 5), cantidad_esperada=None)
+        ]
+        analisis = analizar_discrepancias(CONTEO_INICIAL, final)
+        por_id = {d["instrumento_id"]: d for d in analisis["discrepancias"]}
+        
+        assert set(por_id) == {1, 3, 4}
+        assert por_id[1]["tipo"] == "CANTIDAD_DIFERENTE"
+        assert por_id[1]["diferencia"] == -1
+        assert por_id[1]["nivel_riesgo"] == "CRÍTICO"
+        assert por_id[3]["tipo"] == "FALTANTE_EN_FINAL"
+        assert por_id[3]["encontrado"] == 0
+        assert por_id[4]["tipo"] == "SOBRANTE_EN_FINAL"
+        assert por_id[4]["esperado"] == 0
+        assert por_id[4]["encontrado"] == 5
+        
+        assert analisis["nivel_riesgo"] == "CRÍTICO"
+        assert analisis["requiere_accion_inmediata"] is True
+        assert analisis["discrepancias"][0]["instrumento_id"] == 1
+        assert analisis["resumen"]["faltantes"] == 2
+        assert analisis["resumen"]["sobrantes"] == 1
+    
+    def test_faltante_respecto_al_set(self):
+        """Test para detectar material faltante respecto al set aunque ambos conteos coincidan."""
+        gasas = dict(item(5, "Gasa 10x10", 10), cantidad_contada=9)
+        analisis = analizar_discrepancias([gasas], [dict(gasas)])
+        
+        assert len(analisis["discrepancias"]) == 1
+        discrepancia = analisis["discrepancias"][0]
+        assert discrepancia["tipo"] == "FALTANTE_RESPECTO_AL_SET"
+        assert discrepancia["esperado"] == 10
+        assert discrepancia["encontrado"] == 9
+        assert analisis["nivel_riesgo"] == "CRÍTICO"
+        
+        # Faltante al inicio y además una diferencia entre conteos
+        analisis = analizar_discrepancias([gasas], [dict(gasas, cantidad_contada=8)])
+        assert {d["tipo"] for d in analisis["discrepancias"]} == {"FALTANTE_RESPECTO_AL_SET", "CANTIDAD_DIFERENTE"}
+        assert analisis["puntaje_riesgo"] == 6
+    
+    def test_linea_del_set_solo_en_final(self):
+        """Test para comparar con el set una línea del set ausente del conteo inicial."""
+        # Menos de lo esperado: solo el faltante respecto al set, sin sobrante
+        gasas = dict(item(5, "Gasa 10x10", 10), cantidad_contada=8)
+        analisis = analizar_discrepancias(CONTEO_INICIAL, list(CONTEO_INICIAL) + [gasas])
+        
+        assert [(d["tipo"], d["esperado"], d["encontrado"]) for d in analisis["discrepancias"]] == [
+            ("FALTANTE_RESPECTO_AL_SET", 10, 8)
+        ]
+        
+        # Más de lo esperado: sobrante respecto al set
+        gasas = dict(item(5, "Gasa 10x10", 10), cantidad_contada=12)
+        analisis = analizar_discrepancias(CONTEO_INICIAL, list(CONTEO_INICIAL) + [gasas])
+        
+        assert [(d["tipo"], d["esperado"], d["encontrado"]) for d in analisis["discrepancias"]] == [
+            ("SOBRANTE_RESPECTO_AL_SET", 10, 12)
+        ]
+        assert analisis["resumen"]["sobrantes"] == 1
+        
+        # Coincide con lo esperado: sin discrepancias
+        analisis = analizar_discrepancias(CONTEO_INICIAL, list(CONTEO_INICIAL) + [item(5, "Gasa 10x10", 10)])
+        assert analisis["discrepancias"] == []
+    
+    def test_ponderacion_por_criticidad(self):
+        """Test para ponderar el riesgo por la criticidad del instrumento."""
+        assert criticidad_instrumento({"nombre_instrumento": "Gasas estériles"}) == "ALTA"
+        assert criticidad_instrumento({"nombre_instrumento": "Portaagujas Mayo"}) == "MEDIA"
+        assert criticidad_instrumento({"nombre_instrumento": "Riñonera"}) == "BAJA"
+        assert criticidad_instrumento({"nombre_instrumento": "Riñonera", "criticidad": "alta"}) == "ALTA"
+        
+        final = [item(1, "Bisturí #11", 2), item(2, "Pinza Kelly", 3), item(3, "Riñonera", 1)]
+        analisis = analizar_discrepancias(CONTEO_INICIAL, final)
+        
+        assert analisis["nivel_riesgo"] == "ALTO"
+        assert analisis["puntaje_riesgo"] == 2
+    
+    def test_sin_ia_si_los_conteos_coinciden(self):
+        """Test para responder sin llamar a DeepSeek cuando no hay discrepancias."""
+        servicio = EIVAIAssistantService()
+        servicio.deepseek_service.procesar_texto = AsyncMock()
+        
+        resultado = asyncio.run(servicio.analizar_conteo_instrumentos(
+            CONTEO_INICIAL, list(CONTEO_INICIAL), "Laparoscopia"
+        ))
+        
+        servicio.deepseek_service.procesar_texto.assert_not_awaited()
+        assert resultado["analisis_ia_utilizado"] is False
+        assert resultado["discrepancias_detectadas"] == []
+        assert resultado["nivel_riesgo"] == "BAJO"
+        assert resultado["tokens_utilizados"] == 0
+    
+    def test_ia_si_falta_material_del_set(self):
+        """Test para no usar la respuesta rápida si falta material respecto al set."""
+        servicio = EIVAIAssistantService()
+        servicio.deepseek_service.procesar_texto = AsyncMock(return_value={
+            "texto_procesado": "Faltan gasas",
+            "modelo_usado": "test-model",
+            "tokens_entrada": 300,
+            "tokens_salida": 40,
+            "tiempo_proceso": 0.8
+        })
+        gasas = dict(item(5, "Gasa 10x10", 10), cantidad_contada=9)
+        
+        with patch.object(eivai_assistant_service, "cache_respuestas", None):
+            resultado = asyncio.run(servicio.analizar_conteo_instrumentos([gasas], [dict(gasas)], "Laparoscopia"))
+            
+        servicio.deepseek_service.procesar_texto.assert_awaited_once()
+        assert resultado["analisis_ia_utilizado"] is True
+        assert resultado["nivel_riesgo"] == "CRÍTICO"
+        assert resultado["discrepancias_detectadas"][0]["tipo"] == "FALTANTE_RESPECTO_AL_SET"
+    
+    def test_ia_con_discrepancias_o_solicitada(self):
+        """Test para llamar a DeepSeek con discrepancias o cuando se solicita explícitamente."""
+        servicio = EIVAIAssistantService()
+        servicio.deepseek_service.procesar_texto = AsyncMock(return_value={
+            "texto_procesado": "Análisis de prueba",
+            "modelo_usado": "test-model",
+            "tokens_entrada": 300,
+            "tokens_salida": 120,
+            "tiempo_proceso": 1.2
+        })
+        final = [item(1, "Bisturí #11", 1), item(2, "Pinza Kelly", 4), item(3, "Riñonera", 1)]
+        
+        async def analizar():
+            con_discrepancias = await servicio.analizar_conteo_instrumentos(CONTEO_INICIAL, final, "Laparoscopia")
+            solicitado = await servicio.analizar_conteo_instrumentos(
+                CONTEO_INICIAL, list(CONTEO_INICIAL), "Laparoscopia", forzar_analisis_ia=True
+            )
+            return con_discrepancias, solicitado
+            
+        with patch.object(eivai_assistant_service, "cache_respuestas", None):
+            con_discrepancias, solicitado = asyncio.run(analizar())
+            
+        assert servicio.deepseek_service.procesar_texto.await_count == 2
+        prompt = servicio.deepseek_service.procesar_texto.await_args_list[0].kwargs["texto"]
+        assert "NIVEL DE RIESGO CALCULADO: CRÍTICO" in prompt
+        assert con_discrepancias["analisis_ia"] == "Análisis de prueba"
+        assert con_discrepancias["analisis_ia_utilizado"] is True
+        assert con_discrepancias["nivel_riesgo"] == "CRÍTICO"
+        assert solicitado["analisis_ia_utilizado"] is True
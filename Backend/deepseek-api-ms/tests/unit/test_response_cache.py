@@ -0,0 +1,146 @@
+"""
+Tests para la caché de respuestas del asistente.
+"""
+import asyncio
+import threading
+import time
+from unittest.mock import patch, AsyncMock
+from src.services import eivai_assistant_service
+from src.services.eivai_assistant_service import EIVAIAssistantService
+from src.services.response_cache import CacheRespuestas, EmbeddingNgramas, clave_cache, firma_consulta
+
+RESPUESTA = {
+    "texto_procesado": "Respuesta de prueba",
+    "modelo_usado": "test-model",
+    "tokens_entrada": 100,
+    "tokens_salida": 20,
+    "tiempo_proceso": 1.5
+}
+
+class TestCacheRespuestas:
+    """
+    Clase para probar la caché de respuestas.
+    """
+    
+    def test_clave_normalizada(self):
+        """Test para verificar que el formato del prompt no cambia la clave."""
+        clave = clave_cache("Hola\n        MUNDO  ", "m", 0.1, 100)
+        
+        assert clave == clave_cache("hola mundo", "m", 0.1, 100)
+        assert clave != clave_cache("hola mundo", "m", 0.2, 100)
+        assert clave != clave_cache("hola mundo", "m", 0.1, 200)
+        assert clave != clave_cache("hola mundo", "otro", 0.1, 100)
+    
+    def test_acierto_exacto(self):
+        """Test para un acierto exacto y el conteo de tokens ahorrados."""
+        cache = CacheRespuestas()
+        assert cache.obtener("prompt", "m", 0.1, 100) is None
+        
+        cache.guardar("prompt", "m", 0.1, 100, RESPUESTA)
+        resultado = cache.obtener("  PROMPT ", "m", 0.1, 100)
+        
+        assert resultado["texto_procesado"] == "Respuesta de prueba"
+        assert resultado["cache"] == "exacta"
+        estadisticas = cache.estadisticas()
+        assert estadisticas["aciertos"] == 1
+        assert estadisticas["fallos"] == 1
+        assert estadisticas["tasa_aciertos"] == 0.5
+        assert estadisticas["tokens_ahorrados"] == 120
+    
+    def test_temperatura_alta_no_cacheable(self):
+        """Test para verificar que las solicitudes de temperatura alta no se almacenan."""
+        cache = CacheRespuestas(temperatura_maxima=0.3)
+        cache.guardar("prompt", "m", 0.7, 100, RESPUESTA)
+        
+        assert cache.obtener("prompt", "m", 0.7, 100) is None
+        assert cache.estadisticas()["entradas"] == 0
+        assert cache.estadisticas()["no_cacheables"] == 1
+    
+    def test_lru_y_ttl(self):
+        """Test para el desalojo LRU y la expiración por TTL."""
+        cache = CacheRespuestas(max_entradas=2, ttl_segundos=60)
+        cache.guardar("a", "m", 0.1, 100, RESPUESTA)
+        cache.guardar("b", "m", 0.1, 100, RESPUESTA)
+        cache.obtener("a", "m", 0.1, 100)
+        cache.guardar("c", "m", 0.1, 100, RESPUESTA)
+        
+        assert cache.obtener("b", "m", 0.1, 100) is None
+        assert cache.obtener("a", "m", 0.1, 100) is not None
+        assert cache.estadisticas()["desalojos"] == 1
+        
+        with patch("src.services.response_cache.time.monotonic", return_value=time.monotonic() + 120):
+            assert cache.obtener("a", "m", 0.1, 100) is None
+    
+    def test_acierto_semantico(self):
+        """Test para el nivel semántico con consultas casi idénticas."""
+        cache = CacheRespuestas(semantica=True, umbral_semantico=0.8, embedding=EmbeddingNgramas())
+        consulta = "¿Cuál es el protocolo de conteo de gasas?"
+        cache.guardar(f"contexto {consulta}", "m", 0.4, 600, RESPUESTA, consulta=consulta)
+        
+        similar = "cual es el protocolo de conteo de gasas"
+        resultado = cache.obtener(f"contexto {similar}", "m", 0.4, 600, consulta=similar)
+        assert resultado["cache"] == "semantica"
+        assert resultado["similitud_cache"] >= 0.8
+        
+        distinta = "¿Cómo se esteriliza un separador Farabeuf?"
+        assert cache.obtener(f"contexto {distinta}", "m", 0.4, 600, consulta=distinta) is None
+        
+        # Otros parámetros no comparten respuestas
+        assert cache.obtener(f"contexto {similar}", "m", 0.4, 300, consulta=similar) is None
+        assert cache.estadisticas()["aciertos_semanticos"] == 1
+    
+    def test_semantica_respeta_numeros_y_negaciones(self):
+        """Test para no reutilizar respuestas de consultas que difieren en números o negaciones."""
+        cache = CacheRespuestas(semantica=True, umbral_semantico=0.92, embedding=EmbeddingNgramas())
+        preguntas = [
+            "¿Cuántas pinzas Kelly tiene el set 3?",
+            "¿Se debe esterilizar el bisturí después de cada uso?"
+        ]
+        for pregunta in preguntas:
+            cache.guardar(f"contexto {pregunta}", "m", 0.4, 600, RESPUESTA, consulta=pregunta)
+        
+        for distinta in ["¿Cuántas pinzas Kelly tiene el set 4?", "¿No se debe esterilizar el bisturí después de cada uso?"]:
+            assert cache.obtener(f"contexto {distinta}", "m", 0.4, 600, consulta=distinta) is None
+        
+        similar = "cuantas pinzas kelly tiene el set 3"
+        assert cache.obtener(f"contexto {similar}", "m", 0.4, 600, consulta=similar)["cache"] == "semantica"
+        assert firma_consulta("¿No hay gasas en el set TRES?") == ("no", "tres")
+    
+    def test_embedding_fuera_del_event_loop(self):
+        """Test para calcular el embedding en otro hilo desde código asíncrono."""
+        hilos = []
+        
+        def embedding(texto):
+            hilos.append(threading.get_ident())
+            return EmbeddingNgramas()(texto)
+        
+        cache = CacheRespuestas(semantica=True, umbral_semantico=0.8, embedding=embedding)
+        
+        async def usar():
+            await cache.guardar_async("contexto consulta", "m", 0.4, 600, RESPUESTA, consulta="consulta")
+            return await cache.obtener_async("contexto Consulta?", "m", 0.4, 600, consulta="Consulta?"), threading.get_ident()
+        
+        resultado, hilo_loop = asyncio.run(usar())
+        
+        assert resultado["cache"] == "semantica"
+        assert len(hilos) == 2
+        assert hilo_loop not in hilos
+    
+    def test_servicio_reutiliza_respuesta(self):
+        """Test para verificar que el asistente no repite solicitudes idénticas."""
+        cache = CacheRespuestas()
+        servicio = EIVAIAssistantService()
+        servicio.deepseek_service.procesar_texto = AsyncMock(return_value=dict(RESPUESTA))
+        
+        async def consultar():
+            primera = await servicio.generar_alerta_inteligente("FALTANTE", {"set": 1}, "ALTA")
+            segunda = await servicio.generar_alerta_inteligente("FALTANTE", {"set": 1}, "ALTA")
+            return primera, segunda
+        
+        with patch.object(eivai_assistant_service, "cache_respuestas", cache):
+            primera, segunda = asyncio.run(consultar())
+        
+        assert servicio.deepseek_service.procesar_texto.await_count == 1
+        assert primera["cache"] is None
+        assert segunda["cache"] == "exacta"
+        assert segunda["mensaje_generado"] == "Respuesta de prueba"
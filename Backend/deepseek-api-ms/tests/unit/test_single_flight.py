@@ -0,0 +1,115 @@
+"""
+Tests para la agrupación de solicitudes idénticas en curso.
+"""
+import asyncio
+from unittest.mock import patch
+from src.services import eivai_assistant_service
+from src.services.eivai_assistant_service import EIVAIAssistantService
+from src.services.deepseek_service import DeepSeekException
+from src.services.single_flight import SingleFlight
+
+RESPUESTA = {
+    "texto_procesado": "Alerta generada",
+    "modelo_usado": "test-model",
+    "tokens_entrada": 80,
+    "tokens_salida": 15,
+    "tiempo_proceso": 0.05
+}
+
+def crear_servicio(llamadas, error=None):
+    """Crea un asistente cuya llamada a DeepSeek tarda lo suficiente para solaparse."""
+    servicio = EIVAIAssistantService()
+    
+    async def procesar_texto(**kwargs):
+        llamadas.append(kwargs)
+        await asyncio.sleep(0.05)
+        if error is not None:
+            raise error
+        return dict(RESPUESTA)
+        
+    servicio.deepseek_service.procesar_texto = procesar_texto
+    return servicio
+
+class TestSingleFlight:
+    """
+    Clase para probar la agrupación de solicitudes.
+    """
+    
+    def test_alertas_identicas_comparten_llamada(self):
+        """Test para verificar que alertas idénticas simultáneas hacen una sola llamada."""
+        llamadas = []
+        servicios = [crear_servicio(llamadas) for _ in range(5)]
+        agrupador = SingleFlight()
+        
+        async def generar():
+            return await asyncio.gather(*[
+                servicio.generar_alerta_inteligente("FALTANTE", {"set": 1, "faltan": 2}, "ALTA")
+                for servicio in servicios
+            ])
+            
+        with patch.object(eivai_assistant_service, "cache_respuestas", None), \
+                patch.object(eivai_assistant_service, "solicitudes_en_curso", agrupador):
+            alertas = asyncio.run(generar())
+            
+        assert len(llamadas) == 1
+        assert all(alerta["mensaje_generado"] == "Alerta generada" for alerta in alertas)
+        assert [alerta["cache"] for alerta in alertas].count("en_curso") == 4
+        assert agrupador.estadisticas() == {"en_curso": 0, "ejecutadas": 1, "compartidas": 4}
+    
+    def test_solicitudes_distintas_no_se_agrupan(self):
+        """Test para verificar que contextos distintos hacen llamadas independientes."""
+        llamadas = []
+        servicio = crear_servicio(llamadas)
+        
+        async def generar():
+            return await asyncio.gather(
+                servicio.generar_alerta_inteligente("FALTANTE", {"set": 1}, "ALTA"),
+                servicio.generar_alerta_inteligente("FALTANTE", {"set": 2}, "ALTA")
+            )
+            
+        with patch.object(eivai_assistant_service, "cache_respuestas", None), \
+                patch.object(eivai_assistant_service, "solicitudes_en_curso", SingleFlight()):
+            asyncio.run(generar())
+            
+        assert len(llamadas) == 2
+    
+    def test_error_se_propaga_a_todos(self):
+        """Test para verificar que todas las solicitudes agrupadas reciben el error."""
+        llamadas = []
+        servicio = crear_servicio(llamadas, error=DeepSeekException("Error en la API de DeepSeek: 500"))
+        agrupador = SingleFlight()
+        
+        async def generar():
+            return await asyncio.gather(
+                *[servicio.generar_alerta_inteligente("FALTANTE", {"set": 1}, "ALTA") for _ in range(3)],
+                return_exceptions=True
+            )
+            
+        with patch.object(eivai_assistant_service, "cache_respuestas", None), \
+                patch.object(eivai_assistant_service, "solicitudes_en_curso", agrupador):
+            resultados = asyncio.run(generar())
+            
+        assert len(llamadas) == 1
+        assert all(isinstance(resultado, DeepSeekException) for resultado in resultados)
+        assert agrupador.estadisticas()["en_curso"] == 0
+    
+    def test_cancelacion_no_afecta_a_otras_solicitudes(self):
+        """Test para verificar que cancelar una solicitud no cancela la llamada compartida."""
+        agrupador = SingleFlight()
+        
+        async def llamada():
+            await asyncio.sleep(0.05)
+            return dict(RESPUESTA)
+        
+        async def ejecutar():
+            primera = asyncio.ensure_future(agrupador.ejecutar("clave", llamada))
+            segunda = asyncio.ensure_future(agrupador.ejecutar("clave", llamada))
+            await asyncio.sleep(0.01)
+            primera.cancel()
+            return primera, await segunda
+            
+        primera, (resultado, compartida) = asyncio.run(ejecutar())
+        
+        assert primera.cancelled()
+        assert compartida is True
+        assert resultado["texto_procesado"] == "Alerta generada"
@@ -0,0 +1,151 @@
+"""
+Tests para las respuestas en streaming (SSE) del asistente.
+"""
+import asyncio
+import json
+import pytest
+import httpx
+from unittest.mock import patch
+from src.api.controllers.eivai_controller import EIVAIAssistantController
+from src.services import eivai_assistant_service
+from src.services.deepseek_service import DeepSeekService, DeepSeekException
+from src.services.response_cache import CacheRespuestas
+
+def cuerpo_stream(fragmentos):
+    """Cuerpo text/event-stream como lo envía DeepSeek."""
+    lineas = [f"data: {json.dumps({'choices': [{'delta': {'content': f}}]})}\n\n" for f in fragmentos]
+    lineas.append(f"data: {json.dumps({'choices': [], 'usage': {'prompt_tokens': 7, 'completion_tokens': len(fragmentos)}})}\n\n")
+    lineas.append("data: [DONE]\n\n")
+    return "".join(lineas).encode("utf-8")
+
+def crear_servicio(manejador):
+    """Crea un servicio cuyo cliente HTTP responde con `manejador` sin salir a la red."""
+    servicio = DeepSeekService(cliente=httpx.AsyncClient(transport=httpx.MockTransport(manejador)))
+    servicio.tiempo_entre_reintentos = 0
+    return servicio
+
+def leer_eventos(iterador):
+    """Consume un iterador SSE y devuelve la lista de (evento, datos)."""
+    async def consumir():
+        return [fragmento async for fragmento in iterador]
+        
+    eventos = []
+    for bloque in asyncio.run(consumir()):
+        evento, datos = bloque.strip().split("\n")
+        eventos.append((evento[len("event: "):], json.loads(datos[len("data: "):])))
+    return eventos
+
+class TestStreaming:
+    """
+    Clase para probar el streaming de respuestas.
+    """
+    
+    def test_procesar_texto_stream(self):
+        """Test para recibir los fragmentos y el evento final con el uso de tokens."""
+        cuerpos = []
+        
+        def manejador(request):
+            cuerpos.append(json.loads(request.content))
+            return httpx.Response(200, content=cuerpo_stream(["Hola", " mundo"]))
+            
+        servicio = crear_servicio(manejador)
+        
+        async def consumir():
+            return [evento async for evento in servicio.procesar_texto_stream("Texto de prueba")]
+            
+        eventos = asyncio.run(consumir())
+        
+        assert cuerpos[0]["stream"] is True
+        assert [e["texto"] for e in eventos if e["tipo"] == "token"] == ["Hola", " mundo"]
+        assert eventos[-1]["tipo"] == "fin"
+        assert eventos[-1]["texto_procesado"] == "Hola mundo"
+        assert eventos[-1]["tokens_entrada"] == 7
+        assert eventos[-1]["tokens_salida"] == 2
+        assert eventos[-1]["tiempo_primer_token"] is not None
+    
+    def test_procesar_texto_stream_error_api(self):
+        """Test para un error de la API antes de recibir datos."""
+        servicio = crear_servicio(lambda request: httpx.Response(429, json={"error": "Límite"}))
+        
+        async def consumir():
+            return [evento async for evento in servicio.procesar_texto_stream("Texto de prueba")]
+            
+        with pytest.raises(DeepSeekException) as excinfo:
+            asyncio.run(consumir())
+            
+        assert "Error en la API de DeepSeek: 429" in str(excinfo.value)
+    
+    def test_eventos_sse_consulta(self):
+        """Test para los eventos SSE de una consulta y su almacenamiento en caché."""
+        controller = EIVAIAssistantController()
+        controller.assistant_service.deepseek_service = crear_servicio(
+            lambda request: httpx.Response(200, content=cuerpo_stream(["Contar", " gasas"]))
+        )
+        cache = CacheRespuestas()
+        
+        with patch.object(eivai_assistant_service, "cache_respuestas", cache):
+            eventos = leer_eventos(controller.procesar_consulta_natural_stream("¿Cómo contar gasas?"))
+            repetidos = leer_eventos(controller.procesar_consulta_natural_stream("¿Cómo contar gasas?"))
+            
+        assert [evento for evento, _ in eventos] == ["inicio", "token", "token", "fin"]
+        fin = eventos[-1][1]
+        assert fin["respuesta"] == "Contar gasas"
+        assert fin["consulta_original"] == "¿Cómo contar gasas?"
+        assert fin["cache"] is None
+        assert "referencias_incluidas" in fin
+        assert "tiempo_total_proceso" in fin
+        
+        assert [evento for evento, _ in repetidos] == ["inicio", "token", "fin"]
+        assert repetidos[-1][1]["cache"] == "exacta"
+    
+    def test_eventos_sse_error(self):
+        """Test para informar un error de IA como evento."""
+        controller = EIVAIAssistantController()
+        controller.assistant_service.deepseek_service = crear_servicio(
+            lambda request: httpx.Response(500, json={"error": "Interno"})
+        )
+        
+        with patch.object(eivai_assistant_service, "cache_respuestas", None):
+            eventos = leer_eventos(controller.procesar_consulta_natural_stream("Consulta"))
+            
+        assert [evento for evento, _ in eventos] == ["inicio", "error"]
+        assert eventos[-1][1]["tipo_error"] == "IA_ERROR"
+    
+    def test_validacion_antes_del_streaming(self):
+        """Test para rechazar datos inválidos antes de iniciar la respuesta."""
+        controller = EIVAIAssistantController()
+        
+        with pytest.raises(ValueError):
+            controller.procesar_consulta_natural_stream("   ")
+        with pytest.raises(ValueError):
+            controller.generar_reporte_quirurgico_stream({"procedimiento_id": 1})
+    
+    def test_cancelacion_cierra_solicitud(self):
+        """Test para verificar que cerrar el stream (cliente desconectado) cierra la respuesta de DeepSeek."""
+        cerrada = asyncio.Event()
+        
+        class CuerpoLento(httpx.AsyncByteStream):
+            async def __aiter__(self):
+                for i in range(100):
+                    yield f"data: {json.dumps({'choices': [{'delta': {'content': str(i)}}]})}\n\n".encode("utf-8")
+                    await asyncio.sleep(0.01)
+            
+            async def aclose(self):
+                cerrada.set()
+                
+        controller = EIVAIAssistantController()
+        controller.assistant_service.deepseek_service = crear_servicio(
+            lambda request: httpx.Response(200, stream=CuerpoLento())
+        )
+        
+        async def desconectar():
+            iterador = controller.procesar_consulta_natural_stream("Consulta")
+            recibidos = [await iterador.__anext__() for _ in range(3)]
+            await iterador.aclose()
+            return recibidos
+            
+        with patch.object(eivai_assistant_service, "cache_respuestas", None):
+            recibidos = asyncio.run(desconectar())
+            
+        assert recibidos[0].startswith("event: inicio")
+        assert cerrada.is_set()
@@ -1,10 +1,15 @@
 import uvicorn
 from src.api.app import app
+from src.config.settings import settings
 
 if __name__ == "__main__":
+    # Con varios workers cada proceso carga su propio modelo (ver SERVER_WORKERS).
+    # La recarga automática solo en desarrollo (DEBUG) y con un único worker:
+    # uvicorn no admite reload junto con varios procesos
     uvicorn.run(
         "src.api.app:app",
         host="0.0.0.0",
         port=8002,
-        reload=True
+        reload=settings.DEBUG and settings.SERVER_WORKERS == 1,
+        workers=settings.SERVER_WORKERS
     )
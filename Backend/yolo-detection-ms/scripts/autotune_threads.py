@@ -0,0 +1,193 @@
+"""
+Ajuste automático del presupuesto de CPU para la inferencia YOLO
+
+Prueba combinaciones de procesos, hilos intra-op de torch y tamaño de lote en la
+máquina local. Cada proceso carga su propia copia del modelo, como los workers
+del servidor. Se mide el throughput total (imágenes/s) y la latencia por pasada
+con imágenes sintéticas de bandejas, y se reporta la mejor configuración como
+variables de entorno.
+
+Uso:
+    python scripts/autotune_threads.py --duration 10
+    python scripts/autotune_threads.py --workers 1 2 4 --threads 1 2 4 --batch-sizes 1 4 --max-p95-ms 500
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import multiprocessing
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmark_service import generate_tray_images, summarize_latencies  # noqa: E402
+from src.config.settings import settings  # noqa: E402
+
+def available_cpus() -> int:
+    """Núcleos disponibles para este proceso (respeta la afinidad de CPU)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def run_worker(
+    model_path: str,
+    intra_op: int,
+    inter_op: int,
+    batch_size: int,
+    images: List[bytes],
+    duration: float,
+    barrier: Any,
+    results: Any
+) -> None:
+    """Proceso de medición: carga el modelo y procesa lotes durante `duration` segundos"""
+    from src.services.cpu_budget import configure_threads
+    from src.services.yolo_service import YOLODetectionService
+
+    configure_threads(intra_op, inter_op)
+    service = YOLODetectionService(model_path)
+    service.disable_batching()
+    service.prepare()
+    decoded = [service.decode_image_for_inference(data) for data in images]
+
+    barrier.wait()
+    start = time.perf_counter()
+    latencies: List[float] = []
+    processed = 0
+
+    while time.perf_counter() - start < duration:
+        chunk = [decoded[(processed + offset) % len(decoded)] for offset in range(batch_size)]
+        pass_start = time.perf_counter()
+        service.detect_instruments_batch(
+            [image for image, _ in chunk],
+            detail="summary",
+            scales=[scale for _, scale in chunk]
+        )
+        latencies.append(time.perf_counter() - pass_start)
+        processed += batch_size
+
+    results.put({"images": processed, "elapsed": time.perf_counter() - start, "latencies": latencies})
+
+def measure(
+    model_path: str,
+    workers: int,
+    intra_op: int,
+    inter_op: int,
+    batch_size: int,
+    images: List[bytes],
+    duration: float
+) -> Dict[str, Any]:
+    """Medir una combinación con `workers` procesos en paralelo"""
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=run_worker,
+            args=(model_path, intra_op, inter_op, batch_size, images, duration, barrier, results)
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    outputs = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies = [latency for output in outputs for latency in output["latencies"]]
+    elapsed = max(output["elapsed"] for output in outputs)
+    return {
+        "workers": workers,
+        "intra_op_threads": intra_op,
+        "inter_op_threads": inter_op,
+        "batch_size": batch_size,
+        "throughput": round(sum(output["images"] for output in outputs) / elapsed, 2),
+        "pass_latency_ms": summarize_latencies(latencies)
+    }
+
+def candidate_threads(workers: int, cpus: int) -> List[int]:
+    """Hilos a probar por defecto: 1, la mitad y la porción completa de núcleos por proceso"""
+    share = max(1, cpus // workers)
+    return sorted({1, max(1, share // 2), share})
+
+def best_config(results: List[Dict[str, Any]], max_p95_ms: Optional[float]) -> Optional[Dict[str, Any]]:
+    """Mayor throughput entre las combinaciones que cumplen la latencia máxima"""
+    eligible = [
+        result for result in results
+        if max_p95_ms is None or result["pass_latency_ms"]["p95"] <= max_p95_ms
+    ]
+    return max(eligible, key=lambda result: result["throughput"]) if eligible else None
+
+def main() -> None:
+    cpus = available_cpus()
+    parser = argparse.ArgumentParser(description="Ajuste de procesos e hilos para la inferencia YOLO")
+    parser.add_argument("--model", default=settings.YOLO_MODEL_PATH, help="Pesos a medir")
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="Procesos a probar")
+    parser.add_argument("--threads", type=int, nargs="+", default=None, help="Hilos intra-op a probar")
+    parser.add_argument("--interop-threads", type=int, nargs="+", default=[0], help="Hilos inter-op (0 = por defecto)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1], help="Imágenes por pasada")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos de medición por combinación")
+    parser.add_argument("--images", type=int, default=8, help="Número de imágenes sintéticas")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1440)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="Latencia p95 máxima por pasada")
+    parser.add_argument("--allow-oversubscribe", action="store_true", help="Probar procesos × hilos > núcleos")
+    parser.add_argument("--output", default="", help="Archivo JSON de salida")
+    args = parser.parse_args()
+
+    images = generate_tray_images(args.images, args.width, args.height, args.seed)
+    worker_options = args.workers or sorted({1, 2, max(1, cpus // 2), cpus} - {0})
+
+    combos = []
+    for workers in worker_options:
+        for intra_op, inter_op, batch_size in itertools.product(
+            args.threads or candidate_threads(workers, cpus), args.interop_threads, args.batch_sizes
+        ):
+            if workers * intra_op > cpus and not args.allow_oversubscribe:
+                continue
+            combos.append((workers, intra_op, inter_op, batch_size))
+
+    print(f"🖥️  {cpus} núcleos disponibles, {len(combos)} combinaciones de {args.duration:.0f}s")
+    results = []
+    for workers, intra_op, inter_op, batch_size in combos:
+        result = measure(args.model, workers, intra_op, inter_op, batch_size, images, args.duration)
+        results.append(result)
+        print(
+            f"   workers={workers:<2} intra={intra_op:<2} inter={inter_op:<2} batch={batch_size:<2} "
+            f"-> {result['throughput']:8.2f} img/s  p95={result['pass_latency_ms']['p95']:.1f} ms"
+        )
+
+    best = best_config(results, args.max_p95_ms)
+    if best is None:
+        print("❌ Ninguna combinación cumple la latencia máxima")
+        sys.exit(1)
+
+    recommended = {
+        "SERVER_WORKERS": best["workers"],
+        "TORCH_NUM_THREADS": best["intra_op_threads"],
+        "TORCH_INTEROP_THREADS": best["inter_op_threads"],
+        "BATCH_MAX_SIZE": best["batch_size"],
+        "JOBS_BATCH_SIZE": best["batch_size"]
+    }
+    print(f"✅ Mejor configuración: {best['throughput']} img/s")
+    for key, value in recommended.items():
+        print(f"   {key}={value}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "machine": {"cpus": cpus},
+                "model": args.model,
+                "results": results,
+                "best": best,
+                "recommended_env": recommended
+            }, f, indent=2)
+        print(f"📄 Resultados guardados en {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark de backends de inferencia YOLO (PyTorch / ONNX / OpenVINO / TorchScript)
+
+Compara latencia y throughput de cada backend sobre un conjunto fijo de imágenes
+para elegir el runtime más rápido en cada máquina.
+
+Uso:
+    python scripts/benchmark_backends.py --model yolov8n.pt --backends pytorch onnx openvino
+    python scripts/benchmark_backends.py --images ./bandejas --batch-size 4 --output resultados.json
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+import platform
+from typing import Any, Dict, List
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.model_backends import SUPPORTED_BACKENDS, resolve_model_path
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.bmp", "*.webp")
+
+def load_images(images_dir: str, count: int, size: int, seed: int) -> List[np.ndarray]:
+    """Cargar las imágenes del directorio o generar un conjunto sintético fijo"""
+    if images_dir:
+        paths = sorted(
+            path for pattern in IMAGE_PATTERNS
+            for path in glob.glob(os.path.join(images_dir, pattern))
+        )
+        images = [cv2.imread(path) for path in paths[:count]]
+        images = [image for image in images if image is not None]
+        if not images:
+            raise SystemExit(f"No se encontraron imágenes válidas en {images_dir}")
+        return images
+
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, size=(size, size, 3), dtype=np.uint8) for _ in range(count)]
+
+def benchmark_backend(
+    backend: str,
+    args: argparse.Namespace,
+    images: List[np.ndarray]
+) -> Dict[str, Any]:
+    """Medir latencia y throughput de un backend"""
+    from ultralytics import YOLO
+
+    model_path = resolve_model_path(args.model, backend=backend, imgsz=args.imgsz, int8=args.int8)
+    model = YOLO(model_path) if backend == "pytorch" else YOLO(model_path, task="detect")
+
+    batches = [images[i:i + args.batch_size] for i in range(0, len(images), args.batch_size)]
+
+    # Calentamiento
+    for _ in range(args.warmup):
+        model(batches[0], imgsz=args.imgsz, verbose=False)
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(args.runs):
+        for batch in batches:
+            t0 = time.perf_counter()
+            model(batch, imgsz=args.imgsz, verbose=False)
+            latencies.append((time.perf_counter() - t0) * 1000 / len(batch))
+    elapsed = time.perf_counter() - start
+
+    processed = args.runs * len(images)
+    return {
+        "backend": backend,
+        "model_path": model_path,
+        "images": processed,
+        "batch_size": args.batch_size,
+        "latency_ms_per_image": {
+            "mean": round(float(np.mean(latencies)), 2),
+            "p50": round(float(np.percentile(latencies, 50)), 2),
+            "p95": round(float(np.percentile(latencies, 95)), 2)
+        },
+        "throughput_images_per_s": round(processed / elapsed, 2)
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de backends de inferencia YOLO")
+    parser.add_argument("--model", default="yolov8n.pt", help="Modelo PyTorch base (.pt)")
+    parser.add_argument("--backends", nargs="+", default=list(SUPPORTED_BACKENDS), choices=list(SUPPORTED_BACKENDS))
+    parser.add_argument("--images", default="", help="Directorio de imágenes (vacío = sintéticas)")
+    parser.add_argument("--count", type=int, default=16, help="Número de imágenes del conjunto")
+    parser.add_argument("--size", type=int, default=1280, help="Lado de las imágenes sintéticas")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--int8", action="store_true", help="Cuantizar a int8 (ONNX/OpenVINO)")
+    parser.add_argument("--output", default="", help="Archivo JSON de salida")
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.count, args.size, args.seed)
+    results = []
+
+    for backend in args.backends:
+        print(f"⏱️  Midiendo backend {backend}...")
+        try:
+            results.append(benchmark_backend(backend, args, images))
+        except Exception as e:
+            print(f"❌ Error con backend {backend}: {e}")
+            results.append({"backend": backend, "error": str(e)})
+
+    print(f"\n{'Backend':<12} {'p50 ms':>8} {'p95 ms':>8} {'img/s':>8}")
+    for result in results:
+        if "error" in result:
+            print(f"{result['backend']:<12} {'error':>8}")
+            continue
+        latency = result["latency_ms_per_image"]
+        print(f"{result['backend']:<12} {latency['p50']:>8} {latency['p95']:>8} {result['throughput_images_per_s']:>8}")
+
+    successful = [result for result in results if "error" not in result]
+    if successful:
+        best = max(successful, key=lambda result: result["throughput_images_per_s"])
+        print(f"\n✅ Backend más rápido: {best['backend']} (YOLO_BACKEND={best['backend']})")
+
+    if args.output:
+        report = {
+            "machine": {"platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count()},
+            "config": {k: v for k, v in vars(args).items() if k != "output"},
+            "results": results
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Resultados guardados en {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Benchmark de carga del endpoint /api/v1/yolo/detect
+
+Envía imágenes sintéticas de bandejas quirúrgicas a distintos niveles de
+concurrencia y reporta latencia (p50/p95/p99), throughput, errores y memoria.
+Puede ejecutarse dentro del proceso (la app se monta con httpx sin servidor) o
+contra un servicio desplegado por HTTP. Los resultados se guardan en JSON y
+pueden compararse con una ejecución anterior para detectar regresiones.
+
+Uso:
+    python scripts/benchmark_service.py --mode inprocess --concurrency 1 4 8
+    python scripts/benchmark_service.py --mode http --url http://localhost:8002 --requests 200
+    python scripts/benchmark_service.py --output actual.json --baseline anterior.json --max-regression 15
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import subprocess
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+DETECT_PATH = "/api/v1/yolo/detect"
+HEALTH_PATH = "/api/v1/yolo/health"
+MODEL_INFO_PATH = "/api/v1/yolo/model/info"
+
+def generate_tray_images(count: int, width: int, height: int, seed: int) -> List[bytes]:
+    """
+    Generar un conjunto fijo de fotos sintéticas de bandejas en JPEG
+
+    Cada imagen es una bandeja metálica con instrumentos alargados (mangos y
+    hojas) y gasas, en posiciones y orientaciones reproducibles por la semilla.
+    """
+    rng = np.random.default_rng(seed)
+    images = []
+
+    for _ in range(count):
+        tray = np.full((height, width, 3), (175, 180, 185), dtype=np.uint8)
+        tray = np.clip(tray + rng.normal(0, 6, tray.shape), 0, 255).astype(np.uint8)
+        cv2.rectangle(tray, (width // 20, height // 20), (width - width // 20, height - height // 20), (120, 125, 130), 4)
+
+        for _ in range(int(rng.integers(6, 16))):
+            center = (int(rng.integers(width // 8, width - width // 8)), int(rng.integers(height // 8, height - height // 8)))
+            length = int(rng.integers(min(width, height) // 8, min(width, height) // 3))
+            angle = float(rng.uniform(0, np.pi))
+            dx, dy = int(np.cos(angle) * length / 2), int(np.sin(angle) * length / 2)
+            shade = int(rng.integers(60, 230))
+
+            cv2.line(tray, (center[0] - dx, center[1] - dy), (center[0] + dx, center[1] + dy), (shade, shade, min(255, shade + 10)), max(3, length // 25))
+            cv2.circle(tray, (center[0] - dx, center[1] - dy), max(4, length // 18), (shade, shade, shade), 2)
+
+        for _ in range(int(rng.integers(0, 3))):
+            x, y = int(rng.integers(0, width - width // 6)), int(rng.integers(0, height - height // 6))
+            cv2.rectangle(tray, (x, y), (x + width // 8, y + height // 10), (245, 245, 240), -1)
+
+        ok, encoded = cv2.imencode(".jpg", tray, [cv2.IMWRITE_JPEG_QUALITY, 90])
+        if not ok:
+            raise RuntimeError("No se pudo codificar la imagen sintética")
+        images.append(encoded.tobytes())
+
+    return images
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    """Calcular percentiles de latencia en milisegundos"""
+    if not latencies:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+
+    values = np.asarray(latencies) * 1000
+    return {
+        "mean": round(float(values.mean()), 2),
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2),
+        "max": round(float(values.max()), 2)
+    }
+
+async def read_memory(client, mode: str) -> Optional[Dict[str, int]]:
+    """Leer la memoria del servicio (directamente o desde /metrics)"""
+    if mode == "inprocess":
+        from src.services.metrics import read_memory_usage
+        return read_memory_usage()
+
+    try:
+        response = await client.get("/metrics")
+        if response.status_code != 200:
+            return None
+    except Exception:
+        return None
+
+    usage = {}
+    for line in response.text.splitlines():
+        if line.startswith("yolo_process_memory_bytes{"):
+            kind = line.split('kind="', 1)[1].split('"', 1)[0]
+            usage[kind] = int(float(line.rsplit(" ", 1)[1]))
+    return usage or None
+
+async def wait_until_ready(client, timeout: float) -> None:
+    """Esperar a que el servicio termine de cargar y calentar el modelo"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            response = await client.get(HEALTH_PATH)
+            if response.status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    raise SystemExit(f"El servicio no estuvo listo en {timeout:.0f}s")
+
+async def run_level(client, images: List[bytes], concurrency: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Ejecutar un nivel de concurrencia y medir cada solicitud"""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    counter = iter(range(args.requests))
+    params = {"detail": args.detail}
+    if args.sliced:
+        params["sliced"] = "true"
+
+    async def worker() -> None:
+        for index in counter:
+            data = images[index % len(images)]
+            if not args.allow_cache:
+                # Bytes extra tras el marcador de fin del JPEG: el decodificador los
+                # ignora pero el hash cambia, así la caché de resultados no interviene
+                data = data + index.to_bytes(8, "little") + os.urandom(8)
+
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    DETECT_PATH,
+                    params=params,
+                    files={"file": (f"bandeja_{index}.jpg", data, "image/jpeg")}
+                )
+                key = str(response.status_code)
+            except Exception as e:
+                key = type(e).__name__
+            elapsed = time.perf_counter() - start
+
+            statuses[key] = statuses.get(key, 0) + 1
+            if key == "200":
+                latencies.append(elapsed)
+
+    memory_before = await read_memory(client, args.mode)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    memory_after = await read_memory(client, args.mode)
+
+    successful = statuses.get("200", 0)
+    return {
+        "concurrency": concurrency,
+        "requests": args.requests,
+        "successful": successful,
+        "status_codes": statuses,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(successful / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": summarize_latencies(latencies),
+        "memory_bytes": {"before": memory_before, "after": memory_after}
+    }
+
+async def run_benchmark(args: argparse.Namespace, images: List[bytes]) -> Dict[str, Any]:
+    """Montar el cliente según el modo y recorrer los niveles de concurrencia"""
+    import httpx
+
+    timeout = httpx.Timeout(args.timeout)
+
+    if args.mode == "inprocess":
+        if not args.allow_cache:
+            os.environ.setdefault("RESULT_CACHE_ENABLED", "False")
+        from src.api.app import app
+
+        lifespan = app.router.lifespan_context(app)
+        await lifespan.__aenter__()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=timeout)
+    else:
+        lifespan = None
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        client = httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits)
+
+    try:
+        await wait_until_ready(client, args.ready_timeout)
+        model_info = (await client.get(MODEL_INFO_PATH)).json()
+
+        # Solicitudes de calentamiento que no se contabilizan
+        warmup_args = argparse.Namespace(**{**vars(args), "requests": args.warmup_requests})
+        await run_level(client, images, 1, warmup_args)
+
+        levels = []
+        for concurrency in args.concurrency:
+            print(f"⏱️  Concurrencia {concurrency}: {args.requests} solicitudes...")
+            level = await run_level(client, images, concurrency, args)
+            latency = level["latency_ms"]
+            print(
+                f"   p50 {latency['p50']} ms | p95 {latency['p95']} ms | p99 {latency['p99']} ms | "
+                f"{level['throughput_rps']} req/s | códigos {level['status_codes']}"
+            )
+            levels.append(level)
+
+        return {"model": model_info, "levels": levels}
+    finally:
+        await client.aclose()
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+
+def git_revision() -> Optional[str]:
+    """Commit actual del repositorio, si está disponible"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL,
+            text=True
+        ).strip()
+    except Exception:
+        return None
+
+def compare_with_baseline(report: Dict[str, Any], baseline_path: str, max_regression: float) -> List[str]:
+    """
+    Comparar p95 y throughput por nivel de concurrencia con una ejecución previa
+
+    Returns:
+        Lista de regresiones que superan el porcentaje permitido
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    previous = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    regressions = []
+
+    for level in report["levels"]:
+        before = previous.get(level["concurrency"])
+        if before is None:
+            continue
+
+        p95_before, p95_now = before["latency_ms"]["p95"], level["latency_ms"]["p95"]
+        if p95_before > 0 and (p95_now - p95_before) / p95_before * 100 > max_regression:
+            regressions.append(f"concurrencia {level['concurrency']}: p95 {p95_before} -> {p95_now} ms")
+
+        rps_before, rps_now = before["throughput_rps"], level["throughput_rps"]
+        if rps_before > 0 and (rps_before - rps_now) / rps_before * 100 > max_regression:
+            regressions.append(f"concurrencia {level['concurrency']}: throughput {rps_before} -> {rps_now} req/s")
+
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de carga del servicio de detección YOLO")
+    parser.add_argument("--mode", choices=("inprocess", "http"), default="inprocess")
+    parser.add_argument("--url", default="http://localhost:8002", help="URL base del servicio (modo http)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=100, help="Solicitudes por nivel de concurrencia")
+    parser.add_argument("--warmup-requests", type=int, default=5)
+    parser.add_argument("--images", type=int, default=16, help="Número de imágenes sintéticas")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1440)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--detail", choices=("full", "summary"), default="full")
+    parser.add_argument("--sliced", action="store_true", help="Usar inferencia por ventanas")
+    parser.add_argument("--allow-cache", action="store_true", help="Permitir aciertos de la caché de resultados")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Timeout por solicitud (s)")
+    parser.add_argument("--ready-timeout", type=float, default=300.0, help="Espera máxima a que el modelo esté listo (s)")
+    parser.add_argument("--save-images", default="", help="Directorio donde guardar las imágenes generadas")
+    parser.add_argument("--output", default="", help="Archivo JSON de salida")
+    parser.add_argument("--baseline", default="", help="Resultados previos para detectar regresiones")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="Regresión máxima permitida (%%)")
+    args = parser.parse_args()
+
+    images = generate_tray_images(args.images, args.width, args.height, args.seed)
+    if args.save_images:
+        os.makedirs(args.save_images, exist_ok=True)
+        for index, data in enumerate(images):
+            with open(os.path.join(args.save_images, f"bandeja_{index:03d}.jpg"), "wb") as f:
+                f.write(data)
+
+    results = asyncio.run(run_benchmark(args, images))
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "machine": {"platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count()},
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "save_images")},
+        **results
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Resultados guardados en {args.output}")
+
+    if args.baseline:
+        regressions = compare_with_baseline(report, args.baseline, args.max_regression)
+        if regressions:
+            print("❌ Regresiones respecto a la línea base:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            sys.exit(1)
+        print("✅ Sin regresiones respecto a la línea base")
+
+if __name__ == "__main__":
+    main()
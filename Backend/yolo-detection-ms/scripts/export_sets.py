@@ -0,0 +1,42 @@
+"""
+Exportar los sets quirúrgicos a un catálogo JSON para la comparación en /detect
+
+Lee `SetsQuirurgicos`, `SetInstrumentos` e `Instrumentos` de la base SQLite local
+y genera el archivo que se configura en EXPECTED_SETS_PATH.
+
+Uso:
+    python scripts/export_sets.py --db ../../Fronted/eivai_local.db --output sets.json
+"""
+
+import json
+import sqlite3
+import argparse
+
+QUERY = """
+    SELECT s.SetID, s.NombreSet, i.CodigoInstrumento, si.Cantidad
+    FROM SetsQuirurgicos s
+    JOIN SetInstrumentos si ON si.SetID = s.SetID
+    JOIN Instrumentos i ON i.InstrumentoID = si.InstrumentoID
+    WHERE s.Activo IS NULL OR s.Activo = 1
+    ORDER BY s.SetID, i.CodigoInstrumento
+"""
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Exportar sets quirúrgicos a JSON")
+    parser.add_argument("--db", required=True, help="Base de datos SQLite")
+    parser.add_argument("--output", default="sets.json", help="Archivo JSON de salida")
+    args = parser.parse_args()
+
+    catalog = {}
+    with sqlite3.connect(args.db) as connection:
+        for set_id, nombre, codigo, cantidad in connection.execute(QUERY):
+            entry = catalog.setdefault(str(set_id), {"nombre": nombre, "instrumentos": {}})
+            entry["instrumentos"][codigo] = cantidad
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, indent=2, ensure_ascii=False)
+
+    print(f"✅ {len(catalog)} sets exportados a {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Procesos de trabajo independientes para la cola de trabajos de detección
+
+Toman trabajos de la misma base SQLite que la API (JOBS_DB_PATH / JOBS_DIR) y
+permiten reprocesar lotes grandes usando todos los núcleos sin ocupar los
+procesos que atienden solicitudes. Con la API en JOBS_WORKERS=0 todo el
+procesamiento queda en estos procesos.
+
+Uso:
+    python scripts/job_worker.py --workers 4 --torch-threads 2
+"""
+
+import os
+import sys
+import signal
+import logging
+import argparse
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.config.settings import settings  # noqa: E402
+from src.services.job_queue import JobStore, run_job_worker  # noqa: E402
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Procesos de trabajo de la cola de detección")
+    parser.add_argument("--workers", type=int, default=max(1, settings.JOBS_WORKERS), help="Procesos a iniciar")
+    parser.add_argument("--torch-threads", type=int, default=settings.TORCH_NUM_THREADS,
+                        help="Hilos intra-op de torch por proceso (0 = por defecto)")
+    parser.add_argument("--db", default=settings.JOBS_DB_PATH, help="Base SQLite de la cola")
+    parser.add_argument("--data-dir", default=settings.JOBS_DIR, help="Directorio de imágenes de los trabajos")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    JobStore(args.db, args.data_dir).requeue_stale(settings.JOBS_STALE_SECONDS)
+
+    context = multiprocessing.get_context("spawn")
+    stop_event = context.Event()
+    processes = [
+        context.Process(
+            target=run_job_worker,
+            args=(args.db, args.data_dir, stop_event, args.torch_threads),
+            name=f"yolo-jobs-{index}"
+        )
+        for index in range(max(1, args.workers))
+    ]
+    for process in processes:
+        process.start()
+
+    print(f"✅ {len(processes)} procesos de trabajo atendiendo {args.db} (Ctrl+C para detener)")
+
+    def stop(*_):
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        stop()
+        for process in processes:
+            process.join()
+
+if __name__ == "__main__":
+    main()
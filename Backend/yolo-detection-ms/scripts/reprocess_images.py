@@ -0,0 +1,98 @@
+"""
+Reprocesamiento incremental de un directorio de imágenes tras cambiar el modelo
+
+Calcula el hash del contenido de cada imagen, consulta al servicio cuáles aún no
+tienen resultado con el modelo actual (/results/unscored) y encola solo esas
+como trabajos (/jobs). Al terminar, la deriva frente al modelo anterior se
+consulta en /results/drift sin volver a procesar lo ya evaluado.
+
+Uso:
+    python scripts/reprocess_images.py --dir fotos/ --url http://localhost:8002
+    python scripts/reprocess_images.py --dir fotos/ --model cascade --dry-run
+"""
+
+import os
+import sys
+import argparse
+from typing import Dict, List
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.config.settings import settings  # noqa: E402
+from src.services.result_cache import DetectionResultCache  # noqa: E402
+
+API_PREFIX = "/api/v1/yolo"
+
+def collect_images(directory: str) -> Dict[str, str]:
+    """Hash del contenido -> ruta de cada imagen soportada del directorio (recursivo)"""
+    images: Dict[str, str] = {}
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.rsplit(".", 1)[-1].lower() not in settings.ALLOWED_EXTENSIONS:
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                images.setdefault(DetectionResultCache.hash_image(f.read()), path)
+    return images
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reprocesar solo las imágenes sin resultado del modelo actual")
+    parser.add_argument("--dir", required=True, help="Directorio de imágenes")
+    parser.add_argument("--url", default="http://localhost:8002", help="URL del microservicio")
+    parser.add_argument("--model", default=None, help="Modelo del registro o 'cascade'")
+    parser.add_argument("--confidence-threshold", type=float, default=None)
+    parser.add_argument("--iou-threshold", type=float, default=None)
+    parser.add_argument("--chunk", type=int, default=200, help="Imágenes por trabajo")
+    parser.add_argument("--webhook-url", default=None, help="Webhook para cada trabajo (opcional)")
+    parser.add_argument("--dry-run", action="store_true", help="Solo reportar cuántas faltan")
+    args = parser.parse_args()
+
+    images = collect_images(args.dir)
+    print(f"📁 {len(images)} imágenes distintas en {args.dir}")
+
+    with httpx.Client(base_url=args.url, timeout=120) as client:
+        response = client.post(f"{API_PREFIX}/results/unscored", json={
+            "image_hashes": list(images),
+            "model": args.model,
+            "confidence_threshold": args.confidence_threshold,
+            "iou_threshold": args.iou_threshold
+        })
+        response.raise_for_status()
+        pending = response.json()
+        print(f"🔎 {pending['unscored_total']} sin resultado con {pending['weights_id']}")
+
+        if args.dry_run or not pending["unscored"]:
+            return
+
+        params = {
+            key: value for key, value in {
+                "model": args.model,
+                "confidence_threshold": args.confidence_threshold,
+                "iou_threshold": args.iou_threshold,
+                "detail": "summary"
+            }.items() if value is not None
+        }
+        job_ids: List[str] = []
+        hashes = pending["unscored"]
+        for start in range(0, len(hashes), args.chunk):
+            paths = [images[image_hash] for image_hash in hashes[start:start + args.chunk]]
+            handles = [open(path, "rb") for path in paths]
+            try:
+                response = client.post(
+                    f"{API_PREFIX}/jobs",
+                    params=params,
+                    files=[("files", (os.path.basename(path), handle)) for path, handle in zip(paths, handles)],
+                    data={"webhook_url": args.webhook_url} if args.webhook_url else None
+                )
+            finally:
+                for handle in handles:
+                    handle.close()
+            response.raise_for_status()
+            job_ids.append(response.json()["job_id"])
+
+    print(f"✅ {len(job_ids)} trabajos encolados: {', '.join(job_ids)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Cliente de prueba del modo streaming usando un archivo de video como cámara
+
+Lee los cuadros del video al ritmo indicado, los envía al endpoint WebSocket
+`/api/v1/yolo/stream` y muestra las cantidades suavizadas que devuelve el servicio.
+
+Uso:
+    python scripts/stream_video.py --video bandeja.mp4
+    python scripts/stream_video.py --video bandeja.mp4 --fps 15 --smoothing 0.5
+"""
+
+import json
+import time
+import asyncio
+import argparse
+
+import cv2
+import websockets
+
+async def send_frames(websocket, capture: cv2.VideoCapture, fps: float, quality: int) -> int:
+    """Enviar los cuadros del video simulando una cámara en tiempo real"""
+    interval = 1.0 / fps
+    sent = 0
+
+    while True:
+        start = time.perf_counter()
+        ok, frame = capture.read()
+        if not ok:
+            break
+
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if ok:
+            await websocket.send(encoded.tobytes())
+            sent += 1
+
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - start)))
+
+    return sent
+
+async def receive_results(websocket) -> None:
+    """Mostrar los resultados a medida que llegan"""
+    async for message in websocket:
+        data = json.loads(message)
+        if not data.get("success"):
+            print(f"⚠️  {data.get('error')}")
+            continue
+
+        counts = ", ".join(
+            f"{codigo}={item['cantidad']}" for codigo, item in data["smoothed_summary"].items()
+        ) or "sin instrumentos"
+        print(
+            f"cuadro {data['frame']:>5} | procesados {data['processed_frames']:>5} | "
+            f"omitidos {data['dropped_frames']:>5} | {data['latency_ms']:>7} ms | {counts}"
+        )
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Enviar un video al modo streaming del servicio YOLO")
+    parser.add_argument("--video", required=True, help="Archivo de video que simula la cámara")
+    parser.add_argument("--url", default="ws://localhost:8002/api/v1/yolo/stream")
+    parser.add_argument("--fps", type=float, default=10.0, help="Cuadros por segundo a enviar")
+    parser.add_argument("--quality", type=int, default=85, help="Calidad JPEG de los cuadros")
+    parser.add_argument("--smoothing", type=float, default=None, help="Factor de suavizado (0-1]")
+    args = parser.parse_args()
+
+    capture = cv2.VideoCapture(args.video)
+    if not capture.isOpened():
+        raise SystemExit(f"No se pudo abrir el video {args.video}")
+
+    url = args.url if args.smoothing is None else f"{args.url}?smoothing={args.smoothing}"
+
+    async with websockets.connect(url, max_size=None) as websocket:
+        receiver = asyncio.create_task(receive_results(websocket))
+        sent = await send_frames(websocket, capture, args.fps, args.quality)
+
+        # Dar tiempo a que llegue el resultado del último cuadro
+        await asyncio.sleep(2)
+        receiver.cancel()
+
+    capture.release()
+    print(f"\n✅ {sent} cuadros enviados")
+
+if __name__ == "__main__":
+    asyncio.run(main())
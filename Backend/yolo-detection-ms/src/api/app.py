@@ -1,14 +1,22 @@
 import os
 import time
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
 
 from ..config.settings import settings
+from ..services.yolo_service import yolo_service
+from ..services.inference_executor import inference_executor
+from ..services.result_cache import result_cache
+from ..services.result_store import result_recorder
+from ..services.job_queue import job_workers
+from ..services.cpu_budget import configure_threads, current_threads, inference_slots, resolve_intra_op_threads
+from ..services import metrics
 from .routes.yolo_routes import router as yolo_router
 
 # Configurar logging
@@ -30,12 +38,33 @@ async def lifespan(app: FastAPI):
     
     logger.info(f"Directorio de uploads: {settings.UPLOAD_DIR}")
     logger.info(f"Modelo YOLO: {settings.YOLO_MODEL_PATH}")
+    
+    # Presupuesto de hilos antes de cualquier trabajo de torch u OpenCV
+    threads = configure_threads(resolve_intra_op_threads())
+    logger.info(f"Hilos por proceso: {threads}")
+    
+    # Cargar y calentar el modelo en segundo plano; /health reporta 503 mientras tanto.
+    # En modo "process" lo cargan los procesos de inferencia, no el principal
+    if settings.MODEL_LOAD_MODE != "lazy":
+        if inference_executor.mode == "process":
+            app.state.model_task = asyncio.create_task(inference_executor.prepare())
+        else:
+            app.state.model_task = asyncio.create_task(asyncio.to_thread(yolo_service.prepare))
+    
+    # Procesos de la cola de trabajos (cada uno con su propia copia del modelo)
+    if settings.JOBS_ENABLED:
+        await asyncio.to_thread(job_workers.start)
+    
     logger.info("Microservicio YOLO Detection iniciado correctamente")
     
     yield
     
     # Shutdown
     logger.info("Cerrando microservicio YOLO Detection...")
+    inference_executor.shutdown()
+    await asyncio.to_thread(result_recorder.flush)
+    await asyncio.to_thread(job_workers.shutdown)
+    yolo_service.shutdown()
 
 # Crear aplicación FastAPI
 app = FastAPI(
@@ -73,6 +102,12 @@ async def log_requests(request: Request, call_next):
     process_time = time.time() - start_time
     logger.info(f"Response: {response.status_code} - {process_time:.4f}s")
     
+    # Agrupar por plantilla de ruta para acotar la cardinalidad de las etiquetas
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    metrics.http_request_duration.observe(
+        process_time, method=request.method, route=route, status=str(response.status_code)
+    )
+    
     return response
 
 # Incluir routers
@@ -98,9 +133,49 @@ async def get_status():
         "version": settings.APP_VERSION,
         "status": "running",
         "model": settings.YOLO_MODEL_PATH,
-        "upload_dir": settings.UPLOAD_DIR
+        "upload_dir": settings.UPLOAD_DIR,
+        "inference": {
+            **inference_executor.get_stats(),
+            "threads": current_threads(),
+            "concurrent_inferences": inference_slots.get_stats()
+        },
+        "result_cache": {
+            "enabled": settings.RESULT_CACHE_ENABLED,
+            **result_cache.get_stats()
+        },
+        "jobs": job_workers.get_stats() if settings.JOBS_ENABLED else None
     }
 
+@app.get("/metrics", tags=["Root"], include_in_schema=False)
+async def get_metrics():
+    """Métricas del microservicio en formato de texto de Prometheus"""
+    if not settings.METRICS_ENABLED:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    
+    # Los indicadores instantáneos se actualizan al momento de la consulta
+    metrics.queue_depth.set(inference_executor.get_stats()["pending"], queue="executor")
+    metrics.queue_depth.set(yolo_service.batch_queue_depth, queue="batcher")
+    if settings.JOBS_ENABLED:
+        job_stats = await asyncio.to_thread(job_workers.store.get_stats)
+        metrics.queue_depth.set(job_stats.get("queued", 0), queue="jobs")
+    
+    metrics.model_info.clear()
+    metrics.model_info.set(
+        1,
+        model=yolo_service.model_id,
+        backend=settings.YOLO_BACKEND,
+        int8=str(settings.YOLO_INT8).lower(),
+        readiness=inference_executor.readiness if inference_executor.mode == "process" else yolo_service.readiness
+    )
+    
+    for kind, value in metrics.read_memory_usage().items():
+        metrics.memory_bytes.set(value, kind=kind)
+    
+    return PlainTextResponse(
+        metrics.registry.render(),
+        media_type="text/plain; version=0.0.4"
+    )
+
 # Manejador de errores global
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
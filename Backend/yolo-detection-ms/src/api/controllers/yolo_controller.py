@@ -1,11 +1,19 @@
+import asyncio
 import os
-import tempfile
-import shutil
-from typing import Optional, Dict, Any
-from fastapi import UploadFile, HTTPException
+import time
+from typing import Optional, Dict, Any, List
+from fastapi import UploadFile, HTTPException, WebSocket, WebSocketDisconnect
+from starlette.concurrency import run_in_threadpool
 import logging
 
 from ...services.yolo_service import yolo_service
+from ...services.inference_executor import inference_executor, InferenceQueueFullError
+from ...services.result_cache import DetectionResultCache, result_cache
+from ...services.result_store import build_record, result_recorder, result_store
+from ...services.stream_service import FrameCountSmoother, LatestFrameSlot
+from ...services.preprocessing import read_image_size
+from ...services.set_check import compare_with_expected, expected_set_catalog, parse_expected_counts
+from ...services.job_queue import job_store, validate_webhook_url
 from ...config.settings import settings
 
 logger = logging.getLogger(__name__)
@@ -16,14 +24,22 @@ class YOLOController:
     def __init__(self):
         """Inicializar el controlador"""
         self.yolo_service = yolo_service
-        # Crear directorio de subidas si no existe
-        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+        self.inference_executor = inference_executor
+        self.result_cache = result_cache if settings.RESULT_CACHE_ENABLED else None
+        self.result_store = result_store if settings.RESULT_STORE_ENABLED else None
+        self.result_recorder = result_recorder
+        self.job_store = job_store
     
     async def detect_instruments_from_file(
         self,
         file: UploadFile,
         confidence_threshold: Optional[float] = None,
-        iou_threshold: Optional[float] = None
+        iou_threshold: Optional[float] = None,
+        detail: str = "full",
+        sliced: Optional[bool] = None,
+        model: Optional[str] = None,
+        expected: Optional[str] = None,
+        expected_set_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Detectar instrumentos en una imagen subida
@@ -32,67 +48,592 @@ class YOLOController:
             file: Archivo de imagen subido
             confidence_threshold: Umbral de confianza
             iou_threshold: Umbral de IoU
+            detail: "full" incluye cada detección; "summary" solo el resumen
+            sliced: Inferencia por ventanas; None la decide según la resolución
+            model: Modelo del registro o "cascade" (opcional)
+            expected: JSON codigo -> cantidad con los instrumentos esperados (opcional)
+            expected_set_id: Set del catálogo contra el cual comparar (opcional)
             
         Returns:
-            Resultados de la detección
+            Resultados de la detección (con `set_check` si se indicó lo esperado)
         """
-        temp_file_path = None
-        
         try:
-            # Validar el archivo
+            # Validar el archivo, el modelo solicitado y la lista esperada
             self._validate_uploaded_file(file)
+            self._validate_model(model)
+            expected_set = self._resolve_expected(expected, expected_set_id)
+            
+            # Leer el contenido en memoria (sin archivo temporal)
+            data = await self._read_upload(file)
+            
+            # Reutilizar el resultado si la misma imagen ya fue procesada
+            conf_threshold, iou_threshold = self.yolo_service.resolve_thresholds(
+                confidence_threshold, iou_threshold
+            )
+            model_id = self.yolo_service.model_id
+            cache_variant = f"{detail}:sliced={sliced}:model={model}"
+            image_hash = None
+            
+            if self.result_cache is not None or self.result_store is not None:
+                image_hash = await run_in_threadpool(DetectionResultCache.hash_image, data)
+            
+            if self.result_cache is not None:
+                cached = self.result_cache.get(
+                    image_hash, conf_threshold, iou_threshold, model_id, cache_variant
+                )
+                if cached is not None:
+                    cached["cached"] = True
+                    cached["file_info"] = self._file_info(file, data)
+                    self._attach_set_check(cached, expected_set)
+                    return cached
+            
+            if sliced is None:
+                sliced = self._should_slice(data)
             
-            # Guardar archivo temporal
-            temp_file_path = await self._save_temp_file(file)
+            # Decodificar una sola vez; las ventanas necesitan la resolución original
+            if sliced:
+                image = await run_in_threadpool(self.yolo_service.decode_image, data)
+                scale = None
+            else:
+                image, scale = await run_in_threadpool(
+                    self.yolo_service.decode_image_for_inference, data
+                )
             
-            # Validar que la imagen es válida
-            if not self.yolo_service.validate_image(temp_file_path):
+            if not self.yolo_service.validate_image_array(image):
                 raise HTTPException(
                     status_code=400,
                     detail="El archivo no es una imagen válida"
                 )
             
-            # Realizar la detección
-            results = self.yolo_service.detect_instruments(
-                image_path=temp_file_path,
-                confidence_threshold=confidence_threshold,
-                iou_threshold=iou_threshold
+            # Realizar la detección en el ejecutor de inferencia (fuera del event loop)
+            start_time = time.perf_counter()
+            results = await self.inference_executor.run(
+                self.yolo_service.detect_instruments,
+                image=image,
+                confidence_threshold=conf_threshold,
+                iou_threshold=iou_threshold,
+                detail=detail,
+                sliced=sliced,
+                scale=scale,
+                model=model
+            )
+            inference_ms = (time.perf_counter() - start_time) * 1000
+            
+            if self.result_cache is not None and results.get("success"):
+                self.result_cache.set(
+                    image_hash, conf_threshold, iou_threshold, model_id, results, cache_variant
+                )
+            await self._record_results(
+                [(image_hash, results, inference_ms, file.filename)], model, sliced, source="detect"
             )
             
             # Agregar información del archivo procesado
-            results["file_info"] = {
-                "filename": file.filename,
-                "content_type": file.content_type,
-                "size": file.size
-            }
+            results["cached"] = False
+            results["file_info"] = self._file_info(file, data)
+            self._attach_set_check(results, expected_set)
             
             return results
             
         except HTTPException:
             raise
+        except InferenceQueueFullError as e:
+            raise self._queue_full_exception(e)
         except Exception as e:
             logger.error(f"Error procesando archivo {file.filename}: {str(e)}")
             raise HTTPException(
                 status_code=500,
                 detail=f"Error interno procesando la imagen: {str(e)}"
             )
+    
+    async def detect_instruments_from_files(
+        self,
+        files: List[UploadFile],
+        confidence_threshold: Optional[float] = None,
+        iou_threshold: Optional[float] = None,
+        detail: str = "full",
+        model: Optional[str] = None,
+        expected: Optional[str] = None,
+        expected_set_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Detectar instrumentos en varias imágenes de una misma bandeja
+        
+        Las imágenes válidas que no están en caché se procesan en pasadas por
+        lotes del modelo. Las imágenes inválidas se reportan individualmente
+        sin afectar al resto.
+        
+        Args:
+            files: Archivos de imagen subidos
+            confidence_threshold: Umbral de confianza
+            iou_threshold: Umbral de IoU
+            detail: "full" incluye cada detección; "summary" solo el resumen
+            model: Modelo del registro o "cascade" (opcional)
+            expected: JSON codigo -> cantidad con los instrumentos esperados (opcional)
+            expected_set_id: Set del catálogo contra el cual comparar (opcional)
+            
+        Returns:
+            Resultados por imagen y resumen combinado de la bandeja (con
+            `set_check` sobre el resumen combinado si se indicó lo esperado)
+        """
+        if not files:
+            raise HTTPException(
+                status_code=400,
+                detail="No se proporcionó ningún archivo"
+            )
+        
+        if len(files) > settings.MAX_BATCH_FILES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Demasiadas imágenes. Máximo por solicitud: {settings.MAX_BATCH_FILES}"
+            )
+        
+        self._validate_model(model)
+        expected_set = self._resolve_expected(expected, expected_set_id)
+        
+        try:
+            conf_threshold, iou_threshold = self.yolo_service.resolve_thresholds(
+                confidence_threshold, iou_threshold
+            )
+            model_id = self.yolo_service.model_id
+            cache_variant = f"{detail}:sliced=False:model={model}"
+            
+            results: List[Optional[Dict[str, Any]]] = [None] * len(files)
+            pending = []  # (índice, hash, imagen, escala, información del archivo)
+            
+            for index, file in enumerate(files):
+                data = None
+                try:
+                    self._validate_uploaded_file(file)
+                    data = await self._read_upload(file)
+                    
+                    image_hash = None
+                    if self.result_cache is not None or self.result_store is not None:
+                        image_hash = await run_in_threadpool(DetectionResultCache.hash_image, data)
+                    
+                    if self.result_cache is not None:
+                        cached = self.result_cache.get(
+                            image_hash, conf_threshold, iou_threshold, model_id, cache_variant
+                        )
+                        if cached is not None:
+                            cached["cached"] = True
+                            cached["file_info"] = self._file_info(file, data)
+                            results[index] = cached
+                            continue
+                    
+                    image, scale = await run_in_threadpool(
+                        self.yolo_service.decode_image_for_inference, data
+                    )
+                    if not self.yolo_service.validate_image_array(image):
+                        raise HTTPException(
+                            status_code=400,
+                            detail="El archivo no es una imagen válida"
+                        )
+                    
+                    pending.append((index, image_hash, image, scale, self._file_info(file, data)))
+                except HTTPException as e:
+                    results[index] = {
+                        "success": False,
+                        "error": e.detail,
+                        "detections": [],
+                        "summary": {},
+                        "file_info": self._file_info(file, data)
+                    }
+            
+            if pending:
+                start_time = time.perf_counter()
+                batch_results = await self.inference_executor.run(
+                    self.yolo_service.detect_instruments_batch,
+                    images=[image for _, _, image, _, _ in pending],
+                    confidence_threshold=conf_threshold,
+                    iou_threshold=iou_threshold,
+                    detail=detail,
+                    scales=[scale for _, _, _, scale, _ in pending],
+                    model=model
+                )
+                inference_ms = (time.perf_counter() - start_time) * 1000 / len(pending)
+                
+                await self._record_results(
+                    [
+                        (image_hash, result, inference_ms, file_info["filename"])
+                        for (_, image_hash, _, _, file_info), result in zip(pending, batch_results)
+                    ],
+                    model,
+                    source="batch"
+                )
+                
+                for (index, image_hash, _, _, file_info), result in zip(pending, batch_results):
+                    if self.result_cache is not None and result.get("success"):
+                        self.result_cache.set(
+                            image_hash, conf_threshold, iou_threshold, model_id, result, cache_variant
+                        )
+                    
+                    result["cached"] = False
+                    result["file_info"] = file_info
+                    results[index] = result
+            
+            successful = [result for result in results if result.get("success")]
+            
+            response = {
+                "success": len(successful) == len(files),
+                "total_images": len(files),
+                "processed_images": len(successful),
+                "failed_images": len(files) - len(successful),
+                "total_objects": sum(result["total_objects"] for result in successful),
+                "summary": self.yolo_service.merge_summaries(
+                    [result["summary"] for result in successful]
+                ),
+                "results": results,
+                "confidence_threshold": conf_threshold,
+                "iou_threshold": iou_threshold
+            }
+            self._attach_set_check(response, expected_set)
+            
+            return response
+            
+        except HTTPException:
+            raise
+        except InferenceQueueFullError as e:
+            raise self._queue_full_exception(e)
+        except Exception as e:
+            logger.error(f"Error procesando lote de {len(files)} imágenes: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error interno procesando las imágenes: {str(e)}"
+            )
+    
+    async def stream_detection(
+        self,
+        websocket: WebSocket,
+        confidence_threshold: Optional[float] = None,
+        iou_threshold: Optional[float] = None,
+        smoothing: Optional[float] = None
+    ) -> None:
+        """
+        Detectar instrumentos sobre un stream de cuadros recibidos por WebSocket
+        
+        Cada mensaje binario es un cuadro codificado (JPEG/PNG). Solo se procesa
+        el cuadro más reciente: los que llegan mientras hay una inferencia en
+        curso se descartan. Por cada cuadro procesado se envía un mensaje JSON
+        con el resumen del cuadro y las cantidades suavizadas en el tiempo.
+        
+        Args:
+            websocket: Conexión WebSocket
+            confidence_threshold: Umbral de confianza
+            iou_threshold: Umbral de IoU
+            smoothing: Factor de suavizado (1.0 = sin suavizado)
+        """
+        await websocket.accept()
+        
+        try:
+            smoother = FrameCountSmoother(alpha=smoothing or settings.STREAM_SMOOTHING_ALPHA)
+        except ValueError as e:
+            await websocket.close(code=1008, reason=str(e))
+            return
+        
+        conf_threshold, iou_threshold = self.yolo_service.resolve_thresholds(
+            confidence_threshold, iou_threshold
+        )
+        slot = LatestFrameSlot()
+        
+        async def receive_frames() -> None:
+            """Recibir cuadros y conservar solo el más reciente"""
+            try:
+                while True:
+                    frame = await websocket.receive_bytes()
+                    if len(frame) <= settings.MAX_FILE_SIZE:
+                        slot.put(frame)
+            except (WebSocketDisconnect, RuntimeError, KeyError):
+                # KeyError/RuntimeError: mensaje de texto o conexión ya cerrada
+                pass
+            finally:
+                slot.close()
+        
+        receiver = asyncio.create_task(receive_frames())
+        processed = 0
+        
+        try:
+            while True:
+                frame = await slot.get()
+                if frame is None:
+                    break
+                
+                start_time = time.perf_counter()
+                # Solo se devuelve el resumen: la escala de las cajas no se necesita
+                image, _ = await run_in_threadpool(self.yolo_service.decode_image_for_inference, frame)
+                if not self.yolo_service.validate_image_array(image):
+                    await websocket.send_json({"success": False, "error": "El cuadro no es una imagen válida"})
+                    continue
+                
+                try:
+                    result = await self.inference_executor.run(
+                        self.yolo_service.detect_instruments,
+                        image=image,
+                        confidence_threshold=conf_threshold,
+                        iou_threshold=iou_threshold,
+                        detail="summary"
+                    )
+                except InferenceQueueFullError as e:
+                    await websocket.send_json({
+                        "success": False,
+                        "error": "Servicio saturado, cuadro omitido",
+                        "retry_after": e.retry_after
+                    })
+                    continue
+                
+                if not result.get("success"):
+                    await websocket.send_json({"success": False, "error": result.get("error")})
+                    continue
+                
+                processed += 1
+                await websocket.send_json({
+                    "success": True,
+                    "frame": slot.received,
+                    "processed_frames": processed,
+                    "dropped_frames": slot.dropped,
+                    "total_objects": result["total_objects"],
+                    "summary": result["summary"],
+                    "smoothed_summary": smoother.update(result["summary"]),
+                    "latency_ms": round((time.perf_counter() - start_time) * 1000, 1)
+                })
+        except WebSocketDisconnect:
+            pass
         finally:
-            # Limpiar archivo temporal
-            if temp_file_path and os.path.exists(temp_file_path):
+            receiver.cancel()
+            logger.info(
+                f"Stream finalizado: {slot.received} cuadros recibidos, "
+                f"{processed} procesados, {slot.dropped} omitidos"
+            )
+    
+    async def submit_job(
+        self,
+        files: List[UploadFile],
+        confidence_threshold: Optional[float] = None,
+        iou_threshold: Optional[float] = None,
+        detail: str = "full",
+        model: Optional[str] = None,
+        webhook_url: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Encolar un trabajo de detección asíncrono
+        
+        Las imágenes inválidas se registran como fallidas dentro del trabajo sin
+        rechazar el resto.
+        
+        Args:
+            files: Archivos de imagen subidos
+            confidence_threshold: Umbral de confianza
+            iou_threshold: Umbral de IoU
+            detail: "full" incluye cada detección; "summary" solo el resumen
+            model: Modelo del registro o "cascade" (opcional)
+            webhook_url: URL notificada al terminar el trabajo (opcional)
+            
+        Returns:
+            Identificador y estado inicial del trabajo
+        """
+        self._ensure_jobs_enabled()
+        
+        if not files:
+            raise HTTPException(
+                status_code=400,
+                detail="No se proporcionó ningún archivo"
+            )
+        
+        if len(files) > settings.JOBS_MAX_FILES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Demasiadas imágenes. Máximo por trabajo: {settings.JOBS_MAX_FILES}"
+            )
+        
+        if webhook_url:
+            try:
+                await run_in_threadpool(validate_webhook_url, webhook_url)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        
+        self._validate_model(model)
+        conf_threshold, iou_threshold = self.yolo_service.resolve_thresholds(
+            confidence_threshold, iou_threshold
+        )
+        
+        params = {
+            "confidence_threshold": conf_threshold,
+            "iou_threshold": iou_threshold,
+            "detail": detail,
+            "model": model
+        }
+        
+        # Cada imagen se escribe en el directorio del trabajo al leerla: en
+        # memoria solo hay un archivo a la vez, no el lote completo
+        job_id = await run_in_threadpool(self.job_store.new_job)
+        try:
+            images = []  # (nombre, ruta, hash, error de validación)
+            for position, file in enumerate(files):
                 try:
-                    os.unlink(temp_file_path)
-                except Exception as e:
-                    logger.warning(f"No se pudo eliminar archivo temporal {temp_file_path}: {str(e)}")
+                    self._validate_uploaded_file(file)
+                    data = await self._read_upload(file)
+                except HTTPException as e:
+                    images.append((file.filename, None, None, e.detail))
+                    continue
+                path, image_hash = await run_in_threadpool(
+                    self.job_store.store_image, job_id, position, file.filename, data
+                )
+                images.append((file.filename, path, image_hash, None))
+                del data
+            
+            await run_in_threadpool(self.job_store.enqueue, job_id, images, params, webhook_url)
+        except asyncio.CancelledError:
+            # Cliente desconectado a mitad de la subida
+            self.job_store.discard(job_id)
+            raise
+        except Exception as e:
+            await run_in_threadpool(self.job_store.discard, job_id)
+            logger.error(f"Error encolando trabajo de {len(files)} imágenes: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error interno encolando el trabajo: {str(e)}"
+            )
+        
+        return await self.get_job(job_id)
+    
+    async def get_job(self, job_id: str, include_results: bool = False) -> Dict[str, Any]:
+        """
+        Obtener el estado de un trabajo
+        
+        Args:
+            job_id: Identificador del trabajo
+            include_results: Incluir el resultado de cada imagen
+            
+        Returns:
+            Estado, progreso, resumen y (si se pide) resultados del trabajo
+        """
+        self._ensure_jobs_enabled()
+        
+        job = await run_in_threadpool(self.job_store.get_job, job_id, include_results)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Trabajo no encontrado: {job_id}")
+        return job
+    
+    async def cancel_job(self, job_id: str) -> Dict[str, Any]:
+        """
+        Cancelar un trabajo en cola o en curso
+        
+        Args:
+            job_id: Identificador del trabajo
+            
+        Returns:
+            Estado del trabajo tras la cancelación
+        """
+        self._ensure_jobs_enabled()
+        
+        status = await run_in_threadpool(self.job_store.cancel, job_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail=f"Trabajo no encontrado: {job_id}")
+        return await self.get_job(job_id)
+    
+    async def find_unscored(
+        self,
+        image_hashes: List[str],
+        model: Optional[str] = None,
+        confidence_threshold: Optional[float] = None,
+        iou_threshold: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Filtrar las imágenes que aún no tienen resultado con el modelo actual
+        
+        Args:
+            image_hashes: Hashes (blake2b de 20 bytes) del contenido de las imágenes
+            model: Modelo del registro o "cascade" (opcional)
+            confidence_threshold: Exigir también este umbral (opcional)
+            iou_threshold: Exigir también este umbral (opcional)
+            
+        Returns:
+            Pesos evaluados y hashes pendientes de procesar
+        """
+        self._ensure_result_store()
+        self._validate_model(model)
+        
+        weights_id = await run_in_threadpool(self.yolo_service.route_weights_id, model)
+        unscored = await run_in_threadpool(
+            self.result_store.unscored, image_hashes, weights_id, confidence_threshold, iou_threshold
+        )
+        return {
+            "weights_id": weights_id,
+            "total": len(set(image_hashes)),
+            "unscored_total": len(unscored),
+            "unscored": unscored
+        }
+    
+    async def get_result_models(self) -> Dict[str, Any]:
+        """
+        Obtener los modelos con resultados en el historial
+        
+        Returns:
+            Pesos actuales y resumen del historial por modelo
+        """
+        self._ensure_result_store()
+        
+        return {
+            "current_weights_id": await run_in_threadpool(self.yolo_service.route_weights_id),
+            "models": await run_in_threadpool(self.result_store.models)
+        }
     
-    def get_model_info(self) -> Dict[str, Any]:
+    async def get_drift(
+        self,
+        baseline: str,
+        candidate: Optional[str] = None,
+        confidence_threshold: Optional[float] = None,
+        iou_threshold: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Comparar los conteos de dos modelos sobre las imágenes que ambos procesaron
+        
+        Args:
+            baseline: weights_id del modelo de referencia
+            candidate: weights_id a evaluar (por defecto el modelo actual)
+            confidence_threshold: Considerar solo resultados con este umbral (opcional)
+            iou_threshold: Considerar solo resultados con este umbral (opcional)
+            
+        Returns:
+            Resumen de la deriva entre ambos modelos
+        """
+        self._ensure_result_store()
+        
+        if candidate is None:
+            candidate = await run_in_threadpool(self.yolo_service.route_weights_id)
+        return await run_in_threadpool(
+            self.result_store.drift, baseline, candidate, confidence_threshold, iou_threshold
+        )
+    
+    async def get_result_history(self, image_hash: str) -> Dict[str, Any]:
+        """
+        Obtener todos los resultados almacenados de una imagen
+        
+        Args:
+            image_hash: Hash del contenido de la imagen
+            
+        Returns:
+            Resultados por modelo, del más antiguo al más reciente
+        """
+        self._ensure_result_store()
+        
+        history = await run_in_threadpool(self.result_store.history, image_hash)
+        if not history:
+            raise HTTPException(status_code=404, detail=f"Sin resultados para la imagen {image_hash}")
+        return {"image_hash": image_hash, "results": history}
+    
+    async def get_model_info(self) -> Dict[str, Any]:
         """
         Obtener información del modelo
         
         Returns:
-            Información del modelo YOLO
+            Información del modelo YOLO (en modo "process", la de un proceso de inferencia)
         """
         try:
+            if self.inference_executor.mode == "process":
+                return await self.inference_executor.run(self.yolo_service.get_model_info)
             return self.yolo_service.get_model_info()
+        except InferenceQueueFullError as e:
+            raise self._queue_full_exception(e)
         except Exception as e:
             logger.error(f"Error obteniendo información del modelo: {str(e)}")
             raise HTTPException(
@@ -100,6 +641,39 @@ class YOLOController:
                 detail=f"Error obteniendo información del modelo: {str(e)}"
             )
     
+    async def swap_model(self, model_path: str) -> Dict[str, Any]:
+        """
+        Reemplazar los pesos del modelo sin detener el servicio
+        
+        En modo "process" solo los procesos de inferencia cargan los pesos
+        nuevos; el proceso principal registra la ruta sin cargarlos.
+        
+        Args:
+            model_path: Ruta de los nuevos pesos
+            
+        Returns:
+            Información del modelo activo tras el reemplazo
+        """
+        try:
+            if self.inference_executor.mode == "process":
+                if not os.path.exists(model_path):
+                    raise FileNotFoundError(f"No existe el modelo: {model_path}")
+                await self.inference_executor.reload(model_path)
+                self.yolo_service.adopt_model_path(model_path)
+                return await self.get_model_info()
+            
+            return await run_in_threadpool(self.yolo_service.swap_model, model_path)
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error reemplazando el modelo por {model_path}: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error cargando el nuevo modelo: {str(e)}"
+            )
+    
     def get_supported_instruments(self) -> Dict[str, Any]:
         """
         Obtener lista de instrumentos soportados
@@ -120,8 +694,38 @@ class YOLOController:
             Estado del servicio
         """
         try:
+            # En modo "process" el modelo que atiende es el de los procesos de inferencia
+            process_mode = self.inference_executor.mode == "process"
+            source = self.inference_executor if process_mode else self.yolo_service
+            readiness = source.readiness
+            
+            if readiness in ("loading", "warming"):
+                return {
+                    "status": "warming",
+                    "message": "Modelo YOLO cargándose" if readiness == "loading" else "Modelo YOLO en calentamiento"
+                }
+            
+            if readiness == "error":
+                return {
+                    "status": "unhealthy",
+                    "message": f"Error preparando el modelo YOLO: {source.last_error}"
+                }
+            
+            if readiness == "unloaded" and settings.MODEL_LOAD_MODE == "lazy":
+                return {
+                    "status": "healthy",
+                    "message": "Servicio funcionando; el modelo se cargará en la primera solicitud",
+                    "version": settings.APP_VERSION
+                }
+            
+            if process_mode and readiness != "ready":
+                return {
+                    "status": "warming",
+                    "message": "Procesos de inferencia iniciándose"
+                }
+            
             # Verificar que el modelo está cargado
-            model_info = self.yolo_service.get_model_info()
+            model_info = {} if process_mode else self.yolo_service.get_model_info()
             
             if "error" in model_info:
                 return {
@@ -140,6 +744,133 @@ class YOLOController:
                 "message": f"Error en el servicio: {str(e)}"
             }
     
+    def _resolve_expected(
+        self,
+        expected: Optional[str],
+        expected_set_id: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Obtener la lista de instrumentos esperada de la solicitud o del catálogo
+        
+        Args:
+            expected: JSON codigo -> cantidad
+            expected_set_id: Identificador del set en el catálogo
+            
+        Returns:
+            {"set_id", "set_name", "instrumentos"} o None si no se pidió comparar
+        """
+        if expected is not None and expected_set_id is not None:
+            raise HTTPException(
+                status_code=400,
+                detail="Indique solo una de las opciones: expected o expected_set_id"
+            )
+        
+        if expected is not None:
+            try:
+                return {"set_id": None, "set_name": None, "instrumentos": parse_expected_counts(expected)}
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        
+        if expected_set_id is not None:
+            try:
+                expected_set = expected_set_catalog.get(expected_set_id)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error leyendo el catálogo de sets: {str(e)}")
+                raise HTTPException(status_code=500, detail="No se pudo leer el catálogo de sets")
+            
+            if expected_set is None:
+                raise HTTPException(status_code=404, detail=f"Set no encontrado: {expected_set_id}")
+            return {
+                "set_id": expected_set_id,
+                "set_name": expected_set["nombre"],
+                "instrumentos": expected_set["instrumentos"]
+            }
+        
+        return None
+    
+    def _attach_set_check(self, results: Dict[str, Any], expected_set: Optional[Dict[str, Any]]) -> None:
+        """Agregar la comparación con la lista esperada a una respuesta exitosa"""
+        if expected_set is None or not results.get("success", True):
+            return
+        
+        results["set_check"] = {
+            "set_id": expected_set["set_id"],
+            "set_name": expected_set["set_name"],
+            **compare_with_expected(results["summary"], expected_set["instrumentos"])
+        }
+    
+    def _validate_model(self, model: Optional[str]) -> None:
+        """Validar que el modelo solicitado esté registrado"""
+        if model is not None and model not in self.yolo_service.available_models():
+            raise HTTPException(
+                status_code=400,
+                detail=f"Modelo no disponible: {model}. Opciones: {', '.join(self.yolo_service.available_models())}"
+            )
+    
+    def _ensure_result_store(self) -> None:
+        """Rechazar las consultas al historial si está deshabilitado"""
+        if self.result_store is None:
+            raise HTTPException(
+                status_code=503,
+                detail="El historial de resultados está deshabilitado (RESULT_STORE_ENABLED)"
+            )
+    
+    async def _record_results(
+        self,
+        items: List[tuple],
+        model: Optional[str],
+        sliced: bool = False,
+        source: str = "detect"
+    ) -> None:
+        """
+        Agregar resultados nuevos al historial persistente
+        
+        Los pesos se identifican aquí, justo después de la inferencia, para que
+        un reemplazo del modelo posterior no cambie a quién se atribuyen; la
+        escritura se encola y ocurre en segundo plano, sin esperar a SQLite.
+        Un error del historial solo se registra en el log.
+        
+        Args:
+            items: Tuplas (hash, resultado, tiempo de inferencia en ms, nombre del archivo)
+            model: Modelo solicitado
+            sliced: Si se usó inferencia por ventanas
+            source: Origen de los resultados
+        """
+        if self.result_store is None:
+            return
+        
+        try:
+            weights_id = await run_in_threadpool(self.yolo_service.route_weights_id, model, sliced)
+        except Exception as e:
+            logger.warning(f"No se pudo identificar los pesos para el historial: {str(e)}")
+            return
+        
+        def build() -> List[Dict[str, Any]]:
+            return [
+                build_record(image_hash, weights_id, result, sliced, inference_ms, source, filename)
+                for image_hash, result, inference_ms, filename in items
+                if result.get("success")
+            ]
+        
+        self.result_recorder.submit(build)
+    
+    def _ensure_jobs_enabled(self) -> None:
+        """Rechazar las operaciones de trabajos si la cola está deshabilitada"""
+        if not settings.JOBS_ENABLED:
+            raise HTTPException(
+                status_code=503,
+                detail="La cola de trabajos está deshabilitada (JOBS_ENABLED)"
+            )
+    
+    def _should_slice(self, data: bytes) -> bool:
+        """Decidir la inferencia por ventanas según la resolución de la imagen"""
+        min_side = settings.SLICED_AUTO_MIN_SIDE
+        if min_side <= 0:
+            return False
+        
+        size = read_image_size(data)
+        return size is not None and max(size[0], size[1]) >= min_side
+    
     def _validate_uploaded_file(self, file: UploadFile) -> None:
         """
         Validar archivo subido
@@ -172,34 +903,68 @@ class YOLOController:
                 detail=f"Archivo demasiado grande. Tamaño máximo: {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB"
             )
     
-    async def _save_temp_file(self, file: UploadFile) -> str:
+    def _file_info(self, file: UploadFile, data: Optional[bytes]) -> Dict[str, Any]:
         """
-        Guardar archivo temporal
+        Construir la información del archivo procesado
         
         Args:
             file: Archivo subido
+            data: Contenido leído del archivo (None si no se pudo leer)
             
         Returns:
-            Ruta del archivo temporal
+            Nombre, tipo de contenido y tamaño del archivo
         """
-        # Crear archivo temporal
-        file_extension = file.filename.split('.')[-1].lower()
-        temp_file = tempfile.NamedTemporaryFile(
-            delete=False,
-            suffix=f".{file_extension}",
-            dir=settings.UPLOAD_DIR
+        return {
+            "filename": file.filename,
+            "content_type": file.content_type,
+            "size": len(data) if data is not None else file.size
+        }
+    
+    def _queue_full_exception(self, error: InferenceQueueFullError) -> HTTPException:
+        """
+        Construir la respuesta 503 para una cola de inferencia llena
+        
+        Args:
+            error: Error de admisión del ejecutor
+            
+        Returns:
+            HTTPException con cabecera Retry-After
+        """
+        logger.warning(f"Solicitud rechazada: {str(error)}")
+        return HTTPException(
+            status_code=503,
+            detail="Servicio saturado, intente nuevamente más tarde",
+            headers={"Retry-After": str(error.retry_after)}
         )
+    
+    async def _read_upload(self, file: UploadFile) -> bytes:
+        """
+        Leer el contenido del archivo subido en memoria
         
-        try:
-            # Copiar contenido del archivo
-            shutil.copyfileobj(file.file, temp_file)
-            temp_file.close()
-            return temp_file.name
-        except Exception as e:
-            # Limpiar archivo temporal en caso de error
-            if os.path.exists(temp_file.name):
-                os.unlink(temp_file.name)
-            raise e
+        Args:
+            file: Archivo subido
+            
+        Returns:
+            Bytes del archivo
+            
+        Raises:
+            HTTPException: Si el archivo está vacío o excede el tamaño máximo
+        """
+        data = await file.read()
+        
+        if not data:
+            raise HTTPException(
+                status_code=400,
+                detail="El archivo está vacío"
+            )
+        
+        if len(data) > settings.MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Archivo demasiado grande. Tamaño máximo: {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB"
+            )
+        
+        return data
 
 # Instancia global del controlador
 yolo_controller = YOLOController()
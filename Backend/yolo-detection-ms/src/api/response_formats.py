@@ -0,0 +1,95 @@
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import msgpack
+except ImportError:  # Dependencia opcional
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+COLUMNAR_MEDIA_TYPE = "application/vnd.eivai.columnar+json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+def _parse_accept(accept: str) -> List[Tuple[str, float]]:
+    """Obtener los tipos del header Accept ordenados por preferencia (q)"""
+    entries = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        if not media_type:
+            continue
+
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        entries.append((media_type.lower(), quality, position))
+
+    entries.sort(key=lambda entry: (-entry[1], entry[2]))
+    return [(media_type, quality) for media_type, quality, _ in entries if quality > 0]
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """
+    Elegir el formato de respuesta a partir del header Accept
+
+    Args:
+        accept: Valor del header Accept
+
+    Returns:
+        "json" (por defecto), "columnar" o "msgpack"
+
+    Raises:
+        HTTPException: 406 si solo se aceptan formatos no disponibles
+    """
+    if not accept:
+        return "json"
+
+    for media_type, _ in _parse_accept(accept):
+        if media_type == COLUMNAR_MEDIA_TYPE:
+            return "columnar"
+        if media_type in MSGPACK_MEDIA_TYPES and msgpack is not None:
+            return "msgpack"
+        if media_type in (JSON_MEDIA_TYPE, "application/*", "*/*"):
+            return "json"
+
+    raise HTTPException(
+        status_code=406,
+        detail=(
+            f"Formatos soportados: {JSON_MEDIA_TYPE}, {COLUMNAR_MEDIA_TYPE}"
+            + (f", {MSGPACK_MEDIA_TYPES[0]}" if msgpack is not None else "")
+        )
+    )
+
+def detail_for_format(detail: str, response_format: str) -> str:
+    """Los formatos compactos devuelven las detecciones en columnas"""
+    if detail == "full" and response_format != "json":
+        return "columnar"
+    return detail
+
+def render_response(content: Dict[str, Any], response_format: str, status_code: int = 200) -> Response:
+    """
+    Serializar la respuesta en el formato negociado
+
+    Args:
+        content: Contenido de la respuesta
+        response_format: "json", "columnar" o "msgpack"
+        status_code: Código HTTP
+
+    Returns:
+        Respuesta con el tipo de contenido correspondiente
+    """
+    headers = {"Vary": "Accept"}
+
+    if response_format == "msgpack":
+        return Response(
+            content=msgpack.packb(content, use_single_float=True),
+            status_code=status_code,
+            media_type=MSGPACK_MEDIA_TYPES[0],
+            headers=headers
+        )
+
+    media_type = COLUMNAR_MEDIA_TYPE if response_format == "columnar" else JSON_MEDIA_TYPE
+    return JSONResponse(content=content, status_code=status_code, media_type=media_type, headers=headers)
@@ -1,8 +1,11 @@
-from typing import Optional, Dict, Any
-from fastapi import APIRouter, UploadFile, File, Query, HTTPException
+from typing import Optional, Dict, Any, List
+from fastapi import APIRouter, UploadFile, File, Form, Query, HTTPException, Header, WebSocket
 from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
 
 from ..controllers.yolo_controller import yolo_controller
+from ..response_formats import detail_for_format, negotiate_format, render_response
+from ...config.settings import settings
 
 # Crear router para las rutas de YOLO
 router = APIRouter(prefix="/api/v1/yolo", tags=["YOLO Detection"])
@@ -21,7 +24,29 @@ async def detect_instruments(
         ge=0.0, 
         le=1.0, 
         description="Umbral de IoU para eliminación de detecciones duplicadas (0.0-1.0)"
-    )
+    ),
+    detail: str = Query(
+        "full",
+        pattern="^(summary|full)$",
+        description="Nivel de detalle: 'full' incluye cada detección, 'summary' solo el resumen por instrumento"
+    ),
+    sliced: Optional[bool] = Query(
+        None,
+        description="Inferencia por ventanas solapadas para fotos de alta resolución (por defecto según SLICED_AUTO_MIN_SIDE)"
+    ),
+    model: Optional[str] = Query(
+        None,
+        description="Modelo del registro (YOLO_MODELS) o 'cascade'; por defecto la cascada si está habilitada"
+    ),
+    expected: Optional[str] = Form(
+        None,
+        description='Instrumentos esperados como JSON codigo -> cantidad, p. ej. {"BISP-001": 2}'
+    ),
+    expected_set_id: Optional[str] = Query(
+        None,
+        description="Set del catálogo (EXPECTED_SETS_PATH) contra el cual comparar"
+    ),
+    accept: Optional[str] = Header(None)
 ):
     """
     Detectar instrumentos quirúrgicos en una imagen
@@ -29,24 +54,260 @@ async def detect_instruments(
     - **file**: Imagen en formato JPG, PNG, BMP, TIFF o WEBP
     - **confidence_threshold**: Umbral de confianza (opcional, por defecto 0.5)
     - **iou_threshold**: Umbral de IoU (opcional, por defecto 0.45)
+    - **detail**: `full` (por defecto) o `summary` para omitir las detecciones por caja
+    - **sliced**: `true` divide la imagen en ventanas solapadas para detectar instrumentos pequeños
+    - **model**: modelo a usar (`default`, un nombre de `YOLO_MODELS` o `cascade`)
+    - **expected** / **expected_set_id**: lista esperada para comparar en la misma llamada
+    - **Accept**: `application/vnd.eivai.columnar+json` o `application/msgpack` para
+      recibir las detecciones en columnas (cajas, confianzas y clases) con la
+      tabla de instrumentos una sola vez
     
     Retorna:
     - Lista de instrumentos detectados con sus posiciones y confianza
     - Resumen con cantidad de cada tipo de instrumento
+    - `set_check` con faltantes, sobrantes y diferencia por código (si se indicó lo esperado)
     - Información del archivo procesado
     """
+    response_format = negotiate_format(accept)
+    
     try:
         results = await yolo_controller.detect_instruments_from_file(
             file=file,
             confidence_threshold=confidence_threshold,
-            iou_threshold=iou_threshold
+            iou_threshold=iou_threshold,
+            detail=detail_for_format(detail, response_format),
+            sliced=sliced,
+            model=model,
+            expected=expected,
+            expected_set_id=expected_set_id
+        )
+        return render_response(results, response_format)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/detect/batch", response_model=Dict[str, Any])
+async def detect_instruments_batch(
+    files: List[UploadFile] = File(..., description="Imágenes de la bandeja para analizar"),
+    confidence_threshold: Optional[float] = Query(
+        None, 
+        ge=0.0, 
+        le=1.0, 
+        description="Umbral de confianza para las detecciones (0.0-1.0)"
+    ),
+    iou_threshold: Optional[float] = Query(
+        None, 
+        ge=0.0, 
+        le=1.0, 
+        description="Umbral de IoU para eliminación de detecciones duplicadas (0.0-1.0)"
+    ),
+    detail: str = Query(
+        "full",
+        pattern="^(summary|full)$",
+        description="Nivel de detalle: 'full' incluye cada detección, 'summary' solo el resumen por instrumento"
+    ),
+    model: Optional[str] = Query(
+        None,
+        description="Modelo del registro (YOLO_MODELS) o 'cascade'; por defecto la cascada si está habilitada"
+    ),
+    expected: Optional[str] = Form(
+        None,
+        description='Instrumentos esperados como JSON codigo -> cantidad, p. ej. {"BISP-001": 2}'
+    ),
+    expected_set_id: Optional[str] = Query(
+        None,
+        description="Set del catálogo (EXPECTED_SETS_PATH) contra el cual comparar"
+    ),
+    accept: Optional[str] = Header(None)
+):
+    """
+    Detectar instrumentos quirúrgicos en varias imágenes de una misma bandeja
+    
+    - **files**: Imágenes en formato JPG, PNG, BMP, TIFF o WEBP (máximo 10 por defecto)
+    - **confidence_threshold**: Umbral de confianza (opcional, por defecto 0.5)
+    - **iou_threshold**: Umbral de IoU (opcional, por defecto 0.45)
+    - **detail**: `full` (por defecto) o `summary` para omitir las detecciones por caja
+    - **model**: modelo a usar (`default`, un nombre de `YOLO_MODELS` o `cascade`)
+    - **expected** / **expected_set_id**: lista esperada para comparar en la misma llamada
+    - **Accept**: `application/vnd.eivai.columnar+json` o `application/msgpack` para
+      recibir las detecciones en columnas (cajas, confianzas y clases) con la
+      tabla de instrumentos una sola vez
+    
+    Retorna:
+    - Resultados por imagen (detecciones, resumen e información del archivo)
+    - Resumen combinado con la cantidad de cada tipo de instrumento en la bandeja
+    - `set_check` de la bandeja completa (si se indicó lo esperado)
+    """
+    response_format = negotiate_format(accept)
+    
+    try:
+        results = await yolo_controller.detect_instruments_from_files(
+            files=files,
+            confidence_threshold=confidence_threshold,
+            iou_threshold=iou_threshold,
+            detail=detail_for_format(detail, response_format),
+            model=model,
+            expected=expected,
+            expected_set_id=expected_set_id
         )
-        return JSONResponse(content=results, status_code=200)
+        return render_response(results, response_format)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/jobs", response_model=Dict[str, Any], status_code=202)
+async def submit_job(
+    files: List[UploadFile] = File(..., description="Imágenes a procesar en segundo plano"),
+    confidence_threshold: Optional[float] = Query(
+        None, 
+        ge=0.0, 
+        le=1.0, 
+        description="Umbral de confianza para las detecciones (0.0-1.0)"
+    ),
+    iou_threshold: Optional[float] = Query(
+        None, 
+        ge=0.0, 
+        le=1.0, 
+        description="Umbral de IoU para eliminación de detecciones duplicadas (0.0-1.0)"
+    ),
+    detail: str = Query(
+        "full",
+        pattern="^(summary|full)$",
+        description="Nivel de detalle de los resultados por imagen"
+    ),
+    model: Optional[str] = Query(
+        None,
+        description="Modelo del registro (YOLO_MODELS) o 'cascade'"
+    ),
+    webhook_url: Optional[str] = Form(
+        None,
+        description="URL que recibe un POST con el estado final del trabajo"
+    )
+):
+    """
+    Encolar un trabajo de detección asíncrono (reprocesamiento masivo)
+    
+    La respuesta (202) incluye el `job_id`; el avance se consulta con
+    `GET /jobs/{job_id}` o se recibe en `webhook_url` al terminar. Los trabajos
+    persisten en la cola SQLite y los procesan los procesos de trabajo
+    (`JOBS_WORKERS` o `scripts/job_worker.py`).
+    
+    - **files**: Imágenes (máximo `JOBS_MAX_FILES`, 1000 por defecto)
+    - **webhook_url**: notificación opcional al terminar
+    """
+    job = await yolo_controller.submit_job(
+        files=files,
+        confidence_threshold=confidence_threshold,
+        iou_threshold=iou_threshold,
+        detail=detail,
+        model=model,
+        webhook_url=webhook_url
+    )
+    return JSONResponse(content=job, status_code=202)
+
+@router.get("/jobs/{job_id}", response_model=Dict[str, Any])
+async def get_job(
+    job_id: str,
+    include_results: bool = Query(False, description="Incluir el resultado de cada imagen")
+):
+    """
+    Consultar el estado y el progreso de un trabajo
+    
+    Estados: `queued`, `running`, `completed`, `failed`, `cancelled`. El
+    resumen combinado está disponible al completarse el trabajo.
+    """
+    return await yolo_controller.get_job(job_id, include_results)
+
+@router.delete("/jobs/{job_id}", response_model=Dict[str, Any])
+async def cancel_job(job_id: str):
+    """
+    Cancelar un trabajo en cola o en curso
+    
+    Un trabajo en curso se detiene al terminar el grupo de imágenes actual.
+    """
+    return await yolo_controller.cancel_job(job_id)
+
+class UnscoredRequest(BaseModel):
+    """Consulta de imágenes pendientes de procesar con el modelo actual"""
+    
+    image_hashes: List[str] = Field(..., max_length=100000, description="Hashes blake2b (20 bytes) del contenido")
+    model: Optional[str] = Field(None, description="Modelo del registro o 'cascade'")
+    confidence_threshold: Optional[float] = Field(None, ge=0.0, le=1.0)
+    iou_threshold: Optional[float] = Field(None, ge=0.0, le=1.0)
+
+@router.post("/results/unscored", response_model=Dict[str, Any])
+async def find_unscored(request: UnscoredRequest):
+    """
+    Filtrar las imágenes que aún no tienen resultado con el modelo actual
+    
+    Permite reprocesar de forma incremental tras cambiar los pesos: solo se
+    envían (p. ej. como trabajo en `/jobs`) las imágenes devueltas en `unscored`.
+    Con umbrales, un resultado previo solo cuenta si usó esos mismos umbrales.
+    """
+    return await yolo_controller.find_unscored(
+        image_hashes=request.image_hashes,
+        model=request.model,
+        confidence_threshold=request.confidence_threshold,
+        iou_threshold=request.iou_threshold
+    )
+
+@router.get("/results/models", response_model=Dict[str, Any])
+async def get_result_models():
+    """
+    Listar los modelos (weights_id) con resultados en el historial
+    
+    Incluye imágenes procesadas, objetos detectados y tiempo promedio de
+    inferencia por modelo.
+    """
+    return await yolo_controller.get_result_models()
+
+@router.get("/results/drift", response_model=Dict[str, Any])
+async def get_drift(
+    baseline: str = Query(..., description="weights_id del modelo de referencia"),
+    candidate: Optional[str] = Query(None, description="weights_id a evaluar (por defecto el actual)"),
+    confidence_threshold: Optional[float] = Query(None, ge=0.0, le=1.0),
+    iou_threshold: Optional[float] = Query(None, ge=0.0, le=1.0)
+):
+    """
+    Comparar los conteos de dos modelos sin volver a ejecutar la inferencia
+    
+    Usa el resultado más reciente de cada imagen procesada por ambos modelos y
+    reporta imágenes con cambios, diferencia promedio y totales por instrumento.
+    """
+    return await yolo_controller.get_drift(baseline, candidate, confidence_threshold, iou_threshold)
+
+@router.get("/results/{image_hash}", response_model=Dict[str, Any])
+async def get_result_history(image_hash: str):
+    """
+    Obtener el historial de resultados de una imagen por hash de contenido
+    """
+    return await yolo_controller.get_result_history(image_hash)
+
+@router.websocket("/stream")
+async def stream_detection(
+    websocket: WebSocket,
+    confidence_threshold: Optional[float] = Query(None, ge=0.0, le=1.0),
+    iou_threshold: Optional[float] = Query(None, ge=0.0, le=1.0),
+    smoothing: Optional[float] = Query(None, gt=0.0, le=1.0)
+):
+    """
+    Detección continua sobre un stream de cuadros (cámara sobre la bandeja)
+    
+    - Enviar cada cuadro como mensaje binario (JPEG/PNG)
+    - Bajo carga se procesa solo el cuadro más reciente y el resto se omite
+    - Por cada cuadro procesado se recibe un JSON con el resumen del cuadro y
+      las cantidades por instrumento suavizadas en el tiempo
+    - **smoothing**: peso del cuadro actual en el suavizado (1.0 = sin suavizado)
+    """
+    await yolo_controller.stream_detection(
+        websocket,
+        confidence_threshold=confidence_threshold,
+        iou_threshold=iou_threshold,
+        smoothing=smoothing
+    )
+
 @router.get("/model/info", response_model=Dict[str, Any])
 async def get_model_info():
     """
@@ -58,13 +319,42 @@ async def get_model_info():
     - Instrumentos soportados
     """
     try:
-        info = yolo_controller.get_model_info()
+        info = await yolo_controller.get_model_info()
         return JSONResponse(content=info, status_code=200)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class ModelSwapRequest(BaseModel):
+    """Solicitud de reemplazo de los pesos del modelo"""
+    model_config = {"protected_namespaces": ()}
+    
+    model_path: str = Field(..., description="Ruta de los nuevos pesos (.pt) en el servidor")
+
+@router.post("/admin/model", response_model=Dict[str, Any])
+async def swap_model(
+    request: ModelSwapRequest,
+    x_admin_key: Optional[str] = Header(None, description="Clave de administración (ADMIN_API_KEY)")
+):
+    """
+    Reemplazar los pesos del modelo sin reiniciar el servicio
+    
+    El nuevo modelo se carga y se calienta en paralelo al actual; el cambio es
+    atómico y las inferencias en curso terminan con el modelo anterior.
+    
+    - **model_path**: Ruta de los nuevos pesos en el servidor
+    
+    Deshabilitado (403) si no se configura ADMIN_API_KEY.
+    """
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Administración deshabilitada: configure ADMIN_API_KEY")
+    if x_admin_key != settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=401, detail="Clave de administración inválida")
+    
+    info = await yolo_controller.swap_model(request.model_path)
+    return JSONResponse(content=info, status_code=200)
+
 @router.get("/instruments", response_model=Dict[str, Any])
 async def get_supported_instruments():
     """
@@ -87,8 +377,11 @@ async def health_check():
     """
     Verificar el estado de salud del servicio
     
+    Retorna 503 mientras el modelo se calienta al iniciar, para que el balanceador
+    solo envíe tráfico a instancias listas.
+    
     Retorna:
-    - Estado del servicio (healthy/unhealthy)
+    - Estado del servicio (healthy/warming/unhealthy)
     - Mensaje descriptivo
     - Versión del servicio
     """
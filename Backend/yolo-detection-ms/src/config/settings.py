@@ -21,10 +21,117 @@ class Settings:
     YOLO_MODEL_PATH: str = os.getenv("YOLO_MODEL_PATH", "yolov8n.pt")
     CONFIDENCE_THRESHOLD: float = float(os.getenv("CONFIDENCE_THRESHOLD", 0.5))
     IOU_THRESHOLD: float = float(os.getenv("IOU_THRESHOLD", 0.45))
+    YOLO_IMGSZ: int = int(os.getenv("YOLO_IMGSZ", 640))
+    
+    # Carga del modelo: "background" (al iniciar, sin bloquear), "lazy" (primera inferencia) o "eager"
+    MODEL_LOAD_MODE: str = os.getenv("MODEL_LOAD_MODE", "background").lower()
+    
+    # Clave (X-Admin-Key) para los endpoints de administración (vacía = endpoints deshabilitados, 403)
+    ADMIN_API_KEY: str = os.getenv("ADMIN_API_KEY", "")
+    
+    # Backend de inferencia: "pytorch", "onnx", "openvino" o "torchscript"
+    YOLO_BACKEND: str = os.getenv("YOLO_BACKEND", "pytorch").lower()
+    YOLO_INT8: bool = os.getenv("YOLO_INT8", "False").lower() == "true"
+    YOLO_INT8_CALIBRATION_DATA: str = os.getenv("YOLO_INT8_CALIBRATION_DATA", "")
+    
+    # Decodificación reducida al tamaño de entrada del modelo (0 = YOLO_IMGSZ)
+    PREPROCESS_DOWNSCALE_ENABLED: bool = os.getenv("PREPROCESS_DOWNSCALE_ENABLED", "True").lower() == "true"
+    PREPROCESS_TARGET_SIDE: int = int(os.getenv("PREPROCESS_TARGET_SIDE", 0))
+    
+    # Inferencia por ventanas solapadas para fotos de alta resolución
+    SLICED_TILE_SIZE: int = int(os.getenv("SLICED_TILE_SIZE", 640))
+    SLICED_OVERLAP: float = float(os.getenv("SLICED_OVERLAP", 0.2))
+    SLICED_MERGE_THRESHOLD: float = float(os.getenv("SLICED_MERGE_THRESHOLD", 0.5))
+    SLICED_INCLUDE_FULL_IMAGE: bool = os.getenv("SLICED_INCLUDE_FULL_IMAGE", "True").lower() == "true"
+    SLICED_AUTO_MIN_SIDE: int = int(os.getenv("SLICED_AUTO_MIN_SIDE", 0))  # 0 = solo bajo demanda
+    
+    # Modelos adicionales con nombre ("rapido=yolov8n.pt,preciso=yolov8m.pt"); el
+    # modelo de YOLO_MODEL_PATH se registra siempre como "default"
+    YOLO_MODELS: dict = {
+        name.strip(): path.strip()
+        for name, _, path in (
+            entry.partition("=") for entry in os.getenv("YOLO_MODELS", "").split(",") if "=" in entry
+        )
+    }
+    
+    # Cascada: el modelo rápido procesa todo y solo lo dudoso se escala al preciso
+    CASCADE_ENABLED: bool = os.getenv("CASCADE_ENABLED", "False").lower() == "true"
+    CASCADE_FAST_MODEL: str = os.getenv("CASCADE_FAST_MODEL", "")
+    CASCADE_ACCURATE_MODEL: str = os.getenv("CASCADE_ACCURATE_MODEL", "default")
+    CASCADE_MIN_CONFIDENCE: float = float(os.getenv("CASCADE_MIN_CONFIDENCE", 0.25))
+    CASCADE_ACCEPT_CONFIDENCE: float = float(os.getenv("CASCADE_ACCEPT_CONFIDENCE", 0.7))
+    CASCADE_ESCALATION: str = os.getenv("CASCADE_ESCALATION", "regions")  # regions | image
+    CASCADE_REGION_PADDING: float = float(os.getenv("CASCADE_REGION_PADDING", 0.25))
+    
+    # Calentamiento del modelo al iniciar (la salud reporta "warming" hasta terminar)
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "True").lower() == "true"
+    WARMUP_RUNS: int = int(os.getenv("WARMUP_RUNS", 2))
+    WARMUP_BATCH_SIZES: list = [
+        int(size) for size in os.getenv("WARMUP_BATCH_SIZES", "1,4").split(",") if size.strip()
+    ]
+    
+    # Configuración de micro-batching (agrupa solicitudes concurrentes en un solo lote)
+    BATCHING_ENABLED: bool = os.getenv("BATCHING_ENABLED", "True").lower() == "true"
+    BATCH_MAX_SIZE: int = int(os.getenv("BATCH_MAX_SIZE", 8))
+    BATCH_MAX_WAIT_MS: float = float(os.getenv("BATCH_MAX_WAIT_MS", 10))
+    BATCH_RESULT_TIMEOUT_SECONDS: float = float(os.getenv("BATCH_RESULT_TIMEOUT_SECONDS", 60))
+    
+    # Configuración del ejecutor de inferencia ("thread" o "process")
+    INFERENCE_EXECUTOR: str = os.getenv("INFERENCE_EXECUTOR", "thread").lower()
+    INFERENCE_WORKERS: int = int(os.getenv("INFERENCE_WORKERS", 8))
+    INFERENCE_MAX_QUEUE: int = int(os.getenv("INFERENCE_MAX_QUEUE", 32))
+    INFERENCE_RETRY_AFTER_SECONDS: int = int(os.getenv("INFERENCE_RETRY_AFTER_SECONDS", 2))
+    TORCH_NUM_THREADS: int = int(os.getenv("TORCH_NUM_THREADS", 0))  # 0 = valor por defecto de torch
+    
+    # Presupuesto de CPU por proceso (ver scripts/autotune_threads.py)
+    SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", 1))  # Workers de uvicorn
+    TORCH_INTEROP_THREADS: int = int(os.getenv("TORCH_INTEROP_THREADS", 0))  # 0 = valor por defecto de torch
+    OPENCV_NUM_THREADS: int = int(os.getenv("OPENCV_NUM_THREADS", -1))  # -1 = por defecto, 0 = sin hilos propios
+    MAX_CONCURRENT_INFERENCES: int = int(os.getenv("MAX_CONCURRENT_INFERENCES", 0))  # 0 = sin límite
+    # Con TORCH_NUM_THREADS=0, repartir los núcleos entre los procesos que ejecutan el modelo
+    CPU_THREADS_AUTO: bool = os.getenv("CPU_THREADS_AUTO", "False").lower() == "true"
+    
+    # Catálogo JSON de sets esperados (set id -> codigo -> cantidad) para ?expected_set_id
+    EXPECTED_SETS_PATH: str = os.getenv("EXPECTED_SETS_PATH", "")
+    
+    # Endpoint /metrics en formato Prometheus
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+    
+    # Configuración de la caché de resultados
+    RESULT_CACHE_ENABLED: bool = os.getenv("RESULT_CACHE_ENABLED", "True").lower() == "true"
+    RESULT_CACHE_MAX_ENTRIES: int = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 256))
+    RESULT_CACHE_TTL_SECONDS: float = float(os.getenv("RESULT_CACHE_TTL_SECONDS", 600))
+    
+    # Historial persistente de resultados (reprocesamiento incremental y deriva entre modelos)
+    RESULT_STORE_ENABLED: bool = os.getenv("RESULT_STORE_ENABLED", "True").lower() == "true"
+    RESULT_STORE_PATH: str = os.getenv("RESULT_STORE_PATH", os.path.join("results", "detections.db"))
     
     # Configuración de archivos
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "temp_uploads")
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", 10 * 1024 * 1024))  # 10MB
+    MAX_BATCH_FILES: int = int(os.getenv("MAX_BATCH_FILES", 10))  # Imágenes por solicitud en /detect/batch
+    
+    # Cola persistente de trabajos de detección (/jobs)
+    JOBS_ENABLED: bool = os.getenv("JOBS_ENABLED", "False").lower() == "true"  # Inicia JOBS_WORKERS procesos con su propio modelo
+    JOBS_DIR: str = os.getenv("JOBS_DIR", "jobs")  # Imágenes pendientes de cada trabajo
+    JOBS_DB_PATH: str = os.getenv("JOBS_DB_PATH", os.path.join(JOBS_DIR, "jobs.db"))
+    JOBS_WORKERS: int = int(os.getenv("JOBS_WORKERS", 1))  # Procesos iniciados con la API (0 = solo externos)
+    JOBS_BATCH_SIZE: int = int(os.getenv("JOBS_BATCH_SIZE", 16))
+    JOBS_MAX_FILES: int = int(os.getenv("JOBS_MAX_FILES", 1000))
+    JOBS_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOBS_POLL_INTERVAL_SECONDS", 1.0))
+    JOBS_STALE_SECONDS: float = float(os.getenv("JOBS_STALE_SECONDS", 300))
+    JOBS_KEEP_IMAGES: bool = os.getenv("JOBS_KEEP_IMAGES", "False").lower() == "true"
+    JOBS_WEBHOOK_TIMEOUT_SECONDS: float = float(os.getenv("JOBS_WEBHOOK_TIMEOUT_SECONDS", 10))
+    JOBS_WEBHOOK_RETRIES: int = int(os.getenv("JOBS_WEBHOOK_RETRIES", 3))
+    JOBS_WEBHOOK_SECRET: str = os.getenv("JOBS_WEBHOOK_SECRET", "")
+    # Hosts permitidos para los webhooks ("hooks.ejemplo.com,ejemplo.org"; incluye subdominios).
+    # Sin lista se aceptan solo hosts que resuelven a direcciones públicas
+    JOBS_WEBHOOK_ALLOWED_HOSTS: list = [
+        host.strip().lower() for host in os.getenv("JOBS_WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()
+    ]
+    
+    # Configuración del modo streaming (WebSocket)
+    STREAM_SMOOTHING_ALPHA: float = float(os.getenv("STREAM_SMOOTHING_ALPHA", 0.3))
     ALLOWED_EXTENSIONS: set = {"jpg", "jpeg", "png", "bmp", "tiff", "webp"}
     
     # Mapeo de instrumentos quirúrgicos
@@ -40,6 +147,6 @@ class Settings:
         8: {"codigo": "ASPI-001", "nombre": "Aspirador quirúrgico", "descripcion": "Tubo de aspiración quirúrgica"},
         9: {"codigo": "GASA-001", "nombre": "Gasas estériles", "descripcion": "Paquete de gasas estériles 4x4"}
     }
-
+    
 # Instancia global de configuración
 settings = Settings()
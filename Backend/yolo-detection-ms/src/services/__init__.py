@@ -1,3 +1,13 @@
 from .yolo_service import YOLODetectionService, yolo_service
+from .inference_executor import InferenceExecutor, InferenceQueueFullError, inference_executor
+from .result_cache import DetectionResultCache, result_cache
 
-__all__ = ["YOLODetectionService", "yolo_service"]
+__all__ = [
+    "YOLODetectionService",
+    "yolo_service",
+    "InferenceExecutor",
+    "InferenceQueueFullError",
+    "inference_executor",
+    "DetectionResultCache",
+    "result_cache"
+]
@@ -0,0 +1,184 @@
+import threading
+import time
+import queue
+import logging
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """
+    Agrupa solicitudes concurrentes en lotes para ejecutar una sola pasada del modelo
+
+    Cada solicitud se encola con una clave (por ejemplo los umbrales de confianza
+    e IoU); solo se agrupan en el mismo lote las solicitudes que comparten clave.
+    Un hilo de fondo espera hasta `max_wait_ms` o hasta completar `max_batch_size`
+    elementos, ejecuta `batch_fn` y entrega cada resultado a su solicitud.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[Hashable, List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        name: str = "micro-batcher"
+    ):
+        """
+        Inicializar el agrupador
+
+        Args:
+            batch_fn: Función que recibe (clave, elementos) y retorna un resultado por elemento
+            max_batch_size: Tamaño máximo del lote
+            max_wait_ms: Tiempo máximo de espera para completar un lote (milisegundos)
+            name: Nombre del hilo de trabajo
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue: "queue.Queue[Optional[Tuple[Hashable, Any, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    def submit(self, item: Any, key: Hashable = None) -> Future:
+        """
+        Encolar un elemento para el próximo lote
+
+        Args:
+            item: Elemento a procesar
+            key: Clave de agrupación; solo se combinan elementos con la misma clave
+
+        Returns:
+            Future que se resuelve con el resultado del elemento
+        """
+        self._ensure_started()
+        future: Future = Future()
+
+        # Bajo el lock de stop: ningún elemento queda encolado detrás de la señal de parada
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("El agrupador de lotes está detenido")
+            self._queue.put((key, item, future))
+        return future
+
+    @property
+    def pending(self) -> int:
+        """Elementos en cola esperando a formar un lote"""
+        return self._queue.qsize()
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """
+        Detener el hilo de trabajo después de procesar lo pendiente
+
+        Los elementos que siguen en cola al agotarse `timeout` (por ejemplo si el
+        hilo está ocupado en un lote lento) se resuelven con error en lugar de
+        quedar esperando indefinidamente.
+        """
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(None)
+
+        if thread is not None:
+            thread.join(timeout)
+        self._fail_pending()
+
+    def _fail_pending(self) -> None:
+        """Resolver con error los elementos que quedaron en cola"""
+        failed = 0
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if entry is not None and entry[2].set_running_or_notify_cancel():
+                entry[2].set_exception(RuntimeError("El agrupador de lotes se detuvo antes de procesar la solicitud"))
+                failed += 1
+
+        if failed:
+            logger.warning(f"{failed} solicitudes sin procesar al detener el agrupador de lotes")
+
+    def _ensure_started(self) -> None:
+        """Iniciar el hilo de trabajo en el primer uso"""
+        if self._thread is not None:
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect(self, first: Tuple[Hashable, Any, Future]) -> Tuple[List[Tuple[Hashable, Any, Future]], bool]:
+        """
+        Reunir elementos hasta llenar el lote o agotar la ventana de espera
+
+        Returns:
+            Elementos reunidos y si se recibió la señal de parada
+        """
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if entry is None:
+                return batch, True
+            batch.append(entry)
+
+        return batch, False
+
+    def _run(self) -> None:
+        """Bucle principal del hilo de trabajo"""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            batch, stop_requested = self._collect(first)
+
+            # Agrupar por clave conservando el orden de llegada
+            groups: Dict[Hashable, List[Tuple[Any, Future]]] = {}
+            for key, item, future in batch:
+                groups.setdefault(key, []).append((item, future))
+
+            for key, entries in groups.items():
+                self._execute(key, entries)
+
+            if stop_requested:
+                return
+
+    def _execute(self, key: Hashable, entries: List[Tuple[Any, Future]]) -> None:
+        """Ejecutar un lote y distribuir los resultados"""
+        # Descartar solicitudes canceladas antes de ejecutar
+        active = [(item, future) for item, future in entries if future.set_running_or_notify_cancel()]
+        if not active:
+            return
+
+        items = [item for item, _ in active]
+        futures = [future for _, future in active]
+
+        try:
+            results = list(self.batch_fn(key, items))
+            if len(results) != len(items):
+                raise RuntimeError(
+                    f"El lote retornó {len(results)} resultados para {len(items)} elementos"
+                )
+        except Exception as e:
+            logger.error(f"Error ejecutando lote de {len(items)} elementos: {str(e)}")
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        for future, result in zip(futures, results):
+            future.set_result(result)
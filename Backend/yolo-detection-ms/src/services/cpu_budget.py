@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+def inference_processes() -> int:
+    """
+    Procesos que ejecutan el modelo en la máquina con la configuración actual
+
+    Cada worker del servidor tiene su propio modelo (o `INFERENCE_WORKERS`
+    procesos en modo "process") y, con la cola habilitada (`JOBS_ENABLED`),
+    inicia además `JOBS_WORKERS` procesos de la cola de trabajos.
+    """
+    per_server = settings.INFERENCE_WORKERS if settings.INFERENCE_EXECUTOR == "process" else 1
+    job_workers = settings.JOBS_WORKERS if settings.JOBS_ENABLED else 0
+    return max(1, settings.SERVER_WORKERS * (per_server + job_workers))
+
+def resolve_intra_op_threads(requested: Optional[int] = None) -> int:
+    """
+    Hilos intra-op de torch por proceso
+
+    Args:
+        requested: Valor explícito (por defecto TORCH_NUM_THREADS)
+
+    Returns:
+        El valor explícito si es positivo; con CPU_THREADS_AUTO, los núcleos
+        repartidos entre los procesos que ejecutan el modelo; si no, 0 (valor
+        por defecto de torch)
+    """
+    requested = settings.TORCH_NUM_THREADS if requested is None else requested
+    if requested > 0:
+        return requested
+    if settings.CPU_THREADS_AUTO:
+        return max(1, (os.cpu_count() or 1) // inference_processes())
+    return 0
+
+def configure_threads(
+    intra_op: int = 0,
+    inter_op: Optional[int] = None,
+    opencv: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    Aplicar el presupuesto de hilos del proceso a torch y OpenCV
+
+    torch solo admite fijar los hilos inter-op antes de su primer trabajo en
+    paralelo; si ya no es posible se conserva el valor actual.
+
+    Args:
+        intra_op: Hilos intra-op de torch (0 = sin cambios)
+        inter_op: Hilos inter-op de torch (0 = sin cambios; por defecto TORCH_INTEROP_THREADS)
+        opencv: Hilos de OpenCV (-1 = sin cambios, 0 = sin hilos propios;
+            por defecto OPENCV_NUM_THREADS)
+
+    Returns:
+        Hilos efectivos tras la configuración
+    """
+    inter_op = settings.TORCH_INTEROP_THREADS if inter_op is None else inter_op
+    opencv = settings.OPENCV_NUM_THREADS if opencv is None else opencv
+
+    try:
+        import torch
+        if intra_op > 0 and torch.get_num_threads() != intra_op:
+            torch.set_num_threads(intra_op)
+        if inter_op > 0 and torch.get_num_interop_threads() != inter_op:
+            torch.set_num_interop_threads(inter_op)
+    except RuntimeError as e:
+        logger.warning(f"No se pudo fijar los hilos inter-op de torch: {str(e)}")
+    except Exception as e:
+        logger.warning(f"No se pudo configurar el número de hilos de torch: {str(e)}")
+
+    if opencv >= 0:
+        try:
+            import cv2
+            cv2.setNumThreads(opencv)
+        except Exception as e:
+            logger.warning(f"No se pudo configurar el número de hilos de OpenCV: {str(e)}")
+
+    return current_threads()
+
+def current_threads() -> Dict[str, int]:
+    """Hilos actualmente configurados en torch y OpenCV"""
+    threads = {"intra_op": 0, "inter_op": 0, "opencv": 0}
+    try:
+        import torch
+        threads["intra_op"] = torch.get_num_threads()
+        threads["inter_op"] = torch.get_num_interop_threads()
+    except Exception:
+        pass
+
+    try:
+        import cv2
+        threads["opencv"] = cv2.getNumThreads()
+    except Exception:
+        pass
+
+    return threads
+
+class InferenceSlots:
+    """
+    Límite de pasadas del modelo simultáneas por proceso
+
+    Cada modelo ya serializa sus llamadas; este límite acota el total entre
+    todos los modelos del proceso (registro y cascada), y con ello la memoria
+    de activaciones y los hilos de torch en uso a la vez.
+    """
+
+    def __init__(self, limit: int = 0):
+        """
+        Args:
+            limit: Pasadas simultáneas permitidas (0 = sin límite)
+        """
+        self.limit = max(0, int(limit))
+        self._semaphore = threading.BoundedSemaphore(self.limit) if self.limit else None
+        self._active = 0
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> int:
+        """Pasadas del modelo en curso"""
+        return self._active
+
+    def __enter__(self) -> "InferenceSlots":
+        if self._semaphore is not None:
+            self._semaphore.acquire()
+        with self._lock:
+            self._active += 1
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        with self._lock:
+            self._active -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Límite configurado y pasadas en curso"""
+        return {"limit": self.limit, "active": self._active}
+
+# Límite global de pasadas simultáneas del proceso
+inference_slots = InferenceSlots(settings.MAX_CONCURRENT_INFERENCES)
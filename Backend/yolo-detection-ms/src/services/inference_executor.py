@@ -0,0 +1,297 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..config.settings import settings
+from .cpu_budget import configure_threads, resolve_intra_op_threads
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+class InferenceQueueFullError(Exception):
+    """La cola de inferencia alcanzó su capacidad máxima"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+# Servicio propio de cada proceso de trabajo (modo "process")
+_worker_service = None
+
+def _init_process_worker(torch_threads: int, model_path: Optional[str]) -> None:
+    """Inicializar un proceso de trabajo con su propia copia del modelo"""
+    global _worker_service
+    configure_threads(torch_threads)
+
+    from .yolo_service import yolo_service
+
+    # Cada proceso atiende una inferencia a la vez; el batching no aporta
+    yolo_service.disable_batching()
+    if model_path:
+        yolo_service.model_path = model_path
+    yolo_service.prepare()
+    _worker_service = yolo_service
+
+def _process_worker_ready() -> str:
+    """Estado de preparación del modelo del proceso de trabajo"""
+    return _worker_service.readiness if _worker_service is not None else "unloaded"
+
+def _call_in_process_worker(method_name: str, args: tuple, kwargs: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Ejecutar un método del servicio YOLO dentro del proceso de trabajo
+
+    Returns:
+        Tupla (resultado, métricas registradas en el proceso desde la llamada anterior)
+    """
+    result = getattr(_worker_service, method_name)(*args, **kwargs)
+    return result, metrics.registry.drain()
+
+def _merge_worker_metrics(future: Future) -> None:
+    """Sumar al registro del proceso principal las métricas de una llamada terminada"""
+    if not future.cancelled() and future.exception() is None:
+        metrics.registry.merge(future.result()[1])
+
+class InferenceExecutor:
+    """
+    Ejecutor acotado para la inferencia YOLO fuera del event loop
+
+    En modo "thread" las llamadas se ejecutan en un pool de hilos que comparte el
+    modelo del proceso (y su micro-batching). En modo "process" cada proceso del
+    pool carga su propia copia del modelo. La admisión está limitada a
+    `workers + max_queue` llamadas en curso; por encima se rechaza con
+    InferenceQueueFullError para que el cliente reintente más tarde.
+    """
+
+    def __init__(
+        self,
+        mode: str = "thread",
+        workers: int = 4,
+        max_queue: int = 16,
+        torch_threads: int = 0,
+        retry_after: int = 2
+    ):
+        """
+        Inicializar el ejecutor
+
+        Args:
+            mode: "thread" o "process"
+            workers: Número de hilos o procesos de trabajo
+            max_queue: Llamadas adicionales que pueden esperar en cola
+            torch_threads: Hilos intra-op de torch por trabajador (0 = por defecto)
+            retry_after: Segundos sugeridos al cliente cuando la cola está llena
+        """
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Modo de ejecutor no soportado: {mode}")
+
+        self.mode = mode
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self.torch_threads = int(torch_threads)
+        self.retry_after = max(1, int(retry_after))
+
+        self._executor: Optional[Executor] = None
+        self._model_path: Optional[str] = None
+        # Preparación del modelo de los procesos de trabajo (solo modo "process")
+        self.readiness = "unloaded"
+        self.last_error: Optional[str] = None
+        self._pending = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        """Número máximo de llamadas admitidas simultáneamente"""
+        return self.workers + self.max_queue
+
+    def _create_executor(self) -> Executor:
+        """Crear el pool de trabajo del modo configurado"""
+        if self.mode == "process":
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(self.torch_threads, self._model_path)
+            )
+        configure_threads(self.torch_threads)
+        return ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix="yolo-inference"
+        )
+
+    def _get_executor(self) -> Executor:
+        """Crear el pool en el primer uso"""
+        if self._executor is None:
+            self._executor = self._create_executor()
+            logger.info(f"Ejecutor de inferencia iniciado: modo={self.mode}, workers={self.workers}")
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Ejecutar una llamada de inferencia en el pool
+
+        En modo "process", `fn` debe ser un método del servicio YOLO; se invoca
+        por nombre sobre el servicio de cada proceso de trabajo.
+
+        Args:
+            fn: Función o método a ejecutar
+            *args: Argumentos posicionales
+            **kwargs: Argumentos con nombre
+
+        Returns:
+            Resultado de la llamada
+
+        Raises:
+            InferenceQueueFullError: Si se supera la capacidad de admisión
+        """
+        # La plaza se libera al terminar la llamada en el pool (no al cancelarse
+        # la espera), así que el contador también cambia desde sus hilos
+        with self._lock:
+            if self._pending >= self.capacity:
+                self._rejected += 1
+                raise InferenceQueueFullError(
+                    f"Cola de inferencia llena ({self._pending}/{self.capacity})",
+                    retry_after=self.retry_after
+                )
+            self._pending += 1
+
+        try:
+            executor = self._get_executor()
+
+            if self.mode == "process":
+                call = functools.partial(_call_in_process_worker, fn.__name__, args, kwargs)
+            else:
+                call = functools.partial(fn, *args, **kwargs)
+
+            future = executor.submit(call)
+        except BaseException:
+            self._release()
+            raise
+
+        # Si el cliente se desconecta, la llamada ya iniciada sigue ocupando el
+        # pool hasta terminar y su plaza se cuenta hasta entonces
+        future.add_done_callback(self._release)
+        if self.mode != "process":
+            return await asyncio.wrap_future(future)
+
+        # Las métricas se suman aunque el cliente ya no espere el resultado
+        future.add_done_callback(_merge_worker_metrics)
+        result, _ = await asyncio.wrap_future(future)
+        return result
+
+    def _release(self, future: Optional[Future] = None) -> None:
+        """Liberar la plaza de una llamada terminada"""
+        with self._lock:
+            self._pending -= 1
+
+    async def _probe(self, executor: Executor) -> List[str]:
+        """
+        Estado del modelo de cada proceso de un pool
+
+        Se envía una consulta por proceso antes de que termine ninguna: el pool
+        lanza un proceso por tarea mientras no haya procesos libres, y cada uno
+        carga y calienta su modelo al iniciar.
+        """
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*[
+            loop.run_in_executor(executor, _process_worker_ready) for _ in range(self.workers)
+        ])
+
+    async def prepare(self) -> bool:
+        """
+        Iniciar los procesos de trabajo y esperar a que su modelo quede listo
+
+        Solo aplica en modo "process"; en modo "thread" el modelo es el del
+        proceso principal (ver YOLODetectionService.prepare).
+
+        Returns:
+            True si todos los procesos quedaron listos
+        """
+        if self.mode != "process":
+            return True
+
+        self.readiness = "loading"
+        try:
+            states = await self._probe(self._get_executor())
+        except Exception as e:
+            self.readiness = "error"
+            self.last_error = str(e)
+            logger.error(f"Error iniciando los procesos de inferencia: {str(e)}")
+            return False
+
+        if any(state != "ready" for state in states):
+            self.readiness = "error"
+            self.last_error = f"Procesos de inferencia no listos: {states}"
+            logger.error(self.last_error)
+            return False
+
+        self.readiness = "ready"
+        self.last_error = None
+        logger.info(f"Procesos de inferencia listos: {len(states)}")
+        return True
+
+    async def reload(self, model_path: str) -> None:
+        """
+        Reemplazar los procesos de trabajo por otros con un nuevo modelo
+
+        Solo aplica en modo "process" (en modo "thread" el modelo es compartido).
+        El pool nuevo se crea y todos sus procesos cargan y calientan el modelo
+        antes del cambio, mientras el pool anterior sigue atendiendo; después los
+        procesos anteriores terminan las inferencias en curso y salen.
+
+        Args:
+            model_path: Ruta de los nuevos pesos
+
+        Raises:
+            RuntimeError: Si algún proceso nuevo no queda listo (se conserva el pool anterior)
+        """
+        previous_path = self._model_path
+        self._model_path = model_path
+        if self.mode != "process" or self._executor is None:
+            return
+
+        replacement = self._create_executor()
+        try:
+            states = await self._probe(replacement)
+            if any(state != "ready" for state in states):
+                raise RuntimeError(f"Procesos de inferencia no listos con el modelo {model_path}: {states}")
+        except BaseException:
+            self._model_path = previous_path
+            replacement.shutdown(wait=False, cancel_futures=True)
+            raise
+
+        previous = self._executor
+        self._executor = replacement
+        self.readiness = "ready"
+        self.last_error = None
+        previous.shutdown(wait=False)
+        logger.info(f"Procesos de inferencia reemplazados con el modelo {model_path} ya calentado")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obtener el estado actual del ejecutor"""
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "readiness": self.readiness if self.mode == "process" else None,
+            "capacity": self.capacity,
+            "pending": self._pending,
+            "rejected": self._rejected
+        }
+
+    def shutdown(self) -> None:
+        """Detener el pool de trabajo"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Instancia global del ejecutor
+inference_executor = InferenceExecutor(
+    mode=settings.INFERENCE_EXECUTOR,
+    workers=settings.INFERENCE_WORKERS,
+    max_queue=settings.INFERENCE_MAX_QUEUE,
+    torch_threads=resolve_intra_op_threads(),
+    retry_after=settings.INFERENCE_RETRY_AFTER_SECONDS
+)
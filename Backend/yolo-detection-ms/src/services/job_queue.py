@@ -0,0 +1,815 @@
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..config.settings import settings
+from .cpu_budget import resolve_intra_op_threads
+from .result_cache import DetectionResultCache
+from .result_store import DetectionResultStore, build_record
+
+logger = logging.getLogger(__name__)
+
+# Estados de un trabajo
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINAL_STATES = (COMPLETED, FAILED, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    webhook_url TEXT,
+    webhook_status TEXT,
+    worker TEXT,
+    total_images INTEGER NOT NULL,
+    processed_images INTEGER NOT NULL DEFAULT 0,
+    failed_images INTEGER NOT NULL DEFAULT 0,
+    summary TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_images (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    filename TEXT,
+    path TEXT,
+    image_hash TEXT,
+    status TEXT NOT NULL,
+    result TEXT,
+    PRIMARY KEY (job_id, position)
+);
+"""
+
+class JobStore:
+    """
+    Cola persistente de trabajos de detección respaldada por SQLite
+
+    Cada trabajo guarda sus parámetros y el estado de cada imagen; los bytes de
+    las imágenes se escriben en `data_dir/<job_id>/`. La base de datos se abre
+    en modo WAL para que la API y varios procesos de trabajo la compartan: la
+    toma de trabajos es atómica (BEGIN IMMEDIATE) y los trabajos de un proceso
+    caído se recuperan por antigüedad del latido (heartbeat).
+    """
+
+    def __init__(self, db_path: str, data_dir: str):
+        """
+        Args:
+            db_path: Ruta del archivo SQLite
+            data_dir: Directorio donde se guardan las imágenes pendientes
+        """
+        self.db_path = db_path
+        self.data_dir = data_dir
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Abrir una conexión (una por operación: las conexiones no se comparten entre hilos)"""
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    directory = os.path.dirname(self.db_path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    connection = sqlite3.connect(self.db_path, timeout=30)
+                    try:
+                        connection.execute("PRAGMA journal_mode=WAL")
+                        connection.executescript(_SCHEMA)
+                        # Colas creadas antes de registrar el hash de cada imagen
+                        columns = {row[1] for row in connection.execute("PRAGMA table_info(job_images)")}
+                        if "image_hash" not in columns:
+                            connection.execute("ALTER TABLE job_images ADD COLUMN image_hash TEXT")
+                    finally:
+                        connection.close()
+                    self._initialized = True
+
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def new_job(self) -> str:
+        """
+        Reservar el identificador y el directorio de un trabajo aún no encolado
+
+        Returns:
+            Identificador del trabajo
+        """
+        job_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.data_dir, job_id), exist_ok=True)
+        return job_id
+
+    def store_image(self, job_id: str, position: int, filename: Optional[str], data: bytes) -> Tuple[str, str]:
+        """
+        Escribir en disco una imagen de un trabajo reservado con new_job
+
+        Args:
+            job_id: Identificador del trabajo
+            position: Posición de la imagen en el trabajo
+            filename: Nombre original del archivo
+            data: Bytes de la imagen
+
+        Returns:
+            Tupla (ruta del archivo, hash del contenido)
+        """
+        extension = os.path.splitext(filename or "")[1].lower() or ".img"
+        path = os.path.join(self.data_dir, job_id, f"{position:06d}{extension}")
+        with open(path, "wb") as f:
+            f.write(data)
+        return path, DetectionResultCache.hash_image(data)
+
+    def discard(self, job_id: str) -> None:
+        """Eliminar las imágenes de un trabajo reservado que no llegó a encolarse"""
+        shutil.rmtree(os.path.join(self.data_dir, job_id), ignore_errors=True)
+
+    def enqueue(
+        self,
+        job_id: str,
+        images: List[Tuple[str, Optional[str], Optional[str], Optional[str]]],
+        params: Dict[str, Any],
+        webhook_url: Optional[str] = None
+    ) -> str:
+        """
+        Encolar un trabajo reservado con new_job cuyas imágenes ya están en disco
+
+        Args:
+            job_id: Identificador del trabajo
+            images: Tuplas (nombre del archivo, ruta, hash, error de validación);
+                las imágenes con error se registran directamente como fallidas
+            params: Parámetros de detección (umbrales, detalle, modelo)
+            webhook_url: URL notificada al terminar el trabajo (opcional)
+
+        Returns:
+            Identificador del trabajo
+        """
+        rows = []
+        failed = 0
+        for position, (filename, path, image_hash, error) in enumerate(images):
+            if error is not None:
+                failed += 1
+                result = {"success": False, "error": error, "detections": [], "summary": {}}
+                rows.append((job_id, position, filename, None, None, FAILED, json.dumps(result)))
+            else:
+                rows.append((job_id, position, filename, path, image_hash, QUEUED, None))
+
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT INTO jobs (id, status, params, webhook_url, total_images, failed_images, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(params), webhook_url, len(images), failed, now)
+            )
+            connection.executemany(
+                "INSERT INTO job_images (job_id, position, filename, path, image_hash, status, result) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            connection.execute("COMMIT")
+
+        return job_id
+
+    def create_job(
+        self,
+        images: List[Tuple[str, Optional[bytes], Optional[str]]],
+        params: Dict[str, Any],
+        webhook_url: Optional[str] = None
+    ) -> str:
+        """
+        Encolar un trabajo
+
+        Args:
+            images: Tuplas (nombre del archivo, bytes, error de validación); las
+                imágenes con error se registran directamente como fallidas
+            params: Parámetros de detección (umbrales, detalle, modelo)
+            webhook_url: URL notificada al terminar el trabajo (opcional)
+
+        Returns:
+            Identificador del trabajo
+        """
+        job_id = self.new_job()
+        entries = []
+        for position, (filename, data, error) in enumerate(images):
+            if error is not None:
+                entries.append((filename, None, None, error))
+            else:
+                entries.append((filename, *self.store_image(job_id, position, filename, data), None))
+        return self.enqueue(job_id, entries, params, webhook_url)
+
+    def claim_next(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Tomar el trabajo en cola más antiguo
+
+        Args:
+            worker_id: Identificador del proceso que lo toma
+
+        Returns:
+            El trabajo tomado o None si la cola está vacía
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+
+            connection.execute(
+                "UPDATE jobs SET status = ?, worker = ?, started_at = COALESCE(started_at, ?), "
+                "heartbeat_at = ? WHERE id = ?",
+                (RUNNING, worker_id, now, now, row["id"])
+            )
+            connection.execute("COMMIT")
+
+        job = self._row_to_job(row)
+        job["status"] = RUNNING
+        return job
+
+    def pending_images(self, job_id: str) -> List[Tuple[int, str, Optional[str], Optional[str]]]:
+        """Imágenes del trabajo aún sin procesar como tuplas (posición, ruta, hash, nombre)"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT position, path, image_hash, filename FROM job_images "
+                "WHERE job_id = ? AND status = ? ORDER BY position",
+                (job_id, QUEUED)
+            ).fetchall()
+        return [(row["position"], row["path"], row["image_hash"], row["filename"]) for row in rows]
+
+    def record_results(self, job_id: str, results: List[Tuple[int, Dict[str, Any]]]) -> bool:
+        """
+        Guardar los resultados de un grupo de imágenes y renovar el latido
+
+        Args:
+            job_id: Identificador del trabajo
+            results: Tuplas (posición, resultado)
+
+        Returns:
+            False si el trabajo ya no está en curso (p. ej. fue cancelado)
+        """
+        succeeded = sum(1 for _, result in results if result.get("success"))
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            # Un trabajo cancelado o devuelto a la cola conserva sus imágenes intactas
+            cursor = connection.execute(
+                "UPDATE jobs SET processed_images = processed_images + ?, failed_images = failed_images + ?, "
+                "heartbeat_at = ? WHERE id = ? AND status = ?",
+                (succeeded, len(results) - succeeded, time.time(), job_id, RUNNING)
+            )
+            if cursor.rowcount == 0:
+                connection.execute("COMMIT")
+                return False
+
+            connection.executemany(
+                "UPDATE job_images SET status = ?, result = ? WHERE job_id = ? AND position = ?",
+                [
+                    (COMPLETED if result.get("success") else FAILED, json.dumps(result), job_id, position)
+                    for position, result in results
+                ]
+            )
+            connection.execute("COMMIT")
+        return True
+
+    def heartbeat(self, job_id: str) -> bool:
+        """
+        Renovar el latido de un trabajo en curso
+
+        Returns:
+            False si el trabajo ya no está en curso
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?", (time.time(), job_id, RUNNING)
+            )
+        return cursor.rowcount > 0
+
+    def finish_job(
+        self,
+        job_id: str,
+        status: str,
+        summary: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None
+    ) -> None:
+        """Marcar un trabajo en curso como terminado"""
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, summary = ?, error = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (status, json.dumps(summary) if summary is not None else None, error, time.time(), job_id, RUNNING)
+            )
+        self.remove_images(job_id)
+
+    def set_webhook_status(self, job_id: str, webhook_status: str) -> None:
+        """Registrar el resultado de la notificación por webhook"""
+        with self._connect() as connection:
+            connection.execute("UPDATE jobs SET webhook_status = ? WHERE id = ?", (webhook_status, job_id))
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancelar un trabajo en cola o en curso
+
+        Los trabajos en curso se detienen al terminar el grupo de imágenes actual.
+
+        Args:
+            job_id: Identificador del trabajo
+
+        Returns:
+            Estado final del trabajo o None si no existe
+        """
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+
+            if row["status"] in FINAL_STATES:
+                connection.execute("COMMIT")
+                return row["status"]
+
+            connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?", (CANCELLED, time.time(), job_id)
+            )
+            connection.execute("COMMIT")
+
+        self.remove_images(job_id)
+        return CANCELLED
+
+    def requeue_stale(self, stale_seconds: float) -> int:
+        """
+        Devolver a la cola los trabajos cuyo proceso dejó de reportar progreso
+
+        Args:
+            stale_seconds: Antigüedad máxima del último latido
+
+        Returns:
+            Número de trabajos reencolados
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND heartbeat_at < ?",
+                (QUEUED, RUNNING, time.time() - stale_seconds)
+            )
+        if cursor.rowcount:
+            logger.warning(f"{cursor.rowcount} trabajos sin progreso devueltos a la cola")
+        return cursor.rowcount
+
+    def get_job(self, job_id: str, include_results: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Obtener el estado de un trabajo
+
+        Args:
+            job_id: Identificador del trabajo
+            include_results: Incluir el resultado de cada imagen
+
+        Returns:
+            Estado, progreso y (si se pide) resultados, o None si no existe
+        """
+        with self._connect() as connection:
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+
+            job = self._row_to_job(row)
+            if include_results:
+                images = connection.execute(
+                    "SELECT position, filename, status, result FROM job_images WHERE job_id = ? ORDER BY position",
+                    (job_id,)
+                ).fetchall()
+                job["results"] = [
+                    {
+                        "filename": image["filename"],
+                        "status": image["status"],
+                        **(json.loads(image["result"]) if image["result"] else {})
+                    }
+                    for image in images
+                ]
+        return job
+
+    def get_stats(self) -> Dict[str, int]:
+        """Número de trabajos por estado"""
+        with self._connect() as connection:
+            rows = connection.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def remove_images(self, job_id: str) -> None:
+        """Eliminar las imágenes guardadas de un trabajo (salvo JOBS_KEEP_IMAGES)"""
+        if not settings.JOBS_KEEP_IMAGES:
+            shutil.rmtree(os.path.join(self.data_dir, job_id), ignore_errors=True)
+
+    def _row_to_job(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """Convertir una fila de `jobs` en la respuesta pública"""
+        done = row["processed_images"] + row["failed_images"]
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "params": json.loads(row["params"]),
+            "total_images": row["total_images"],
+            "processed_images": row["processed_images"],
+            "failed_images": row["failed_images"],
+            "progress": round(done / row["total_images"], 4) if row["total_images"] else 1.0,
+            "summary": json.loads(row["summary"]) if row["summary"] else None,
+            "error": row["error"],
+            "webhook": {"url": row["webhook_url"], "status": row["webhook_status"]} if row["webhook_url"] else None,
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"]
+        }
+
+def validate_webhook_url(url: str) -> None:
+    """
+    Verificar que un webhook apunte a un destino permitido
+
+    Con JOBS_WEBHOOK_ALLOWED_HOSTS solo se aceptan esos hosts (y sus
+    subdominios); sin lista se rechazan los hosts que resuelven a direcciones
+    privadas, de loopback, link-local o reservadas, para que un trabajo no
+    pueda hacer que el servicio envíe solicitudes a la red interna.
+
+    Args:
+        url: URL del webhook
+
+    Raises:
+        ValueError: Si la URL no es http(s) o su destino no está permitido
+    """
+    parsed = urllib.parse.urlparse(url)
+    host = (parsed.hostname or "").lower()
+    if parsed.scheme not in ("http", "https") or not host:
+        raise ValueError("webhook_url debe ser una URL http(s)")
+
+    allowed = settings.JOBS_WEBHOOK_ALLOWED_HOSTS
+    if allowed:
+        if not any(host == entry or host.endswith(f".{entry}") for entry in allowed):
+            raise ValueError(f"Host de webhook no permitido: {host}")
+        return
+
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parsed.port or None)}
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f"No se pudo resolver el host del webhook {host}: {str(e)}")
+
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if not ip.is_global or ip.is_multicast:
+            raise ValueError(f"El webhook apunta a una dirección no pública: {host} ({address})")
+
+def send_webhook(url: str, payload: Dict[str, Any], timeout: float, retries: int, secret: str = "") -> bool:
+    """
+    Notificar el fin de un trabajo con un POST JSON
+
+    Si hay secreto, el cuerpo se firma con HMAC-SHA256 en el header
+    `X-EIVAI-Signature`. Los errores se reintentan con espera exponencial.
+
+    Args:
+        url: URL del webhook
+        payload: Cuerpo de la notificación
+        timeout: Tiempo máximo por intento (segundos)
+        retries: Reintentos adicionales tras el primer intento
+        secret: Secreto compartido para la firma (opcional)
+
+    Returns:
+        True si el receptor respondió 2xx
+    """
+    body = json.dumps(payload).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if secret:
+        signature = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        headers["X-EIVAI-Signature"] = f"sha256={signature}"
+
+    for attempt in range(retries + 1):
+        try:
+            request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                if 200 <= response.status < 300:
+                    return True
+        except (urllib.error.URLError, OSError) as e:
+            logger.warning(f"Webhook {url} falló (intento {attempt + 1}): {str(e)}")
+
+        if attempt < retries:
+            time.sleep(2 ** attempt)
+
+    return False
+
+def process_job(
+    store: JobStore,
+    service: Any,
+    job: Dict[str, Any],
+    batch_size: int,
+    result_store: Optional[DetectionResultStore] = None
+) -> str:
+    """
+    Procesar las imágenes pendientes de un trabajo por grupos
+
+    Args:
+        store: Cola de trabajos
+        service: Servicio YOLO del proceso de trabajo
+        job: Trabajo tomado con claim_next
+        batch_size: Imágenes por pasada del modelo
+        result_store: Historial donde se agregan los resultados (opcional)
+
+    Returns:
+        Estado final del trabajo
+    """
+    job_id = job["job_id"]
+    params = job["params"]
+    pending = store.pending_images(job_id)
+    weights_id = service.route_weights_id(params.get("model")) if result_store is not None else None
+
+    # El latido se renueva con un temporizador: un grupo lento no debe parecer un proceso caído
+    done = threading.Event()
+    interval = max(0.1, settings.JOBS_STALE_SECONDS / 3)
+
+    def beat() -> None:
+        while not done.wait(interval):
+            try:
+                if not store.heartbeat(job_id):
+                    return
+            except Exception as e:
+                logger.warning(f"No se pudo renovar el latido del trabajo {job_id}: {str(e)}")
+
+    heartbeat = threading.Thread(target=beat, name=f"job-heartbeat-{job_id[:8]}", daemon=True)
+    heartbeat.start()
+
+    try:
+        for start in range(0, len(pending), max(1, batch_size)):
+            chunk = pending[start:start + batch_size]
+            results: List[Tuple[int, Dict[str, Any]]] = []
+            decoded = []  # (posición, imagen, escala)
+            details = {position: (image_hash, filename) for position, _, image_hash, filename in chunk}
+
+            for position, path, _, _ in chunk:
+                try:
+                    with open(path, "rb") as f:
+                        image, scale = service.decode_image_for_inference(f.read())
+                except OSError as e:
+                    image, scale = None, None
+                    logger.warning(f"No se pudo leer la imagen {path}: {str(e)}")
+
+                if service.validate_image_array(image):
+                    decoded.append((position, image, scale))
+                else:
+                    results.append((position, {
+                        "success": False,
+                        "error": "El archivo no es una imagen válida",
+                        "detections": [],
+                        "summary": {}
+                    }))
+
+            if decoded:
+                start_time = time.perf_counter()
+                outputs = service.detect_instruments_batch(
+                    images=[image for _, image, _ in decoded],
+                    confidence_threshold=params["confidence_threshold"],
+                    iou_threshold=params["iou_threshold"],
+                    detail=params["detail"],
+                    scales=[scale for _, _, scale in decoded],
+                    model=params.get("model")
+                )
+                inference_ms = (time.perf_counter() - start_time) * 1000 / len(decoded)
+                results.extend((position, output) for (position, _, _), output in zip(decoded, outputs))
+
+                if result_store is not None:
+                    result_store.record([
+                        build_record(
+                            details[position][0], weights_id, output,
+                            inference_ms=inference_ms, source="job", filename=details[position][1]
+                        )
+                        for (position, _, _), output in zip(decoded, outputs)
+                        if output.get("success") and details[position][0]
+                    ])
+
+            if not store.record_results(job_id, results):
+                logger.info(f"Trabajo {job_id} detenido: ya no está en curso")
+                return CANCELLED
+
+        final = store.get_job(job_id, include_results=True)
+        summary = service.merge_summaries(
+            [result["summary"] for result in final["results"] if result.get("success")]
+        )
+        store.finish_job(job_id, COMPLETED, summary=summary)
+        return COMPLETED
+
+    except Exception as e:
+        logger.error(f"Error procesando el trabajo {job_id}: {str(e)}")
+        store.finish_job(job_id, FAILED, error=str(e))
+        return FAILED
+    finally:
+        done.set()
+
+def notify_job(store: JobStore, job_id: str) -> None:
+    """Enviar el webhook de un trabajo terminado (sin los resultados por imagen)"""
+    job = store.get_job(job_id)
+    if job is None or job["webhook"] is None:
+        return
+
+    # Se vuelve a validar al enviar: el DNS del host pudo cambiar desde que se encoló
+    try:
+        validate_webhook_url(job["webhook"]["url"])
+    except ValueError as e:
+        logger.warning(f"Webhook del trabajo {job_id} bloqueado: {str(e)}")
+        store.set_webhook_status(job_id, "blocked")
+        return
+
+    delivered = send_webhook(
+        job["webhook"]["url"],
+        {key: value for key, value in job.items() if key != "webhook"},
+        timeout=settings.JOBS_WEBHOOK_TIMEOUT_SECONDS,
+        retries=settings.JOBS_WEBHOOK_RETRIES,
+        secret=settings.JOBS_WEBHOOK_SECRET
+    )
+    store.set_webhook_status(job_id, "delivered" if delivered else "failed")
+
+def run_job_worker(db_path: str, data_dir: str, stop_event: Any, torch_threads: int = 0) -> None:
+    """
+    Bucle de un proceso de trabajo: toma trabajos de la cola hasta que se detenga
+
+    Cada proceso carga su propia copia del modelo y procesa un trabajo a la vez
+    en pasadas por lotes.
+
+    Args:
+        db_path: Ruta del archivo SQLite de la cola
+        data_dir: Directorio de las imágenes de los trabajos
+        stop_event: Evento de multiprocessing que detiene el bucle
+        torch_threads: Hilos intra-op de torch (0 = por defecto)
+    """
+    from .cpu_budget import configure_threads
+    from .yolo_service import yolo_service
+
+    configure_threads(torch_threads)
+    # Un trabajo a la vez por proceso: los lotes se arman aquí, no en el micro-batcher
+    yolo_service.disable_batching()
+    yolo_service.prepare()
+
+    store = JobStore(db_path, data_dir)
+    result_store = DetectionResultStore(settings.RESULT_STORE_PATH) if settings.RESULT_STORE_ENABLED else None
+    worker_id = f"{os.uname().nodename if hasattr(os, 'uname') else 'local'}:{os.getpid()}"
+    logger.info(f"Proceso de trabajos iniciado: {worker_id}")
+
+    try:
+        serve_jobs(store, yolo_service, worker_id, stop_event, result_store)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        yolo_service.shutdown()
+
+def serve_jobs(
+    store: JobStore,
+    service: Any,
+    worker_id: str,
+    stop_event: Any,
+    result_store: Optional[DetectionResultStore] = None
+) -> None:
+    """
+    Tomar y procesar trabajos hasta que se detenga
+
+    Sin trabajos en cola se devuelven a la cola los abandonados por procesos
+    caídos (latido más antiguo que JOBS_STALE_SECONDS), de modo que se
+    retoman sin reiniciar el servicio.
+
+    Args:
+        store: Cola de trabajos
+        service: Servicio YOLO del proceso
+        worker_id: Identificador del proceso
+        stop_event: Evento (de threading o multiprocessing) que detiene el bucle
+        result_store: Historial donde se agregan los resultados (opcional)
+    """
+    while not stop_event.is_set():
+        job = store.claim_next(worker_id)
+        if job is None:
+            if not store.requeue_stale(settings.JOBS_STALE_SECONDS):
+                stop_event.wait(settings.JOBS_POLL_INTERVAL_SECONDS)
+            continue
+
+        status = process_job(store, service, job, settings.JOBS_BATCH_SIZE, result_store)
+        logger.info(f"Trabajo {job['job_id']} terminado: {status}")
+        if status != CANCELLED:
+            notify_job(store, job["job_id"])
+
+class JobWorkerPool:
+    """Procesos de trabajo de la cola iniciados junto con la API"""
+
+    def __init__(self, store: JobStore, workers: int = 1, torch_threads: int = 0):
+        """
+        Args:
+            store: Cola de trabajos
+            workers: Número de procesos (0 = solo procesos externos, ver scripts/job_worker.py)
+            torch_threads: Hilos intra-op de torch por proceso (0 = por defecto)
+        """
+        self.store = store
+        self.workers = max(0, int(workers))
+        self.torch_threads = int(torch_threads)
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = None
+        self._processes: List[Any] = []
+        self._supervisor: Optional[threading.Thread] = None
+        self._restarts = 0
+
+    def start(self) -> None:
+        """Recuperar trabajos abandonados, iniciar los procesos y su supervisor"""
+        self.store.requeue_stale(settings.JOBS_STALE_SECONDS)
+        if self.workers == 0 or self._processes:
+            return
+
+        self._stop_event = self._context.Event()
+        self._processes = [self._spawn(index) for index in range(self.workers)]
+        logger.info(f"Procesos de trabajos iniciados: {self.workers}")
+
+        self._supervisor = threading.Thread(target=self._supervise, name="yolo-jobs-supervisor", daemon=True)
+        self._supervisor.start()
+
+    def _spawn(self, index: int) -> Any:
+        """Iniciar el proceso de trabajo en la posición indicada"""
+        process = self._context.Process(
+            target=run_job_worker,
+            args=(self.store.db_path, self.store.data_dir, self._stop_event, self.torch_threads),
+            name=f"yolo-jobs-{index}",
+            daemon=True
+        )
+        process.start()
+        return process
+
+    def _supervise(self) -> None:
+        """Revisar los procesos periódicamente hasta que se detenga el pool"""
+        interval = max(1.0, settings.JOBS_POLL_INTERVAL_SECONDS)
+        while not self._stop_event.wait(interval):
+            try:
+                self.check_processes()
+            except Exception as e:
+                logger.error(f"Error supervisando los procesos de trabajos: {str(e)}")
+
+    def check_processes(self) -> int:
+        """
+        Reiniciar los procesos caídos y devolver a la cola sus trabajos
+
+        Un proceso que muere a mitad de un trabajo deja de renovar el latido;
+        el trabajo vuelve a la cola al cumplirse JOBS_STALE_SECONDS.
+
+        Returns:
+            Número de procesos reiniciados
+        """
+        if self._stop_event is None or self._stop_event.is_set():
+            return 0
+
+        restarted = 0
+        for index, process in enumerate(self._processes):
+            if process.is_alive():
+                continue
+            logger.warning(f"Proceso de trabajos {process.name} terminó (código {process.exitcode}); se reinicia")
+            self._processes[index] = self._spawn(index)
+            restarted += 1
+
+        self._restarts += restarted
+        self.store.requeue_stale(settings.JOBS_STALE_SECONDS)
+        return restarted
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Procesos vivos, reinicios y trabajos por estado"""
+        return {
+            "workers": self.workers,
+            "alive": sum(1 for process in self._processes if process.is_alive()),
+            "restarts": self._restarts,
+            "jobs": self.store.get_stats()
+        }
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Detener los procesos; el trabajo en curso se retoma al reiniciar"""
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self._supervisor is not None:
+            self._supervisor.join(timeout)
+            self._supervisor = None
+
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+# Instancias globales de la cola y sus procesos de trabajo
+job_store = JobStore(settings.JOBS_DB_PATH, settings.JOBS_DIR)
+job_workers = JobWorkerPool(job_store, workers=settings.JOBS_WORKERS, torch_threads=resolve_intra_op_threads())
@@ -0,0 +1,301 @@
+import bisect
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Límites (segundos) para las duraciones de las etapas del pipeline
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Límites para la distribución del tamaño de lote
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    """Escapar un valor de etiqueta"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    """Formatear las etiquetas en la sintaxis de exposición de Prometheus"""
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    """Formatear un valor numérico sin decimales innecesarios"""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class _Metric:
+    """Base de las métricas: nombre, ayuda, etiquetas y lock compartido"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Etiquetas inválidas para {self.name}: {sorted(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+    def drain(self) -> Dict[LabelValues, Any]:
+        """Retirar los valores acumulados para sumarlos en otro proceso (sin valores por defecto)"""
+        return {}
+
+    def merge(self, values: Dict[LabelValues, Any]) -> None:
+        """Sumar valores retirados con drain en otro proceso"""
+
+class Counter(_Metric):
+    """Contador monótono por combinación de etiquetas"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Incrementar el contador"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels: str) -> float:
+        """Valor actual del contador"""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def drain(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[LabelValues, float]) -> None:
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0.0) + value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+class Gauge(_Metric):
+    """Valor instantáneo por combinación de etiquetas"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        """Fijar el valor del indicador"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def clear(self) -> None:
+        """Eliminar todos los valores (útil para indicadores de información)"""
+        with self._lock:
+            self._values.clear()
+
+    def get(self, **labels: str) -> Optional[float]:
+        """Valor actual del indicador"""
+        with self._lock:
+            return self._values.get(self._key(labels))
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+class Histogram(_Metric):
+    """Histograma acumulativo con límites fijos por combinación de etiquetas"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DURATION_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Por etiqueta: conteos por límite (+Inf al final) y suma de observaciones
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Registrar una observación"""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def get_count(self, **labels: str) -> int:
+        """Número de observaciones registradas"""
+        with self._lock:
+            return sum(self._counts.get(self._key(labels), []))
+
+    def drain(self) -> Dict[LabelValues, Tuple[List[int], float]]:
+        with self._lock:
+            values = {key: (counts, self._sums[key]) for key, counts in self._counts.items()}
+            self._counts, self._sums = {}, {}
+        return values
+
+    def merge(self, values: Dict[LabelValues, Tuple[List[int], float]]) -> None:
+        with self._lock:
+            for key, (counts, total) in values.items():
+                current = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+                for index, count in enumerate(counts):
+                    current[index] += count
+                self._sums[key] = self._sums.get(key, 0.0) + total
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, list(counts), self._sums[key]) for key, counts in self._counts.items())
+
+        lines = self._header()
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Registro de métricas expuestas en formato de texto de Prometheus"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Registrar una métrica (los nombres son únicos)"""
+        if metric.name in self._metrics:
+            raise ValueError(f"Métrica duplicada: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def drain(self) -> Dict[str, Dict[LabelValues, Any]]:
+        """
+        Retirar los contadores e histogramas acumulados desde el último drain
+
+        Los procesos de inferencia (INFERENCE_EXECUTOR=process) envían el
+        resultado al proceso principal junto con lo retirado, y este lo suma a
+        su registro con merge; los indicadores no se envían.
+        """
+        drained = {}
+        for name, metric in self._metrics.items():
+            values = metric.drain()
+            if values:
+                drained[name] = values
+        return drained
+
+    def merge(self, drained: Dict[str, Dict[LabelValues, Any]]) -> None:
+        """Sumar las métricas retiradas con drain en otro proceso"""
+        for name, values in drained.items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(values)
+
+    def render(self) -> str:
+        """Generar la exposición de todas las métricas"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+def read_memory_usage() -> Dict[str, int]:
+    """
+    Obtener el uso de memoria del proceso
+
+    Returns:
+        Diccionario con la memoria residente actual y el pico (bytes)
+    """
+    usage = {"resident": 0, "peak": 0}
+
+    try:
+        import resource
+        # ru_maxrss está en KB en Linux
+        usage["peak"] = usage["resident"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        pass
+
+    try:
+        with open("/proc/self/statm") as f:
+            usage["resident"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+
+    return usage
+
+# Registro global y métricas del servicio
+registry = MetricsRegistry()
+
+stage_duration = registry.register(Histogram(
+    "yolo_stage_duration_seconds",
+    "Duración por imagen de cada etapa del pipeline (decode, preprocess, inference, postprocess)",
+    ("stage",)
+))
+batch_size = registry.register(Histogram(
+    "yolo_batch_size",
+    "Imágenes por pasada del modelo",
+    buckets=BATCH_SIZE_BUCKETS
+))
+detections_total = registry.register(Counter(
+    "yolo_detections_total",
+    "Instrumentos detectados por código",
+    ("codigo",)
+))
+http_request_duration = registry.register(Histogram(
+    "yolo_http_request_duration_seconds",
+    "Duración de las solicitudes HTTP",
+    ("method", "route", "status")
+))
+queue_depth = registry.register(Gauge(
+    "yolo_queue_depth",
+    "Solicitudes en espera por cola",
+    ("queue",)
+))
+model_info = registry.register(Gauge(
+    "yolo_model_info",
+    "Modelo cargado, backend y estado de preparación",
+    ("model", "backend", "int8", "readiness")
+))
+memory_bytes = registry.register(Gauge(
+    "yolo_process_memory_bytes",
+    "Memoria del proceso",
+    ("kind",)
+))
+result_cache_requests = registry.register(Counter(
+    "yolo_result_cache_requests_total",
+    "Consultas a la caché de resultados por resultado (hit/miss)",
+    ("result",)
+))
@@ -0,0 +1,106 @@
+import os
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Backend -> formato de exportación de Ultralytics (None = PyTorch sin exportar)
+SUPPORTED_BACKENDS = {
+    "pytorch": None,
+    "onnx": "onnx",
+    "openvino": "openvino",
+    "torchscript": "torchscript"
+}
+
+def exported_model_path(model_path: str, backend: str, int8: bool = False) -> str:
+    """
+    Obtener la ruta del artefacto exportado para un backend
+
+    Sigue la convención de nombres de Ultralytics (junto al archivo .pt).
+
+    Args:
+        model_path: Ruta del modelo PyTorch (.pt)
+        backend: Backend de inferencia
+        int8: Si el artefacto está cuantizado a int8
+
+    Returns:
+        Ruta del modelo exportado
+    """
+    stem, _ = os.path.splitext(model_path)
+
+    if backend == "onnx":
+        return f"{stem}_int8.onnx" if int8 else f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_int8_openvino_model" if int8 else f"{stem}_openvino_model"
+    if backend == "torchscript":
+        return f"{stem}.torchscript"
+    return model_path
+
+def _quantize_onnx(fp32_path: str, int8_path: str) -> str:
+    """Cuantizar dinámicamente un modelo ONNX a int8 con ONNX Runtime"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QUInt8)
+    return int8_path
+
+def resolve_model_path(
+    model_path: str,
+    backend: str = "pytorch",
+    imgsz: int = 640,
+    int8: bool = False,
+    calibration_data: Optional[str] = None
+) -> str:
+    """
+    Obtener la ruta del modelo a cargar para el backend configurado
+
+    Si el artefacto exportado no existe, se exporta desde el modelo PyTorch
+    una única vez y se reutiliza en los siguientes arranques.
+
+    Args:
+        model_path: Ruta del modelo PyTorch (.pt)
+        backend: "pytorch", "onnx", "openvino" o "torchscript"
+        imgsz: Tamaño de entrada del modelo exportado
+        int8: Cuantizar a int8 (ONNX y OpenVINO)
+        calibration_data: Dataset de calibración para int8 en OpenVINO
+
+    Returns:
+        Ruta del modelo listo para cargar con ultralytics.YOLO
+    """
+    if backend not in SUPPORTED_BACKENDS:
+        raise ValueError(
+            f"Backend no soportado: {backend}. Opciones: {', '.join(SUPPORTED_BACKENDS)}"
+        )
+
+    export_format = SUPPORTED_BACKENDS[backend]
+    if export_format is None:
+        return model_path
+
+    if int8 and backend == "torchscript":
+        logger.warning("La cuantización int8 no está disponible para TorchScript; se exporta en fp32")
+        int8 = False
+
+    target_path = exported_model_path(model_path, backend, int8)
+    if os.path.exists(target_path):
+        return target_path
+
+    from ultralytics import YOLO
+
+    logger.info(f"Exportando {model_path} a {backend} (imgsz={imgsz}, int8={int8})")
+    export_args = {
+        "format": export_format,
+        "imgsz": imgsz,
+        # Eje de lote dinámico para permitir el micro-batching
+        "dynamic": backend in ("onnx", "openvino")
+    }
+    if int8 and backend == "openvino":
+        export_args["int8"] = True
+        if calibration_data:
+            export_args["data"] = calibration_data
+
+    exported = str(YOLO(model_path).export(**export_args))
+
+    if int8 and backend == "onnx":
+        exported = _quantize_onnx(exported, target_path)
+
+    logger.info(f"Modelo exportado: {exported}")
+    return exported
@@ -0,0 +1,83 @@
+import io
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Factores de reducción que libjpeg aplica durante la decodificación
+_JPEG_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2)
+)
+
+def read_image_size(data: bytes) -> Optional[Tuple[int, int, str]]:
+    """
+    Leer las dimensiones de una imagen desde su cabecera, sin decodificarla
+
+    Args:
+        data: Contenido del archivo
+
+    Returns:
+        Tupla (ancho, alto, formato) o None si no se reconoce la imagen
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.width, image.height, image.format or ""
+    except Exception:
+        return None
+
+def decode_downscaled(data: bytes, target_side: int) -> Tuple[Optional[np.ndarray], Tuple[float, float]]:
+    """
+    Decodificar una imagen reduciéndola hacia el tamaño de entrada del modelo
+
+    Los JPEG se decodifican a escala (1/2, 1/4 u 1/8) directamente en libjpeg,
+    sin materializar la imagen completa; el lado mayor nunca queda por debajo
+    de `target_side`. Otros formatos se decodifican completos. En ambos casos
+    el resultado se ajusta a `target_side` con INTER_AREA, de modo que la imagen
+    original no se retiene mientras la solicitud espera en cola.
+
+    Args:
+        data: Contenido del archivo
+        target_side: Lado mayor mínimo deseado (tamaño de entrada del modelo)
+
+    Returns:
+        Tupla (imagen BGR o None, (escala_x, escala_y)) donde la escala
+        convierte coordenadas de la imagen reducida a la original
+    """
+    if not data:
+        return None, (1.0, 1.0)
+
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    header = read_image_size(data)
+    flag = cv2.IMREAD_COLOR
+
+    if header is not None and target_side > 0 and header[2] == "JPEG":
+        long_side = max(header[0], header[1])
+        for factor, reduced_flag in _JPEG_REDUCED_FLAGS:
+            if long_side // factor >= target_side:
+                flag = reduced_flag
+                break
+
+    image = cv2.imdecode(buffer, flag)
+    if image is None or header is None:
+        return image, (1.0, 1.0)
+
+    original_width, original_height = header[0], header[1]
+    height, width = image.shape[:2]
+
+    # La orientación EXIF puede rotar la imagen decodificada respecto a la cabecera
+    if (width > height) != (original_width > original_height) and width != height:
+        original_width, original_height = original_height, original_width
+
+    if target_side > 0 and max(height, width) > target_side:
+        ratio = target_side / max(height, width)
+        image = cv2.resize(
+            image,
+            (max(1, round(width * ratio)), max(1, round(height * ratio))),
+            interpolation=cv2.INTER_AREA
+        )
+        height, width = image.shape[:2]
+
+    return image, (original_width / width, original_height / height)
@@ -0,0 +1,157 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from ..config.settings import settings
+from . import metrics
+
+class DetectionResultCache:
+    """
+    Caché LRU con expiración (TTL) para resultados de detección
+
+    Las entradas se indexan por el hash del contenido de la imagen, los umbrales
+    usados y la variante de la respuesta (nivel de detalle, modo de inferencia).
+    El identificador del modelo se verifica en cada acceso: si el modelo cambió,
+    la caché se vacía completa.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 600.0):
+        """
+        Inicializar la caché
+
+        Args:
+            max_entries: Número máximo de resultados almacenados
+            ttl_seconds: Tiempo de vida de cada entrada en segundos (0 = sin expiración)
+        """
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+
+        self._entries: "OrderedDict[Tuple[str, float, float, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_id: Optional[str] = None
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def hash_image(data: bytes) -> str:
+        """
+        Calcular el hash del contenido de una imagen
+
+        Args:
+            data: Bytes de la imagen
+
+        Returns:
+            Hash hexadecimal del contenido
+        """
+        return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+    def _check_model(self, model_id: str) -> None:
+        """Vaciar la caché si cambió el modelo (requiere el lock tomado)"""
+        if model_id != self._model_id:
+            if self._entries:
+                self._invalidations += 1
+            self._entries.clear()
+            self._model_id = model_id
+
+    def get(
+        self,
+        image_hash: str,
+        confidence_threshold: float,
+        iou_threshold: float,
+        model_id: str,
+        variant: str = "full"
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Obtener un resultado almacenado
+
+        Args:
+            image_hash: Hash del contenido de la imagen
+            confidence_threshold: Umbral de confianza usado
+            iou_threshold: Umbral de IoU usado
+            model_id: Identificador del modelo actual
+            variant: Variante de la respuesta (p. ej. nivel de detalle)
+
+        Returns:
+            Copia profunda del resultado almacenado o None si no existe o expiró
+        """
+        key = (image_hash, confidence_threshold, iou_threshold, variant)
+
+        with self._lock:
+            self._check_model(model_id)
+            entry = self._entries.get(key)
+
+            if entry is not None and self.ttl_seconds > 0 and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+
+            if entry is None:
+                self._misses += 1
+                metrics.result_cache_requests.inc(result="miss")
+                return None
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            metrics.result_cache_requests.inc(result="hit")
+            return copy.deepcopy(entry[1])
+
+    def set(
+        self,
+        image_hash: str,
+        confidence_threshold: float,
+        iou_threshold: float,
+        model_id: str,
+        result: Dict[str, Any],
+        variant: str = "full"
+    ) -> None:
+        """
+        Almacenar un resultado de detección
+
+        Args:
+            image_hash: Hash del contenido de la imagen
+            confidence_threshold: Umbral de confianza usado
+            iou_threshold: Umbral de IoU usado
+            model_id: Identificador del modelo que produjo el resultado
+            result: Resultado de la detección
+            variant: Variante de la respuesta (p. ej. nivel de detalle)
+        """
+        key = (image_hash, confidence_threshold, iou_threshold, variant)
+
+        with self._lock:
+            self._check_model(model_id)
+            self._entries[key] = (time.monotonic(), copy.deepcopy(result))
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """Eliminar todas las entradas"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obtener estadísticas de uso de la caché"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / total, 3) if total else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations
+            }
+
+# Instancia global de la caché
+result_cache = DetectionResultCache(
+    max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,410 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS detection_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    image_hash TEXT NOT NULL,
+    model_id TEXT NOT NULL,
+    confidence_threshold REAL NOT NULL,
+    iou_threshold REAL NOT NULL,
+    sliced INTEGER NOT NULL DEFAULT 0,
+    total_objects INTEGER NOT NULL,
+    counts TEXT NOT NULL,
+    inference_ms REAL,
+    source TEXT,
+    filename TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_hash_model ON detection_results (image_hash, model_id);
+CREATE INDEX IF NOT EXISTS idx_results_model ON detection_results (model_id, created_at);
+"""
+
+# Límite de parámetros por consulta IN (...) en SQLite
+_IN_CHUNK = 500
+
+def build_record(
+    image_hash: str,
+    model_id: str,
+    result: Dict[str, Any],
+    sliced: bool = False,
+    inference_ms: Optional[float] = None,
+    source: str = "detect",
+    filename: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Construir el registro almacenable de un resultado de detección
+
+    Args:
+        image_hash: Hash del contenido de la imagen
+        model_id: Identificador de los pesos que produjeron el resultado
+        result: Resultado de detect_instruments
+        sliced: Si se usó inferencia por ventanas
+        inference_ms: Tiempo de inferencia de la imagen en milisegundos
+        source: Origen del resultado ("detect", "batch" o "job")
+        filename: Nombre del archivo (opcional)
+
+    Returns:
+        Registro con los conteos por código de instrumento
+    """
+    return {
+        "image_hash": image_hash,
+        "model_id": model_id,
+        "confidence_threshold": result["confidence_threshold"],
+        "iou_threshold": result["iou_threshold"],
+        "sliced": bool(sliced),
+        "total_objects": result["total_objects"],
+        "counts": {codigo: item["cantidad"] for codigo, item in result["summary"].items()},
+        "inference_ms": round(inference_ms, 3) if inference_ms is not None else None,
+        "source": source,
+        "filename": filename
+    }
+
+class DetectionResultStore:
+    """
+    Historial persistente (solo inserción) de resultados de detección
+
+    Cada fila guarda el hash de la imagen, el modelo, los umbrales, los conteos
+    por código y el tiempo de inferencia. Los índices por (hash, modelo) permiten
+    saber qué imágenes faltan por procesar con el modelo actual y comparar los
+    conteos entre dos modelos sin volver a ejecutar la inferencia.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: Ruta del archivo SQLite
+        """
+        self.db_path = db_path
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Abrir una conexión (una por operación: las conexiones no se comparten entre hilos)"""
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    directory = os.path.dirname(self.db_path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    connection = sqlite3.connect(self.db_path, timeout=30)
+                    try:
+                        connection.execute("PRAGMA journal_mode=WAL")
+                        connection.executescript(_SCHEMA)
+                    finally:
+                        connection.close()
+                    self._initialized = True
+
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        # En WAL, NORMAL mantiene la consistencia y evita un fsync por inserción
+        connection.execute("PRAGMA synchronous=NORMAL")
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def record(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Agregar resultados al historial
+
+        Args:
+            records: Registros construidos con build_record
+
+        Returns:
+            Número de registros insertados
+        """
+        if not records:
+            return 0
+
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany(
+                "INSERT INTO detection_results (image_hash, model_id, confidence_threshold, iou_threshold, "
+                "sliced, total_objects, counts, inference_ms, source, filename, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        record["image_hash"], record["model_id"], record["confidence_threshold"],
+                        record["iou_threshold"], int(record["sliced"]), record["total_objects"],
+                        json.dumps(record["counts"], sort_keys=True), record["inference_ms"],
+                        record["source"], record["filename"], now
+                    )
+                    for record in records
+                ]
+            )
+            connection.execute("COMMIT")
+        return len(records)
+
+    def unscored(
+        self,
+        image_hashes: List[str],
+        model_id: str,
+        confidence_threshold: Optional[float] = None,
+        iou_threshold: Optional[float] = None
+    ) -> List[str]:
+        """
+        Filtrar las imágenes que aún no tienen resultado con un modelo
+
+        Args:
+            image_hashes: Hashes de las imágenes candidatas
+            model_id: Identificador del modelo
+            confidence_threshold: Exigir además este umbral de confianza (opcional)
+            iou_threshold: Exigir además este umbral de IoU (opcional)
+
+        Returns:
+            Hashes sin resultado, en el orden recibido
+        """
+        conditions = ["model_id = ?"]
+        extra: List[Any] = []
+        if confidence_threshold is not None:
+            conditions.append("confidence_threshold = ?")
+            extra.append(confidence_threshold)
+        if iou_threshold is not None:
+            conditions.append("iou_threshold = ?")
+            extra.append(iou_threshold)
+
+        unique = list(dict.fromkeys(image_hashes))
+        scored = set()
+        with self._connect() as connection:
+            for start in range(0, len(unique), _IN_CHUNK):
+                chunk = unique[start:start + _IN_CHUNK]
+                rows = connection.execute(
+                    f"SELECT DISTINCT image_hash FROM detection_results WHERE {' AND '.join(conditions)} "
+                    f"AND image_hash IN ({','.join('?' * len(chunk))})",
+                    [model_id, *extra, *chunk]
+                ).fetchall()
+                scored.update(row["image_hash"] for row in rows)
+
+        return [image_hash for image_hash in unique if image_hash not in scored]
+
+    def history(self, image_hash: str) -> List[Dict[str, Any]]:
+        """Todos los resultados almacenados de una imagen, del más antiguo al más reciente"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT * FROM detection_results WHERE image_hash = ? ORDER BY id", (image_hash,)
+            ).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    def models(self) -> List[Dict[str, Any]]:
+        """Modelos con resultados almacenados: imágenes, objetos y tiempo promedio"""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT model_id, COUNT(DISTINCT image_hash) AS images, COUNT(*) AS results, "
+                "SUM(total_objects) AS objects, AVG(inference_ms) AS avg_inference_ms, "
+                "MIN(created_at) AS first_seen, MAX(created_at) AS last_seen "
+                "FROM detection_results GROUP BY model_id ORDER BY last_seen DESC"
+            ).fetchall()
+        return [
+            {
+                **dict(row),
+                "avg_inference_ms": round(row["avg_inference_ms"], 3) if row["avg_inference_ms"] is not None else None
+            }
+            for row in rows
+        ]
+
+    def drift(
+        self,
+        baseline_model_id: str,
+        candidate_model_id: str,
+        confidence_threshold: Optional[float] = None,
+        iou_threshold: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Comparar los conteos de dos modelos sobre las imágenes que ambos procesaron
+
+        Se usa el resultado más reciente de cada imagen por modelo. Sin etiquetas
+        de referencia, la deriva se mide contra el modelo base (p. ej. el validado
+        en producción).
+
+        Args:
+            baseline_model_id: Modelo de referencia
+            candidate_model_id: Modelo a evaluar
+            confidence_threshold: Considerar solo resultados con este umbral (opcional)
+            iou_threshold: Considerar solo resultados con este umbral (opcional)
+
+        Returns:
+            Imágenes comparadas y con cambios, totales por código y diferencia
+            absoluta promedio de objetos por imagen
+        """
+        baseline = self._latest_counts(baseline_model_id, confidence_threshold, iou_threshold)
+        candidate = self._latest_counts(candidate_model_id, confidence_threshold, iou_threshold)
+        shared = sorted(set(baseline) & set(candidate))
+
+        per_codigo: Dict[str, Dict[str, int]] = {}
+        changed = 0
+        absolute_delta = 0
+        for image_hash in shared:
+            before, after = baseline[image_hash], candidate[image_hash]
+            if before != after:
+                changed += 1
+            for codigo in set(before) | set(after):
+                totals = per_codigo.setdefault(codigo, {"baseline": 0, "candidate": 0})
+                totals["baseline"] += before.get(codigo, 0)
+                totals["candidate"] += after.get(codigo, 0)
+                absolute_delta += abs(after.get(codigo, 0) - before.get(codigo, 0))
+
+        return {
+            "baseline_model_id": baseline_model_id,
+            "candidate_model_id": candidate_model_id,
+            "images_compared": len(shared),
+            "images_changed": changed,
+            "change_rate": round(changed / len(shared), 4) if shared else 0.0,
+            "mean_abs_count_delta": round(absolute_delta / len(shared), 4) if shared else 0.0,
+            "baseline_only": len(set(baseline) - set(candidate)),
+            "candidate_only": len(set(candidate) - set(baseline)),
+            "per_codigo": {
+                codigo: {**totals, "delta": totals["candidate"] - totals["baseline"]}
+                for codigo, totals in sorted(per_codigo.items())
+            }
+        }
+
+    def _latest_counts(
+        self,
+        model_id: str,
+        confidence_threshold: Optional[float],
+        iou_threshold: Optional[float]
+    ) -> Dict[str, Dict[str, int]]:
+        """Conteos del resultado más reciente de cada imagen para un modelo"""
+        conditions = ["model_id = ?"]
+        params: List[Any] = [model_id]
+        if confidence_threshold is not None:
+            conditions.append("confidence_threshold = ?")
+            params.append(confidence_threshold)
+        if iou_threshold is not None:
+            conditions.append("iou_threshold = ?")
+            params.append(iou_threshold)
+
+        where = " AND ".join(conditions)
+        with self._connect() as connection:
+            rows = connection.execute(
+                f"SELECT image_hash, counts FROM detection_results WHERE id IN ("
+                f"SELECT MAX(id) FROM detection_results WHERE {where} GROUP BY image_hash)",
+                params
+            ).fetchall()
+        return {row["image_hash"]: json.loads(row["counts"]) for row in rows}
+
+    def _row_to_record(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """Convertir una fila en el registro público"""
+        record = dict(row)
+        record["sliced"] = bool(record["sliced"])
+        record["counts"] = json.loads(record["counts"])
+        return record
+
+class ResultRecorder:
+    """
+    Escritura del historial fuera del camino de la solicitud
+
+    Las solicitudes encolan una función que construye sus registros y responden
+    sin esperar a SQLite; un único hilo de fondo ejecuta esas funciones e
+    inserta en una sola transacción todo lo acumulado en la cola. Con la cola
+    llena los registros nuevos se descartan (el historial no debe frenar la
+    detección).
+    """
+
+    def __init__(self, store: DetectionResultStore, max_pending: int = 10000, name: str = "result-recorder"):
+        """
+        Args:
+            store: Historial donde se insertan los registros
+            max_pending: Escrituras encoladas como máximo
+            name: Nombre del hilo de escritura
+        """
+        self.store = store
+        self.name = name
+        self._queue: "queue.Queue[Callable[[], List[Dict[str, Any]]]]" = queue.Queue(max(1, int(max_pending)))
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._dropped = 0
+
+    def submit(self, build: Callable[[], List[Dict[str, Any]]]) -> bool:
+        """
+        Encolar una escritura
+
+        Args:
+            build: Función que retorna los registros (se ejecuta en el hilo de escritura)
+
+        Returns:
+            False si la cola estaba llena y la escritura se descartó
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(build)
+        except queue.Full:
+            self._dropped += 1
+            logger.warning("Cola del historial de resultados llena; se descartan registros")
+            return False
+        return True
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """
+        Esperar a que se escriba todo lo encolado
+
+        Returns:
+            True si la cola quedó vacía antes del tiempo límite
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def get_stats(self) -> Dict[str, int]:
+        """Escrituras pendientes y descartadas"""
+        return {"pending": self._queue.qsize(), "dropped": self._dropped}
+
+    def _ensure_started(self) -> None:
+        """Iniciar el hilo de escritura en el primer uso"""
+        if self._thread is not None:
+            return
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        """Bucle del hilo de escritura"""
+        while True:
+            builds = [self._queue.get()]
+            while True:
+                try:
+                    builds.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            records = []
+            for build in builds:
+                try:
+                    records.extend(build())
+                except Exception as e:
+                    logger.warning(f"No se pudo preparar el historial de resultados: {str(e)}")
+
+            try:
+                self.store.record(records)
+            except Exception as e:
+                logger.warning(f"No se pudo guardar el historial de resultados: {str(e)}")
+            finally:
+                for _ in builds:
+                    self._queue.task_done()
+
+# Instancia global del historial de resultados
+result_store = DetectionResultStore(settings.RESULT_STORE_PATH)
+
+# Escritura en segundo plano del historial global
+result_recorder = ResultRecorder(result_store)
@@ -0,0 +1,141 @@
+import json
+import os
+import threading
+import logging
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+def parse_expected_counts(raw: Any) -> Dict[str, int]:
+    """
+    Validar una lista de instrumentos esperados (codigo -> cantidad)
+
+    Args:
+        raw: Diccionario o texto JSON con las cantidades por código
+
+    Returns:
+        Diccionario codigo -> cantidad
+
+    Raises:
+        ValueError: Si el formato o alguna cantidad no es válida
+    """
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON inválido en la lista esperada: {e.msg}")
+
+    if not isinstance(raw, dict):
+        raise ValueError("La lista esperada debe ser un objeto codigo -> cantidad")
+
+    expected = {}
+    for codigo, cantidad in raw.items():
+        if isinstance(cantidad, bool) or not isinstance(cantidad, int) or cantidad < 0:
+            raise ValueError(f"Cantidad inválida para {codigo}: {cantidad}")
+        expected[str(codigo)] = cantidad
+    return expected
+
+def compare_with_expected(summary: Dict[str, Any], expected: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Comparar el resumen detectado con la lista de instrumentos esperada
+
+    La diferencia se calcula sobre arreglos alineados por código (unión de
+    códigos esperados y detectados).
+
+    Args:
+        summary: Resumen de la detección por código de instrumento
+        expected: Cantidades esperadas por código
+
+    Returns:
+        Faltantes, sobrantes y diferencia por código (detectado - esperado)
+    """
+    codigos = sorted(set(expected) | set(summary))
+    expected_counts = np.array([expected.get(codigo, 0) for codigo in codigos], dtype=np.int64)
+    detected_counts = np.array(
+        [summary[codigo]["cantidad"] if codigo in summary else 0 for codigo in codigos],
+        dtype=np.int64
+    )
+
+    delta = detected_counts - expected_counts
+    missing = np.maximum(-delta, 0)
+    extra = np.maximum(delta, 0)
+
+    return {
+        "complete": bool(not missing.any() and not extra.any()),
+        "expected_total": int(expected_counts.sum()),
+        "detected_total": int(detected_counts.sum()),
+        "missing_total": int(missing.sum()),
+        "extra_total": int(extra.sum()),
+        "missing": {codigo: int(n) for codigo, n in zip(codigos, missing) if n},
+        "extra": {codigo: int(n) for codigo, n in zip(codigos, extra) if n},
+        "delta": {codigo: int(d) for codigo, d in zip(codigos, delta)}
+    }
+
+class ExpectedSetCatalog:
+    """
+    Catálogo de sets quirúrgicos esperados (set id -> codigo -> cantidad)
+
+    Se lee de un archivo JSON exportado de los sets (`SetInstrumentos`) y se
+    recarga automáticamente cuando el archivo cambia. Cada set puede escribirse
+    como {"BISP-001": 2, ...} o como {"nombre": "...", "instrumentos": {...}}.
+    """
+
+    def __init__(self, path: str = ""):
+        """
+        Args:
+            path: Ruta del archivo JSON del catálogo (vacío = sin catálogo)
+        """
+        self.path = path
+        self._sets: Dict[str, Dict[str, Any]] = {}
+        self._mtime: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _reload_if_changed(self) -> None:
+        """Recargar el catálogo si el archivo cambió desde la última lectura"""
+        if not self.path:
+            return
+
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            logger.warning(f"Catálogo de sets no encontrado: {self.path}")
+            return
+
+        with self._lock:
+            if mtime == self._mtime:
+                return
+
+            with open(self.path, encoding="utf-8") as f:
+                raw = json.load(f)
+
+            sets = {}
+            for set_id, entry in raw.items():
+                instrumentos = entry.get("instrumentos", entry) if isinstance(entry, dict) else entry
+                sets[str(set_id)] = {
+                    "nombre": entry.get("nombre") if isinstance(entry, dict) else None,
+                    "instrumentos": parse_expected_counts(instrumentos)
+                }
+
+            self._sets = sets
+            self._mtime = mtime
+            logger.info(f"Catálogo de sets cargado: {len(sets)} sets desde {self.path}")
+
+    def get(self, set_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtener un set del catálogo
+
+        Args:
+            set_id: Identificador del set
+
+        Returns:
+            {"nombre", "instrumentos"} o None si el set no existe
+        """
+        self._reload_if_changed()
+        return self._sets.get(str(set_id))
+
+# Instancia global del catálogo
+expected_set_catalog = ExpectedSetCatalog(settings.EXPECTED_SETS_PATH)
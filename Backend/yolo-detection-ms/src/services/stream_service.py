@@ -0,0 +1,104 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+class LatestFrameSlot:
+    """
+    Contenedor de un solo cuadro para el modo de streaming
+
+    Solo se conserva el cuadro más reciente: si llega uno nuevo antes de que el
+    anterior sea procesado, el anterior se descarta. Así la inferencia siempre
+    trabaja sobre la imagen más actual y los cuadros se omiten bajo carga.
+    """
+
+    def __init__(self):
+        self._frame: Optional[bytes] = None
+        self._event = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame: bytes) -> None:
+        """Guardar un cuadro reemplazando el pendiente (si lo hay)"""
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = frame
+        self.received += 1
+        self._event.set()
+
+    def close(self) -> None:
+        """Marcar el fin del stream"""
+        self._closed = True
+        self._event.set()
+
+    async def get(self) -> Optional[bytes]:
+        """
+        Esperar el siguiente cuadro
+
+        Returns:
+            Bytes del cuadro más reciente, o None si el stream terminó
+        """
+        while self._frame is None:
+            if self._closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+
+        frame, self._frame = self._frame, None
+        return frame
+
+class FrameCountSmoother:
+    """
+    Suavizado temporal de las cantidades por instrumento entre cuadros
+
+    Aplica un promedio móvil exponencial por código de instrumento. Los
+    instrumentos que dejan de detectarse decaen hacia cero y se eliminan al
+    quedar por debajo de `min_count`.
+    """
+
+    def __init__(self, alpha: float = 0.3, min_count: float = 0.05):
+        """
+        Args:
+            alpha: Peso del cuadro actual (1.0 = sin suavizado)
+            min_count: Cantidad suavizada mínima para conservar un instrumento
+        """
+        if not 0.0 < alpha <= 1.0:
+            raise ValueError("alpha debe estar en el rango (0, 1]")
+
+        self.alpha = alpha
+        self.min_count = min_count
+        self._counts: Dict[str, float] = {}
+        self._names: Dict[str, str] = {}
+
+    def update(self, summary: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Incorporar el resumen de un cuadro
+
+        Args:
+            summary: Resumen por código de instrumento del cuadro actual
+
+        Returns:
+            Cantidades suavizadas por código de instrumento
+        """
+        for codigo in set(self._counts) | set(summary):
+            current = summary[codigo]["cantidad"] if codigo in summary else 0
+            previous = self._counts.get(codigo)
+            if previous is None:
+                self._counts[codigo] = float(current)
+            else:
+                self._counts[codigo] = self.alpha * current + (1 - self.alpha) * previous
+
+            if codigo in summary:
+                self._names[codigo] = summary[codigo]["nombre"]
+
+        for codigo in [codigo for codigo, count in self._counts.items() if count < self.min_count]:
+            del self._counts[codigo]
+            self._names.pop(codigo, None)
+
+        return {
+            codigo: {
+                "nombre": self._names.get(codigo, codigo),
+                "cantidad": int(round(count)),
+                "cantidad_suavizada": round(count, 3)
+            }
+            for codigo, count in sorted(self._counts.items())
+        }
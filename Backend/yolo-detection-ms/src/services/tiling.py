@@ -0,0 +1,99 @@
+from typing import List, Tuple
+
+import numpy as np
+
+def compute_tiles(height: int, width: int, tile_size: int, overlap: float) -> List[Tuple[int, int, int, int]]:
+    """
+    Calcular las ventanas de un recorte en mosaico con solapamiento
+
+    La última fila y columna se alinean con el borde de la imagen para que
+    todas las ventanas tengan el mismo tamaño (salvo imágenes más pequeñas
+    que una ventana).
+
+    Args:
+        height: Alto de la imagen
+        width: Ancho de la imagen
+        tile_size: Lado de cada ventana en píxeles
+        overlap: Fracción de solapamiento entre ventanas vecinas [0, 1)
+
+    Returns:
+        Lista de ventanas (x1, y1, x2, y2)
+    """
+    if tile_size <= 0:
+        raise ValueError("tile_size debe ser positivo")
+    if not 0.0 <= overlap < 1.0:
+        raise ValueError("overlap debe estar en el rango [0, 1)")
+
+    stride = max(1, int(tile_size * (1.0 - overlap)))
+
+    def starts(length: int) -> List[int]:
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, stride))
+        positions.append(length - tile_size)
+        return positions
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height)
+        for x in starts(width)
+    ]
+
+def batched_nms(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    class_ids: np.ndarray,
+    threshold: float,
+    metric: str = "ios"
+) -> np.ndarray:
+    """
+    Supresión de no máximos por clase, vectorizada con numpy
+
+    Las cajas de clases distintas se desplazan a regiones disjuntas para
+    resolver todas las clases en una sola pasada. Con metric="ios"
+    (intersección sobre la caja más pequeña) se eliminan también los
+    fragmentos de un objeto cortado por el borde de una ventana, que con IoU
+    no llegarían al umbral.
+
+    Args:
+        boxes: Cajas Nx4 en formato xyxy
+        scores: Confianzas por caja
+        class_ids: Clases por caja
+        threshold: Umbral de solapamiento para suprimir
+        metric: "iou" o "ios"
+
+    Returns:
+        Índices de las cajas conservadas, ordenados por confianza descendente
+    """
+    if metric not in ("iou", "ios"):
+        raise ValueError(f"Métrica no soportada: {metric}")
+    if boxes.shape[0] == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Separar las clases desplazando cada una fuera del rango de las demás
+    offsets = class_ids.astype(np.float64)[:, None] * (float(boxes.max()) + 1.0)
+    shifted = boxes.astype(np.float64) + offsets
+
+    x1, y1, x2, y2 = shifted.T
+    areas = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+
+    while order.size > 0:
+        current = order[0]
+        keep.append(current)
+        rest = order[1:]
+
+        inter_w = np.maximum(0.0, np.minimum(x2[current], x2[rest]) - np.maximum(x1[current], x1[rest]))
+        inter_h = np.maximum(0.0, np.minimum(y2[current], y2[rest]) - np.maximum(y1[current], y1[rest]))
+        intersection = inter_w * inter_h
+
+        if metric == "iou":
+            denominator = areas[current] + areas[rest] - intersection
+        else:
+            denominator = np.minimum(areas[current], areas[rest])
+
+        overlap = intersection / np.maximum(denominator, 1e-9)
+        order = rest[overlap <= threshold]
+
+    return np.asarray(keep, dtype=np.int64)
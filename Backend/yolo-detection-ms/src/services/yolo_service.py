@@ -1,86 +1,347 @@
 import os
-import tempfile
-import shutil
-from typing import List, Dict, Any, Optional
+import time
+import hashlib
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Optional, Tuple, Union
 from ultralytics import YOLO
 import cv2
 import numpy as np
-from PIL import Image
 import logging
 
 from ..config.settings import settings
+from .batching import MicroBatcher
+from .cpu_budget import inference_slots
+from .model_backends import resolve_model_path
+from .tiling import compute_tiles, batched_nms
+from .preprocessing import decode_downscaled
+from . import metrics
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_fingerprints: Dict[Tuple[str, float, int], str] = {}
+
+def weights_fingerprint(model_path: str) -> str:
+    """
+    Huella del archivo de pesos: nombre y hash del contenido
+    
+    El hash se calcula una vez por versión del archivo (ruta, mtime y tamaño).
+    Si el archivo no existe (p. ej. pesos que ultralytics descarga al cargar)
+    se usa solo el nombre.
+    
+    Args:
+        model_path: Ruta de los pesos
+        
+    Returns:
+        "<nombre>@<hash>" o el nombre del archivo
+    """
+    name = os.path.basename(model_path)
+    try:
+        stat = os.stat(model_path)
+    except OSError:
+        return name
+    
+    key = (os.path.abspath(model_path), stat.st_mtime, stat.st_size)
+    if key not in _fingerprints:
+        digest = hashlib.blake2b(digest_size=8)
+        with open(model_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        _fingerprints[key] = f"{name}@{digest.hexdigest()}"
+    return _fingerprints[key]
+
 class YOLODetectionService:
     """Servicio para detección de objetos usando YOLO"""
     
-    def __init__(self):
-        """Inicializar el servicio de detección"""
+    # Nombre de la ruta que combina el modelo rápido y el preciso
+    CASCADE = "cascade"
+    
+    def __init__(self, model_path: Optional[str] = None, name: str = "default"):
+        """
+        Inicializar el servicio de detección
+        
+        El modelo no se carga aquí (salvo MODEL_LOAD_MODE=eager): se carga en
+        segundo plano al iniciar la aplicación o en la primera inferencia, de
+        modo que importar el módulo sea inmediato.
+        
+        Args:
+            model_path: Ruta del modelo (por defecto YOLO_MODEL_PATH)
+            name: Nombre del modelo en el registro
+        """
+        self.name = name
         self.model = None
-        self._load_model()
+        self.model_path = model_path or settings.YOLO_MODEL_PATH
+        self.model_version = 0
+        self.loaded_model_path: Optional[str] = None
+        # Estado de preparación: unloaded -> loading -> warming -> ready (o error)
+        self.readiness = "unloaded"
+        self.last_error: Optional[str] = None
+        self._class_lookup = self._build_class_lookup()
+        self._batcher: Optional[MicroBatcher] = None
+        self._model_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        # Modelos adicionales del registro (YOLO_MODELS), creados al primer uso
+        self._models: Dict[str, "YOLODetectionService"] = {}
+        self._registry_lock = threading.Lock()
+        
+        # En modo "process" el modelo lo cargan los procesos de inferencia
+        if settings.MODEL_LOAD_MODE == "eager" and settings.INFERENCE_EXECUTOR != "process":
+            self._load_model()
+        
+        if settings.BATCHING_ENABLED:
+            self._batcher = MicroBatcher(
+                self._predict_batch,
+                max_batch_size=settings.BATCH_MAX_SIZE,
+                max_wait_ms=settings.BATCH_MAX_WAIT_MS,
+                name="yolo-batcher"
+            )
+    
+    def _create_model(self, model_path: str) -> Tuple[Any, str]:
+        """
+        Crear una instancia del modelo para el backend configurado
+        
+        Args:
+            model_path: Ruta del modelo PyTorch (.pt)
+            
+        Returns:
+            Tupla (modelo, ruta efectivamente cargada)
+        """
+        # Exportar (si hace falta) al backend optimizado configurado
+        loaded_path = resolve_model_path(
+            model_path,
+            backend=settings.YOLO_BACKEND,
+            imgsz=settings.YOLO_IMGSZ,
+            int8=settings.YOLO_INT8,
+            calibration_data=settings.YOLO_INT8_CALIBRATION_DATA or None
+        )
+        
+        logger.info(f"Cargando modelo YOLO: {loaded_path} (backend: {settings.YOLO_BACKEND})")
+        if loaded_path == model_path:
+            return YOLO(loaded_path), loaded_path
+        return YOLO(loaded_path, task="detect"), loaded_path
     
     def _load_model(self) -> None:
         """Cargar el modelo YOLO"""
         try:
-            logger.info(f"Cargando modelo YOLO: {settings.YOLO_MODEL_PATH}")
-            self.model = YOLO(settings.YOLO_MODEL_PATH)
+            self.readiness = "loading"
+            self.model, self.loaded_model_path = self._create_model(self.model_path)
+            self.model_version += 1
+            self.readiness = "warming" if settings.WARMUP_ENABLED else "ready"
             logger.info("Modelo YOLO cargado exitosamente")
         except Exception as e:
+            self.readiness = "error"
+            self.last_error = str(e)
             logger.error(f"Error al cargar el modelo YOLO: {str(e)}")
             raise
     
+    def ensure_model_loaded(self, warm: bool = True) -> None:
+        """
+        Cargar el modelo si aún no está cargado (seguro entre hilos)
+        
+        Si la carga ocurre aquí (carga perezosa en la primera inferencia) el
+        modelo también se calienta; de lo contrario quedaría en "warming".
+        
+        Args:
+            warm: Si calentar el modelo cuando esta llamada lo carga
+        """
+        if self.model is not None:
+            return
+        
+        with self._load_lock:
+            if self.model is None:
+                self._load_model()
+                if warm and settings.WARMUP_ENABLED:
+                    self.warmup()
+    
+    def prepare(self) -> bool:
+        """
+        Cargar y calentar el modelo (usado al iniciar la aplicación en segundo plano)
+        
+        Returns:
+            True si el modelo quedó listo para recibir tráfico
+        """
+        try:
+            self.ensure_model_loaded()
+        except Exception:
+            return False
+        
+        # Cargado en el constructor (eager) sin calentar, o calentamiento fallido
+        ready = self.readiness == "ready" or (self.warmup() if settings.WARMUP_ENABLED else True)
+        if ready:
+            self.readiness = "ready"
+        
+        # Los modelos de la cascada se preparan junto con el principal
+        if ready and self.name == "default" and settings.CASCADE_ENABLED:
+            for name in (settings.CASCADE_FAST_MODEL, settings.CASCADE_ACCURATE_MODEL):
+                model = self.get_model(name)
+                if model is not self:
+                    ready = model.prepare() and ready
+        
+        return ready
+    
+    def available_models(self) -> List[str]:
+        """Nombres de modelo que se pueden solicitar por petición"""
+        names = ["default", *settings.YOLO_MODELS]
+        if settings.CASCADE_ENABLED:
+            names.append(self.CASCADE)
+        return names
+    
+    def get_model(self, name: Optional[str]) -> "YOLODetectionService":
+        """
+        Obtener el servicio de un modelo del registro
+        
+        Args:
+            name: Nombre del modelo (None o "default" para el principal)
+            
+        Returns:
+            Servicio que atiende ese modelo
+            
+        Raises:
+            ValueError: Si el nombre no está registrado
+        """
+        if name in (None, "", "default", self.name):
+            return self
+        
+        if name not in settings.YOLO_MODELS:
+            raise ValueError(f"Modelo no registrado: {name}")
+        
+        with self._registry_lock:
+            if name not in self._models:
+                model = YOLODetectionService(settings.YOLO_MODELS[name], name=name)
+                if self._batcher is None:
+                    model.disable_batching()
+                self._models[name] = model
+            return self._models[name]
+    
+    def swap_model(self, model_path: str) -> Dict[str, Any]:
+        """
+        Cargar nuevos pesos en paralelo y reemplazar el modelo de forma atómica
+        
+        El modelo nuevo se carga y se calienta sin afectar al actual. El
+        reemplazo ocurre bajo el lock del modelo, por lo que las inferencias en
+        curso terminan con el modelo anterior y las siguientes usan el nuevo.
+        
+        Args:
+            model_path: Ruta de los nuevos pesos (.pt)
+            
+        Returns:
+            Información del modelo activo tras el reemplazo
+        """
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"No existe el modelo: {model_path}")
+        
+        with self._swap_lock:
+            start_time = time.perf_counter()
+            new_model, loaded_path = self._create_model(model_path)
+            
+            if settings.WARMUP_ENABLED:
+                self._warmup_passes(
+                    lambda batch: new_model(
+                        batch,
+                        conf=settings.CONFIDENCE_THRESHOLD,
+                        iou=settings.IOU_THRESHOLD,
+                        imgsz=settings.YOLO_IMGSZ,
+                        verbose=False
+                    ),
+                    settings.WARMUP_RUNS,
+                    settings.WARMUP_BATCH_SIZES or [1]
+                )
+            
+            with self._model_lock:
+                previous_path = self.model_path
+                self.model = new_model
+                self.model_path = model_path
+                self.loaded_model_path = loaded_path
+                self.model_version += 1
+                self.readiness = "ready"
+                self.last_error = None
+            
+            logger.info(
+                f"Modelo reemplazado: {previous_path} -> {model_path} "
+                f"en {time.perf_counter() - start_time:.2f}s"
+            )
+        
+        return self.get_model_info()
+    
+    def adopt_model_path(self, model_path: str) -> None:
+        """
+        Registrar pesos cargados en otros procesos sin cargarlos en este
+        
+        Con INFERENCE_EXECUTOR=process los procesos de inferencia cargan el
+        modelo; el proceso principal solo actualiza la ruta y la versión, que
+        forman parte de model_id y weights_id (caché e historial).
+        
+        Args:
+            model_path: Ruta de los nuevos pesos
+        """
+        with self._model_lock:
+            self.model_path = model_path
+            self.loaded_model_path = None
+            self.model_version += 1
+    
     def detect_instruments(
         self, 
-        image_path: str,
+        image: Union[str, np.ndarray],
         confidence_threshold: Optional[float] = None,
-        iou_threshold: Optional[float] = None
+        iou_threshold: Optional[float] = None,
+        detail: str = "full",
+        sliced: bool = False,
+        scale: Optional[Tuple[float, float]] = None,
+        model: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Detectar instrumentos quirúrgicos en una imagen
         
         Args:
-            image_path: Ruta de la imagen
+            image: Ruta de la imagen o imagen ya decodificada (arreglo BGR)
             confidence_threshold: Umbral de confianza (opcional)
             iou_threshold: Umbral de IoU (opcional)
+            detail: "full" incluye cada detección; "summary" solo el resumen
+            sliced: Procesar la imagen en ventanas solapadas (imágenes de alta resolución)
+            scale: Factores (x, y) para llevar las cajas a la imagen original
+                si la imagen se decodificó reducida
+            model: Modelo del registro o "cascade" (por defecto la cascada si
+                está habilitada, si no el modelo principal)
             
         Returns:
             Diccionario con los resultados de detección
         """
         try:
+            route = self._resolve_route(model, sliced)
+            if route == self.CASCADE:
+                return self._detect_cascade(
+                    image, *self.resolve_thresholds(confidence_threshold, iou_threshold), detail, scale
+                )
+            
+            target = self.get_model(route)
+            if target is not self:
+                return target.detect_instruments(
+                    image, confidence_threshold, iou_threshold, detail, sliced, scale, model=target.name
+                )
+            
             if not self.model:
-                raise ValueError("Modelo YOLO no está cargado")
+                self.ensure_model_loaded()
             
             # Usar valores por defecto si no se proporcionan
-            conf_threshold = confidence_threshold or settings.CONFIDENCE_THRESHOLD
-            iou_threshold = iou_threshold or settings.IOU_THRESHOLD
-            
-            logger.info(f"Procesando imagen: {image_path}")
+            conf_threshold, iou_threshold = self.resolve_thresholds(confidence_threshold, iou_threshold)
             
-            # Realizar la detección
-            results = self.model(
-                image_path,
-                conf=conf_threshold,
-                iou=iou_threshold,
-                verbose=False
-            )
+            if isinstance(image, np.ndarray):
+                logger.info(f"Procesando imagen en memoria: {image.shape[1]}x{image.shape[0]}")
+            else:
+                logger.info(f"Procesando imagen: {image}")
             
-            # Procesar los resultados
-            detections = self._process_results(results[0])
+            if sliced:
+                return self._detect_sliced(image, conf_threshold, iou_threshold, detail)
             
-            # Generar resumen
-            summary = self._generate_summary(detections)
+            # Realizar la detección (agrupada con otras solicitudes si hay batching)
+            result = self._predict(image, conf_threshold, iou_threshold)
             
-            return {
-                "success": True,
-                "total_objects": len(detections),
-                "detections": detections,
-                "summary": summary,
-                "confidence_threshold": conf_threshold,
-                "iou_threshold": iou_threshold
-            }
+            response = self._build_detection_result(result, conf_threshold, iou_threshold, detail, scale)
+            response["model"] = self.name
+            return response
             
         except Exception as e:
             logger.error(f"Error en detección: {str(e)}")
@@ -91,43 +352,672 @@ class YOLODetectionService:
                 "summary": {}
             }
     
-    def _process_results(self, result) -> List[Dict[str, Any]]:
+    def detect_instruments_batch(
+        self,
+        images: List[Union[str, np.ndarray]],
+        confidence_threshold: Optional[float] = None,
+        iou_threshold: Optional[float] = None,
+        detail: str = "full",
+        scales: Optional[List[Optional[Tuple[float, float]]]] = None,
+        model: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Detectar instrumentos en varias imágenes usando pasadas por lotes del modelo
+        
+        Args:
+            images: Rutas o imágenes ya decodificadas
+            confidence_threshold: Umbral de confianza (opcional)
+            iou_threshold: Umbral de IoU (opcional)
+            detail: "full" incluye cada detección; "summary" solo el resumen
+            scales: Factores de escala por imagen (ver detect_instruments)
+            model: Modelo del registro o "cascade" (ver detect_instruments)
+            
+        Returns:
+            Un resultado por imagen, con la misma estructura que detect_instruments
+        """
+        conf_threshold, iou_threshold = self.resolve_thresholds(confidence_threshold, iou_threshold)
+        outputs: List[Dict[str, Any]] = []
+        chunk_size = max(1, settings.BATCH_MAX_SIZE)
+        scales = scales or [None] * len(images)
+        
+        route = self._resolve_route(model)
+        if route == self.CASCADE:
+            return [
+                self.detect_instruments(image, conf_threshold, iou_threshold, detail, scale=scale, model=route)
+                for image, scale in zip(images, scales)
+            ]
+        
+        target = self.get_model(route)
+        if target is not self:
+            return target.detect_instruments_batch(
+                images, conf_threshold, iou_threshold, detail, scales, model=target.name
+            )
+        
+        for start in range(0, len(images), chunk_size):
+            chunk = images[start:start + chunk_size]
+            
+            try:
+                results = self._predict_batch((conf_threshold, iou_threshold), chunk)
+                for result, scale in zip(results, scales[start:start + chunk_size]):
+                    response = self._build_detection_result(result, conf_threshold, iou_threshold, detail, scale)
+                    response["model"] = self.name
+                    outputs.append(response)
+            except Exception as e:
+                logger.error(f"Error en detección por lote: {str(e)}")
+                outputs.extend(
+                    {"success": False, "error": str(e), "detections": [], "summary": {}}
+                    for _ in chunk
+                )
+        
+        return outputs
+    
+    def _build_detection_result(
+        self,
+        result,
+        conf_threshold: float,
+        iou_threshold: float,
+        detail: str = "full",
+        scale: Optional[Tuple[float, float]] = None
+    ) -> Dict[str, Any]:
         """
-        Procesar los resultados de YOLO
+        Construir la respuesta de detección para el resultado de una imagen
         
         Args:
             result: Resultado de YOLO
+            conf_threshold: Umbral de confianza usado
+            iou_threshold: Umbral de IoU usado
+            detail: "full" incluye cada detección; "summary" solo el resumen
+            scale: Factores (x, y) hacia la imagen original (opcional)
+            
+        Returns:
+            Diccionario con detecciones y resumen
+        """
+        start_time = time.perf_counter()
+        response = self._build_result_from_arrays(
+            *self._extract_arrays(result), conf_threshold, iou_threshold, detail, scale
+        )
+        self._observe_speed(result, time.perf_counter() - start_time)
+        return response
+    
+    def _build_result_from_arrays(
+        self,
+        boxes: np.ndarray,
+        confidences: np.ndarray,
+        class_ids: np.ndarray,
+        conf_threshold: float,
+        iou_threshold: float,
+        detail: str = "full",
+        scale: Optional[Tuple[float, float]] = None
+    ) -> Dict[str, Any]:
+        """
+        Construir la respuesta de detección a partir de los arreglos de cajas
+        
+        Args:
+            boxes: Cajas Nx4 en formato xyxy
+            confidences: Confianzas por caja
+            class_ids: Clases por caja
+            conf_threshold: Umbral de confianza usado
+            iou_threshold: Umbral de IoU usado
+            detail: "full" incluye cada detección, "columnar" las agrupa en
+                arreglos paralelos y "summary" solo devuelve el resumen
+            scale: Factores (x, y) hacia la imagen original (opcional)
+            
+        Returns:
+            Diccionario con detecciones y resumen
+        """
+        if scale is not None and tuple(scale) != (1.0, 1.0):
+            scale_x, scale_y = scale
+            boxes = boxes * np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)
+        
+        # Las detecciones por caja solo se construyen si se solicitan
+        if detail == "columnar":
+            detections = self._build_columnar(boxes, confidences, class_ids)
+        elif detail == "full":
+            detections = self._build_detections(boxes, confidences, class_ids)
+        else:
+            detections = []
+        summary = self._summarize_arrays(confidences, class_ids)
+        
+        for codigo, item in summary.items():
+            metrics.detections_total.inc(item["cantidad"], codigo=codigo)
+        
+        return {
+            "success": True,
+            "total_objects": int(confidences.size),
+            "detections": detections,
+            "summary": summary,
+            "detail": detail,
+            "confidence_threshold": conf_threshold,
+            "iou_threshold": iou_threshold
+        }
+    
+    def _detect_sliced(
+        self,
+        image: Union[str, np.ndarray],
+        conf_threshold: float,
+        iou_threshold: float,
+        detail: str
+    ) -> Dict[str, Any]:
+        """
+        Detección por ventanas solapadas para imágenes de alta resolución
+        
+        La imagen se divide en ventanas del tamaño de entrada del modelo, que se
+        procesan en lotes; las cajas se trasladan a coordenadas de la imagen
+        original y se fusionan con una supresión de no máximos entre ventanas.
+        
+        Args:
+            image: Ruta o imagen decodificada
+            conf_threshold: Umbral de confianza
+            iou_threshold: Umbral de IoU
+            detail: Nivel de detalle de la respuesta
+            
+        Returns:
+            Diccionario con los resultados de detección
+        """
+        if not isinstance(image, np.ndarray):
+            path = image
+            image = cv2.imread(path)
+            if image is None:
+                raise ValueError(f"No se pudo leer la imagen: {path}")
+        
+        height, width = image.shape[:2]
+        tiles = compute_tiles(height, width, settings.SLICED_TILE_SIZE, settings.SLICED_OVERLAP)
+        
+        # Las ventanas son vistas del arreglo original (sin copias)
+        sources = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+        offsets = [(float(x1), float(y1)) for x1, y1, _, _ in tiles]
+        if settings.SLICED_INCLUDE_FULL_IMAGE and len(tiles) > 1:
+            # Pasada global para objetos grandes que no caben en una ventana
+            sources.append(image)
+            offsets.append((0.0, 0.0))
+        
+        all_boxes, all_confidences, all_class_ids = [], [], []
+        chunk_size = max(1, settings.BATCH_MAX_SIZE)
+        
+        for start in range(0, len(sources), chunk_size):
+            results = self._predict_batch(
+                (conf_threshold, iou_threshold), sources[start:start + chunk_size]
+            )
+            
+            for result, (offset_x, offset_y) in zip(results, offsets[start:start + chunk_size]):
+                self._observe_speed(result)
+                boxes, confidences, class_ids = self._extract_arrays(result)
+                all_boxes.append(boxes + np.array([offset_x, offset_y, offset_x, offset_y], dtype=np.float32))
+                all_confidences.append(confidences)
+                all_class_ids.append(class_ids)
+        
+        boxes = np.concatenate(all_boxes)
+        confidences = np.concatenate(all_confidences)
+        class_ids = np.concatenate(all_class_ids)
+        
+        keep = batched_nms(boxes, confidences, class_ids, settings.SLICED_MERGE_THRESHOLD, metric="ios")
+        
+        response = self._build_result_from_arrays(
+            boxes[keep], confidences[keep], class_ids[keep], conf_threshold, iou_threshold, detail
+        )
+        response["model"] = self.name
+        response["sliced"] = {
+            "tiles": len(tiles),
+            "tile_size": settings.SLICED_TILE_SIZE,
+            "overlap": settings.SLICED_OVERLAP,
+            "merged_boxes": int(boxes.shape[0] - keep.size)
+        }
+        return response
+    
+    def _resolve_route(self, model: Optional[str], sliced: bool = False) -> str:
+        """
+        Elegir el modelo que atiende una solicitud
+        
+        Sin modelo explícito se usa la cascada si está habilitada. La inferencia
+        por ventanas no pasa por la cascada: usa el modelo principal.
+        """
+        route = model or (self.CASCADE if settings.CASCADE_ENABLED else self.name)
+        if route == self.CASCADE:
+            if not settings.CASCADE_FAST_MODEL:
+                raise ValueError("La cascada requiere CASCADE_FAST_MODEL")
+            if sliced:
+                return self.name
+        return route
+    
+    def _detect_cascade(
+        self,
+        image: Union[str, np.ndarray],
+        conf_threshold: float,
+        iou_threshold: float,
+        detail: str,
+        scale: Optional[Tuple[float, float]] = None
+    ) -> Dict[str, Any]:
+        """
+        Detección en cascada: modelo rápido primero y preciso solo si hay dudas
+        
+        El modelo rápido se ejecuta con un umbral bajo para ver también los
+        candidatos dudosos. Las detecciones con confianza mayor o igual a
+        CASCADE_ACCEPT_CONFIDENCE se aceptan; si quedan candidatos por debajo, se
+        escala al modelo preciso la imagen completa o solo las regiones dudosas
+        (recortes con margen, procesados en lote).
+        
+        Args:
+            image: Ruta o imagen decodificada
+            conf_threshold: Umbral de confianza final
+            iou_threshold: Umbral de IoU
+            detail: Nivel de detalle de la respuesta
+            scale: Factores (x, y) hacia la imagen original (opcional)
+            
+        Returns:
+            Diccionario con los resultados de detección
+        """
+        fast = self.get_model(settings.CASCADE_FAST_MODEL)
+        accurate = self.get_model(settings.CASCADE_ACCURATE_MODEL)
+        
+        if not isinstance(image, np.ndarray):
+            path = image
+            image = cv2.imread(path)
+            if image is None:
+                raise ValueError(f"No se pudo leer la imagen: {path}")
+        
+        fast.ensure_model_loaded()
+        fast_result = fast._predict(image, min(settings.CASCADE_MIN_CONFIDENCE, conf_threshold), iou_threshold)
+        boxes, confidences, class_ids = fast._extract_arrays(fast_result)
+        fast._observe_speed(fast_result)
+        
+        accept_threshold = max(settings.CASCADE_ACCEPT_CONFIDENCE, conf_threshold)
+        ambiguous = confidences < accept_threshold
+        escalation = "none"
+        regions = 0
+        
+        if ambiguous.any() and settings.CASCADE_ESCALATION == "image":
+            escalation = "image"
+            accurate.ensure_model_loaded()
+            accurate_result = accurate._predict(image, conf_threshold, iou_threshold)
+            accurate._observe_speed(accurate_result)
+            boxes, confidences, class_ids = accurate._extract_arrays(accurate_result)
+        elif ambiguous.any():
+            escalation = "regions"
+            windows = self._cascade_regions(boxes[ambiguous], image.shape[:2])
+            regions = len(windows)
+            
+            kept_boxes = [boxes[~ambiguous]]
+            kept_confidences = [confidences[~ambiguous]]
+            kept_class_ids = [class_ids[~ambiguous]]
+            
+            crops = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in windows]
+            chunk_size = max(1, settings.BATCH_MAX_SIZE)
+            for start in range(0, len(crops), chunk_size):
+                results = accurate._predict_batch(
+                    (conf_threshold, iou_threshold), crops[start:start + chunk_size]
+                )
+                for result, (x1, y1, _, _) in zip(results, windows[start:start + chunk_size]):
+                    accurate._observe_speed(result)
+                    region_boxes, region_confidences, region_class_ids = accurate._extract_arrays(result)
+                    kept_boxes.append(region_boxes + np.array([x1, y1, x1, y1], dtype=np.float32))
+                    kept_confidences.append(region_confidences)
+                    kept_class_ids.append(region_class_ids)
+            
+            boxes = np.concatenate(kept_boxes)
+            confidences = np.concatenate(kept_confidences)
+            class_ids = np.concatenate(kept_class_ids)
+            
+            # Mismo criterio de fusión que la inferencia por ventanas
+            keep = batched_nms(boxes, confidences, class_ids, settings.SLICED_MERGE_THRESHOLD, metric="ios")
+            boxes, confidences, class_ids = boxes[keep], confidences[keep], class_ids[keep]
+        
+        selected = confidences >= conf_threshold
+        response = self._build_result_from_arrays(
+            boxes[selected], confidences[selected], class_ids[selected],
+            conf_threshold, iou_threshold, detail, scale
+        )
+        response["model"] = self.CASCADE
+        response["cascade"] = {
+            "fast_model": fast.name,
+            "accurate_model": accurate.name,
+            "escalation": escalation,
+            "ambiguous_detections": int(ambiguous.sum()),
+            "escalated_regions": regions
+        }
+        return response
+    
+    def _cascade_regions(self, boxes: np.ndarray, shape: Tuple[int, int]) -> List[Tuple[int, int, int, int]]:
+        """
+        Calcular los recortes (con margen) alrededor de las detecciones dudosas
+        
+        Args:
+            boxes: Cajas dudosas Nx4 en formato xyxy
+            shape: Alto y ancho de la imagen
+            
+        Returns:
+            Lista de ventanas (x1, y1, x2, y2) dentro de la imagen
+        """
+        height, width = shape
+        sizes = np.maximum(boxes[:, 2:] - boxes[:, :2], 1.0)
+        # Margen proporcional con un mínimo para dar contexto a objetos pequeños
+        margins = np.maximum(sizes * settings.CASCADE_REGION_PADDING, 16.0)
+        
+        x1 = np.clip(boxes[:, 0] - margins[:, 0], 0, width).astype(int)
+        y1 = np.clip(boxes[:, 1] - margins[:, 1], 0, height).astype(int)
+        x2 = np.clip(np.ceil(boxes[:, 2] + margins[:, 0]), 0, width).astype(int)
+        y2 = np.clip(np.ceil(boxes[:, 3] + margins[:, 1]), 0, height).astype(int)
+        
+        return [
+            (int(a), int(b), int(c), int(d))
+            for a, b, c, d in zip(x1, y1, x2, y2) if c > a and d > b
+        ]
+    
+    @property
+    def model_id(self) -> str:
+        """Identificador del modelo actualmente cargado (cambia al recargarlo)"""
+        return f"{self.loaded_model_path or self.model_path}#{self.model_version}"
+    
+    @property
+    def weights_id(self) -> str:
+        """Identificador persistente de los pesos (huella del archivo y backend)"""
+        weights = weights_fingerprint(self.model_path)
+        if settings.YOLO_BACKEND != "pytorch":
+            weights += f"/{settings.YOLO_BACKEND}{'-int8' if settings.YOLO_INT8 else ''}"
+        return weights
+    
+    def route_weights_id(self, model: Optional[str] = None, sliced: bool = False) -> str:
+        """
+        Identificador persistente de los pesos que atienden una solicitud
+        
+        A diferencia de model_id, no depende del proceso: es el mismo en la API,
+        en los procesos de trabajo y entre reinicios mientras los pesos no cambien.
+        
+        Args:
+            model: Modelo del registro o "cascade" (ver detect_instruments)
+            sliced: Si la solicitud usa inferencia por ventanas
+            
+        Returns:
+            weights_id del modelo resuelto; en cascada combina el rápido y el preciso
+        """
+        route = self._resolve_route(model, sliced)
+        if route == self.CASCADE:
+            fast = self.get_model(settings.CASCADE_FAST_MODEL)
+            accurate = self.get_model(settings.CASCADE_ACCURATE_MODEL)
+            return f"{self.CASCADE}:{fast.weights_id}>{accurate.weights_id}"
+        return self.get_model(route).weights_id
+    
+    def resolve_thresholds(
+        self,
+        confidence_threshold: Optional[float] = None,
+        iou_threshold: Optional[float] = None
+    ) -> Tuple[float, float]:
+        """
+        Resolver los umbrales efectivos aplicando los valores por defecto
+        
+        Args:
+            confidence_threshold: Umbral de confianza (opcional)
+            iou_threshold: Umbral de IoU (opcional)
+            
+        Returns:
+            Tupla (umbral de confianza, umbral de IoU)
+        """
+        return (
+            confidence_threshold or settings.CONFIDENCE_THRESHOLD,
+            iou_threshold or settings.IOU_THRESHOLD
+        )
+    
+    def _predict(self, source: Any, conf_threshold: float, iou_threshold: float):
+        """
+        Ejecutar el modelo sobre una imagen
+        
+        Si el micro-batching está habilitado, la imagen se encola y se procesa
+        junto con las demás solicitudes concurrentes que usan los mismos umbrales.
+        
+        Args:
+            source: Ruta o arreglo de la imagen
+            conf_threshold: Umbral de confianza
+            iou_threshold: Umbral de IoU
+            
+        Returns:
+            Resultado de YOLO para la imagen
+        """
+        if self._batcher is not None:
+            future = self._batcher.submit(source, key=(conf_threshold, iou_threshold))
+            try:
+                return future.result(timeout=settings.BATCH_RESULT_TIMEOUT_SECONDS)
+            except FutureTimeoutError:
+                future.cancel()
+                raise RuntimeError(
+                    f"El lote no respondió en {settings.BATCH_RESULT_TIMEOUT_SECONDS} s"
+                )
+        
+        metrics.batch_size.observe(1)
+        results = self._call_model(source, conf_threshold, iou_threshold)
+        return results[0]
+    
+    def _call_model(self, source: Any, conf_threshold: float, iou_threshold: float) -> List[Any]:
+        """
+        Invocar el modelo de forma exclusiva
+        
+        El predictor de Ultralytics mantiene estado interno y no es seguro entre
+        hilos, por lo que las llamadas se serializan con un lock. Además, el
+        total de pasadas simultáneas del proceso (entre todos los modelos) se
+        limita con MAX_CONCURRENT_INFERENCES.
+        
+        Args:
+            source: Ruta, arreglo o lista de imágenes
+            conf_threshold: Umbral de confianza
+            iou_threshold: Umbral de IoU
+            
+        Returns:
+            Resultados de YOLO
+        """
+        with self._model_lock, inference_slots:
+            return self.model(
+                source,
+                conf=conf_threshold,
+                iou=iou_threshold,
+                imgsz=settings.YOLO_IMGSZ,
+                verbose=False
+            )
+    
+    def _predict_batch(self, key: Tuple[float, float], sources: List[Any]) -> List[Any]:
+        """
+        Ejecutar una sola pasada del modelo sobre un lote de imágenes
+        
+        Args:
+            key: Tupla (umbral de confianza, umbral de IoU) compartida por el lote
+            sources: Rutas o arreglos de las imágenes
+            
+        Returns:
+            Un resultado de YOLO por imagen, en el mismo orden
+        """
+        self.ensure_model_loaded()
+        
+        conf_threshold, iou_threshold = key
+        metrics.batch_size.observe(len(sources))
+        results = self._call_model(list(sources), conf_threshold, iou_threshold)
+        return list(results)
+    
+    @property
+    def batch_queue_depth(self) -> int:
+        """Imágenes esperando en el micro-batcher"""
+        return self._batcher.pending if self._batcher is not None else 0
+    
+    def _observe_speed(self, result, extra_postprocess: float = 0.0) -> None:
+        """
+        Registrar los tiempos por etapa que Ultralytics reporta para una imagen
+        
+        Args:
+            result: Resultado de YOLO (atributo `speed` en milisegundos)
+            extra_postprocess: Segundos de post-proceso propio (armado de la respuesta)
+        """
+        speed = getattr(result, "speed", None)
+        if not isinstance(speed, dict):
+            return
+        
+        for stage in ("preprocess", "inference"):
+            if speed.get(stage) is not None:
+                metrics.stage_duration.observe(speed[stage] / 1000, stage=stage)
+        metrics.stage_duration.observe(
+            (speed.get("postprocess") or 0.0) / 1000 + extra_postprocess, stage="postprocess"
+        )
+    
+    def warmup(self, runs: Optional[int] = None, batch_sizes: Optional[List[int]] = None) -> bool:
+        """
+        Calentar el modelo con inferencias sobre imágenes vacías
+        
+        Fuerza la inicialización perezosa de grafos, kernels y memoria antes de
+        recibir tráfico real, al tamaño de entrada y tamaños de lote configurados.
+        
+        Args:
+            runs: Inferencias por tamaño de lote (por defecto WARMUP_RUNS)
+            batch_sizes: Tamaños de lote a calentar (por defecto WARMUP_BATCH_SIZES)
+            
+        Returns:
+            True si el calentamiento terminó correctamente
+        """
+        runs = settings.WARMUP_RUNS if runs is None else runs
+        batch_sizes = batch_sizes or settings.WARMUP_BATCH_SIZES or [1]
+        
+        try:
+            self.ensure_model_loaded(warm=False)
+            self.readiness = "warming"
+            
+            start_time = time.perf_counter()
+            self._warmup_passes(
+                lambda batch: self._call_model(batch, settings.CONFIDENCE_THRESHOLD, settings.IOU_THRESHOLD),
+                runs,
+                batch_sizes
+            )
+            
+            self.readiness = "ready"
+            logger.info(
+                f"Calentamiento completado en {time.perf_counter() - start_time:.2f}s "
+                f"(lotes: {batch_sizes}, repeticiones: {runs})"
+            )
+            return True
+        except Exception as e:
+            self.readiness = "error"
+            self.last_error = str(e)
+            logger.error(f"Error en el calentamiento del modelo: {str(e)}")
+            return False
+    
+    def _warmup_passes(self, call: Any, runs: int, batch_sizes: List[int]) -> None:
+        """
+        Ejecutar las inferencias de calentamiento con imágenes vacías
+        
+        Args:
+            call: Función que ejecuta el modelo sobre una lista de imágenes
+            runs: Inferencias por tamaño de lote
+            batch_sizes: Tamaños de lote a calentar
+        """
+        dummy = np.zeros((settings.YOLO_IMGSZ, settings.YOLO_IMGSZ, 3), dtype=np.uint8)
+        
+        for batch_size in batch_sizes:
+            for _ in range(max(1, runs)):
+                call([dummy] * batch_size)
+    
+    def disable_batching(self) -> None:
+        """Desactivar el micro-batching (las inferencias se ejecutan directamente)"""
+        if self._batcher is not None:
+            self._batcher.stop()
+            self._batcher = None
+    
+    def shutdown(self) -> None:
+        """Liberar recursos del servicio (hilo de batching y modelos del registro)"""
+        if self._batcher is not None:
+            self._batcher.stop()
+        for model in self._models.values():
+            model.shutdown()
+    
+    def _extract_arrays(self, result) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Extraer cajas, confianzas y clases de un resultado de YOLO como arreglos
+        
+        Args:
+            result: Resultado de YOLO
+            
+        Returns:
+            Tupla (cajas Nx4, confianzas N, class_ids N)
+        """
+        if result.boxes is None:
+            return (
+                np.empty((0, 4), dtype=np.float32),
+                np.empty(0, dtype=np.float32),
+                np.empty(0, dtype=np.int64)
+            )
+        
+        boxes = np.asarray(result.boxes.xyxy.cpu().numpy(), dtype=np.float32).reshape(-1, 4)
+        confidences = np.asarray(result.boxes.conf.cpu().numpy(), dtype=np.float32).reshape(-1)
+        class_ids = np.asarray(result.boxes.cls.cpu().numpy().astype(int), dtype=np.int64).reshape(-1)
+        
+        return boxes, confidences, class_ids
+    
+    def _build_detections(
+        self,
+        boxes: np.ndarray,
+        confidences: np.ndarray,
+        class_ids: np.ndarray
+    ) -> List[Dict[str, Any]]:
+        """
+        Construir la lista detallada de detecciones (una por caja)
+        
+        Args:
+            boxes: Cajas Nx4 en formato xyxy
+            confidences: Confianzas por caja
+            class_ids: Clases por caja
             
         Returns:
             Lista de detecciones procesadas
         """
-        detections = []
+        # Convertir una sola vez a tipos nativos de Python
+        box_list = boxes.tolist()
+        confidence_list = confidences.tolist()
+        class_list = class_ids.tolist()
         
-        if result.boxes is not None:
-            boxes = result.boxes.xyxy.cpu().numpy()
-            confidences = result.boxes.conf.cpu().numpy()
-            class_ids = result.boxes.cls.cpu().numpy().astype(int)
+        return [
+            {
+                "id": i + 1,
+                "class_id": class_id,
+                "confidence": confidence,
+                "bbox": {"x1": box[0], "y1": box[1], "x2": box[2], "y2": box[3]},
+                "instrument": self._get_instrument_info(class_id)
+            }
+            for i, (box, confidence, class_id) in enumerate(zip(box_list, confidence_list, class_list))
+        ]
+    
+    def _build_columnar(
+        self,
+        boxes: np.ndarray,
+        confidences: np.ndarray,
+        class_ids: np.ndarray
+    ) -> Dict[str, Any]:
+        """
+        Construir las detecciones en formato columnar
+        
+        Las cajas, confianzas y clases se devuelven como arreglos paralelos y la
+        información de cada instrumento se incluye una sola vez por clase
+        presente, en lugar de repetirse en cada detección.
+        
+        Args:
+            boxes: Cajas Nx4 en formato xyxy
+            confidences: Confianzas por caja
+            class_ids: Clases por caja
             
-            for i, (box, confidence, class_id) in enumerate(zip(boxes, confidences, class_ids)):
-                # Obtener información del instrumento
-                instrument_info = self._get_instrument_info(class_id)
-                
-                detection = {
-                    "id": i + 1,
-                    "class_id": int(class_id),
-                    "confidence": float(confidence),
-                    "bbox": {
-                        "x1": float(box[0]),
-                        "y1": float(box[1]),
-                        "x2": float(box[2]),
-                        "y2": float(box[3])
-                    },
-                    "instrument": instrument_info
-                }
-                
-                detections.append(detection)
+        Returns:
+            Diccionario con boxes, confidences, class_ids y classes
+        """
+        return {
+            "boxes": np.round(boxes, 2).tolist(),
+            "confidences": np.round(confidences, 4).tolist(),
+            "class_ids": class_ids.tolist(),
+            "classes": [
+                {"class_id": class_id, **self._get_instrument_info(class_id)}
+                for class_id in np.unique(class_ids).tolist()
+            ]
+        }
+    
+    def _build_class_lookup(self) -> List[Dict[str, str]]:
+        """
+        Precalcular la tabla class_id -> instrumento
         
-        return detections
+        Returns:
+            Lista indexada por class_id con la información de cada instrumento
+        """
+        instrument_map = settings.SURGICAL_INSTRUMENTS_MAP
+        size = max(instrument_map.keys()) + 1 if instrument_map else 0
+        return [self._get_instrument_info(class_id) for class_id in range(size)]
     
     def _get_instrument_info(self, class_id: int) -> Dict[str, str]:
         """
@@ -139,6 +1029,11 @@ class YOLODetectionService:
         Returns:
             Información del instrumento
         """
+        # Usar la tabla precalculada cuando está disponible
+        lookup = getattr(self, "_class_lookup", None)
+        if lookup is not None and 0 <= class_id < len(lookup):
+            return lookup[class_id]
+        
         # En un modelo personalizado, mapearías los class_ids a instrumentos
         # Por ahora, usamos un mapeo simulado
         instrument_map = settings.SURGICAL_INSTRUMENTS_MAP
@@ -152,72 +1047,145 @@ class YOLODetectionService:
                 "descripcion": f"Objeto no identificado con class_id {class_id}"
             }
     
-    def _generate_summary(self, detections: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def _summarize_arrays(self, confidences: np.ndarray, class_ids: np.ndarray) -> Dict[str, Any]:
         """
-        Generar resumen de las detecciones
+        Generar el resumen por instrumento directamente desde los arreglos
         
         Args:
-            detections: Lista de detecciones
+            confidences: Confianzas por caja
+            class_ids: Clases por caja
             
         Returns:
-            Resumen de las detecciones
+            Resumen con cantidad y confianza promedio por código de instrumento
         """
-        summary = {}
+        if class_ids.size == 0:
+            return {}
         
-        # Contar instrumentos por tipo
-        for detection in detections:
-            instrument = detection["instrument"]
+        counts = np.bincount(class_ids)
+        confidence_sums = np.bincount(class_ids, weights=confidences.astype(np.float64))
+        
+        summary: Dict[str, Any] = {}
+        for class_id in np.flatnonzero(counts).tolist():
+            instrument = self._get_instrument_info(class_id)
             codigo = instrument["codigo"]
-            nombre = instrument["nombre"]
             
             if codigo not in summary:
                 summary[codigo] = {
-                    "nombre": nombre,
+                    "nombre": instrument["nombre"],
                     "descripcion": instrument["descripcion"],
                     "cantidad": 0,
                     "confianza_promedio": 0.0
                 }
             
-            summary[codigo]["cantidad"] += 1
-            summary[codigo]["confianza_promedio"] += detection["confidence"]
+            summary[codigo]["cantidad"] += int(counts[class_id])
+            summary[codigo]["confianza_promedio"] += float(confidence_sums[class_id])
         
         # Calcular confianza promedio
-        for codigo in summary:
-            if summary[codigo]["cantidad"] > 0:
-                summary[codigo]["confianza_promedio"] /= summary[codigo]["cantidad"]
-                summary[codigo]["confianza_promedio"] = round(summary[codigo]["confianza_promedio"], 3)
+        for item in summary.values():
+            item["confianza_promedio"] = round(item["confianza_promedio"] / item["cantidad"], 3)
         
         return summary
     
-    def validate_image(self, image_path: str) -> bool:
+    def decode_image(self, data: bytes) -> Optional[np.ndarray]:
         """
-        Validar que la imagen es válida
+        Decodificar los bytes de una imagen directamente a memoria
         
         Args:
-            image_path: Ruta de la imagen
+            data: Contenido del archivo subido
             
         Returns:
-            True si la imagen es válida, False en caso contrario
+            Imagen BGR como arreglo numpy, o None si no se pudo decodificar
         """
         try:
-            # Verificar que el archivo existe
-            if not os.path.exists(image_path):
-                return False
-            
-            # Intentar abrir la imagen con PIL
-            with Image.open(image_path) as img:
-                img.verify()
-            
-            # Intentar cargar con OpenCV
-            image = cv2.imread(image_path)
-            if image is None:
-                return False
+            if not data:
+                return None
             
-            return True
+            start_time = time.perf_counter()
+            buffer = np.frombuffer(data, dtype=np.uint8)
+            image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+            metrics.stage_duration.observe(time.perf_counter() - start_time, stage="decode")
+            return image
+        except Exception as e:
+            logger.error(f"Error decodificando imagen: {str(e)}")
+            return None
+    
+    def decode_image_for_inference(self, data: bytes) -> Tuple[Optional[np.ndarray], Tuple[float, float]]:
+        """
+        Decodificar una imagen reducida al tamaño de entrada del modelo
+        
+        La reducción ocurre durante la decodificación (JPEG) para ahorrar CPU y
+        memoria; los factores devueltos permiten expresar las cajas en las
+        coordenadas de la imagen original.
+        
+        Args:
+            data: Contenido del archivo subido
             
+        Returns:
+            Tupla (imagen BGR o None, factores de escala (x, y))
+        """
+        if not settings.PREPROCESS_DOWNSCALE_ENABLED:
+            return self.decode_image(data), (1.0, 1.0)
+        
+        try:
+            start_time = time.perf_counter()
+            target_side = settings.PREPROCESS_TARGET_SIDE or settings.YOLO_IMGSZ
+            decoded = decode_downscaled(data, target_side)
+            metrics.stage_duration.observe(time.perf_counter() - start_time, stage="decode")
+            return decoded
         except Exception as e:
-            logger.error(f"Error validando imagen {image_path}: {str(e)}")
+            logger.error(f"Error decodificando imagen: {str(e)}")
+            return None, (1.0, 1.0)
+    
+    def validate_image_array(self, image: Optional[np.ndarray]) -> bool:
+        """
+        Validar una imagen ya decodificada
+        
+        Args:
+            image: Imagen como arreglo numpy
+            
+        Returns:
+            True si la imagen es válida, False en caso contrario
+        """
+        if not isinstance(image, np.ndarray):
+            return False
+        
+        if image.ndim not in (2, 3) or image.size == 0:
             return False
+        
+        return image.shape[0] > 0 and image.shape[1] > 0
+    
+    def merge_summaries(self, summaries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Combinar los resúmenes de varias imágenes en un resumen de la bandeja
+        
+        Args:
+            summaries: Resúmenes por imagen
+            
+        Returns:
+            Resumen combinado con cantidades sumadas y confianza promedio ponderada
+        """
+        merged: Dict[str, Any] = {}
+        
+        for summary in summaries:
+            for codigo, item in summary.items():
+                if codigo not in merged:
+                    merged[codigo] = {
+                        "nombre": item["nombre"],
+                        "descripcion": item.get("descripcion", ""),
+                        "cantidad": 0,
+                        "confianza_promedio": 0.0
+                    }
+                
+                merged[codigo]["cantidad"] += item["cantidad"]
+                merged[codigo]["confianza_promedio"] += item["confianza_promedio"] * item["cantidad"]
+        
+        for codigo in merged:
+            if merged[codigo]["cantidad"] > 0:
+                merged[codigo]["confianza_promedio"] = round(
+                    merged[codigo]["confianza_promedio"] / merged[codigo]["cantidad"], 3
+                )
+        
+        return merged
     
     def get_model_info(self) -> Dict[str, Any]:
         """
@@ -227,13 +1195,40 @@ class YOLODetectionService:
             Información del modelo
         """
         if not self.model:
-            return {"error": "Modelo no cargado"}
+            return {
+                "error": "Modelo no cargado",
+                "model_path": self.model_path,
+                "readiness": self.readiness,
+                "last_error": self.last_error
+            }
         
         return {
-            "model_path": settings.YOLO_MODEL_PATH,
+            "model_path": self.model_path,
+            "model_version": self.model_version,
             "model_type": "YOLOv8",
+            "readiness": self.readiness,
+            "loaded_model_path": self.loaded_model_path,
+            "backend": settings.YOLO_BACKEND,
+            "int8": settings.YOLO_INT8,
+            "imgsz": settings.YOLO_IMGSZ,
             "confidence_threshold": settings.CONFIDENCE_THRESHOLD,
             "iou_threshold": settings.IOU_THRESHOLD,
+            "batching": {
+                "enabled": self._batcher is not None,
+                "max_batch_size": settings.BATCH_MAX_SIZE,
+                "max_wait_ms": settings.BATCH_MAX_WAIT_MS
+            },
+            "models": {
+                "default": self.model_path,
+                **settings.YOLO_MODELS
+            },
+            "cascade": {
+                "enabled": settings.CASCADE_ENABLED,
+                "fast_model": settings.CASCADE_FAST_MODEL,
+                "accurate_model": settings.CASCADE_ACCURATE_MODEL,
+                "accept_confidence": settings.CASCADE_ACCEPT_CONFIDENCE,
+                "escalation": settings.CASCADE_ESCALATION
+            },
             "supported_instruments": list(settings.SURGICAL_INSTRUMENTS_MAP.keys())
         }
 
@@ -1,8 +1,14 @@
 import pytest
 import os
 import sys
+import tempfile
 from fastapi.testclient import TestClient
 
+# La cola de trabajos y el historial de las pruebas viven en directorios temporales
+os.environ.setdefault("JOBS_ENABLED", "True")
+os.environ.setdefault("JOBS_DIR", tempfile.mkdtemp(prefix="yolo-jobs-"))
+os.environ.setdefault("RESULT_STORE_PATH", os.path.join(tempfile.mkdtemp(prefix="yolo-results-"), "detections.db"))
+
 # Agregar el directorio src al path para importaciones
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
@@ -1,7 +1,8 @@
+import asyncio
 import pytest
 from fastapi import status
 import io
-from unittest.mock import patch
+from unittest.mock import patch, AsyncMock, MagicMock
 
 class TestYOLOAPI:
     """Tests para la API de YOLO"""
@@ -26,6 +27,24 @@ class TestYOLOAPI:
         assert "version" in data
         assert "status" in data
         assert data["status"] == "running"
+        assert "hits" in data["result_cache"]
+        assert "misses" in data["result_cache"]
+        assert "intra_op" in data["inference"]["threads"]
+        assert data["inference"]["concurrent_inferences"]["active"] == 0
+    
+    def test_metrics_endpoint(self, client):
+        """Test del endpoint de métricas en formato Prometheus"""
+        client.get("/status")
+        response = client.get("/metrics")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/plain")
+        
+        body = response.text
+        assert "# TYPE yolo_stage_duration_seconds histogram" in body
+        assert 'yolo_queue_depth{queue="executor"}' in body
+        assert "yolo_model_info{" in body
+        assert 'yolo_process_memory_bytes{kind="resident"}' in body
+        assert 'yolo_http_request_duration_seconds_count{method="GET",route="/status",status="200"}' in body
     
     def test_health_check(self, client):
         """Test del health check"""
@@ -37,6 +56,33 @@ class TestYOLOAPI:
         assert "status" in data
         assert "message" in data
     
+    def test_health_check_warming(self, client):
+        """Test del health check mientras el modelo se calienta"""
+        from src.api.controllers.yolo_controller import yolo_controller
+        
+        with patch.object(yolo_controller.yolo_service, "readiness", "warming"):
+            response = client.get("/api/v1/yolo/health")
+        
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.json()["status"] == "warming"
+    
+    def test_health_check_process_mode(self, client):
+        """Test del health check con la preparación de los procesos de inferencia"""
+        from src.api.controllers.yolo_controller import yolo_controller
+        
+        executor = yolo_controller.inference_executor
+        with patch.object(executor, "mode", "process"), \
+                patch.object(yolo_controller.yolo_service, "readiness", "unloaded"):
+            with patch.object(executor, "readiness", "loading"):
+                warming = client.get("/api/v1/yolo/health")
+            with patch.object(executor, "readiness", "ready"):
+                ready = client.get("/api/v1/yolo/health")
+        
+        assert warming.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert warming.json()["status"] == "warming"
+        assert ready.status_code == status.HTTP_200_OK
+        assert ready.json()["status"] == "healthy"
+    
     def test_get_model_info(self, client):
         """Test de obtención de información del modelo"""
         response = client.get("/api/v1/yolo/model/info")
@@ -46,6 +92,40 @@ class TestYOLOAPI:
         # Puede contener error si el modelo no está cargado
         assert isinstance(data, dict)
     
+    def test_swap_model_missing_weights(self, client):
+        """Test de reemplazo de modelo con pesos inexistentes"""
+        from src.config.settings import settings
+        
+        with patch.object(settings, "ADMIN_API_KEY", "secreta"):
+            response = client.post(
+                "/api/v1/yolo/admin/model",
+                json={"model_path": "no_existe.pt"},
+                headers={"X-Admin-Key": "secreta"}
+            )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_swap_model_disabled_without_admin_key(self, client):
+        """Test de administración deshabilitada si no hay clave configurada"""
+        from src.config.settings import settings
+        
+        with patch.object(settings, "ADMIN_API_KEY", ""):
+            response = client.post("/api/v1/yolo/admin/model", json={"model_path": "nuevo.pt"})
+        
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+    
+    def test_swap_model_requires_admin_key(self, client):
+        """Test de autenticación del endpoint de administración"""
+        from src.config.settings import settings
+        
+        with patch.object(settings, "ADMIN_API_KEY", "secreta"):
+            response = client.post(
+                "/api/v1/yolo/admin/model",
+                json={"model_path": "nuevo.pt"},
+                headers={"X-Admin-Key": "incorrecta"}
+            )
+        
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    
     def test_get_supported_instruments(self, client):
         """Test de obtención de instrumentos soportados"""
         response = client.get("/api/v1/yolo/instruments")
@@ -82,7 +162,8 @@ class TestYOLOAPI:
     def test_detect_instruments_valid_image(self, mock_yolo_service, client, sample_image_bytes):
         """Test de detección con imagen válida"""
         # Mock del servicio YOLO
-        mock_yolo_service.validate_image.return_value = True
+        mock_yolo_service.decode_image.return_value = object()
+        mock_yolo_service.validate_image_array.return_value = True
         mock_yolo_service.detect_instruments.return_value = {
             "success": True,
             "total_objects": 2,
@@ -121,6 +202,166 @@ class TestYOLOAPI:
         assert "summary" in data
         assert "file_info" in data
     
+    def test_detect_instruments_corrupt_image(self, client):
+        """Test de detección con bytes que no son una imagen"""
+        files = {
+            "file": ("test.jpg", io.BytesIO(b"no es un jpeg"), "image/jpeg")
+        }
+        
+        response = client.post("/api/v1/yolo/detect", files=files)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        
+        data = response.json()
+        assert "no es una imagen válida" in data["detail"]
+    
+    def test_detect_instruments_queue_full(self, client, sample_image_bytes):
+        """Test de rechazo con 503 y Retry-After cuando la cola está llena"""
+        from src.api.controllers.yolo_controller import yolo_controller
+        from src.services.inference_executor import InferenceQueueFullError
+        
+        files = {
+            "file": ("test.jpg", sample_image_bytes, "image/jpeg")
+        }
+        
+        error = InferenceQueueFullError("Cola llena", retry_after=3)
+        with patch.object(yolo_controller.inference_executor, "run", AsyncMock(side_effect=error)), \
+                patch.object(yolo_controller, "result_cache", None):
+            response = client.post("/api/v1/yolo/detect", files=files)
+        
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.headers["retry-after"] == "3"
+    
+    def test_detect_batch_too_many_files(self, client, sample_image_bytes):
+        """Test de lote con más imágenes de las permitidas"""
+        from src.config.settings import settings
+        
+        content = sample_image_bytes.getvalue()
+        files = [
+            ("files", (f"test_{i}.jpg", io.BytesIO(content), "image/jpeg"))
+            for i in range(settings.MAX_BATCH_FILES + 1)
+        ]
+        
+        response = client.post("/api/v1/yolo/detect/batch", files=files)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+    
+    def test_detect_batch_reports_invalid_files(self, client):
+        """Test de lote con archivos inválidos reportados por imagen"""
+        files = [
+            ("files", ("test.txt", io.BytesIO(b"texto"), "text/plain")),
+            ("files", ("test.jpg", io.BytesIO(b"no es un jpeg"), "image/jpeg"))
+        ]
+        
+        response = client.post("/api/v1/yolo/detect/batch", files=files)
+        assert response.status_code == status.HTTP_200_OK
+        
+        data = response.json()
+        assert data["success"] is False
+        assert data["total_images"] == 2
+        assert data["failed_images"] == 2
+        assert all(result["success"] is False for result in data["results"])
+    
+    def test_submit_and_cancel_job(self, client, sample_image_bytes):
+        """Test de encolado, consulta y cancelación de un trabajo"""
+        files = [
+            ("files", ("test.jpg", io.BytesIO(sample_image_bytes.getvalue()), "image/jpeg")),
+            ("files", ("test.txt", io.BytesIO(b"texto"), "text/plain"))
+        ]
+
+        response = client.post("/api/v1/yolo/jobs", files=files, params={"detail": "summary"})
+        assert response.status_code == status.HTTP_202_ACCEPTED
+
+        job = response.json()
+        assert job["status"] == "queued"
+        assert job["total_images"] == 2
+        assert job["failed_images"] == 1
+        assert job["params"]["detail"] == "summary"
+
+        response = client.get(f"/api/v1/yolo/jobs/{job['job_id']}", params={"include_results": True})
+        assert response.status_code == status.HTTP_200_OK
+        assert [result["status"] for result in response.json()["results"]] == ["queued", "failed"]
+
+        response = client.delete(f"/api/v1/yolo/jobs/{job['job_id']}")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["status"] == "cancelled"
+
+    def test_job_validation(self, client, sample_image_bytes):
+        """Test de trabajos inexistentes y webhook inválido"""
+        response = client.get("/api/v1/yolo/jobs/inexistente")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+        response = client.post(
+            "/api/v1/yolo/jobs",
+            files={"files": ("test.jpg", sample_image_bytes, "image/jpeg")},
+            data={"webhook_url": "ftp://ejemplo"}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = client.post(
+            "/api/v1/yolo/jobs",
+            files={"files": ("test.jpg", sample_image_bytes, "image/jpeg")},
+            data={"webhook_url": "http://127.0.0.1:8080/interno"}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_record_results_keeps_weights_of_inference(self):
+        """Test de que el historial atribuye los resultados a los pesos de la inferencia"""
+        from src.api.controllers.yolo_controller import yolo_controller
+        
+        result = {
+            "success": True, "total_objects": 1, "summary": {"BISP-001": {"cantidad": 1}},
+            "confidence_threshold": 0.5, "iou_threshold": 0.45
+        }
+        recorder = MagicMock()
+        service = yolo_controller.yolo_service
+        with patch.object(yolo_controller, "result_recorder", recorder), \
+                patch.object(yolo_controller, "result_store", MagicMock()), \
+                patch.object(service, "route_weights_id", return_value="anterior.pt@1"):
+            asyncio.run(yolo_controller._record_results([("hash-1", result, 5.0, "a.jpg")], None))
+        
+        # Un reemplazo del modelo antes de la escritura no cambia la atribución
+        with patch.object(service, "route_weights_id", return_value="nuevo.pt@2"):
+            records = recorder.submit.call_args[0][0]()
+        
+        assert [record["model_id"] for record in records] == ["anterior.pt@1"]
+    
+    def test_result_store_endpoints(self, client):
+        """Test del historial: pendientes por modelo, deriva e imagen sin resultados"""
+        from src.api.controllers.yolo_controller import yolo_controller
+        from src.services.result_store import build_record
+        
+        weights_id = yolo_controller.yolo_service.route_weights_id()
+        yolo_controller.result_store.record([build_record("hash-api", weights_id, {
+            "success": True,
+            "total_objects": 1,
+            "summary": {"BISP-001": {"cantidad": 1}},
+            "confidence_threshold": 0.5,
+            "iou_threshold": 0.45
+        })])
+        
+        response = client.post(
+            "/api/v1/yolo/results/unscored",
+            json={"image_hashes": ["hash-api", "hash-nuevo"]}
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["weights_id"] == weights_id
+        assert response.json()["unscored"] == ["hash-nuevo"]
+        
+        response = client.get("/api/v1/yolo/results/drift", params={"baseline": weights_id})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["images_changed"] == 0
+        
+        assert client.get("/api/v1/yolo/results/hash-api").json()["results"][0]["counts"] == {"BISP-001": 1}
+        assert client.get("/api/v1/yolo/results/hash-inexistente").status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_stream_invalid_frame(self, client):
+        """Test del modo streaming con un cuadro inválido"""
+        with client.websocket_connect("/api/v1/yolo/stream") as websocket:
+            websocket.send_bytes(b"no es una imagen")
+            data = websocket.receive_json()
+        
+        assert data["success"] is False
+        assert "error" in data
+    
     def test_detect_instruments_with_parameters(self, client, sample_image_bytes):
         """Test de detección con parámetros personalizados"""
         files = {
@@ -136,6 +377,67 @@ class TestYOLOAPI:
         # El resultado depende del modelo cargado, pero no debería dar error 422
         assert response.status_code != status.HTTP_422_UNPROCESSABLE_ENTITY
     
+    def test_detect_unknown_model(self, client, sample_image_bytes):
+        """Test de detección con un modelo no registrado"""
+        response = client.post(
+            "/api/v1/yolo/detect?model=inexistente",
+            files={"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "inexistente" in response.json()["detail"]
+    
+    def test_detect_with_expected_set(self, client, sample_image_bytes):
+        """Test de detección con comparación contra la lista esperada"""
+        response = client.post(
+            "/api/v1/yolo/detect",
+            files={"file": ("test.jpg", sample_image_bytes, "image/jpeg")},
+            data={"expected": '{"BISP-001": 2}'}
+        )
+        
+        if response.status_code == status.HTTP_200_OK:
+            set_check = response.json()["set_check"]
+            assert "missing" in set_check
+            assert "delta" in set_check
+            assert set_check["expected_total"] == 2
+    
+    def test_detect_with_invalid_expected(self, client, sample_image_bytes):
+        """Test de lista esperada inválida o set inexistente"""
+        response = client.post(
+            "/api/v1/yolo/detect",
+            files={"file": ("test.jpg", sample_image_bytes, "image/jpeg")},
+            data={"expected": '{"BISP-001": -2}'}
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        
+        sample_image_bytes.seek(0)
+        response = client.post(
+            "/api/v1/yolo/detect?expected_set_id=999",
+            files={"file": ("test.jpg", sample_image_bytes, "image/jpeg")}
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    
+    def test_detect_columnar_format(self, client, sample_image_bytes):
+        """Test de respuesta columnar negociada con el header Accept"""
+        response = client.post(
+            "/api/v1/yolo/detect",
+            files={"file": ("test.jpg", sample_image_bytes, "image/jpeg")},
+            headers={"Accept": "application/vnd.eivai.columnar+json"}
+        )
+        
+        if response.status_code == status.HTTP_200_OK:
+            assert response.headers["content-type"].startswith("application/vnd.eivai.columnar+json")
+            detections = response.json()["detections"]
+            assert set(detections) == {"boxes", "confidences", "class_ids", "classes"}
+    
+    def test_detect_not_acceptable(self, client, sample_image_bytes):
+        """Test de formato de respuesta no soportado"""
+        response = client.post(
+            "/api/v1/yolo/detect",
+            files={"file": ("test.jpg", sample_image_bytes, "image/jpeg")},
+            headers={"Accept": "text/html"}
+        )
+        assert response.status_code == status.HTTP_406_NOT_ACCEPTABLE
+    
     def test_invalid_confidence_threshold(self, client, sample_image_bytes):
         """Test con umbral de confianza inválido"""
         files = {
@@ -176,6 +478,7 @@ class TestYOLOAPI:
         
         # Verificar que los endpoints están documentados
         assert "/api/v1/yolo/detect" in data["paths"]
+        assert "/api/v1/yolo/detect/batch" in data["paths"]
         assert "/api/v1/yolo/health" in data["paths"]
         assert "/api/v1/yolo/instruments" in data["paths"]
     
@@ -0,0 +1,87 @@
+import threading
+import pytest
+from src.services.batching import MicroBatcher
+
+class TestMicroBatcher:
+    """Tests para el agrupador de solicitudes en lotes"""
+
+    def test_concurrent_requests_share_batch(self):
+        """Test de agrupación de solicitudes concurrentes en un solo lote"""
+        batch_sizes = []
+
+        def batch_fn(key, items):
+            batch_sizes.append(len(items))
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=200)
+        futures = [batcher.submit(i, key="k") for i in range(4)]
+
+        assert [f.result(timeout=5) for f in futures] == [0, 2, 4, 6]
+        assert batch_sizes == [4]
+        batcher.stop()
+
+    def test_groups_by_key(self):
+        """Test de separación de lotes por clave"""
+        calls = []
+        lock = threading.Lock()
+
+        def batch_fn(key, items):
+            with lock:
+                calls.append((key, list(items)))
+            return [f"{key}-{item}" for item in items]
+
+        batcher = MicroBatcher(batch_fn, max_batch_size=8, max_wait_ms=100)
+        f1 = batcher.submit(1, key=(0.5, 0.45))
+        f2 = batcher.submit(2, key=(0.7, 0.45))
+        f3 = batcher.submit(3, key=(0.5, 0.45))
+
+        assert f1.result(timeout=5) == "(0.5, 0.45)-1"
+        assert f2.result(timeout=5) == "(0.7, 0.45)-2"
+        assert f3.result(timeout=5) == "(0.5, 0.45)-3"
+        assert ((0.5, 0.45), [1, 3]) in calls
+        batcher.stop()
+
+    def test_error_propagates_to_all_requests(self):
+        """Test de propagación de errores del lote"""
+        def batch_fn(key, items):
+            raise ValueError("fallo del modelo")
+
+        batcher = MicroBatcher(batch_fn, max_batch_size=2, max_wait_ms=50)
+        futures = [batcher.submit(i) for i in range(2)]
+
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result(timeout=5)
+        batcher.stop()
+
+    def test_submit_after_stop(self):
+        """Test de rechazo de solicitudes tras detener el agrupador"""
+        batcher = MicroBatcher(lambda key, items: items)
+        batcher.stop()
+
+        with pytest.raises(RuntimeError):
+            batcher.submit(1)
+
+    def test_stop_fails_pending_requests(self):
+        """Test de que detener el agrupador resuelve con error lo que sigue en cola"""
+        started = threading.Event()
+        release = threading.Event()
+
+        def batch_fn(key, items):
+            started.set()
+            release.wait(5)
+            return items
+
+        batcher = MicroBatcher(batch_fn, max_batch_size=1, max_wait_ms=0)
+        first = batcher.submit(1)
+        assert started.wait(5)
+        queued = [batcher.submit(i) for i in range(2, 4)]
+
+        # El hilo sigue ocupado con el primer lote al agotarse la espera
+        batcher.stop(timeout=0.05)
+        release.set()
+
+        assert first.result(timeout=5) == 1
+        for future in queued:
+            with pytest.raises(RuntimeError):
+                future.result(timeout=5)
@@ -0,0 +1,96 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from src.config.settings import settings
+from src.services import cpu_budget
+from src.services.cpu_budget import (
+    InferenceSlots,
+    configure_threads,
+    current_threads,
+    inference_processes,
+    resolve_intra_op_threads
+)
+
+class TestThreadBudget:
+    """Tests del reparto de hilos por proceso"""
+
+    def test_inference_processes(self):
+        """Test del conteo de procesos que ejecutan el modelo"""
+        with patch.object(settings, "SERVER_WORKERS", 2), \
+                patch.object(settings, "INFERENCE_EXECUTOR", "thread"), \
+                patch.object(settings, "JOBS_ENABLED", True), \
+                patch.object(settings, "JOBS_WORKERS", 1):
+            assert inference_processes() == 4
+
+        # Con la cola deshabilitada no se inician sus procesos
+        with patch.object(settings, "SERVER_WORKERS", 2), \
+                patch.object(settings, "INFERENCE_EXECUTOR", "thread"), \
+                patch.object(settings, "JOBS_ENABLED", False), \
+                patch.object(settings, "JOBS_WORKERS", 1):
+            assert inference_processes() == 2
+
+        with patch.object(settings, "SERVER_WORKERS", 1), \
+                patch.object(settings, "INFERENCE_EXECUTOR", "process"), \
+                patch.object(settings, "INFERENCE_WORKERS", 3), \
+                patch.object(settings, "JOBS_WORKERS", 0):
+            assert inference_processes() == 3
+
+    def test_resolve_intra_op_threads(self):
+        """Test de valor explícito, reparto automático y valor por defecto"""
+        assert resolve_intra_op_threads(3) == 3
+
+        with patch.object(settings, "CPU_THREADS_AUTO", True), \
+                patch.object(cpu_budget, "inference_processes", return_value=4), \
+                patch.object(cpu_budget.os, "cpu_count", return_value=16):
+            assert resolve_intra_op_threads(0) == 4
+
+        with patch.object(settings, "CPU_THREADS_AUTO", True), \
+                patch.object(cpu_budget, "inference_processes", return_value=8), \
+                patch.object(cpu_budget.os, "cpu_count", return_value=2):
+            assert resolve_intra_op_threads(0) == 1
+
+        with patch.object(settings, "CPU_THREADS_AUTO", False):
+            assert resolve_intra_op_threads(0) == 0
+
+    def test_configure_threads(self):
+        """Test de aplicación de los hilos intra-op"""
+        torch = pytest.importorskip("torch")
+        previous = torch.get_num_threads()
+        try:
+            threads = configure_threads(1, inter_op=0, opencv=-1)
+            assert threads["intra_op"] == 1
+            assert threads == current_threads()
+        finally:
+            torch.set_num_threads(previous)
+
+class TestInferenceSlots:
+    """Tests del límite de pasadas simultáneas"""
+
+    def test_unlimited(self):
+        """Test sin límite: solo cuenta las pasadas en curso"""
+        slots = InferenceSlots(0)
+        with slots, slots:
+            assert slots.active == 2
+        assert slots.get_stats() == {"limit": 0, "active": 0}
+
+    def test_limit(self):
+        """Test de que nunca hay más pasadas en curso que el límite"""
+        slots = InferenceSlots(2)
+        peak = []
+
+        def run():
+            with slots:
+                peak.append(slots.active)
+                time.sleep(0.02)
+
+        workers = [threading.Thread(target=run) for _ in range(6)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        assert max(peak) <= 2
+        assert slots.active == 0
@@ -0,0 +1,159 @@
+import asyncio
+import importlib
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from src.services.inference_executor import InferenceExecutor, InferenceQueueFullError
+
+# El paquete src.services reexporta la instancia global con el mismo nombre que el módulo
+executor_module = importlib.import_module("src.services.inference_executor")
+
+class TestInferenceExecutor:
+    """Tests para el ejecutor acotado de inferencia"""
+
+    def test_run_returns_result(self):
+        """Test de ejecución de una llamada en el pool de hilos"""
+        executor = InferenceExecutor(mode="thread", workers=2, max_queue=0)
+
+        async def scenario():
+            return await executor.run(lambda a, b=0: a + b, 2, b=3)
+
+        assert asyncio.run(scenario()) == 5
+        executor.shutdown()
+
+    def test_rejects_when_queue_full(self):
+        """Test de rechazo con Retry-After cuando se supera la capacidad"""
+        executor = InferenceExecutor(mode="thread", workers=1, max_queue=0, retry_after=7)
+        release = threading.Event()
+
+        async def scenario():
+            first = asyncio.create_task(executor.run(release.wait, 5))
+            await asyncio.sleep(0.05)
+
+            with pytest.raises(InferenceQueueFullError) as exc_info:
+                await executor.run(lambda: None)
+
+            release.set()
+            await first
+            return exc_info.value
+
+        error = asyncio.run(scenario())
+        assert error.retry_after == 7
+        assert executor.get_stats()["rejected"] == 1
+        assert executor.get_stats()["pending"] == 0
+        executor.shutdown()
+
+    def test_cancelled_call_keeps_slot_until_done(self):
+        """Test de que una solicitud cancelada ocupa su plaza hasta que termina la llamada"""
+        executor = InferenceExecutor(mode="thread", workers=1, max_queue=0)
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait(5)
+
+        async def scenario():
+            task = asyncio.create_task(executor.run(blocking))
+            await asyncio.to_thread(started.wait, 5)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+            # La llamada sigue en el pool: no se admite otra
+            assert executor.get_stats()["pending"] == 1
+            with pytest.raises(InferenceQueueFullError):
+                await executor.run(lambda: None)
+
+            release.set()
+            for _ in range(100):
+                if executor.get_stats()["pending"] == 0:
+                    break
+                await asyncio.sleep(0.01)
+            return await executor.run(lambda: "ok")
+
+        assert asyncio.run(scenario()) == "ok"
+        assert executor.get_stats()["pending"] == 0
+        executor.shutdown()
+
+    def test_process_mode_merges_worker_metrics(self):
+        """Test de suma de las métricas registradas en los procesos de trabajo"""
+        from src.services import metrics
+
+        executor = InferenceExecutor(mode="process", workers=1, max_queue=0)
+        drained = {"yolo_detections_total": {("TEST-METRICS",): 2.0}}
+        before = metrics.detections_total.get(codigo="TEST-METRICS")
+
+        def detect():
+            """Método simulado del servicio"""
+
+        with patch.object(executor, "_create_executor", return_value=ThreadPoolExecutor(max_workers=1)), \
+                patch.object(executor_module, "_call_in_process_worker", return_value=({"success": True}, drained)):
+            result = asyncio.run(executor.run(detect))
+
+        assert result == {"success": True}
+        assert metrics.detections_total.get(codigo="TEST-METRICS") == before + 2
+        executor.shutdown()
+
+    def test_invalid_mode(self):
+        """Test de modo de ejecutor no soportado"""
+        with pytest.raises(ValueError):
+            InferenceExecutor(mode="gpu")
+
+    def test_prepare_probes_process_workers(self):
+        """Test de preparación del pool en modo proceso a partir del estado de cada proceso"""
+        executor = InferenceExecutor(mode="process", workers=2, max_queue=0)
+
+        with patch.object(executor, "_create_executor", return_value=ThreadPoolExecutor(max_workers=2)), \
+                patch.object(executor_module, "_process_worker_ready", return_value="ready") as ready:
+            assert asyncio.run(executor.prepare()) is True
+
+        assert ready.call_count == 2
+        assert executor.readiness == "ready"
+        assert executor.get_stats()["readiness"] == "ready"
+        executor.shutdown()
+
+        executor = InferenceExecutor(mode="process", workers=2, max_queue=0)
+        with patch.object(executor, "_create_executor", return_value=ThreadPoolExecutor(max_workers=2)), \
+                patch.object(executor_module, "_process_worker_ready", side_effect=["ready", "error"]):
+            assert asyncio.run(executor.prepare()) is False
+
+        assert executor.readiness == "error"
+        assert "error" in executor.last_error
+        executor.shutdown()
+
+        # En modo hilo el modelo es el del proceso principal
+        assert asyncio.run(InferenceExecutor(mode="thread").prepare()) is True
+
+    def test_reload_swaps_pool_once_ready(self):
+        """Test de reemplazo del pool en modo proceso solo con los procesos nuevos listos"""
+        executor = InferenceExecutor(mode="process", workers=2, max_queue=0)
+        previous = ThreadPoolExecutor(max_workers=1)
+        replacement = ThreadPoolExecutor(max_workers=2)
+        executor._executor = previous
+
+        with patch.object(executor, "_create_executor", return_value=replacement), \
+                patch.object(executor_module, "_process_worker_ready", return_value="ready") as ready:
+            asyncio.run(executor.reload("nuevo.pt"))
+
+        assert ready.call_count == 2
+        assert executor._executor is replacement
+        assert executor._model_path == "nuevo.pt"
+        executor.shutdown()
+
+    def test_reload_keeps_pool_if_not_ready(self):
+        """Test de reemplazo fallido: se conserva el pool anterior"""
+        executor = InferenceExecutor(mode="process", workers=2, max_queue=0)
+        previous = ThreadPoolExecutor(max_workers=1)
+        executor._executor = previous
+        executor._model_path = "actual.pt"
+
+        with patch.object(executor, "_create_executor", return_value=ThreadPoolExecutor(max_workers=2)), \
+                patch.object(executor_module, "_process_worker_ready", return_value="error"):
+            with pytest.raises(RuntimeError):
+                asyncio.run(executor.reload("roto.pt"))
+
+        assert executor._executor is previous
+        assert executor._model_path == "actual.pt"
+        executor.shutdown()
@@ -0,0 +1,261 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from src.services.job_queue import (
+    CANCELLED, COMPLETED, QUEUED, RUNNING,
+    JobStore, JobWorkerPool, notify_job, process_job, send_webhook, serve_jobs, validate_webhook_url
+)
+from src.config.settings import settings
+from src.services.result_cache import DetectionResultCache
+from src.services.result_store import DetectionResultStore
+
+PARAMS = {"confidence_threshold": 0.5, "iou_threshold": 0.45, "detail": "summary", "model": None}
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"), str(tmp_path / "data"))
+
+def _fake_service():
+    """Servicio YOLO simulado que detecta un bisturí por imagen"""
+    service = MagicMock()
+    service.decode_image_for_inference.side_effect = lambda data: (
+        (np.zeros((8, 8, 3), dtype=np.uint8), None) if data != b"roto" else (None, None)
+    )
+    service.validate_image_array.side_effect = lambda image: image is not None
+    service.detect_instruments_batch.side_effect = lambda images, **kwargs: [
+        {
+            "success": True,
+            "total_objects": 1,
+            "summary": {"BISP-001": {"cantidad": 1}},
+            "confidence_threshold": kwargs["confidence_threshold"],
+            "iou_threshold": kwargs["iou_threshold"]
+        }
+        for _ in images
+    ]
+    service.route_weights_id.return_value = "yolov8n.pt@abc"
+    service.merge_summaries.side_effect = lambda summaries: {
+        "BISP-001": {"cantidad": sum(summary["BISP-001"]["cantidad"] for summary in summaries)}
+    }
+    return service
+
+class TestJobStore:
+    """Tests de la cola persistente de trabajos"""
+
+    def test_create_and_claim(self, store):
+        """Test de encolado y toma atómica del trabajo más antiguo"""
+        job_id = store.create_job([("a.jpg", b"x", None), ("b.txt", None, "Tipo no soportado")], PARAMS)
+
+        job = store.get_job(job_id)
+        assert job["status"] == QUEUED
+        assert job["total_images"] == 2
+        assert job["failed_images"] == 1
+
+        claimed = store.claim_next("worker-1")
+        assert claimed["job_id"] == job_id
+        assert claimed["status"] == RUNNING
+        assert claimed["params"] == PARAMS
+        assert store.claim_next("worker-2") is None
+        assert [position for position, *_ in store.pending_images(job_id)] == [0]
+
+    def test_requeue_stale(self, store):
+        """Test de recuperación de trabajos de un proceso caído"""
+        job_id = store.create_job([("a.jpg", b"x", None)], PARAMS)
+        store.claim_next("worker-1")
+
+        assert store.requeue_stale(stale_seconds=60) == 0
+        assert store.requeue_stale(stale_seconds=-1) == 1
+        assert store.get_job(job_id)["status"] == QUEUED
+
+    def test_cancel(self, store):
+        """Test de cancelación de un trabajo en curso"""
+        job_id = store.create_job([("a.jpg", b"x", None)], PARAMS)
+        store.claim_next("worker-1")
+
+        assert store.cancel(job_id) == CANCELLED
+        assert store.record_results(job_id, [(0, {"success": True})]) is False
+        assert store.cancel("inexistente") is None
+
+    def test_record_results_skips_requeued_job(self, store):
+        """Test de que un trabajo devuelto a la cola conserva sus imágenes pendientes"""
+        job_id = store.create_job([("a.jpg", b"x", None)], PARAMS)
+        store.claim_next("worker-1")
+        store.requeue_stale(stale_seconds=-1)
+
+        assert store.record_results(job_id, [(0, {"success": True})]) is False
+        job = store.get_job(job_id, include_results=True)
+        assert job["results"][0]["status"] == QUEUED
+        assert job["processed_images"] == 0
+
+class TestProcessJob:
+    """Tests del procesamiento de trabajos"""
+
+    def test_process_job(self, store, tmp_path):
+        """Test de procesamiento por grupos con imágenes inválidas"""
+        job_id = store.create_job(
+            [("a.jpg", b"img", None), ("b.jpg", b"roto", None), ("c.jpg", b"img", None)],
+            PARAMS
+        )
+        service = _fake_service()
+        result_store = DetectionResultStore(str(tmp_path / "detections.db"))
+
+        status = process_job(store, service, store.claim_next("worker-1"), batch_size=2, result_store=result_store)
+
+        assert status == COMPLETED
+        assert service.detect_instruments_batch.call_count == 2
+        assert service.detect_instruments_batch.call_args.kwargs["detail"] == "summary"
+
+        job = store.get_job(job_id, include_results=True)
+        assert job["status"] == COMPLETED
+        assert job["processed_images"] == 2
+        assert job["failed_images"] == 1
+        assert job["progress"] == 1.0
+        assert job["summary"]["BISP-001"]["cantidad"] == 2
+        assert [result["success"] for result in job["results"]] == [True, False, True]
+        assert [result["filename"] for result in job["results"]] == ["a.jpg", "b.jpg", "c.jpg"]
+
+        # Los resultados quedan en el historial con el hash de cada imagen
+        history = result_store.history(DetectionResultCache.hash_image(b"img"))
+        assert [record["filename"] for record in history] == ["a.jpg", "c.jpg"]
+        assert history[0]["model_id"] == "yolov8n.pt@abc"
+        assert history[0]["source"] == "job"
+
+    def test_heartbeat_during_slow_chunk(self, store):
+        """Test de que el latido se renueva mientras un grupo lento se procesa"""
+        job_id = store.create_job([("a.jpg", b"img", None)], PARAMS)
+        service = _fake_service()
+        detect = service.detect_instruments_batch.side_effect
+        requeued = []
+
+        def slow_detect(images, **kwargs):
+            time.sleep(0.5)
+            requeued.append(store.requeue_stale(stale_seconds=0.25))
+            return detect(images, **kwargs)
+
+        service.detect_instruments_batch.side_effect = slow_detect
+        with patch.object(settings, "JOBS_STALE_SECONDS", 0.3):
+            status = process_job(store, service, store.claim_next("worker-1"), batch_size=1)
+
+        assert requeued == [0]
+        assert status == COMPLETED
+        assert store.get_job(job_id)["status"] == COMPLETED
+
+class TestWorkers:
+    """Tests de la recuperación de trabajos y procesos caídos"""
+
+    def test_running_worker_resumes_stale_job(self, store):
+        """Test de que un proceso en marcha retoma el trabajo de un proceso caído"""
+        job_id = store.create_job([("a.jpg", b"img", None), ("b.jpg", b"img", None)], PARAMS)
+        store.claim_next("worker-caido")
+        stop_event = threading.Event()
+
+        with patch.object(settings, "JOBS_STALE_SECONDS", 0.2), \
+                patch.object(settings, "JOBS_POLL_INTERVAL_SECONDS", 0.02):
+            thread = threading.Thread(
+                target=serve_jobs, args=(store, _fake_service(), "worker-2", stop_event), daemon=True
+            )
+            thread.start()
+            try:
+                for _ in range(200):
+                    if store.get_job(job_id)["status"] == COMPLETED:
+                        break
+                    time.sleep(0.02)
+            finally:
+                stop_event.set()
+                thread.join(5)
+
+        job = store.get_job(job_id)
+        assert job["status"] == COMPLETED
+        assert job["processed_images"] == 2
+
+    def test_pool_restarts_dead_processes(self, store):
+        """Test de reinicio de los procesos de trabajo caídos"""
+        pool = JobWorkerPool(store, workers=2)
+        pool._context = MagicMock()
+        pool._context.Event.return_value = threading.Event()
+        pool._context.Process.side_effect = lambda **kwargs: MagicMock()
+
+        with patch.object(settings, "JOBS_POLL_INTERVAL_SECONDS", 60):
+            pool.start()
+            dead = pool._processes[0]
+            dead.is_alive.return_value = False
+
+            assert pool.check_processes() == 1
+            assert pool._context.Process.call_count == 3
+            assert pool._processes[0] is not dead
+            assert pool.get_stats()["restarts"] == 1
+            pool.shutdown(timeout=1)
+
+class TestWebhook:
+    """Tests de la notificación por webhook"""
+
+    def test_send_webhook_signed(self):
+        """Test de entrega con firma HMAC"""
+        received = {}
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                received["body"] = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                received["signature"] = self.headers["X-EIVAI-Signature"]
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.handle_request, daemon=True)
+        thread.start()
+        try:
+            delivered = send_webhook(
+                f"http://127.0.0.1:{server.server_port}/hook",
+                {"job_id": "abc", "status": COMPLETED},
+                timeout=5,
+                retries=0,
+                secret="secreto"
+            )
+        finally:
+            thread.join(5)
+            server.server_close()
+
+        assert delivered is True
+        assert received["body"] == {"job_id": "abc", "status": COMPLETED}
+        assert received["signature"].startswith("sha256=")
+
+    def test_send_webhook_unreachable(self):
+        """Test de webhook inaccesible sin reintentos"""
+        start = time.time()
+        assert send_webhook("http://127.0.0.1:9/hook", {}, timeout=1, retries=0) is False
+        assert time.time() - start < 5
+
+    def test_validate_webhook_blocks_internal_hosts(self):
+        """Test de rechazo de webhooks hacia la red interna"""
+        for url in ("ftp://ejemplo.com/hook", "http://127.0.0.1:8080/hook", "http://10.0.0.5/hook",
+                    "http://169.254.169.254/latest", "http://[::1]/hook", "http://localhost/hook"):
+            with pytest.raises(ValueError):
+                validate_webhook_url(url)
+
+        validate_webhook_url("https://93.184.216.34/hook")
+
+    def test_validate_webhook_allowlist(self):
+        """Test de la lista de hosts permitidos"""
+        with patch.object(settings, "JOBS_WEBHOOK_ALLOWED_HOSTS", ["hooks.interno"]):
+            validate_webhook_url("http://hooks.interno/hook")
+            validate_webhook_url("http://api.hooks.interno/hook")
+            with pytest.raises(ValueError):
+                validate_webhook_url("https://93.184.216.34/hook")
+
+    def test_notify_job_blocked(self, store):
+        """Test de webhook bloqueado al enviar la notificación"""
+        job_id = store.create_job([("a.jpg", b"x", None)], PARAMS, webhook_url="http://127.0.0.1:9/hook")
+
+        with patch("src.services.job_queue.send_webhook") as send:
+            notify_job(store, job_id)
+
+        send.assert_not_called()
+        assert store.get_job(job_id)["webhook"]["status"] == "blocked"
@@ -0,0 +1,80 @@
+import pytest
+from src.services.metrics import Counter, Gauge, Histogram, MetricsRegistry, read_memory_usage
+
+class TestMetrics:
+    """Tests para las métricas en formato Prometheus"""
+
+    def test_counter_render(self):
+        """Test de contador con etiquetas"""
+        counter = Counter("detecciones_total", "Detecciones", ("codigo",))
+        counter.inc(2, codigo="BISP-001")
+        counter.inc(codigo="BISP-001")
+
+        assert counter.get(codigo="BISP-001") == 3
+        assert 'detecciones_total{codigo="BISP-001"} 3' in counter.render()
+
+    def test_histogram_cumulative_buckets(self):
+        """Test de que los límites del histograma son acumulativos"""
+        histogram = Histogram("lote", "Tamaño de lote", buckets=(1, 4, 8))
+        for value in (1, 3, 4, 20):
+            histogram.observe(value)
+
+        lines = histogram.render()
+        assert 'lote_bucket{le="1"} 1' in lines
+        assert 'lote_bucket{le="4"} 3' in lines
+        assert 'lote_bucket{le="8"} 3' in lines
+        assert 'lote_bucket{le="+Inf"} 4' in lines
+        assert "lote_sum 28" in lines
+        assert "lote_count 4" in lines
+        assert histogram.get_count() == 4
+
+    def test_invalid_labels(self):
+        """Test de etiquetas que no corresponden a la métrica"""
+        gauge = Gauge("cola", "Profundidad", ("queue",))
+        with pytest.raises(ValueError):
+            gauge.set(1, otra="x")
+
+    def test_label_escaping(self):
+        """Test de escape de comillas en los valores de etiquetas"""
+        gauge = Gauge("modelo", "Modelo", ("path",))
+        gauge.set(1, path='a"b')
+        assert 'modelo{path="a\\"b"} 1' in gauge.render()
+
+    def test_registry_rejects_duplicates(self):
+        """Test de nombres de métricas únicos en el registro"""
+        registry = MetricsRegistry()
+        registry.register(Counter("x", "X"))
+        with pytest.raises(ValueError):
+            registry.register(Gauge("x", "X"))
+
+        assert registry.render().startswith("# HELP x X\n# TYPE x counter")
+
+    def test_drain_and_merge(self):
+        """Test de traspaso de contadores e histogramas entre registros de procesos"""
+        worker, main = MetricsRegistry(), MetricsRegistry()
+        for registry in (worker, main):
+            registry.register(Counter("det_total", "Detecciones", ("codigo",)))
+            registry.register(Histogram("lote", "Lote", buckets=(1, 4)))
+            registry.register(Gauge("cola", "Cola"))
+
+        worker._metrics["det_total"].inc(2, codigo="BISP-001")
+        worker._metrics["lote"].observe(3)
+        worker._metrics["cola"].set(5)
+        main._metrics["det_total"].inc(codigo="BISP-001")
+
+        drained = worker.drain()
+        assert set(drained) == {"det_total", "lote"}
+        assert worker.drain() == {}
+
+        main.merge(drained)
+        main.merge(drained)
+        assert main._metrics["det_total"].get(codigo="BISP-001") == 5
+        assert main._metrics["lote"].get_count() == 2
+        assert "lote_sum 6" in main._metrics["lote"].render()
+        assert main._metrics["cola"].get() is None
+
+    def test_read_memory_usage(self):
+        """Test de lectura de memoria del proceso"""
+        usage = read_memory_usage()
+        assert usage["resident"] > 0
+        assert usage["peak"] > 0
@@ -0,0 +1,29 @@
+import pytest
+from src.services.model_backends import exported_model_path, resolve_model_path
+
+class TestModelBackends:
+    """Tests para la selección de backends de inferencia"""
+
+    def test_pytorch_uses_original_model(self):
+        """Test de que el backend PyTorch no exporta el modelo"""
+        assert resolve_model_path("models/yolov8n.pt", backend="pytorch") == "models/yolov8n.pt"
+
+    def test_exported_paths(self):
+        """Test de rutas de los artefactos exportados"""
+        assert exported_model_path("models/yolov8n.pt", "onnx") == "models/yolov8n.onnx"
+        assert exported_model_path("models/yolov8n.pt", "onnx", int8=True) == "models/yolov8n_int8.onnx"
+        assert exported_model_path("models/yolov8n.pt", "openvino") == "models/yolov8n_openvino_model"
+        assert exported_model_path("models/yolov8n.pt", "torchscript") == "models/yolov8n.torchscript"
+
+    def test_existing_export_is_reused(self, tmp_path):
+        """Test de reutilización de un artefacto ya exportado"""
+        model_path = tmp_path / "yolov8n.pt"
+        exported = tmp_path / "yolov8n.onnx"
+        exported.write_bytes(b"onnx")
+
+        assert resolve_model_path(str(model_path), backend="onnx") == str(exported)
+
+    def test_unsupported_backend(self):
+        """Test de backend no soportado"""
+        with pytest.raises(ValueError):
+            resolve_model_path("yolov8n.pt", backend="tensorrt")
@@ -0,0 +1,51 @@
+import cv2
+import numpy as np
+import pytest
+from src.services.preprocessing import read_image_size, decode_downscaled
+
+def _encode(image: np.ndarray, extension: str) -> bytes:
+    ok, encoded = cv2.imencode(extension, image)
+    assert ok
+    return encoded.tobytes()
+
+class TestPreprocessing:
+    """Tests para la decodificación reducida de imágenes"""
+
+    @pytest.fixture
+    def large_image(self):
+        """Imagen 2000x1000 con un rectángulo blanco conocido"""
+        image = np.zeros((1000, 2000, 3), dtype=np.uint8)
+        image[400:600, 1000:1400] = 255
+        return image
+
+    def test_read_image_size(self, large_image):
+        """Test de lectura de dimensiones desde la cabecera"""
+        assert read_image_size(_encode(large_image, ".jpg")) == (2000, 1000, "JPEG")
+        assert read_image_size(b"no es una imagen") is None
+
+    @pytest.mark.parametrize("extension", [".jpg", ".png"])
+    def test_decode_downscaled_keeps_scale(self, large_image, extension):
+        """Test de reducción al tamaño objetivo conservando los factores de escala"""
+        image, (scale_x, scale_y) = decode_downscaled(_encode(large_image, extension), 640)
+
+        assert image.shape[:2] == (320, 640)
+        assert scale_x == pytest.approx(2000 / 640)
+        assert scale_y == pytest.approx(1000 / 320)
+
+        # El rectángulo vuelve a su posición original al aplicar la escala
+        ys, xs = np.nonzero(image[:, :, 0] > 127)
+        assert xs.min() * scale_x == pytest.approx(1000, abs=2 * scale_x)
+        assert ys.max() * scale_y == pytest.approx(600, abs=2 * scale_y)
+
+    def test_small_image_not_rescaled(self):
+        """Test de que una imagen pequeña no se modifica"""
+        small = np.zeros((200, 300, 3), dtype=np.uint8)
+        image, scale = decode_downscaled(_encode(small, ".jpg"), 640)
+
+        assert image.shape[:2] == (200, 300)
+        assert scale == (1.0, 1.0)
+
+    def test_invalid_data(self):
+        """Test con datos que no son una imagen"""
+        assert decode_downscaled(b"", 640) == (None, (1.0, 1.0))
+        assert decode_downscaled(b"no es una imagen", 640)[0] is None
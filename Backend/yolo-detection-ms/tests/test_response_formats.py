@@ -0,0 +1,41 @@
+import pytest
+from fastapi import HTTPException
+from src.api import response_formats
+from src.api.response_formats import detail_for_format, negotiate_format, render_response
+
+class TestResponseFormats:
+    """Tests para la negociación del formato de respuesta"""
+
+    def test_default_is_json(self):
+        """Test de JSON por defecto"""
+        assert negotiate_format(None) == "json"
+        assert negotiate_format("*/*") == "json"
+        assert negotiate_format("application/json") == "json"
+
+    def test_columnar_and_quality(self):
+        """Test de preferencia por el valor q del header Accept"""
+        assert negotiate_format("application/vnd.eivai.columnar+json") == "columnar"
+        assert negotiate_format("application/json;q=0.5, application/vnd.eivai.columnar+json") == "columnar"
+        assert negotiate_format("application/vnd.eivai.columnar+json;q=0.2, application/json") == "json"
+
+    def test_msgpack(self):
+        """Test de msgpack cuando la dependencia está instalada"""
+        if response_formats.msgpack is None:
+            pytest.skip("msgpack no instalado")
+
+        assert negotiate_format("application/msgpack") == "msgpack"
+        response = render_response({"boxes": [[1.5, 2.0, 3.0, 4.0]]}, "msgpack")
+        assert response.media_type == "application/msgpack"
+        assert response_formats.msgpack.unpackb(response.body) == {"boxes": [[1.5, 2.0, 3.0, 4.0]]}
+
+    def test_not_acceptable(self):
+        """Test de 406 cuando no se acepta ningún formato soportado"""
+        with pytest.raises(HTTPException) as exc_info:
+            negotiate_format("text/html")
+        assert exc_info.value.status_code == 406
+
+    def test_detail_for_format(self):
+        """Test de detecciones columnares en los formatos compactos"""
+        assert detail_for_format("full", "msgpack") == "columnar"
+        assert detail_for_format("full", "json") == "full"
+        assert detail_for_format("summary", "columnar") == "summary"
@@ -0,0 +1,93 @@
+import time
+from src.services import metrics
+from src.services.result_cache import DetectionResultCache
+
+class TestDetectionResultCache:
+    """Tests para la caché de resultados de detección"""
+
+    def test_hit_and_miss(self):
+        """Test de acierto y fallo de la caché"""
+        cache = DetectionResultCache(max_entries=4, ttl_seconds=60)
+        image_hash = cache.hash_image(b"bandeja")
+
+        assert cache.get(image_hash, 0.5, 0.45, "modelo#1") is None
+
+        cache.set(image_hash, 0.5, 0.45, "modelo#1", {"success": True, "summary": {}})
+        result = cache.get(image_hash, 0.5, 0.45, "modelo#1")
+
+        assert result == {"success": True, "summary": {}}
+        assert cache.get(image_hash, 0.7, 0.45, "modelo#1") is None
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+
+    def test_requests_counter(self):
+        """Test del contador de Prometheus de consultas a la caché"""
+        cache = DetectionResultCache(max_entries=4, ttl_seconds=60)
+        hits = metrics.result_cache_requests.get(result="hit")
+        misses = metrics.result_cache_requests.get(result="miss")
+
+        cache.get("h1", 0.5, 0.45, "modelo#1")
+        cache.set("h1", 0.5, 0.45, "modelo#1", {"success": True})
+        cache.get("h1", 0.5, 0.45, "modelo#1")
+        cache.get("h1", 0.5, 0.45, "modelo#1")
+
+        assert metrics.result_cache_requests.get(result="hit") == hits + 2
+        assert metrics.result_cache_requests.get(result="miss") == misses + 1
+        assert "# TYPE yolo_result_cache_requests_total counter" in metrics.registry.render()
+
+    def test_returned_result_is_a_copy(self):
+        """Test de que modificar el resultado no altera la entrada"""
+        cache = DetectionResultCache()
+        cache.set("h", 0.5, 0.45, "m", {"success": True})
+
+        result = cache.get("h", 0.5, 0.45, "m")
+        result["file_info"] = {"filename": "otra.jpg"}
+
+        assert "file_info" not in cache.get("h", 0.5, 0.45, "m")
+
+    def test_nested_objects_are_not_shared(self):
+        """Test de que los objetos anidados no se comparten con la caché"""
+        cache = DetectionResultCache()
+        stored = {"success": True, "detections": [{"class_name": "pinza", "bbox": [1, 2, 3, 4]}]}
+        cache.set("h", 0.5, 0.45, "m", stored)
+        stored["detections"].append({"class_name": "tijera"})
+
+        result = cache.get("h", 0.5, 0.45, "m")
+        assert len(result["detections"]) == 1
+        result["detections"][0]["class_name"] = "bisturi"
+        result["detections"][0]["bbox"][0] = 99
+        result["detections"].clear()
+
+        again = cache.get("h", 0.5, 0.45, "m")
+        assert again["detections"] == [{"class_name": "pinza", "bbox": [1, 2, 3, 4]}]
+
+    def test_lru_eviction(self):
+        """Test de expulsión de la entrada menos usada"""
+        cache = DetectionResultCache(max_entries=2, ttl_seconds=0)
+        cache.set("a", 0.5, 0.45, "m", {"id": "a"})
+        cache.set("b", 0.5, 0.45, "m", {"id": "b"})
+        cache.get("a", 0.5, 0.45, "m")
+        cache.set("c", 0.5, 0.45, "m", {"id": "c"})
+
+        assert cache.get("b", 0.5, 0.45, "m") is None
+        assert cache.get("a", 0.5, 0.45, "m") == {"id": "a"}
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_ttl_expiration(self):
+        """Test de expiración por TTL"""
+        cache = DetectionResultCache(ttl_seconds=0.01)
+        cache.set("a", 0.5, 0.45, "m", {"id": "a"})
+        time.sleep(0.02)
+
+        assert cache.get("a", 0.5, 0.45, "m") is None
+
+    def test_model_change_invalidates(self):
+        """Test de invalidación al cambiar el modelo"""
+        cache = DetectionResultCache()
+        cache.set("a", 0.5, 0.45, "modelo#1", {"id": "a"})
+
+        assert cache.get("a", 0.5, 0.45, "modelo#2") is None
+        assert cache.get_stats()["entries"] == 0
+        assert cache.get_stats()["invalidations"] == 1
@@ -0,0 +1,111 @@
+import pytest
+
+from src.services.result_store import DetectionResultStore, ResultRecorder, build_record
+
+def _result(counts, conf=0.5, iou=0.45):
+    """Resultado de detección mínimo con los conteos indicados"""
+    return {
+        "success": True,
+        "total_objects": sum(counts.values()),
+        "summary": {codigo: {"cantidad": cantidad} for codigo, cantidad in counts.items()},
+        "confidence_threshold": conf,
+        "iou_threshold": iou
+    }
+
+@pytest.fixture
+def store(tmp_path):
+    return DetectionResultStore(str(tmp_path / "detections.db"))
+
+class TestDetectionResultStore:
+    """Tests del historial persistente de resultados"""
+
+    def test_build_record(self):
+        """Test de construcción del registro desde un resultado"""
+        record = build_record("h1", "m1", _result({"BISP-001": 2}), inference_ms=12.34567, filename="a.jpg")
+
+        assert record["counts"] == {"BISP-001": 2}
+        assert record["total_objects"] == 2
+        assert record["inference_ms"] == 12.346
+        assert record["confidence_threshold"] == 0.5
+
+    def test_unscored(self, store):
+        """Test de imágenes pendientes por modelo y umbrales"""
+        store.record([
+            build_record("h1", "m1", _result({"BISP-001": 1})),
+            build_record("h2", "m1", _result({"BISP-001": 1}, conf=0.3))
+        ])
+
+        assert store.unscored(["h1", "h2", "h3", "h1"], "m1") == ["h3"]
+        assert store.unscored(["h1", "h2", "h3"], "m1", confidence_threshold=0.5) == ["h2", "h3"]
+        assert store.unscored(["h1", "h2"], "m2") == ["h1", "h2"]
+
+    def test_history_is_append_only(self, store):
+        """Test de historial con varios resultados por imagen"""
+        store.record([build_record("h1", "m1", _result({"BISP-001": 1}))])
+        store.record([build_record("h1", "m2", _result({"BISP-001": 2}), sliced=True)])
+
+        history = store.history("h1")
+        assert [record["model_id"] for record in history] == ["m1", "m2"]
+        assert history[1]["sliced"] is True
+        assert history[1]["counts"] == {"BISP-001": 2}
+
+        models = {model["model_id"]: model for model in store.models()}
+        assert models["m1"]["images"] == 1
+        assert models["m2"]["objects"] == 2
+
+    def test_drift(self, store):
+        """Test de deriva entre dos modelos usando el resultado más reciente"""
+        store.record([
+            build_record("h1", "base", _result({"BISP-001": 2})),
+            build_record("h2", "base", _result({"PINZ-001": 1})),
+            build_record("h3", "base", _result({"PINZ-001": 1})),
+            build_record("h1", "nuevo", _result({"BISP-001": 3})),
+            build_record("h2", "nuevo", _result({"PINZ-001": 1}))
+        ])
+        # Un resultado posterior reemplaza al anterior en la comparación
+        store.record([build_record("h1", "nuevo", _result({"BISP-001": 1}))])
+
+        drift = store.drift("base", "nuevo")
+
+        assert drift["images_compared"] == 2
+        assert drift["images_changed"] == 1
+        assert drift["change_rate"] == 0.5
+        assert drift["mean_abs_count_delta"] == 0.5
+        assert drift["baseline_only"] == 1
+        assert drift["per_codigo"]["BISP-001"] == {"baseline": 2, "candidate": 1, "delta": -1}
+
+class TestResultRecorder:
+    """Tests de la escritura del historial en segundo plano"""
+
+    def test_records_in_background(self, store):
+        """Test de escrituras encoladas agrupadas por el hilo de fondo"""
+        recorder = ResultRecorder(store)
+        for index in range(5):
+            assert recorder.submit(lambda index=index: [build_record(f"h{index}", "m1", _result({"BISP-001": 1}))])
+
+        assert recorder.flush(timeout=5)
+        assert store.unscored([f"h{index}" for index in range(5)], "m1") == []
+        assert recorder.get_stats() == {"pending": 0, "dropped": 0}
+
+    def test_errors_do_not_stop_writer(self, store):
+        """Test de un error al preparar registros sin afectar a los demás"""
+        recorder = ResultRecorder(store)
+
+        def failing():
+            raise RuntimeError("modelo no disponible")
+
+        recorder.submit(failing)
+        recorder.submit(lambda: [build_record("h1", "m1", _result({"BISP-001": 1}))])
+
+        assert recorder.flush(timeout=5)
+        assert len(store.history("h1")) == 1
+
+    def test_drops_when_full(self, store):
+        """Test de descarte con la cola llena"""
+        recorder = ResultRecorder(store, max_pending=1)
+        recorder._thread = object()  # sin hilo de escritura: la cola no se vacía
+
+        assert recorder.submit(lambda: []) is True
+        assert recorder.submit(lambda: []) is False
+        assert recorder.get_stats() == {"pending": 1, "dropped": 1}
+        assert recorder.flush(timeout=0.05) is False
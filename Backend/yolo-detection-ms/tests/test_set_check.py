@@ -0,0 +1,57 @@
+import json
+import pytest
+from src.services.set_check import ExpectedSetCatalog, compare_with_expected, parse_expected_counts
+
+class TestSetCheck:
+    """Tests para la comparación con la lista de instrumentos esperada"""
+
+    def test_compare_with_expected(self):
+        """Test de faltantes, sobrantes y diferencia por código"""
+        summary = {
+            "BISP-001": {"nombre": "Bisturí #11", "cantidad": 1},
+            "PINZ-001": {"nombre": "Pinza Kelly", "cantidad": 3},
+            "GASA-001": {"nombre": "Gasas estériles", "cantidad": 1}
+        }
+        expected = {"BISP-001": 2, "PINZ-001": 3, "TIJR-001": 1}
+
+        result = compare_with_expected(summary, expected)
+
+        assert result["complete"] is False
+        assert result["missing"] == {"BISP-001": 1, "TIJR-001": 1}
+        assert result["extra"] == {"GASA-001": 1}
+        assert result["delta"] == {"BISP-001": -1, "GASA-001": 1, "PINZ-001": 0, "TIJR-001": -1}
+        assert result["expected_total"] == 6
+        assert result["detected_total"] == 5
+
+    def test_complete_set(self):
+        """Test de bandeja completa"""
+        result = compare_with_expected({"BISP-001": {"cantidad": 2}}, {"BISP-001": 2})
+        assert result["complete"] is True
+        assert result["missing"] == {} and result["extra"] == {}
+
+    def test_parse_expected_counts(self):
+        """Test de validación de la lista esperada"""
+        assert parse_expected_counts('{"BISP-001": 2}') == {"BISP-001": 2}
+
+        for invalid in ("no es json", "[1, 2]", '{"BISP-001": -1}', '{"BISP-001": 1.5}'):
+            with pytest.raises(ValueError):
+                parse_expected_counts(invalid)
+
+    def test_catalog_reload(self, tmp_path):
+        """Test del catálogo de sets y su recarga al cambiar el archivo"""
+        path = tmp_path / "sets.json"
+        path.write_text(json.dumps({
+            "1": {"nombre": "Set básico", "instrumentos": {"BISP-001": 2}},
+            "2": {"PINZ-001": 4}
+        }))
+        catalog = ExpectedSetCatalog(str(path))
+
+        assert catalog.get("1") == {"nombre": "Set básico", "instrumentos": {"BISP-001": 2}}
+        assert catalog.get("2")["instrumentos"] == {"PINZ-001": 4}
+        assert catalog.get("3") is None
+
+        import os
+        path.write_text(json.dumps({"3": {"GASA-001": 1}}))
+        os.utime(path, (0, os.path.getmtime(path) + 10))
+        assert catalog.get("3")["instrumentos"] == {"GASA-001": 1}
+        assert catalog.get("1") is None
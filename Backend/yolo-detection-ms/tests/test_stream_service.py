@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from src.services.stream_service import FrameCountSmoother, LatestFrameSlot
+
+def _summary(**counts):
+    return {codigo: {"nombre": codigo, "cantidad": cantidad} for codigo, cantidad in counts.items()}
+
+class TestFrameCountSmoother:
+    """Tests para el suavizado temporal de cantidades"""
+
+    def test_first_frame_is_not_smoothed(self):
+        """Test de que el primer cuadro se toma tal cual"""
+        smoother = FrameCountSmoother(alpha=0.5)
+        smoothed = smoother.update(_summary(**{"BISP-001": 3}))
+
+        assert smoothed["BISP-001"]["cantidad"] == 3
+
+    def test_missing_detection_decays(self):
+        """Test de que un fallo puntual del detector no borra el conteo"""
+        smoother = FrameCountSmoother(alpha=0.3)
+        smoother.update(_summary(**{"PINZ-001": 2}))
+        smoothed = smoother.update({})
+
+        assert smoothed["PINZ-001"]["cantidad"] == 1
+        assert smoothed["PINZ-001"]["cantidad_suavizada"] == 1.4
+
+    def test_instrument_removed_after_decay(self):
+        """Test de eliminación de instrumentos que dejan de detectarse"""
+        smoother = FrameCountSmoother(alpha=0.9)
+        smoother.update(_summary(**{"GASA-001": 1}))
+        smoother.update({})
+        smoothed = smoother.update({})
+
+        assert "GASA-001" not in smoothed
+
+    def test_invalid_alpha(self):
+        """Test de factor de suavizado inválido"""
+        with pytest.raises(ValueError):
+            FrameCountSmoother(alpha=0)
+
+class TestLatestFrameSlot:
+    """Tests para el contenedor del cuadro más reciente"""
+
+    def test_keeps_only_latest_frame(self):
+        """Test de descarte de cuadros bajo carga"""
+        async def scenario():
+            slot = LatestFrameSlot()
+            slot.put(b"1")
+            slot.put(b"2")
+            slot.put(b"3")
+            frame = await slot.get()
+            slot.close()
+            return slot, frame, await slot.get()
+
+        slot, frame, after_close = asyncio.run(scenario())
+        assert frame == b"3"
+        assert after_close is None
+        assert slot.received == 3
+        assert slot.dropped == 2
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from src.services.tiling import compute_tiles, batched_nms
+
+class TestComputeTiles:
+    """Tests para el cálculo de ventanas solapadas"""
+
+    def test_small_image_single_tile(self):
+        """Test de imagen más pequeña que una ventana"""
+        assert compute_tiles(300, 400, 640, 0.2) == [(0, 0, 400, 300)]
+
+    def test_tiles_cover_image(self):
+        """Test de que las ventanas cubren toda la imagen con tamaño fijo"""
+        tiles = compute_tiles(1500, 2000, 640, 0.2)
+
+        assert all(x2 - x1 == 640 and y2 - y1 == 640 for x1, y1, x2, y2 in tiles)
+        assert max(x2 for _, _, x2, _ in tiles) == 2000
+        assert max(y2 for _, _, _, y2 in tiles) == 1500
+
+        covered = np.zeros((1500, 2000), dtype=bool)
+        for x1, y1, x2, y2 in tiles:
+            covered[y1:y2, x1:x2] = True
+        assert covered.all()
+
+    def test_invalid_parameters(self):
+        """Test de parámetros inválidos"""
+        with pytest.raises(ValueError):
+            compute_tiles(100, 100, 0, 0.2)
+        with pytest.raises(ValueError):
+            compute_tiles(100, 100, 64, 1.0)
+
+class TestBatchedNMS:
+    """Tests para la supresión de no máximos entre ventanas"""
+
+    def test_suppresses_fragment_of_same_class(self):
+        """Test de que un fragmento contenido en otra caja se elimina con IoS"""
+        boxes = np.array([[0, 0, 100, 100], [60, 0, 100, 100]], dtype=np.float32)
+        scores = np.array([0.9, 0.8], dtype=np.float32)
+        class_ids = np.array([1, 1])
+
+        assert batched_nms(boxes, scores, class_ids, 0.5, metric="ios").tolist() == [0]
+        # Con IoU (0.4) el fragmento no llegaría al umbral
+        assert batched_nms(boxes, scores, class_ids, 0.5, metric="iou").tolist() == [0, 1]
+
+    def test_keeps_different_classes(self):
+        """Test de que cajas solapadas de clases distintas se conservan"""
+        boxes = np.array([[0, 0, 100, 100], [0, 0, 100, 100]], dtype=np.float32)
+        scores = np.array([0.6, 0.9], dtype=np.float32)
+        class_ids = np.array([0, 3])
+
+        assert batched_nms(boxes, scores, class_ids, 0.5).tolist() == [1, 0]
+
+    def test_empty_input(self):
+        """Test sin cajas"""
+        keep = batched_nms(np.empty((0, 4)), np.empty(0), np.empty(0, dtype=int), 0.5)
+        assert keep.size == 0
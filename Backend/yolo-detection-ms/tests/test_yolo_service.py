@@ -1,9 +1,19 @@
 import pytest
 import os
+from concurrent.futures import Future
 from unittest.mock import Mock, patch
 from src.services.yolo_service import YOLODetectionService
 from src.config.settings import settings
 
+def _mock_result(boxes, confidences, class_ids):
+    """Resultado de YOLO simulado con las cajas indicadas"""
+    result = Mock()
+    result.boxes = Mock()
+    result.boxes.xyxy.cpu.return_value.numpy.return_value = boxes
+    result.boxes.conf.cpu.return_value.numpy.return_value = confidences
+    result.boxes.cls.cpu.return_value.numpy.return_value.astype.return_value = class_ids
+    return result
+
 class TestYOLOService:
     """Tests para el servicio YOLO"""
     
@@ -23,6 +33,61 @@ class TestYOLOService:
         """Test de inicialización del modelo"""
         assert yolo_service.model is not None
     
+    def test_model_not_loaded_at_construction(self):
+        """Test de carga diferida: crear el servicio no carga el modelo"""
+        with patch('src.services.yolo_service.YOLO') as mock_yolo, \
+                patch.object(settings, "MODEL_LOAD_MODE", "lazy"):
+            service = YOLODetectionService()
+            
+            assert service.model is None
+            assert service.readiness == "unloaded"
+            mock_yolo.assert_not_called()
+            
+            service.ensure_model_loaded()
+            assert service.model is mock_yolo.return_value
+            mock_yolo.assert_called_once()
+    
+    def test_lazy_load_becomes_ready(self):
+        """Test de carga perezosa: la primera inferencia carga y calienta el modelo"""
+        with patch('src.services.yolo_service.YOLO') as mock_yolo, \
+                patch.object(settings, "MODEL_LOAD_MODE", "lazy"), \
+                patch.object(settings, "WARMUP_ENABLED", True):
+            service = YOLODetectionService()
+            service.ensure_model_loaded()
+            
+            assert service.readiness == "ready"
+            assert mock_yolo.return_value.call_count > 0
+            
+            # prepare() no repite el calentamiento
+            calls = mock_yolo.return_value.call_count
+            assert service.prepare() is True
+            assert mock_yolo.return_value.call_count == calls
+    
+    def test_swap_model(self, yolo_service, tmp_path):
+        """Test de reemplazo atómico de los pesos del modelo"""
+        new_weights = tmp_path / "nuevo.pt"
+        new_weights.write_bytes(b"pesos")
+        previous_id = yolo_service.model_id
+        
+        with patch('src.services.yolo_service.YOLO') as mock_yolo:
+            new_model = Mock()
+            mock_yolo.return_value = new_model
+            info = yolo_service.swap_model(str(new_weights))
+        
+        assert yolo_service.model is new_model
+        assert yolo_service.model_id != previous_id
+        assert yolo_service.readiness == "ready"
+        assert info["model_path"] == str(new_weights)
+    
+    def test_swap_model_missing_file(self, yolo_service):
+        """Test de reemplazo con pesos inexistentes"""
+        previous_model = yolo_service.model
+        
+        with pytest.raises(FileNotFoundError):
+            yolo_service.swap_model("no_existe.pt")
+        
+        assert yolo_service.model is previous_model
+    
     def test_get_model_info(self, yolo_service):
         """Test de obtención de información del modelo"""
         info = yolo_service.get_model_info()
@@ -32,6 +97,23 @@ class TestYOLOService:
         assert "confidence_threshold" in info
         assert info["model_type"] == "YOLOv8"
     
+    def test_warmup_marks_service_ready(self, yolo_service):
+        """Test de calentamiento del modelo"""
+        assert yolo_service.warmup(runs=2, batch_sizes=[1, 4]) is True
+        
+        assert yolo_service.readiness == "ready"
+        assert yolo_service.model.call_count == 4
+        batch = yolo_service.model.call_args[0][0]
+        assert len(batch) == 4
+        assert batch[0].shape == (settings.YOLO_IMGSZ, settings.YOLO_IMGSZ, 3)
+    
+    def test_warmup_failure(self, yolo_service):
+        """Test de calentamiento fallido"""
+        yolo_service.model.side_effect = RuntimeError("fallo")
+        
+        assert yolo_service.warmup(runs=1, batch_sizes=[1]) is False
+        assert yolo_service.readiness == "error"
+    
     def test_get_instrument_info_known_class(self, yolo_service):
         """Test de obtención de información de instrumento conocido"""
         # Test con clase conocida
@@ -52,70 +134,215 @@ class TestYOLOService:
         assert "descripcion" in info
         assert info["codigo"].startswith("UNKNOWN-")
     
-    def test_validate_image_valid(self, yolo_service, sample_image):
-        """Test de validación de imagen válida"""
-        is_valid = yolo_service.validate_image(sample_image)
-        assert is_valid is True
+    def test_decode_image_valid(self, yolo_service, sample_image_bytes):
+        """Test de decodificación de imagen en memoria"""
+        image = yolo_service.decode_image(sample_image_bytes.getvalue())
         
-        # Limpiar archivo temporal
-        os.unlink(sample_image)
+        assert image is not None
+        assert image.shape == (100, 100, 3)
+        assert yolo_service.validate_image_array(image) is True
     
-    def test_validate_image_invalid(self, yolo_service):
-        """Test de validación de imagen inválida"""
-        # Archivo que no existe
-        is_valid = yolo_service.validate_image("archivo_inexistente.jpg")
-        assert is_valid is False
+    def test_decode_image_invalid(self, yolo_service):
+        """Test de decodificación de bytes inválidos"""
+        image = yolo_service.decode_image(b"no es una imagen")
+        
+        assert image is None
+        assert yolo_service.validate_image_array(image) is False
     
-    def test_generate_summary(self, yolo_service):
-        """Test de generación de resumen"""
-        # Detecciones de prueba
-        detections = [
-            {
-                "confidence": 0.8,
-                "instrument": {
-                    "codigo": "BISP-001",
-                    "nombre": "Bisturí #11",
-                    "descripcion": "Bisturí hoja número 11"
-                }
-            },
-            {
-                "confidence": 0.9,
-                "instrument": {
-                    "codigo": "BISP-001",
-                    "nombre": "Bisturí #11",
-                    "descripcion": "Bisturí hoja número 11"
-                }
-            },
+    def test_merge_summaries(self, yolo_service):
+        """Test de combinación de resúmenes de varias imágenes"""
+        summaries = [
+            {"BISP-001": {"nombre": "Bisturí #11", "descripcion": "", "cantidad": 2, "confianza_promedio": 0.8}},
             {
-                "confidence": 0.7,
-                "instrument": {
-                    "codigo": "PINZ-001",
-                    "nombre": "Pinza Kelly",
-                    "descripcion": "Pinza hemostática Kelly curva"
-                }
+                "BISP-001": {"nombre": "Bisturí #11", "descripcion": "", "cantidad": 2, "confianza_promedio": 0.9},
+                "PINZ-001": {"nombre": "Pinza Kelly", "descripcion": "", "cantidad": 1, "confianza_promedio": 0.7}
             }
         ]
         
-        summary = yolo_service._generate_summary(detections)
+        merged = yolo_service.merge_summaries(summaries)
+        
+        assert merged["BISP-001"]["cantidad"] == 4
+        assert merged["BISP-001"]["confianza_promedio"] == 0.85
+        assert merged["PINZ-001"]["cantidad"] == 1
+    
+    def test_summarize_arrays(self, yolo_service):
+        """Test de resumen vectorizado desde arreglos"""
+        import numpy as np
+        
+        confidences = np.array([0.8, 0.9, 0.7, 0.6], dtype=np.float32)
+        class_ids = np.array([0, 0, 2, 42])
+        
+        summary = yolo_service._summarize_arrays(confidences, class_ids)
         
-        # Verificar resumen
-        assert "BISP-001" in summary
-        assert "PINZ-001" in summary
         assert summary["BISP-001"]["cantidad"] == 2
-        assert summary["PINZ-001"]["cantidad"] == 1
         assert summary["BISP-001"]["confianza_promedio"] == 0.85
+        assert summary["PINZ-001"]["cantidad"] == 1
+        assert summary["UNKNOWN-042"]["cantidad"] == 1
+    
+    def test_detect_instruments_summary_detail(self, yolo_service):
+        """Test de detección con detalle 'summary' (sin detecciones por caja)"""
+        mock_result = Mock()
+        mock_result.boxes = Mock()
+        mock_result.boxes.xyxy.cpu.return_value.numpy.return_value = [[10, 20, 30, 40], [50, 60, 70, 80]]
+        mock_result.boxes.conf.cpu.return_value.numpy.return_value = [0.8, 0.6]
+        mock_result.boxes.cls.cpu.return_value.numpy.return_value.astype.return_value = [0, 0]
+        
+        yolo_service.model.return_value = [mock_result]
+        
+        result = yolo_service.detect_instruments("a.jpg", detail="summary")
+        
+        assert result["success"] is True
+        assert result["total_objects"] == 2
+        assert result["detections"] == []
+        assert result["summary"]["BISP-001"]["cantidad"] == 2
+        assert result["summary"]["BISP-001"]["confianza_promedio"] == 0.7
+    
+    def test_detect_instruments_columnar_detail(self, yolo_service):
+        """Test de detecciones en columnas con la tabla de clases una sola vez"""
+        yolo_service.model.return_value = [
+            _mock_result([[10, 20, 30, 40], [50, 60, 70, 80], [1, 2, 3, 4]], [0.8, 0.6, 0.7], [0, 0, 2])
+        ]
+        
+        result = yolo_service.detect_instruments("a.jpg", detail="columnar")
+        detections = result["detections"]
+        
+        assert detections["boxes"][1] == [50, 60, 70, 80]
+        assert detections["class_ids"] == [0, 0, 2]
+        assert [item["codigo"] for item in detections["classes"]] == ["BISP-001", "PINZ-001"]
+        assert result["summary"]["BISP-001"]["cantidad"] == 2
+    
+    def test_detect_instruments_batch(self, yolo_service):
+        """Test de detección por lotes en una sola pasada del modelo"""
+        mock_result = Mock()
+        mock_result.boxes = Mock()
+        mock_result.boxes.xyxy.cpu.return_value.numpy.return_value = [[10, 20, 30, 40]]
+        mock_result.boxes.conf.cpu.return_value.numpy.return_value = [0.8]
+        mock_result.boxes.cls.cpu.return_value.numpy.return_value.astype.return_value = [0]
+        
+        yolo_service.model.return_value = [mock_result, mock_result, mock_result]
+        
+        results = yolo_service.detect_instruments_batch(["a.jpg", "b.jpg", "c.jpg"])
+        
+        assert len(results) == 3
+        assert all(result["success"] for result in results)
+        assert yolo_service.model.call_count == 1
+    
+    def test_detect_instruments_scaled_boxes(self, yolo_service):
+        """Test de cajas devueltas en coordenadas de la imagen original"""
+        mock_result = Mock()
+        mock_result.boxes = Mock()
+        mock_result.boxes.xyxy.cpu.return_value.numpy.return_value = [[10, 20, 30, 40]]
+        mock_result.boxes.conf.cpu.return_value.numpy.return_value = [0.8]
+        mock_result.boxes.cls.cpu.return_value.numpy.return_value.astype.return_value = [0]
+        
+        yolo_service.model.return_value = [mock_result]
+        
+        result = yolo_service.detect_instruments("a.jpg", scale=(2.0, 4.0))
+        
+        assert result["detections"][0]["bbox"] == {"x1": 20.0, "y1": 80.0, "x2": 60.0, "y2": 160.0}
+    
+    def test_detect_instruments_sliced(self, yolo_service):
+        """Test de detección por ventanas: cajas trasladadas y fusionadas entre ventanas"""
+        import numpy as np
+        
+        def tile_result(boxes, confidence):
+            result = Mock()
+            result.boxes = Mock()
+            result.boxes.xyxy.cpu.return_value.numpy.return_value = boxes
+            result.boxes.conf.cpu.return_value.numpy.return_value = [confidence] * len(boxes)
+            result.boxes.cls.cpu.return_value.numpy.return_value.astype.return_value = [0] * len(boxes)
+            return result
+        
+        # Imagen 100x180 con ventanas de 100 y solapamiento 0.2 -> x = 0 y 80
+        image = np.zeros((100, 180, 3), dtype=np.uint8)
+        yolo_service.model.return_value = [
+            tile_result([[85, 10, 100, 30]], 0.6),  # fragmento cortado por el borde
+            tile_result([[0, 10, 40, 30]], 0.9)     # mismo objeto en la segunda ventana
+        ]
+        
+        with patch.object(settings, "SLICED_TILE_SIZE", 100), \
+                patch.object(settings, "SLICED_OVERLAP", 0.2), \
+                patch.object(settings, "SLICED_INCLUDE_FULL_IMAGE", False):
+            result = yolo_service.detect_instruments(image, sliced=True)
+        
+        assert result["success"] is True
+        assert result["total_objects"] == 1
+        assert result["detections"][0]["bbox"]["x2"] == 120
+        assert result["sliced"]["tiles"] == 2
+        assert result["sliced"]["merged_boxes"] == 1
+        assert yolo_service.model.call_count == 1
+    
+    def _register_fast_model(self, yolo_service):
+        """Registrar un modelo 'rapido' simulado junto al principal"""
+        fast = YOLODetectionService("rapido.pt", name="rapido")
+        fast.model = Mock()
+        yolo_service._models["rapido"] = fast
+        return fast
+    
+    def test_detect_instruments_with_named_model(self, yolo_service):
+        """Test de selección de modelo por solicitud"""
+        fast = self._register_fast_model(yolo_service)
+        fast.model.return_value = [_mock_result([[10, 20, 30, 40]], [0.9], [0])]
+        
+        with patch.dict(settings.YOLO_MODELS, {"rapido": "rapido.pt"}):
+            assert "rapido" in yolo_service.available_models()
+            result = yolo_service.detect_instruments("a.jpg", model="rapido")
+            unknown = yolo_service.detect_instruments("a.jpg", model="inexistente")
+        
+        assert result["success"] is True
+        assert result["model"] == "rapido"
+        fast.model.assert_called_once()
+        yolo_service.model.assert_not_called()
+        assert unknown["success"] is False
+    
+    def test_cascade_accepts_confident_detections(self, yolo_service):
+        """Test de cascada sin escalar cuando el modelo rápido está seguro"""
+        import numpy as np
+        fast = self._register_fast_model(yolo_service)
+        fast.model.return_value = [_mock_result([[10, 20, 30, 40]], [0.95], [0])]
+        
+        with patch.dict(settings.YOLO_MODELS, {"rapido": "rapido.pt"}), \
+                patch.object(settings, "CASCADE_ENABLED", True), \
+                patch.object(settings, "CASCADE_FAST_MODEL", "rapido"):
+            result = yolo_service.detect_instruments(np.zeros((100, 100, 3), dtype=np.uint8))
+        
+        assert result["model"] == "cascade"
+        assert result["cascade"]["escalation"] == "none"
+        assert result["total_objects"] == 1
+        yolo_service.model.assert_not_called()
+    
+    def test_cascade_escalates_ambiguous_regions(self, yolo_service):
+        """Test de cascada que escala solo la región dudosa al modelo preciso"""
+        import numpy as np
+        fast = self._register_fast_model(yolo_service)
+        fast.model.return_value = [
+            _mock_result([[10, 10, 30, 30], [100, 100, 140, 140]], [0.95, 0.4], [0, 1])
+        ]
+        # El modelo preciso confirma el objeto dudoso dentro del recorte
+        yolo_service.model.return_value = [_mock_result([[16, 16, 56, 56]], [0.88], [1])]
+        
+        with patch.dict(settings.YOLO_MODELS, {"rapido": "rapido.pt"}), \
+                patch.object(settings, "CASCADE_ENABLED", True), \
+                patch.object(settings, "CASCADE_FAST_MODEL", "rapido"), \
+                patch.object(settings, "CASCADE_ESCALATION", "regions"):
+            result = yolo_service.detect_instruments(np.zeros((200, 200, 3), dtype=np.uint8))
+        
+        assert result["cascade"]["escalation"] == "regions"
+        assert result["cascade"]["escalated_regions"] == 1
+        assert result["total_objects"] == 2
+        
+        crop = yolo_service.model.call_args[0][0][0]
+        assert crop.shape[:2] == (72, 72)
+        confirmed = [d for d in result["detections"] if d["class_id"] == 1][0]
+        assert confirmed["bbox"]["x1"] == 100.0
+        assert confirmed["confidence"] == pytest.approx(0.88)
     
     @patch('src.services.yolo_service.cv2.imread')
-    @patch('src.services.yolo_service.Image.open')
-    def test_detect_instruments_success(self, mock_pil_open, mock_cv2_imread, yolo_service, sample_image):
+    def test_detect_instruments_success(self, mock_cv2_imread, yolo_service, sample_image):
         """Test de detección exitosa de instrumentos"""
         # Mock de OpenCV
         mock_cv2_imread.return_value = Mock()  # Imagen válida
         
-        # Mock de PIL
-        mock_pil_image = Mock()
-        mock_pil_open.return_value.__enter__.return_value = mock_pil_image
-        
         # Mock del resultado de YOLO
         mock_result = Mock()
         mock_result.boxes = Mock()
@@ -137,6 +364,18 @@ class TestYOLOService:
         # Limpiar archivo temporal
         os.unlink(sample_image)
     
+    def test_predict_batch_timeout(self, yolo_service):
+        """Test de que la espera por el lote tiene tiempo límite"""
+        pending = Future()
+        yolo_service._batcher = Mock()
+        yolo_service._batcher.submit.return_value = pending
+        
+        with patch.object(settings, "BATCH_RESULT_TIMEOUT_SECONDS", 0.05):
+            with pytest.raises(RuntimeError):
+                yolo_service._predict("imagen.jpg", 0.5, 0.45)
+        
+        assert pending.cancelled()
+    
     def test_detect_instruments_model_not_loaded(self):
         """Test de detección sin modelo cargado"""
         service = YOLODetectionService()